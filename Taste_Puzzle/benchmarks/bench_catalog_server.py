@@ -0,0 +1,201 @@
+"""Нагрузочный тест сервиса каталога (src.modules.catalog_server).
+
+Сервис запускается в отдельном процессе над синтетической базой, а
+терминалы - в своих процессах: каждый через RemoteDataBase повторяет
+запросы главного окна (счетчики по типам блюд, страницы карточек двух
+типов, счетчики фильтров) со случайными фильтрами. Режимы:
+  * etag      - клиент отправляет If-None-Match, неизменные ответы приходят 304;
+  * no-etag   - клиент ничего не хранит, каждый ответ передается целиком;
+  * writes    - etag и доля записей (избранное), которые сбрасывают кэш ответов;
+  * images    - повторная загрузка изображений карточек по ETag.
+Для каждого режима печатаются запросов в секунду, задержки p50/p95 и доля 304.
+
+Запуск из корня проекта:
+    python benchmarks/bench_catalog_server.py [рецептов] [терминалов] [секунд на режим]
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+
+from src.database import Base, DataBase
+from src.modules.remote_database import RemoteDataBase
+
+DISH_TYPES = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
+CUISINES_COUNT = 10
+FAVORITES_PER_USER = 300
+PAGE_SIZE = 24
+# Запись (избранное) в режиме writes - в одном цикле терминала из пяти, около 5% запросов
+WRITE_CHANCE = 0.2
+# Фильтры терминалов: набор небольшой, поэтому одни и те же запросы повторяются, как у живых терминалов
+FILTERS = [
+    {},
+    {'cuisine': "Кухня 3"},
+    {'max_time': 30},
+    {'favorites_only': True},
+    {'nutrition_ranges': {'calories': (None, 500)}},
+]
+MODES = ('etag', 'no-etag', 'writes', 'images')
+
+
+def build_database(path, recipes_count, users_count, rng):
+    """Создает базу с рецептами, КБЖУ, изображениями из img/recipe_img и избранным пользователей"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    images = DataBase.STOCK_IMAGES
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO Users (id, login, password) VALUES (?, ?, 'bench')",
+                           [(user_id, f"terminal{user_id}") for user_id in range(1, users_count + 1)])
+    connection.executemany("INSERT INTO Dish_types (id, name) VALUES (?, ?)", list(enumerate(DISH_TYPES, start=1)))
+    connection.executemany(
+        "INSERT INTO Cuisines (id, name) VALUES (?, ?)",
+        [(cuisine_id, f"Кухня {cuisine_id}") for cuisine_id in range(1, CUISINES_COUNT + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, dish_type_id, cuisine_id, cook_time, image) "
+        "VALUES (?, 1, ?, ?, ?, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.randint(1, len(DISH_TYPES)),
+          rng.choice([None] + list(range(1, CUISINES_COUNT + 1))), rng.choice([None] + list(range(5, 150))),
+          rng.choice(images)) for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Nutrition (recipe_id, calories, proteins, fats, carbohydrates, computed) VALUES (?, ?, ?, ?, ?, 1)",
+        [(recipe_id, rng.randint(0, 1200), rng.random() * 60, rng.random() * 60, rng.random() * 120)
+         for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Favorites (user_id, recipe_id) VALUES (?, ?)",
+        [(user_id, recipe_id) for user_id in range(1, users_count + 1)
+         for recipe_id in rng.sample(range(1, recipes_count + 1), FAVORITES_PER_USER)]
+    )
+    connection.commit()
+    connection.close()
+
+
+def run_server(path, ports):
+    """Процесс сервиса: порт выбирает ОС и сообщает его через очередь"""
+    from src.modules.catalog_server import CatalogServer
+
+    server = CatalogServer(('127.0.0.1', 0), path, prepare=False)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+class CountingRemoteDataBase(RemoteDataBase):
+    """Терминал-заглушка: RemoteDataBase, считающий ответы по статусам"""
+
+    def __init__(self, url, cache_dir, conditional=True):
+        self.statuses = {}
+        self.conditional = conditional
+        super().__init__(url, cache_dir)
+
+    def request(self, method, path, body=None, headers=None):
+        if not self.conditional and headers:
+            headers.pop('If-None-Match', None)
+        status, response_headers, response_body = super().request(method, path, body, headers)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        return status, response_headers, response_body
+
+
+def terminal(url, user_id, mode, duration, recipes_count, cache_dir):
+    """Процесс терминала: (запросов, задержки в секундах, ответы по статусам)"""
+    rng = random.Random(user_id)
+    db = CountingRemoteDataBase(url, cache_dir, conditional=mode != 'no-etag')
+    db.statuses.clear()
+    latencies = []
+
+    def call(func, *args, **kwargs):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+
+    deadline = time.perf_counter() + duration
+    if mode == 'images':
+        paths = DataBase.STOCK_IMAGES
+        etags = {}
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            headers = {'If-None-Match': etags[path]} if path in etags else {}
+            start = time.perf_counter()
+            _, response_headers, _ = db.request('GET', '/images/' + path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            etags[path] = response_headers.get('ETag')
+        return len(latencies), latencies, db.statuses
+
+    while time.perf_counter() < deadline:
+        filters = rng.choice(FILTERS)
+        call(db.count_recipes_by_dish_type, user_id, **filters)
+        for dish_type in rng.sample(DISH_TYPES, 2):
+            call(db.get_recipes_page, user_id, dish_type, page_size=PAGE_SIZE, **filters)
+        call(db.get_filter_facets, user_id, **filters)
+        if mode == 'writes' and rng.random() < WRITE_CHANCE:
+            call(db.toggle_favorite, user_id, rng.randint(1, recipes_count))
+    return len(latencies), latencies, db.statuses
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    terminals = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, terminals, rng)
+        DataBase(path, prepare=False)._create_additional_tables()
+        print(f"База: {recipes_count} рецептов, {terminals} терминалов, создана за {time.perf_counter() - start:.1f} с")
+
+        context = multiprocessing.get_context('spawn')
+        ports = context.Queue()
+        server = context.Process(target=run_server, args=(path, ports), daemon=True)
+        server.start()
+        url = f"http://127.0.0.1:{ports.get(timeout=120)}"
+
+        with ProcessPoolExecutor(max_workers=terminals, mp_context=context) as executor:
+            # Прогрев: запуск процессов терминалов, первые запросы к базе и кэш ответов сервиса
+            list(executor.map(terminal, [url] * terminals, range(1, terminals + 1), ['etag'] * terminals,
+                              [1] * terminals, [recipes_count] * terminals,
+                              [os.path.join(directory, f"cache-warmup-{index}") for index in range(terminals)]))
+            for mode in MODES:
+                cache_dirs = [os.path.join(directory, f"cache-{mode}-{index}") for index in range(terminals)]
+                start = time.perf_counter()
+                results = list(executor.map(terminal, [url] * terminals, range(1, terminals + 1),
+                                            [mode] * terminals, [duration] * terminals,
+                                            [recipes_count] * terminals, cache_dirs))
+                elapsed = time.perf_counter() - start
+
+                requests = sum(count for count, _, _ in results)
+                latencies = [latency for _, values, _ in results for latency in values]
+                statuses = {}
+                for _, _, counts in results:
+                    for status, count in counts.items():
+                        statuses[status] = statuses.get(status, 0) + count
+                answered = sum(statuses.values()) or 1
+                print(f"{mode:<8} {requests / elapsed:7.0f} запросов/с, p50 {percentile(latencies, 0.5) * 1000:6.1f} мс, "
+                      f"p95 {percentile(latencies, 0.95) * 1000:6.1f} мс, 304: {statuses.get(304, 0) / answered * 100:4.0f}%"
+                      + (f", ошибок: {answered - statuses.get(200, 0) - statuses.get(304, 0)}"
+                         if answered != statuses.get(200, 0) + statuses.get(304, 0) else ""))
+
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
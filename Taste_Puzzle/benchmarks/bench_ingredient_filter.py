@@ -0,0 +1,148 @@
+"""Бенчмарк фильтра «рецепт содержит все выбранные ингредиенты».
+
+Сравнивает на синтетической базе два способа:
+  * intersect - прежняя реализация: отдельный ILIKE-запрос на каждое название
+                и цепочка вложенных INTERSECT по подзапросу на ингредиент;
+  * group by  - DataBase._ingredient_match_subquery: одно соединение с таблицей
+                шаблонов и GROUP BY recipe_id HAVING COUNT(DISTINCT term) = k.
+
+Запуск из корня проекта:
+    python benchmarks/bench_ingredient_filter.py [рецептов] [макс_ингредиентов]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+
+from src.database import Base, DataBase, Ingredient, Recipe, recipe_ingredients
+
+INGREDIENTS_COUNT = 2000
+INGREDIENTS_PER_RECIPE = (4, 14)
+REPEATS = 3
+
+
+def build_database(path, recipes_count, rng):
+    """Создает базу с recipes_count рецептами; популярные ингредиенты встречаются чаще"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    weights = [1 / (rank + 1) for rank in range(INGREDIENTS_COUNT)]
+    population = list(range(1, INGREDIENTS_COUNT + 1))
+
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO Users (id, login, password) VALUES (?, ?, ?)", [(1, "bench", "bench")])
+    # Суффикс "x" не дает одному названию оказаться подстрокой другого при ILIKE '%...%'
+    connection.executemany(
+        "INSERT INTO Ingredients (id, name) VALUES (?, ?)",
+        [(ingredient_id, f"ing{ingredient_id:04d}x") for ingredient_id in population]
+    )
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, cook_time) VALUES (?, 1, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.randint(5, 120)) for recipe_id in range(1, recipes_count + 1)]
+    )
+
+    rows = []
+    for recipe_id in range(1, recipes_count + 1):
+        for ingredient_id in set(rng.choices(population, weights, k=rng.randint(*INGREDIENTS_PER_RECIPE))):
+            rows.append((recipe_id, ingredient_id, 1.0))
+    connection.executemany(
+        "INSERT INTO Recipe_ingredients (recipe_id, ingredient_id, quantity) VALUES (?, ?, ?)", rows
+    )
+    connection.commit()
+    connection.close()
+
+
+def open_database(path):
+    """DataBase поверх готового файла без миграций и обработки изображений"""
+    db = DataBase(path, prepare=False)
+    db._create_additional_tables()
+    return db
+
+
+def intersect_chain_ids(session, names):
+    """Прежняя реализация фильтра по ингредиентам (цепочка INTERSECT)"""
+    subqueries = []
+    for name in names:
+        matching = session.query(Ingredient).filter(Ingredient.name.ilike(f"%{name}%")).all()
+        if not matching:
+            return set()
+        subqueries.append(session.query(recipe_ingredients.c.recipe_id).filter(
+            recipe_ingredients.c.ingredient_id.in_([ingredient.id for ingredient in matching])
+        ).subquery())
+
+    combined = subqueries[0]
+    for subquery in subqueries[1:]:
+        combined = session.query(*combined.c).intersect(
+            session.query(subquery.c.recipe_id)
+        ).subquery()
+
+    # После INTERSECT у подзапроса единственный столбец с автоматическим именем
+    query = session.query(Recipe.id).filter(Recipe.id.in_(select(*combined.c)))
+    return {row[0] for row in query}
+
+
+def group_by_ids(db, session, names):
+    subquery = db._ingredient_match_subquery(names, DataBase.INGREDIENT_MODE_ALL)
+    query = session.query(Recipe.id).filter(Recipe.id.in_(subquery))
+    return {row[0] for row in query}
+
+
+def measure(func):
+    timings = []
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    max_selected = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с")
+
+        db = open_database(path)
+        session = db.Session()
+        try:
+            print(f"{'k':>3} {'intersect, мс':>14} {'group by, мс':>13} {'рецептов':>9}")
+            for selected_count in range(1, max_selected + 1):
+                # Берем ингредиенты из самых популярных, чтобы при малом k результат был непустым
+                names = [f"ing{ingredient_id:04d}x" for ingredient_id in rng.sample(range(1, 41), selected_count)]
+
+                group_time, result = measure(lambda: group_by_ids(db, session, names))
+                try:
+                    intersect_time, expected = measure(lambda: intersect_chain_ids(session, names))
+                except OperationalError as e:
+                    # Глубоко вложенные INTERSECT упираются в ограничения парсера SQLite
+                    session.rollback()
+                    intersect_column = "ошибка"
+                    status = f"  intersect: {e.orig}"
+                else:
+                    intersect_column = f"{intersect_time * 1000:.1f}"
+                    status = "" if result == expected else "  РАСХОЖДЕНИЕ"
+
+                print(f"{selected_count:>3} {intersect_column:>14} {group_time * 1000:>13.1f} "
+                      f"{len(result):>9}{status}")
+        finally:
+            session.close()
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Бенчмарк составления плана питания и пакетной записи продуктов в корзину.
+
+Для нескольких наборов целей замеряет MealPlanner.plan на каталоге
+рецептов, проверяет, что рецепты в плане не повторяются и укладываются в
+бюджет времени, и печатает отклонение дневного КБЖУ от целей. Затем
+сравнивает запись продуктов плана в корзину одной транзакцией
+(DataBase.add_cart_items) с поштучным add_cart_item и сверяет содержимое
+корзины после обоих способов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_meal_planner.py [рецептов]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+
+from src.database import Base, DataBase
+from src.modules.meal_planner import MACROS, MealPlanner, shopping_list
+
+DISH_TYPES = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
+INGREDIENTS_COUNT = 500
+INGREDIENTS_PER_RECIPE = (4, 12)
+UNITS = ["г", "мл", "шт", "ст.л."]
+NUTRITION_SHARE = 0.9
+FAVORITES_COUNT = 1000
+REPEATS = 5
+# Время плана, которое считается приемлемым для интерфейса
+PLAN_TIME_LIMIT = 1.0
+
+TARGETS = {
+    "2000 ккал, 100/70/250": ({'calories': 2000, 'proteins': 100, 'fats': 70, 'carbohydrates': 250}, None),
+    "1600 ккал, белки 120 г, до 90 минут в день": ({'calories': 1600, 'proteins': 120}, 90),
+    "2500 ккал, до 60 минут в день": ({'calories': 2500}, 60),
+}
+
+
+def build_database(path, recipes_count, rng):
+    """Создает базу с рецептами, КБЖУ на порцию, временем готовки и ингредиентами"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO Users (id, login, password) VALUES (1, 'bench', 'bench')")
+    connection.executemany("INSERT INTO Dish_types (id, name) VALUES (?, ?)", list(enumerate(DISH_TYPES, start=1)))
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, dish_type_id, cook_time) VALUES (?, 1, ?, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.randint(1, len(DISH_TYPES)), rng.choice([None] + list(range(5, 150))))
+         for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Nutrition (recipe_id, calories, proteins, fats, carbohydrates, computed) VALUES (?, ?, ?, ?, ?, 1)",
+        [(recipe_id, rng.randint(50, 1200), round(rng.random() * 60, 1), round(rng.random() * 60, 1),
+          round(rng.random() * 120, 1)) for recipe_id in range(1, recipes_count + 1) if rng.random() < NUTRITION_SHARE]
+    )
+    connection.executemany("INSERT INTO Ingredients (id, name) VALUES (?, ?)",
+                           [(ingredient_id, f"Продукт {ingredient_id}")
+                            for ingredient_id in range(1, INGREDIENTS_COUNT + 1)])
+    connection.executemany(
+        "INSERT INTO Recipe_ingredients (recipe_id, ingredient_id, quantity) VALUES (?, ?, ?)",
+        [(recipe_id, ingredient_id, f"{rng.randint(1, 500)} {rng.choice(UNITS)}")
+         for recipe_id in range(1, recipes_count + 1)
+         for ingredient_id in rng.sample(range(1, INGREDIENTS_COUNT + 1), rng.randint(*INGREDIENTS_PER_RECIPE))]
+    )
+    connection.executemany("INSERT INTO Favorites (user_id, recipe_id) VALUES (1, ?)",
+                           [(recipe_id,) for recipe_id in rng.sample(range(1, recipes_count + 1), FAVORITES_COUNT)])
+    connection.commit()
+    connection.close()
+
+
+def open_database(path):
+    """DataBase поверх готового файла без миграций и обработки изображений"""
+    db = DataBase(path, prepare=False)
+    db._create_additional_tables()
+    return db
+
+
+def measure(func, repeats=REPEATS):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def cart_contents(db):
+    return sorted((item['name'], item['quantity'], item['unit']) for item in db.get_cart_items(1))
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с")
+
+        db = open_database(path)
+        try:
+            load_time, planner = measure(lambda: MealPlanner.from_database(db, 1), repeats=1)
+            print(f"Данные плана: {len(planner.recipe_ids)} рецептов с КБЖУ, загружены за {load_time * 1000:.0f} мс")
+
+            plan = None
+            for label, (targets, max_day_minutes) in TARGETS.items():
+                plan_time, plan = measure(lambda: planner.plan(days=7, meals_per_day=3, targets=targets,
+                                                               max_day_minutes=max_day_minutes, seed=1))
+                recipe_ids = [recipe_id for day in plan['days'] for recipe_id in day]
+                unique = len(set(recipe_ids)) == len(recipe_ids)
+                in_budget = max_day_minutes is None or all(day['minutes'] <= max_day_minutes
+                                                           for day in plan['totals'])
+                deviations = ", ".join(
+                    f"{macro} {max(abs(day[macro] / value - 1) for day in plan['totals']) * 100:.0f}%"
+                    for macro, value in targets.items() if macro in MACROS
+                )
+                status = "OK" if unique and in_budget and plan_time < PLAN_TIME_LIMIT else "ОШИБКА"
+                print(f"\n{label}: план за {plan_time * 1000:.0f} мс, без повторов {unique}, "
+                      f"в бюджете времени {in_budget}, проверка {status}")
+                print(f"  наибольшее отклонение дня от цели: {deviations}")
+
+            recipe_ids = [recipe_id for day in plan['days'] for recipe_id in day]
+            list_time, ingredients = measure(lambda: shopping_list(db, recipe_ids))
+            print(f"\nПродукты плана: {len(ingredients)} позиций, собраны за {list_time * 1000:.1f} мс")
+
+            db.clear_cart(1)
+            start = time.perf_counter()
+            for name, quantity, unit in ingredients:
+                db.add_cart_item(1, name, quantity, unit)
+            single_time = time.perf_counter() - start
+            expected = cart_contents(db)
+
+            db.clear_cart(1)
+            start = time.perf_counter()
+            added = db.add_cart_items(1, ingredients)
+            batch_time = time.perf_counter() - start
+            status = "OK" if cart_contents(db) == expected and added == len(ingredients) else "РАСХОЖДЕНИЕ"
+            print(f"Корзина: поштучно {single_time * 1000:.0f} мс, одной транзакцией {batch_time * 1000:.0f} мс, "
+                  f"сверка {status}")
+        finally:
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Бенчмарк подбора рецептов по кладовой (PantryIndex).
+
+Строит синтетический каталог и замеряет оценку всего каталога по кладовой
+заданного размера. Для сверки считает тот же результат полным перебором.
+
+Запуск из корня проекта:
+    python benchmarks/bench_pantry_matcher.py [рецептов] [размер_кладовой]
+"""
+import os
+import random
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.modules.pantry_matcher import PantryIndex
+
+INGREDIENTS_COUNT = 2000
+INGREDIENTS_PER_RECIPE = (4, 14)
+REPEATS = 20
+
+
+def make_catalogue(recipes_count, rng):
+    """Пары (recipe_id, ingredient_id); популярные ингредиенты встречаются чаще"""
+    weights = [1 / (rank + 1) for rank in range(INGREDIENTS_COUNT)]
+    population = list(range(1, INGREDIENTS_COUNT + 1))
+
+    pairs = []
+    for recipe_id in range(1, recipes_count + 1):
+        size = rng.randint(*INGREDIENTS_PER_RECIPE)
+        ingredients = set(rng.choices(population, weights, k=size))
+        pairs.extend((recipe_id, ingredient_id) for ingredient_id in ingredients)
+    return pairs
+
+
+def brute_force(pairs, pantry, max_missing=2):
+    recipes = {}
+    for recipe_id, ingredient_id in pairs:
+        recipes.setdefault(recipe_id, set()).add(ingredient_id)
+    return {
+        recipe_id for recipe_id, ingredients in recipes.items()
+        if ingredients & pantry and len(ingredients - pantry) <= max_missing
+    }
+
+
+def measure(func):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    pantry_size = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    rng = random.Random(42)
+
+    pairs = make_catalogue(recipes_count, rng)
+
+    start = time.perf_counter()
+    index = PantryIndex(pairs)
+    build_time = time.perf_counter() - start
+    print(f"Каталог: {recipes_count} рецептов, {len(pairs)} связей; индекс построен за {build_time * 1000:.0f} мс")
+
+    # Кладовая из самых ходовых продуктов - худший случай по длине списков рецептов
+    pantry = set(range(1, pantry_size + 1))
+
+    # Первый вызов дополнительно строит битовые множества использованных ингредиентов
+    start = time.perf_counter()
+    index.match(pantry)
+    print(f"Первый подбор (с построением битовых множеств): {(time.perf_counter() - start) * 1000:.1f} мс")
+
+    result = index.match(pantry)
+    counts = [sum(1 for _, missing in result if len(missing) == k) for k in range(3)]
+    print(f"Можно приготовить: {counts[0]}, не хватает 1: {counts[1]}, не хватает 2: {counts[2]}")
+
+    for label, limit in (("все рецепты", None), ("до 200 на группу, как в диалоге", 200)):
+        timings = measure(lambda: index.match(pantry, limit=limit))
+        print(f"Кладовая из {pantry_size} продуктов, {label}: медиана {timings[len(timings) // 2] * 1000:.1f} мс, "
+              f"максимум {timings[-1] * 1000:.1f} мс")
+
+    expected = brute_force(pairs, pantry)
+    print("Сверка с перебором:", "OK" if expected == {recipe_id for recipe_id, _ in result} else "РАСХОЖДЕНИЕ")
+
+
+if __name__ == "__main__":
+    main()
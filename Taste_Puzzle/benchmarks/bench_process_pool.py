@@ -0,0 +1,126 @@
+"""Бенчмарк слоя данных без Qt: расчет КБЖУ каталога в пуле процессов.
+
+DataBase передается в задачи ProcessPoolExecutor (запуск процессов через
+spawn, как в Windows): при передаче копируется только путь к файлу, и
+каждый процесс открывает свое подключение. Бенчмарк сравнивает расчет КБЖУ
+всего каталога в одном процессе и порциями в пуле, сверяет результаты и
+проверяет, что ни основной процесс, ни процессы пула не загрузили PyQt6.
+
+Запуск из корня проекта:
+    python benchmarks/bench_process_pool.py [рецептов] [процессов]
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+
+from src.database import Base, DataBase
+from src.modules.nutrition_calculator import NutritionCalculator
+
+INGREDIENTS_COUNT = 500
+INGREDIENTS_PER_RECIPE = (4, 12)
+QUANTITIES = ["{} г", "{} мл", "{} шт", "{} ст.л.", "{} ч.л.", "{} стакана", "по вкусу"]
+CHUNKS_PER_WORKER = 4
+
+
+def build_database(path, recipes_count, rng):
+    """Создает базу с рецептами, ингредиентами с количествами и КБЖУ ингредиентов"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO Users (id, login, password) VALUES (1, 'bench', 'bench')")
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, servings) VALUES (?, 1, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.choice([None, 1, 2, 4, 6]))
+         for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany("INSERT INTO Ingredients (id, name) VALUES (?, ?)",
+                           [(ingredient_id, f"Продукт {ingredient_id}")
+                            for ingredient_id in range(1, INGREDIENTS_COUNT + 1)])
+    connection.executemany(
+        "INSERT INTO ingredient_nutrition (ingredient_id, calories, proteins, fats, carbohydrates, density, "
+        "piece_grams) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(ingredient_id, rng.randint(0, 900), rng.random() * 30, rng.random() * 30, rng.random() * 80,
+          rng.choice([None, 0.9, 1.0, 1.1]), rng.choice([None, 50, 120]))
+         for ingredient_id in range(1, INGREDIENTS_COUNT + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Recipe_ingredients (recipe_id, ingredient_id, quantity) VALUES (?, ?, ?)",
+        [(recipe_id, ingredient_id, rng.choice(QUANTITIES).format(rng.randint(1, 500)))
+         for recipe_id in range(1, recipes_count + 1)
+         for ingredient_id in rng.sample(range(1, INGREDIENTS_COUNT + 1), rng.randint(*INGREDIENTS_PER_RECIPE))]
+    )
+    connection.commit()
+    connection.close()
+
+
+def compute_nutrition(db, recipe_ids):
+    """Задача пула: КБЖУ порции рецептов (None - всех) и признак того, что процесс загрузил PyQt6"""
+    calculator = NutritionCalculator.from_database(db)
+    values = calculator.compute(db.get_recipe_quantities(recipe_ids), db.get_recipe_servings(recipe_ids))
+    return values, 'PyQt6' in sys.modules
+
+
+def same_values(left, right):
+    """Совпадение результатов с точностью до округления: порядок суммирования в порциях другой"""
+    return left.keys() == right.keys() and all(
+        abs(a - b) <= (1 if index == 0 else 0.1)
+        for recipe_id, value in left.items() for index, (a, b) in enumerate(zip(value, right[recipe_id]))
+    )
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else min(4, os.cpu_count() or 1)
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с")
+
+        db = DataBase(path, prepare=False)
+        recipe_ids = list(range(1, recipes_count + 1))
+
+        start = time.perf_counter()
+        expected, _ = compute_nutrition(db, None)  # весь каталог, как recompute_nutrition по умолчанию
+        single_time = time.perf_counter() - start
+        print(f"Один процесс: {len(expected)} рецептов за {single_time * 1000:.0f} мс")
+
+        chunk_size = -(-recipes_count // (workers * CHUNKS_PER_WORKER))
+        chunks = [recipe_ids[index:index + chunk_size] for index in range(0, recipes_count, chunk_size)]
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            start = time.perf_counter()
+            list(executor.map(compute_nutrition, [db] * workers, [[1]] * workers))
+            spawn_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = list(executor.map(compute_nutrition, [db] * len(chunks), chunks))
+            pool_time = time.perf_counter() - start
+
+        values = {}
+        for chunk_values, _ in results:
+            values.update(chunk_values)
+        qt_loaded = 'PyQt6' in sys.modules or any(loaded for _, loaded in results)
+        status = "OK" if same_values(values, expected) else "РАСХОЖДЕНИЕ"
+        print(f"Пул из {workers} процессов: {len(chunks)} порций за {pool_time * 1000:.0f} мс "
+              f"(запуск процессов {spawn_time * 1000:.0f} мс), сверка {status}")
+        print(f"PyQt6 загружен: {'да - ОШИБКА' if qt_loaded else 'нет'}")
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Микробенчмарк построения карточек рецептов.
+
+Сравнивает два варианта:
+  * shared   - карточки создаются внутри окна с общей таблицей стилей (как сейчас);
+  * per-card - каждая карточка дополнительно получает собственный setStyleSheet,
+               как было до перехода на общую тему.
+
+Запуск из корня проекта:
+    python benchmarks/bench_recipe_cards.py [количество_карточек]
+"""
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QWidget
+
+from src.main_window import RecipeCard
+from src.modules.theme import RECIPE_CARD_STYLE, apply_theme
+
+
+class StubImageSource:
+    """Источник изображений без обращения к БД: все карточки получают заглушку"""
+
+    def get_recipe_image_path(self, recipe_id):
+        return None
+
+
+def make_recipe(index):
+    """Кортеж рецепта в формате get_recipes_with_filters"""
+    return (index, 1, f"Рецепт {index}", "", "", "", "", "", 30, 4,
+            None, None, None, None, None, index % 2 == 0, index % 3 == 0,
+            "Итальянская", "Основные блюда")
+
+
+def build_cards(count, per_card_style):
+    app = QApplication.instance()
+    window = QWidget()
+    apply_theme(window)
+    window.user_id = 1
+    db = StubImageSource()
+
+    start = time.perf_counter()
+    cards = []
+    for index in range(count):
+        card = RecipeCard(make_recipe(index), db, window)
+        if per_card_style:
+            card.setStyleSheet(RECIPE_CARD_STYLE)
+        cards.append(card)
+    window.show()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    app = QApplication(sys.argv)
+
+    # Прогрев: первый запуск включает загрузку шрифтов и плагинов
+    build_cards(10, False)
+
+    for label, per_card_style in (("shared", False), ("per-card", True)):
+        elapsed = build_cards(count, per_card_style)
+        print(f"{label:>8}: {count} карточек за {elapsed * 1000:.1f} мс "
+              f"({elapsed * 1000 / count:.2f} мс/карточка)")
+
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Бенчмарк каталога рецептов в памяти против запросов к SQLite.
+
+Для наборов фильтров и сортировок сравнивает отбор ID рецептов
+(RecipeCatalog.select_ids против SQL-запроса с теми же фильтрами), полный
+DataBase.get_recipes_with_filters и счетчики фильтров get_filter_facets
+с каталогом и без него, сверяя результаты. Отдельно замеряет загрузку
+каталога и обработку записи (избранное, изменение рецепта).
+
+Запуск из корня проекта:
+    python benchmarks/bench_recipe_catalog.py [рецептов]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+
+from src.database import Base, DataBase, Recipe
+from src.modules.recipe_catalog import RecipeCatalog
+
+DISH_TYPES = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
+CUISINES_COUNT = 10
+NUTRITION_SHARE = 0.9
+FAVORITES_COUNT = 3000
+COOKED_COUNT = 3000
+SCORES_COUNT = 5000
+REPEATS = 5
+
+FILTERS = {
+    "без фильтров": {},
+    "кухня и время": {'cuisine': "Кухня 3", 'max_time': 60},
+    "избранное": {'favorites_only': True},
+    "КБЖУ 300-600 ккал, белки от 10 г": {'nutrition_ranges': {'calories': (300, 600), 'proteins': (10, None)}},
+    "приготовленные до 30 минут": {'cooked_only': True, 'max_time': 30},
+}
+SORTS = [DataBase.SORT_RELEVANCE, DataBase.SORT_COOK_TIME, DataBase.SORT_CALORIES,
+         DataBase.SORT_PROTEIN_DENSITY, DataBase.SORT_RECENT]
+
+
+def build_database(path, recipes_count, rng):
+    """Создает базу с рецептами, КБЖУ, избранным, приготовленным и персональными оценками"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO Users (id, login, password) VALUES (1, 'bench', 'bench')")
+    connection.executemany("INSERT INTO Dish_types (id, name) VALUES (?, ?)", list(enumerate(DISH_TYPES, start=1)))
+    connection.executemany(
+        "INSERT INTO Cuisines (id, name) VALUES (?, ?)",
+        [(cuisine_id, f"Кухня {cuisine_id}") for cuisine_id in range(1, CUISINES_COUNT + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, dish_type_id, cuisine_id, cook_time) VALUES (?, 1, ?, ?, ?, ?)",
+        [(recipe_id, f"Рецепт {rng.randint(1, recipes_count)}", rng.randint(1, len(DISH_TYPES)),
+          rng.choice([None] + list(range(1, CUISINES_COUNT + 1))), rng.choice([None] + list(range(5, 150))))
+         for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Nutrition (recipe_id, calories, proteins, fats, carbohydrates, computed) VALUES (?, ?, ?, ?, ?, 1)",
+        [(recipe_id, rng.randint(0, 1200), round(rng.random() * 60, 1), round(rng.random() * 60, 1),
+          round(rng.random() * 120, 1)) for recipe_id in range(1, recipes_count + 1) if rng.random() < NUTRITION_SHARE]
+    )
+    connection.executemany("INSERT INTO Favorites (user_id, recipe_id) VALUES (1, ?)",
+                           [(recipe_id,) for recipe_id in rng.sample(range(1, recipes_count + 1), min(FAVORITES_COUNT, recipes_count))])
+    connection.executemany("INSERT INTO cooked_recipes (user_id, recipe_id) VALUES (1, ?)",
+                           [(recipe_id,) for recipe_id in rng.sample(range(1, recipes_count + 1), min(COOKED_COUNT, recipes_count))])
+    connection.executemany(
+        "INSERT INTO recipe_scores (user_id, recipe_id, score) VALUES (1, ?, ?)",
+        [(recipe_id, round(rng.random(), 3)) for recipe_id in rng.sample(range(1, recipes_count + 1), min(SCORES_COUNT, recipes_count))]
+    )
+    connection.commit()
+    connection.close()
+
+
+def open_database(path):
+    """DataBase поверх готового файла без миграций и обработки изображений"""
+    db = DataBase(path, prepare=False)
+    db._create_additional_tables()
+    return db
+
+
+def measure(func, repeats=REPEATS):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def sql_recipe_ids(db, filters, sort):
+    """ID рецептов в порядке выдачи, отобранные SQL-запросом get_recipes_with_filters"""
+    session = db.Session()
+    try:
+        query = db._recipe_list_query(session, Recipe.id)
+        query = db._apply_recipe_filters(session, query, 1, sort=sort, **filters)
+        if query is None:
+            return []
+        key_columns, descending = db._sort_key(sort)
+        if key_columns is None:
+            query, relevance = db._relevance_key(query, 1)
+            query = query.order_by(relevance.desc(), Recipe.name, Recipe.id)
+        else:
+            query = query.order_by(*[column.desc() if descending else column for column in key_columns])
+        return [recipe_id for (recipe_id,) in query]
+    finally:
+        session.close()
+
+
+def grouped_ids(grouped):
+    return [(dish_type, [recipe[0] for recipe in recipes]) for dish_type, recipes in grouped.items()]
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с")
+
+        db = open_database(path)
+        try:
+            load_time, catalog = measure(lambda: RecipeCatalog.from_database(db), repeats=1)
+            print(f"Загрузка каталога: {load_time * 1000:.0f} мс")
+
+            mismatches = 0
+            for label, filters in FILTERS.items():
+                print(f"\n{label}")
+                for sort in SORTS:
+                    sql_time, sql_ids = measure(lambda: sql_recipe_ids(db, filters, sort))
+                    catalog_time, catalog_ids = measure(lambda: catalog.select_ids(1, sort=sort, **filters))
+                    status = "OK" if catalog_ids.tolist() == sql_ids else "РАСХОЖДЕНИЕ"
+                    mismatches += status != "OK"
+                    print(f"  {sort}: отбор ID SQL {sql_time * 1000:.1f} мс, каталог {catalog_time * 1000:.1f} мс, "
+                          f"рецептов {len(sql_ids)}, сверка {status}")
+
+                db.set_recipe_catalog(None)
+                sql_full_time, sql_grouped = measure(lambda: db.get_recipes_with_filters(1, **filters), repeats=1)
+                sql_facets_time, sql_facets = measure(lambda: db.get_filter_facets(1, **filters))
+                db.set_recipe_catalog(catalog)
+                catalog_full_time, catalog_grouped = measure(lambda: db.get_recipes_with_filters(1, **filters), repeats=1)
+                catalog_facets_time, catalog_facets = measure(lambda: db.get_filter_facets(1, **filters))
+                db.set_recipe_catalog(None)
+
+                status = "OK" if (grouped_ids(sql_grouped) == grouped_ids(catalog_grouped)
+                                  and sql_facets == catalog_facets) else "РАСХОЖДЕНИЕ"
+                mismatches += status != "OK"
+                print(f"  get_recipes_with_filters: SQL {sql_full_time * 1000:.0f} мс, "
+                      f"каталог {catalog_full_time * 1000:.0f} мс")
+                print(f"  get_filter_facets: SQL {sql_facets_time * 1000:.1f} мс, "
+                      f"каталог {catalog_facets_time * 1000:.1f} мс, сверка {status}")
+
+            print("\nОбработка записи каталогом")
+            db.set_recipe_catalog(catalog)
+            favorite_time, _ = measure(lambda: (db.toggle_favorite(1, 1), catalog.select_ids(1, favorites_only=True)))
+            recipe_time, _ = measure(lambda: catalog.reload_recipes([2, 3, 4]))
+            db.set_recipe_catalog(None)
+            print(f"  избранное и повторный отбор: {favorite_time * 1000:.1f} мс")
+            print(f"  перечитывание трех рецептов: {recipe_time * 1000:.1f} мс")
+
+            status = "OK" if catalog.select_ids(1, sort=DataBase.SORT_RECENT).tolist() == \
+                sql_recipe_ids(db, {}, DataBase.SORT_RECENT) else "РАСХОЖДЕНИЕ"
+            mismatches += status != "OK"
+            print(f"  сверка после записи: {status}")
+            print(f"\nРасхождений: {mismatches}")
+        finally:
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Бенчмарк сортировок и фильтров КБЖУ в постраничной загрузке рецептов.
+
+Для каждой сортировки и набора фильтров замеряет первую и следующую
+страницу раздела (DataBase.get_recipes_page), печатает план запроса SQLite
+и сверяет постраничный обход раздела с полной выборкой того же порядка.
+
+Запуск из корня проекта:
+    python benchmarks/bench_recipe_sort.py [рецептов]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, event
+
+from src.database import Base, DataBase
+
+DISH_TYPES = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
+CUISINES_COUNT = 10
+# Доля рецептов с заполненным КБЖУ
+NUTRITION_SHARE = 0.9
+PAGE_SIZE = 24
+REPEATS = 5
+
+FILTERS = {
+    "без фильтров": {},
+    "КБЖУ 300-600 ккал, белки от 10 г": {'nutrition_ranges': {'calories': (300, 600), 'proteins': (10, None)}},
+    "кухня и время": {'cuisine': "Кухня 3", 'max_time': 60},
+}
+
+
+def build_database(path, recipes_count, rng):
+    """Создает базу с recipes_count рецептами разных типов блюд, кухонь и КБЖУ"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO Users (id, login, password) VALUES (1, 'bench', 'bench')")
+    connection.executemany("INSERT INTO Dish_types (id, name) VALUES (?, ?)", list(enumerate(DISH_TYPES, start=1)))
+    connection.executemany(
+        "INSERT INTO Cuisines (id, name) VALUES (?, ?)",
+        [(cuisine_id, f"Кухня {cuisine_id}") for cuisine_id in range(1, CUISINES_COUNT + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, dish_type_id, cuisine_id, cook_time) VALUES (?, 1, ?, ?, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.randint(1, len(DISH_TYPES)), rng.randint(1, CUISINES_COUNT),
+          rng.randint(5, 120)) for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Nutrition (recipe_id, calories, proteins, fats, carbohydrates, computed) VALUES (?, ?, ?, ?, ?, 1)",
+        [(recipe_id, rng.randint(50, 1200), round(rng.random() * 60, 1), round(rng.random() * 60, 1),
+          round(rng.random() * 120, 1)) for recipe_id in range(1, recipes_count + 1) if rng.random() < NUTRITION_SHARE]
+    )
+    connection.commit()
+    connection.close()
+
+
+def open_database(path):
+    """DataBase поверх готового файла без миграций и обработки изображений"""
+    db = DataBase(path, prepare=False)
+    db._create_additional_tables()
+    return db
+
+
+def query_plan(db, statement, parameters):
+    connection = db.engine.raw_connection()
+    try:
+        return "; ".join(row[3] for row in connection.cursor().execute("EXPLAIN QUERY PLAN " + statement, parameters))
+    finally:
+        connection.close()
+
+
+def measure(func):
+    timings = []
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2], result
+
+
+def walk_pages(db, dish_type, sort, filters):
+    """ID всех рецептов раздела, собранные постранично"""
+    recipe_ids, cursor = [], None
+    while True:
+        page, cursor = db.get_recipes_page(1, dish_type=dish_type, cursor=cursor, page_size=500, sort=sort, **filters)
+        recipe_ids.extend(recipe[0] for recipe in page)
+        if cursor is None:
+            return recipe_ids
+
+
+def main():
+    recipes_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(42)
+    dish_type = DISH_TYPES[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        build_database(path, recipes_count, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с")
+
+        db = open_database(path)
+        statements = []
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, parameters, context, executemany:
+                     statements.append((statement, parameters)))
+
+        sorts = [DataBase.SORT_RELEVANCE, DataBase.SORT_COOK_TIME, DataBase.SORT_CALORIES,
+                 DataBase.SORT_PROTEIN_DENSITY, DataBase.SORT_RECENT]
+        try:
+            for sort in sorts:
+                print(f"\nСортировка {sort}, раздел «{dish_type}»")
+                for label, filters in FILTERS.items():
+                    statements.clear()
+                    first_time, (_, cursor) = measure(
+                        lambda: db.get_recipes_page(1, dish_type=dish_type, page_size=PAGE_SIZE, sort=sort, **filters)
+                    )
+                    page_statement = next(item for item in statements if "LIMIT" in item[0])
+                    next_time, _ = measure(
+                        lambda: db.get_recipes_page(1, dish_type=dish_type, cursor=cursor, page_size=PAGE_SIZE,
+                                                    sort=sort, **filters)
+                    )
+
+                    expected = [recipe[0] for recipe in db.get_recipes_with_filters(1, sort=sort, **filters)
+                                .get(dish_type, [])]
+                    status = "OK" if walk_pages(db, dish_type, sort, filters) == expected else "РАСХОЖДЕНИЕ"
+
+                    print(f"  {label}: первая страница {first_time * 1000:.1f} мс, "
+                          f"следующая {next_time * 1000:.1f} мс, рецептов {len(expected)}, сверка {status}")
+                    print(f"    план: {query_plan(db, *page_statement)}")
+        finally:
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
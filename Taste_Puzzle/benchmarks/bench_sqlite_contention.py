@@ -0,0 +1,217 @@
+"""Бенчмарк конкурентной записи в один файл SQLite из нескольких процессов.
+
+Как при импорте рецептов рядом с открытым приложением: один процесс
+добавляет рецепты пачками (import_recipes, длинные транзакции записи),
+остальные без пауз повторяют операции окна через DataBase - страницы
+карточек и счетчики фильтров, избранное, отметки приготовления, корзину,
+правку рецепта. Режимы различаются журналом SQLite (delete, wal), временем
+ожидания блокировки (busy_timeout) и повтором записи при занятой базе
+(retry_on_busy: без повторов и DataBase.BUSY_RETRIES). Каждый режим
+начинается с одной и той же копии базы.
+
+Для каждого режима печатаются операций в секунду, задержки p50/p99,
+отказы из-за занятой базы (операция вернула значение ошибки) и счетчики
+повторов DataBase.get_busy_metrics.
+
+Запуск из корня проекта:
+    python benchmarks/bench_sqlite_contention.py [процессов] [секунд на режим] [рецептов]
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine
+
+from src.database import Base, DataBase
+
+DISH_TYPES = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
+INGREDIENTS_COUNT = 300
+PAGE_SIZE = 12
+IMPORT_BATCH = 50
+JOURNAL_MODES = ('delete', 'wal')
+BUSY_TIMEOUTS = (0, 0.05, DataBase.BUSY_TIMEOUT)
+RETRIES = (0, DataBase.BUSY_RETRIES)
+# Операции окна и их доли: чтение преобладает, запись - по действиям пользователя
+APP_OPERATIONS = [
+    ('get_recipes_page', 40),
+    ('get_filter_facets', 15),
+    ('toggle_favorite', 20),
+    ('mark_recipe_as_cooked', 8),
+    ('add_cart_item', 10),
+    ('clear_cart', 2),
+    ('update_recipe_details', 5),
+]
+# Запас на запуск задач во всех процессах пула: измерение начинается одновременно
+START_DELAY = 0.5
+
+
+def build_database(path, recipes_count, users_count, rng):
+    """Создает подготовленную базу с рецептами, ингредиентами и пользователями"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    # Дополнительные таблицы и триггеры журнала изменений - как у базы приложения
+    DataBase(path, prepare=False)._create_additional_tables()
+
+    connection = sqlite3.connect(path)
+    connection.executemany("INSERT INTO Users (id, login, password) VALUES (?, ?, 'bench')",
+                           [(user_id, f"user{user_id}") for user_id in range(1, users_count + 1)])
+    connection.executemany("INSERT INTO Dish_types (id, name) VALUES (?, ?)", list(enumerate(DISH_TYPES, start=1)))
+    connection.executemany("INSERT INTO Ingredients (id, name) VALUES (?, ?)",
+                           [(ingredient_id, f"Продукт {ingredient_id}")
+                            for ingredient_id in range(1, INGREDIENTS_COUNT + 1)])
+    connection.executemany(
+        "INSERT INTO Recipes (id, user_id, name, dish_type_id, cook_time) VALUES (?, 1, ?, ?, ?)",
+        [(recipe_id, f"Рецепт {recipe_id}", rng.randint(1, len(DISH_TYPES)), rng.randint(5, 150))
+         for recipe_id in range(1, recipes_count + 1)]
+    )
+    connection.executemany(
+        "INSERT INTO Recipe_ingredients (recipe_id, ingredient_id, quantity) VALUES (?, ?, ?)",
+        [(recipe_id, ingredient_id, f"{rng.randint(1, 500)} г")
+         for recipe_id in range(1, recipes_count + 1)
+         for ingredient_id in rng.sample(range(1, INGREDIENTS_COUNT + 1), rng.randint(3, 10))]
+    )
+    connection.commit()
+    connection.close()
+
+
+def set_journal_mode(path, mode):
+    """Переключает журнал файла; режим wal сохраняется в файле, delete - режим по умолчанию"""
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA journal_mode={mode}")
+    connection.close()
+
+
+def import_batch(rng, number):
+    """Пачка рецептов для import_recipes, как из файла импорта"""
+    return [{
+        'name': f"Импорт {number}-{index}",
+        'instruction': "Смешать и подать.",
+        'dish_type': rng.choice(DISH_TYPES),
+        'cook_time': rng.randint(5, 150),
+        'ingredients': [{'name': f"Продукт {ingredient_id}", 'quantity': f"{rng.randint(1, 500)} г"}
+                        for ingredient_id in rng.sample(range(1, INGREDIENTS_COUNT + 1), 6)],
+    } for index in range(IMPORT_BATCH)]
+
+
+def worker(path, index, busy_timeout, retries, start_at, duration, recipes_count):
+    """Процесс нагрузки: {операция: (задержки, отказы)} и счетчики повторов DataBase.
+
+    Процесс 0 импортирует рецепты, остальные работают как окно приложения
+    пользователя index.
+    """
+    # Сообщения методов DataBase об ошибках не смешиваются с таблицей результатов
+    sys.stdout = open(os.devnull, 'w')
+    db = DataBase(path, prepare=False, busy_timeout=busy_timeout)
+    db.BUSY_RETRIES = retries
+    rng = random.Random(index)
+    results = {}
+
+    def call(name, *args, **kwargs):
+        start = time.perf_counter()
+        result = getattr(db, name)(*args, **kwargs)
+        latencies, failures = results.setdefault(name, ([], [0]))
+        latencies.append(time.perf_counter() - start)
+        # Методы DataBase сообщают об ошибке значением: False, None, 0, пустая страница
+        failed = not result[0] if name == 'get_recipes_page' else not result
+        failures[0] += failed
+
+    names = [name for name, _ in APP_OPERATIONS]
+    weights = [weight for _, weight in APP_OPERATIONS]
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + duration
+    batch = 0
+    while time.perf_counter() < deadline:
+        if index == 0:
+            batch += 1
+            call('import_recipes', 1, import_batch(rng, batch))
+            continue
+
+        name = rng.choices(names, weights)[0]
+        recipe_id = rng.randint(1, recipes_count)
+        if name == 'get_recipes_page':
+            call(name, index, dish_type=rng.choice(DISH_TYPES), page_size=PAGE_SIZE)
+        elif name == 'get_filter_facets':
+            call(name, index)
+        elif name == 'toggle_favorite':
+            call(name, index, recipe_id)
+        elif name == 'mark_recipe_as_cooked':
+            call(name, index, recipe_id, rng.random() < 0.7)
+        elif name == 'add_cart_item':
+            call(name, index, f"Продукт {rng.randint(1, INGREDIENTS_COUNT)}", str(rng.randint(1, 500)), 'г')
+        elif name == 'clear_cart':
+            call(name, index)
+        else:
+            call(name, recipe_id, rng.choice([None, 2, 4]), None)
+
+    db.engine.dispose()
+    return {name: (latencies, failures[0]) for name, (latencies, failures) in results.items()}, db.get_busy_metrics()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    recipes_count = int(sys.argv[3]) if len(sys.argv) > 3 else 5_000
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, "template.db")
+        start = time.perf_counter()
+        build_database(template, recipes_count, processes, rng)
+        print(f"База: {recipes_count} рецептов, создана за {time.perf_counter() - start:.1f} с; "
+              f"процессов: {processes} (1 импорт, {processes - 1} окна), {duration:g} с на режим")
+        print(f"{'журнал':<7} {'ожидание':>8} {'повторы':>7} {'опер./с':>8} {'p50 мс':>7} {'p99 мс':>8} "
+              f"{'отказы':>7} {'повторов':>8} {'спасено':>7} {'импорт/с':>9}")
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            for mode in JOURNAL_MODES:
+                for busy_timeout in BUSY_TIMEOUTS:
+                    for retries in RETRIES:
+                        path = os.path.join(directory, f"bench-{mode}-{busy_timeout}-{retries}.db")
+                        shutil.copy(template, path)
+                        set_journal_mode(path, mode)
+
+                        start_at = time.time() + START_DELAY
+                        results = list(executor.map(
+                            worker, [path] * processes, range(processes), [busy_timeout] * processes,
+                            [retries] * processes, [start_at] * processes, [duration] * processes,
+                            [recipes_count] * processes
+                        ))
+
+                        latencies = [latency for operations, _ in results
+                                     for name, (values, _) in operations.items() if name != 'import_recipes'
+                                     for latency in values]
+                        failures = sum(failed for operations, _ in results for _, failed in operations.values())
+                        imported = sum(len(operations.get('import_recipes', ([], 0))[0]) - operations.get(
+                            'import_recipes', ([], 0))[1] for operations, _ in results) * IMPORT_BATCH
+                        metrics = {}
+                        for _, busy in results:
+                            for key, value in busy.items():
+                                metrics[key] = metrics.get(key, 0) + value
+                        print(f"{mode:<7} {busy_timeout:>7g}с {retries:>7} {len(latencies) / duration:>8.0f} "
+                              f"{percentile(latencies, 0.5) * 1000:>7.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                              f"{failures:>7} {metrics['retries']:>8} {metrics['recovered']:>7} "
+                              f"{imported / duration:>9.0f}")
+                        os.remove(path)
+                        for suffix in ('-wal', '-shm'):
+                            if os.path.exists(path + suffix):
+                                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
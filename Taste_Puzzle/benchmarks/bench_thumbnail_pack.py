@@ -0,0 +1,154 @@
+"""Бенчмарк загрузки изображений сетки карточек: файл миниатюр против отдельных файлов.
+
+Сравнивает получение QPixmap для всех карточек сетки тремя способами:
+  * originals  - декодирование исходных изображений рецептов (decode_card_image);
+  * thumbnails - по файлу JPEG размером с карточку на изображение (open/read/decode);
+  * pack       - ThumbnailPack: открытие индекса и QImage поверх отображенного файла.
+
+Каждый способ замеряется холодным (страницы файлов вытеснены из кэша ОС
+через posix_fadvise, где он есть; для pack - еще и заново открытый файл) и
+теплым (повторный проход). Затем половина миниатюр удаляется, файл
+открывается заново со сжатием, и сжатые миниатюры сверяются с исходными.
+
+Запуск из корня проекта:
+    python benchmarks/bench_thumbnail_pack.py [изображений]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QPointF
+from PyQt6.QtGui import QColor, QGuiApplication, QImage, QImageReader, QLinearGradient, QPainter, QPixmap
+
+from src.modules import thumbnail_pack
+from src.modules.card_images import decode_card_image, decode_card_thumbnail
+from src.modules.thumbnail_pack import ThumbnailPack
+
+SOURCE_SIZE = (1280, 960)
+THUMBNAIL_QUALITY = 85
+
+
+def make_source(path, rng):
+    """JPEG размером с сохраняемое изображение рецепта: градиент и несколько фигур"""
+    image = QImage(*SOURCE_SIZE, QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(QPointF(0, 0), QPointF(*SOURCE_SIZE))
+    gradient.setColorAt(0, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    gradient.setColorAt(1, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.fillRect(image.rect(), gradient)
+    for _ in range(20):
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        painter.drawEllipse(rng.randrange(SOURCE_SIZE[0]), rng.randrange(SOURCE_SIZE[1]),
+                            rng.randrange(50, 400), rng.randrange(50, 400))
+    painter.end()
+    image.save(path, 'JPEG', 85)
+
+
+def evict(paths):
+    """Вытесняет страницы файлов из кэша ОС. False, если это недоступно"""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def load_files(paths):
+    return [QPixmap.fromImage(decode_card_image(path)) for path in paths]
+
+
+def load_thumbnail_files(paths):
+    pixmaps = []
+    for path in paths:
+        reader = QImageReader(path)
+        pixmaps.append(QPixmap.fromImage(reader.read()))
+    return pixmaps
+
+
+def load_pack(pack, keys):
+    return [QPixmap.fromImage(pack.image(key)) for key in keys]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def report(label, count, cold, warm):
+    print(f"{label:<11} холодный {cold * 1000:7.1f} мс ({cold / count * 1e6:6.0f} мкс/карточка), "
+          f"теплый {warm * 1000:7.1f} мс ({warm / count * 1e6:6.0f} мкс/карточка)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = QGuiApplication(sys.argv)
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        sources, thumbnails = [], []
+        for index in range(count):
+            source = os.path.join(directory, f"{index:05d}.jpg")
+            make_source(source, rng)
+            thumbnail = os.path.join(directory, f"{index:05d}.thumb.jpg")
+            decode_card_image(source).save(thumbnail, 'JPEG', THUMBNAIL_QUALITY)
+            sources.append(source)
+            thumbnails.append(thumbnail)
+
+        pack_path = os.path.join(directory, "thumbs", "card")
+        pack = ThumbnailPack(pack_path)
+        keys = [os.path.basename(source) for source in sources]
+        for key, source in zip(keys, sources):
+            pack.put(key, decode_card_thumbnail(source))
+        pack.close()
+        print(f"{count} изображений {SOURCE_SIZE[0]}x{SOURCE_SIZE[1]} подготовлены за "
+              f"{time.perf_counter() - start:.1f} с; файл миниатюр {os.path.getsize(pack_path + '.pack') / 2 ** 20:.1f} МБ")
+
+        evicted = evict(sources)
+        cold, _ = timed(lambda: load_files(sources))
+        warm, _ = timed(lambda: load_files(sources))
+        report("originals", count, cold, warm)
+
+        evict(thumbnails)
+        cold, _ = timed(lambda: load_thumbnail_files(thumbnails))
+        warm, _ = timed(lambda: load_thumbnail_files(thumbnails))
+        report("thumbnails", count, cold, warm)
+
+        evict([pack_path + '.pack', pack_path + '.idx'])
+        open_time, pack = timed(lambda: ThumbnailPack(pack_path))
+        cold, expected = timed(lambda: load_pack(pack, keys))
+        warm, _ = timed(lambda: load_pack(pack, keys))
+        report("pack", count, open_time + cold, warm)
+        print(f"  из них открытие файла миниатюр: {open_time * 1000:.1f} мс")
+        if not evicted:
+            print("  posix_fadvise недоступен: холодные замеры идут с файлами в кэше ОС")
+
+        # Сжатие: половина миниатюр больше не нужна
+        pack.discard(keys[::2])
+        dead_share = pack.dead_bytes / pack.size
+        pack.close()
+        thumbnail_pack.COMPACT_MIN_BYTES = 0
+        compact_time, pack = timed(lambda: ThumbnailPack(pack_path))
+        images_match = all(pack.image(key) == expected[index].toImage().convertToFormat(QImage.Format.Format_RGB888)
+                           for index, key in enumerate(keys) if index % 2)
+        status = "OK" if len(pack) == count // 2 and pack.dead_bytes == 0 and images_match else "РАСХОЖДЕНИЕ"
+        print(f"\nСжатие при {dead_share * 100:.0f}% мертвого места: {compact_time * 1000:.1f} мс, "
+              f"файл {os.path.getsize(pack_path + '.pack') / 2 ** 20:.1f} МБ, сверка {status}")
+        pack.close()
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
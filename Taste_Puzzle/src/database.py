@@ -1,8 +1,16 @@
+import csv
+import functools
+import hashlib
+import random
 import re
-import shutil
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, ForeignKey, Table, text, DateTime, or_
+import sqlite3
+import threading
+import time
+from sqlalchemy import create_engine, Column, Integer, String, Text, Float, ForeignKey, Table, text, DateTime, or_, func, \
+    tuple_, select, literal, literal_column, union_all, Index, Boolean, update, bindparam, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, joinedload
 from sqlalchemy import inspect
 from datetime import datetime
 import os
@@ -15,14 +23,21 @@ recipe_ingredients = Table(
     'Recipe_ingredients', Base.metadata,
     Column('recipe_id', Integer, ForeignKey('Recipes.id'), primary_key=True),
     Column('ingredient_id', Integer, ForeignKey('Ingredients.id'), primary_key=True),
-    Column('quantity', Float, nullable=False)
+    # Количество с единицей в виде текста: '100 г', '2 штуки', 'по вкусу'
+    Column('quantity', Text, nullable=False)
 )
 
+# Поиск рецептов по ингредиенту (фильтр по ингредиентам идет от ингредиента к рецептам)
+Index('ix_recipe_ingredients_ingredient', recipe_ingredients.c.ingredient_id, recipe_ingredients.c.recipe_id)
+
 favorites = Table(
     'Favorites', Base.metadata,
     Column('user_id', Integer, ForeignKey('Users.id'), primary_key=True),
     Column('recipe_id', Integer, ForeignKey('Recipes.id'), primary_key=True)
 )
+# В поставляемой базе у Favorites нет первичного ключа: уникальность пары держит этот индекс
+# (дубликаты удаляются перед его созданием, см. _create_additional_tables)
+Index('ux_favorites_user_recipe', favorites.c.user_id, favorites.c.recipe_id, unique=True)
 
 
 # МОДЕЛЬ КОРЗИНЫ
@@ -99,6 +114,8 @@ class Recipe(Base):
     cook_time = Column(Integer)
     external_url = Column(String(500))
     image = Column(String(500))
+    # Заглушка изображения: цвета сетки 4×3 в hex (RGB, 72 символа) - рисуется до загрузки картинки
+    image_placeholder = Column(String(72))
     servings = Column(Integer)
     created_at = Column(DateTime, default=datetime.now)
 
@@ -139,18 +156,176 @@ class Nutrition(Base):
     proteins = Column(Float)
     fats = Column(Float)
     carbohydrates = Column(Float)
+    # True - значения рассчитаны по ингредиентам и пересчитываются автоматически,
+    # False - введены вручную
+    computed = Column(Boolean, nullable=False, default=False)
 
     recipe = relationship("Recipe", back_populates="nutrition")
 
 
+# Ключи сортировки списка рецептов. SQLite применяет индекс по выражению, только если
+# в запросе стоит то же выражение, поэтому индексы ниже построены по этим же объектам
+RECIPE_COOK_TIME_KEY = func.coalesce(Recipe.cook_time, literal_column('0'))
+# Граммы белка на килокалорию; NULL, если калорийность не указана
+PROTEIN_DENSITY_KEY = Nutrition.proteins / func.nullif(Nutrition.calories, literal_column('0'))
+
+# Страница раздела по времени приготовления и по новизне (id) - чтение индекса по диапазону
+Index('ix_recipes_dish_type_cook_time', Recipe.dish_type_id, RECIPE_COOK_TIME_KEY, Recipe.name)
+Index('ix_recipes_dish_type', Recipe.dish_type_id)
+# Счетчики фильтров группируют каталог по этим столбцам в порядке индекса
+Index('ix_recipes_facets', Recipe.cuisine_id, Recipe.dish_type_id, Recipe.cook_time)
+# Проверка, ссылается ли рецепт на файл изображения (сверка счетчиков и очистка каталога)
+Index('ix_recipes_image', Recipe.image)
+# В старых базах у Nutrition нет первичного ключа: соединение с рецептом и фильтры КБЖУ
+# читаются из одного покрывающего индекса
+Index('ix_nutrition_recipe', Nutrition.recipe_id, Nutrition.calories, Nutrition.proteins,
+      Nutrition.fats, Nutrition.carbohydrates)
+Index('ix_nutrition_calories', Nutrition.calories, Nutrition.recipe_id)
+Index('ix_nutrition_protein_density', PROTEIN_DENSITY_KEY, Nutrition.recipe_id)
+
+
+# МОДЕЛЬ ПИЩЕВОЙ ЦЕННОСТИ ИНГРЕДИЕНТА (на 100 г)
+class IngredientNutrition(Base):
+    __tablename__ = 'ingredient_nutrition'
+
+    ingredient_id = Column(Integer, ForeignKey('Ingredients.id'), primary_key=True)
+    calories = Column(Float, nullable=False, default=0)
+    proteins = Column(Float, nullable=False, default=0)
+    fats = Column(Float, nullable=False, default=0)
+    carbohydrates = Column(Float, nullable=False, default=0)
+    # Плотность (г/мл) для объемных мер и масса одной штуки (г); None - перевод невозможен
+    density = Column(Float)
+    piece_grams = Column(Float)
+
+
+# МОДЕЛЬ СОЧЕТАЕМОСТИ ИНГРЕДИЕНТОВ (top-N соседей каждого ингредиента по PMI)
+class IngredientPairing(Base):
+    __tablename__ = 'ingredient_pairings'
+    # Без rowid строки хранятся прямо в B-дереве первичного ключа
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    ingredient_id = Column(Integer, ForeignKey('Ingredients.id'), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey('Ingredients.id'), primary_key=True)
+    score = Column(Float, nullable=False)
+
+
+# МОДЕЛЬ ПЕРСОНАЛЬНОЙ ОЦЕНКИ РЕЦЕПТА (результат обучения рекомендаций)
+class RecipeScore(Base):
+    __tablename__ = 'recipe_scores'
+
+    # Первичный ключ (user_id, recipe_id) служит индексом для соединения со списком рецептов
+    user_id = Column(Integer, ForeignKey('Users.id'), primary_key=True)
+    recipe_id = Column(Integer, ForeignKey('Recipes.id'), primary_key=True)
+    score = Column(Float, nullable=False)
+
+
+# МОДЕЛЬ СОСТОЯНИЯ РЕКОМЕНДАЦИЙ (одна строка)
+class RecommenderState(Base):
+    __tablename__ = 'recommender_state'
+
+    id = Column(Integer, primary_key=True)
+    # Изменений избранного и приготовленных с момента последнего обучения
+    pending_interactions = Column(Integer, nullable=False, default=0)
+    trained_at = Column(DateTime)
+
+
+# МОДЕЛЬ ФАЙЛА В ХРАНИЛИЩЕ ИЗОБРАЖЕНИЙ (одинаковое содержимое хранится один раз)
+class StoredImage(Base):
+    __tablename__ = 'images'
+
+    # Путь относительно img/recipe_img, он же значение Recipes.image: 'store/ab/<sha256>.jpg'
+    path = Column(String(100), primary_key=True)
+    size = Column(Integer, nullable=False)
+    # Сколько рецептов ссылаются на файл; меняется в одной транзакции с рецептом
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+# МОДЕЛЬ СОСТОЯНИЯ ПРОВЕРКИ КАТАЛОГА ИЗОБРАЖЕНИЙ (одна строка)
+class ImageScanState(Base):
+    __tablename__ = 'image_scan_state'
+
+    id = Column(Integer, primary_key=True)
+    # Последний полностью проверенный каталог текущего прохода; None - проход не начат
+    position = Column(String(100))
+    pass_started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Итоги текущего (или последнего завершенного) прохода
+    quarantined = Column(Integer, nullable=False, default=0)
+    missing = Column(Integer, nullable=False, default=0)
+
+
+# МОДЕЛЬ ЖУРНАЛА ИЗМЕНЕНИЙ (заполняется триггерами, см. DataBase.CHANGE_LOG_SOURCES)
+class ChangeLog(Base):
+    __tablename__ = 'change_log'
+    # Номера не используются повторно после очистки журнала: по ним экземпляры видят пропуски
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    operation = Column(String(10), nullable=False)  # insert, update, delete
+    recipe_id = Column(Integer)  # None для корзины
+    user_id = Column(Integer)  # None для рецептов
+
+
+def is_busy_error(error):
+    """True, если SQLite не выполнила запрос, потому что базу заблокировало другое подключение"""
+    error = getattr(error, 'orig', error)  # sqlalchemy.exc.OperationalError оборачивает ошибку sqlite3
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message or 'database is busy' in message
+
+
+def retry_on_busy(method):
+    """Повторяет метод записи DataBase с нарастающей паузой, пока база занята другим процессом.
+
+    Метод пробрасывает ошибку занятой базы из своего обработчика исключений,
+    если DataBase._busy_retryable разрешает повтор. На последней попытке
+    (по числу повторов или по истечении общего срока вызова) повтор не
+    разрешается, и метод возвращает свое обычное значение ошибки.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self._call_with_busy_retry(method, args, kwargs)
+    return wrapper
+
+
 class DataBase:
-    def __init__(self):
-        """Инициализация подключения к базе данных"""
+    """Слой данных приложения. Не зависит от PyQt: изображения отдаются путями и
+    байтами, а QPixmap из них делает src.modules.image_service.
+
+    Экземпляр можно передавать в задачи ProcessPoolExecutor: при передаче
+    копируется только путь к файлу БД, а процесс-исполнитель открывает свое
+    подключение без миграций (схему уже подготовил основной процесс).
+    """
+
+    DB_PATH = '../data/Taste_Pazzle.db'
+
+    # Сколько секунд подключение ждет снятия блокировки другим процессом (как у sqlite3 по умолчанию)
+    BUSY_TIMEOUT = 5.0
+    # Повторы метода записи, если база осталась занятой (см. retry_on_busy): паузы от
+    # BUSY_RETRY_DELAY, удваиваются до BUSY_RETRY_MAX_DELAY, со случайным разбросом
+    BUSY_RETRIES = 5
+    BUSY_RETRY_DELAY = 0.02
+    BUSY_RETRY_MAX_DELAY = 0.5
+    # Общий срок вызова с повторами, включая ожидание блокировки в каждой попытке; в потоке
+    # окна (set_interactive_thread) срок короче, а повторы идут без пауз
+    BUSY_RETRY_DEADLINE = 10.0
+    INTERACTIVE_BUSY_DEADLINE = 1.0
+
+    def __init__(self, db_path=None, prepare=True, busy_timeout=None):
+        """Инициализация подключения к базе данных.
+
+        prepare=False только подключается к уже подготовленной базе: без
+        миграций, начальных данных и переноса изображений (для инструментов
+        и фоновых процессов). busy_timeout - сколько секунд ждать блокировку
+        другого процесса (по умолчанию BUSY_TIMEOUT).
+        """
         try:
-            db_path = os.path.join('../data/Taste_Pazzle.db')
-
-            self.engine = create_engine(f'sqlite:///{db_path}', echo=False)
-            self.Session = sessionmaker(bind=self.engine)
+            self._connect(db_path or self.DB_PATH, busy_timeout)
+            if not prepare:
+                return
 
             Base.metadata.create_all(self.engine)
 
@@ -159,26 +334,76 @@ class DataBase:
 
             # Добавляем отсутствующие столбцы
             self._migrate_database()
+            self._seed_ingredient_nutrition()
 
             self._check_existing_data()
 
             self._check_existing_data()
 
-            self.assign_unique_images_to_recipes()
-            self.check_image_status()
             self.migrate_existing_images()
+            self.assign_unique_images_to_recipes()
 
 
         except Exception as e:
             print(f"Ошибка подключения к базе данных: {e}")
             raise
 
+    def _connect(self, db_path, busy_timeout=None):
+        # Подписчики на изменения рецептов:
+        # callback(recipe_id, ingredient_ids или None при удалении, прежние ingredient_ids)
+        self.recipe_listeners = []
+        # Подписчики на запись в таблицы, по которым фильтруется список рецептов:
+        # callback(таблица, recipe_ids или None, user_id или None)
+        self.write_listeners = []
+        # Растет при каждой записи: по нему видно, что данные менялись, пока каталог загружался
+        self.write_version = 0
+        # Каталог рецептов в памяти (src.modules.recipe_catalog), если подключен
+        self.recipe_catalog = None
+        # Отдельное подключение для PRAGMA data_version (см. data_version)
+        self._version_connection = None
+        # Номера записей журнала изменений, сделанных через этот экземпляр (см. track_own_changes)
+        self._own_changes = None
+        self._own_changes_lock = threading.Lock()
+        # Повторы записи при занятой базе (см. retry_on_busy и get_busy_metrics)
+        self._busy_local = threading.local()
+        self._busy_lock = threading.Lock()
+        self.busy_metrics = {'retried_calls': 0, 'retries': 0, 'recovered': 0, 'failures': 0, 'wait': 0.0}
+        self.interactive_thread = None
+
+        self.db_path = os.path.abspath(db_path)
+        self.busy_timeout = self.BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+        self.engine = create_engine(f'sqlite:///{self.db_path}', echo=False,
+                                    connect_args={'timeout': self.busy_timeout})
+        event.listen(self.engine, 'checkout', self._apply_busy_timeout)
+        event.listen(self.engine, 'checkout', self._prepare_own_changes)
+        event.listen(self.engine, 'begin', self._forget_pending_own_changes)
+        event.listen(self.engine, 'commit', self._collect_own_changes)
+        event.listen(self.engine, 'rollback', self._discard_pending_own_changes)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def __getstate__(self):
+        # Подключение, подписчики и каталог принадлежат процессу - передается только путь
+        return {'db_path': self.db_path, 'busy_timeout': self.busy_timeout}
+
+    def __setstate__(self, state):
+        self._connect(state['db_path'], state.get('busy_timeout'))
+
     def _migrate_database(self):
         """Упрощенная миграция - просто создаем все таблицы"""
         try:
             # Создаем все таблицы из моделей
             Base.metadata.create_all(self.engine)
 
+            # create_all не добавляет столбцы в существующие таблицы
+            nutrition_columns = [col['name'] for col in inspect(self.engine).get_columns('Nutrition')]
+            if 'computed' not in nutrition_columns:
+                with self.engine.begin() as connection:
+                    connection.execute(text("ALTER TABLE Nutrition ADD COLUMN computed BOOLEAN NOT NULL DEFAULT 0"))
+            recipe_columns = [col['name'] for col in inspect(self.engine).get_columns('Recipes')]
+            if 'image_placeholder' not in recipe_columns:
+                with self.engine.begin() as connection:
+                    connection.execute(text("ALTER TABLE Recipes ADD COLUMN image_placeholder VARCHAR(72)"))
+
             session = self.Session()
             try:
                 dish_type_names = ["Салаты", "Десерты", "Основные блюда", "Завтраки", "Гарниры", "Супы"]
@@ -196,160 +421,107 @@ class DataBase:
             raise
 
     def migrate_existing_images(self):
-        """Мигрирует существующие пути изображений к новому формату"""
+        """Переносит изображения старого формата (отдельный файл или путь на рецепт) в хранилище.
+
+        Файлы с одинаковым содержимым, например копии одной стоковой картинки,
+        попадают в хранилище один раз. Рецепты, чей файл не найден, не меняются.
+        Старые файлы остаются на месте до очистки неиспользуемых изображений.
+        """
         session = self.Session()
         try:
-            recipes = session.query(Recipe).filter(Recipe.image.isnot(None)).all()
+            recipes = session.query(Recipe).filter(
+                Recipe.image.isnot(None), Recipe.image != '',
+                ~Recipe.image.startswith(f"{self.IMAGE_STORE_DIR}/")
+            ).all()
+            if not recipes:
+                return
+
+            images_dir = self.images_dir()
+            stored = {}
             migrated_count = 0
-
             for recipe in recipes:
-                if recipe.image and isinstance(recipe.image, str):
-                    if '/' in recipe.image or '\\' in recipe.image:
-                        old_path = recipe.image
-                        new_filename = os.path.basename(old_path)
-                        recipe.image = new_filename
-                        migrated_count += 1
-
-            if migrated_count > 0:
-                session.commit()
+                source = recipe.image
+                if not os.path.isabs(source):
+                    source = os.path.join(images_dir, os.path.basename(source))
+                if source not in stored:
+                    stored[source] = self.store_image(source) if os.path.isfile(source) else None
+                if stored[source] is None:
+                    continue
+
+                path, size = stored[source]
+                self._acquire_image(session, path, size)
+                recipe.image = path
+                migrated_count += 1
+
+            session.commit()
+            if migrated_count:
+                print(f"Изображений перенесено в хранилище: {migrated_count} рецептов, "
+                      f"{len({item for item in stored.values() if item})} файлов")
+                self._verify_image_assignments()
 
         except Exception as e:
             session.rollback()
+            print(f"Ошибка переноса изображений в хранилище: {e}")
         finally:
             session.close()
 
+    # Стоковые изображения для рецептов без своей картинки и ключевые слова для их выбора
+    STOCK_IMAGES = [
+        'apple_pie.jpg', 'cabbage_rolls.jpg', 'caesar.jpg',
+        'mashed_potatoes.jpg', 'olivier.jpg', 'ramen.jpg',
+        'french_toast.jpg', 'pasta_carbonara.jpg'
+    ]
+    STOCK_IMAGE_KEYWORDS = {
+        'яблочн': 'apple_pie.jpg',
+        'пирог': 'apple_pie.jpg',
+        'голубц': 'cabbage_rolls.jpg',
+        'капуст': 'cabbage_rolls.jpg',
+        'цезар': 'caesar.jpg',
+        'салат цезар': 'caesar.jpg',
+        'картофельн': 'mashed_potatoes.jpg',
+        'пюре': 'mashed_potatoes.jpg',
+        'картошк': 'mashed_potatoes.jpg',
+        'оливье': 'olivier.jpg',
+        'салат оливье': 'olivier.jpg',
+        'рамен': 'ramen.jpg',
+        'лапш': 'ramen.jpg',
+        'французск': 'french_toast.jpg',
+        'френч': 'french_toast.jpg',
+        'тост': 'french_toast.jpg',
+        'карбонар': 'pasta_carbonara.jpg',
+        'паста': 'pasta_carbonara.jpg',
+        'спагетт': 'pasta_carbonara.jpg',
+        'макарон': 'pasta_carbonara.jpg'
+    }
+
     def assign_unique_images_to_recipes(self):
-        """Назначает каждому рецепту уникальное изображение на основе его названия"""
+        """Назначает рецептам без изображения стоковую картинку по ключевому слову в названии
+        или по хэшу названия. Каждая стоковая картинка хранится один раз, рецепты ссылаются на нее"""
         session = self.Session()
         try:
-            available_images = [
-                'apple_pie.jpg', 'cabbage_rolls.jpg', 'caesar.jpg',
-                'mashed_potatoes.jpg', 'olivier.jpg', 'ramen.jpg',
-                'french_toast.jpg', 'pasta_carbonara.jpg'
-            ]
-
-            keyword_mapping = {
-                'яблочн': 'apple_pie.jpg',
-                'пирог': 'apple_pie.jpg',
-                'голубц': 'cabbage_rolls.jpg',
-                'капуст': 'cabbage_rolls.jpg',
-                'цезар': 'caesar.jpg',
-                'салат цезар': 'caesar.jpg',
-                'картофельн': 'mashed_potatoes.jpg',
-                'пюре': 'mashed_potatoes.jpg',
-                'картошк': 'mashed_potatoes.jpg',
-                'оливье': 'olivier.jpg',
-                'салат оливье': 'olivier.jpg',
-                'рамен': 'ramen.jpg',
-                'лапш': 'ramen.jpg',
-                'французск': 'french_toast.jpg',
-                'френч': 'french_toast.jpg',
-                'тост': 'french_toast.jpg',
-                'карбонар': 'pasta_carbonara.jpg',
-                'паста': 'pasta_carbonara.jpg',
-                'спагетт': 'pasta_carbonara.jpg',
-                'макарон': 'pasta_carbonara.jpg'
-            }
-
-            recipes = session.query(Recipe).all()
-
-            used_images = set()
-            updated_count = 0
+            recipes = session.query(Recipe).filter(or_(Recipe.image.is_(None), Recipe.image == '')).all()
+            if not recipes:
+                return
 
+            images_dir = self.images_dir()
+            stored = {}
             for recipe in recipes:
-                # Пропускаем рецепты, у которых уже есть изображение
-                if recipe.image and recipe.image.strip():
-                    used_images.add(recipe.image)
-                    continue
-
                 recipe_name_lower = recipe.name.lower()
-                image_assigned = False
-
-                # Сначала проверяем по ключевым словам
-                for keyword, image_file in keyword_mapping.items():
-                    if keyword in recipe_name_lower:
-                        # Создаем уникальное имя для изображения
-                        import hashlib
-                        recipe_hash = hashlib.md5(f"{recipe.id}_{recipe.name}".encode()).hexdigest()[:8]
-                        unique_image_name = f"{recipe_hash}_{image_file}"
-
-                        # Копируем изображение с уникальным именем
-                        current_dir = os.path.dirname(os.path.abspath(__file__))
-                        project_root = os.path.dirname(current_dir)
-                        images_dir = os.path.join(project_root, 'img', 'recipe_img')
-
-                        original_path = os.path.join(images_dir, image_file)
-                        unique_path = os.path.join(images_dir, unique_image_name)
-
-                        if os.path.exists(original_path):
-                            try:
-                                import shutil
-                                shutil.copy2(original_path, unique_path)
-                                recipe.image = unique_image_name
-                                used_images.add(unique_image_name)
-                                updated_count += 1
-                                image_assigned = True
-                                break
-                            except Exception as e:
-                                continue
-
-                # Если не назначили по ключевому слову, используем хэш
-                if not image_assigned and available_images:
-                    import hashlib
-                    recipe_hash = hashlib.md5(f"{recipe.id}_{recipe.name}".encode()).hexdigest()[:8]
+                image_file = next((image_file for keyword, image_file in self.STOCK_IMAGE_KEYWORDS.items()
+                                   if keyword in recipe_name_lower), None)
+                if image_file is None:
                     hash_int = int(hashlib.md5(recipe.name.encode()).hexdigest()[:8], 16)
-                    image_index = hash_int % len(available_images)
-
-                    for i in range(len(available_images)):
-                        current_index = (image_index + i) % len(available_images)
-                        image_file = available_images[current_index]
-
-                        # Создаем уникальное имя
-                        unique_image_name = f"{recipe_hash}_{image_file}"
-
-                        if unique_image_name not in used_images:
-                            # Копируем изображение
-                            current_dir = os.path.dirname(os.path.abspath(__file__))
-                            project_root = os.path.dirname(current_dir)
-                            images_dir = os.path.join(project_root, 'img', 'recipe_img')
-
-                            original_path = os.path.join(images_dir, image_file)
-                            unique_path = os.path.join(images_dir, unique_image_name)
-
-                            if os.path.exists(original_path):
-                                try:
-                                    import shutil
-                                    shutil.copy2(original_path, unique_path)
-                                    recipe.image = unique_image_name
-                                    used_images.add(unique_image_name)
-                                    updated_count += 1
-                                    image_assigned = True
-                                    break
-                                except Exception as e:
-                                    continue
-
-                if not image_assigned and available_images:
-                    # Если всё ещё не назначили, создаем последний вариант
-                    import hashlib
-                    recipe_hash = hashlib.md5(f"{recipe.id}_{recipe.name}".encode()).hexdigest()[:8]
-                    unique_image_name = f"{recipe_hash}_{available_images[0]}"
-
-                    # Копируем изображение
-                    current_dir = os.path.dirname(os.path.abspath(__file__))
-                    project_root = os.path.dirname(current_dir)
-                    images_dir = os.path.join(project_root, 'img', 'recipe_img')
-
-                    original_path = os.path.join(images_dir, available_images[0])
-                    unique_path = os.path.join(images_dir, unique_image_name)
-
-                    if os.path.exists(original_path):
-                        try:
-                            import shutil
-                            shutil.copy2(original_path, unique_path)
-                            recipe.image = unique_image_name
-                            updated_count += 1
-                        except Exception as e:
-                            pass
+                    image_file = self.STOCK_IMAGES[hash_int % len(self.STOCK_IMAGES)]
+
+                if image_file not in stored:
+                    source = os.path.join(images_dir, image_file)
+                    stored[image_file] = self.store_image(source) if os.path.isfile(source) else None
+                if stored[image_file] is None:
+                    continue
+
+                path, size = stored[image_file]
+                self._acquire_image(session, path, size)
+                recipe.image = path
 
             session.commit()
             self._verify_image_assignments()
@@ -362,65 +534,43 @@ class DataBase:
             session.close()
 
     def _verify_image_assignments(self):
-        """Проверяет, что все рецепты имеют уникальные изображения"""
+        """Сверяет счетчики ссылок хранилища с рецептами и исправляет расхождения"""
         session = self.Session()
         try:
-            recipes = session.query(Recipe).all()
-            image_count = {}
-
-            for recipe in recipes:
-                if recipe.image:
-                    if recipe.image in image_count:
-                        image_count[recipe.image] += 1
-                    else:
-                        image_count[recipe.image] = 1
-
-            for image_file, count in image_count.items():
-                status = "OK" if count == 1 else "ПОВТОР"
-                print(f"{image_file}: {count} рецептов - {status}")
+            counts = dict(session.query(Recipe.image, func.count(Recipe.id)).filter(
+                Recipe.image.startswith(f"{self.IMAGE_STORE_DIR}/")
+            ).group_by(Recipe.image))
+            ref_counts = dict(session.query(StoredImage.path, StoredImage.ref_count))
+
+            fixed = 0
+            for path in counts.keys() | ref_counts.keys():
+                if counts.get(path, 0) == ref_counts.get(path):
+                    continue
+                print(f"{path}: рецептов {counts.get(path, 0)}, ссылок {ref_counts.get(path)} - ИСПРАВЛЕНО")
+                if path in ref_counts:
+                    session.execute(update(StoredImage.__table__).where(StoredImage.path == path)
+                                    .values(ref_count=counts.get(path, 0)))
+                else:
+                    file_path = os.path.join(self.images_dir(), *path.split('/'))
+                    if os.path.isfile(file_path):
+                        self._acquire_image(session, path, os.path.getsize(file_path), counts[path])
+                fixed += 1
+            session.commit()
 
-            recipes_without_images = [r for r in recipes if not r.image]
+            recipes_without_images = session.query(Recipe.name).filter(
+                or_(Recipe.image.is_(None), Recipe.image == '')
+            ).all()
             if recipes_without_images:
                 print(f"Рецепты без изображений: {len(recipes_without_images)}")
-                for recipe in recipes_without_images:
-                    print(f"  - {recipe.name}")
+                for (name,) in recipes_without_images:
+                    print(f"  - {name}")
 
         except Exception as e:
+            session.rollback()
             print(f"Ошибка при проверке назначения изображений: {e}")
         finally:
             session.close()
 
-    def check_image_status(self):
-        """Проверяет статус изображений в базе данных"""
-        session = self.Session()
-        try:
-            total_recipes = session.query(Recipe).count()
-            recipes_with_images = session.query(Recipe).filter(Recipe.image.isnot(None)).all()
-
-            available_images = 0
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)
-            images_dir = os.path.join(project_root, 'img', 'recipe_img')
-
-            for recipe in recipes_with_images:
-                if recipe.image and isinstance(recipe.image, str):
-                    image_path = os.path.join(images_dir, recipe.image)
-                    if os.path.exists(image_path):
-                        available_images += 1
-
-            recipes = session.query(Recipe).all()
-            for recipe in recipes:
-                if recipe.image:
-                    image_path = os.path.join(images_dir, recipe.image)
-                    status = "Есть файл" if os.path.exists(image_path) else "Файл не найден"
-                else:
-                    status = "Нет изображения"
-
-        except Exception as e:
-            print(f"Ошибка проверки статуса изображений: {e}")
-        finally:
-            session.close()
-
     def _create_additional_tables(self):
         """Создает дополнительные таблицы если они не существуют"""
         try:
@@ -433,6 +583,32 @@ class DataBase:
             if 'cooked_recipes' not in existing_tables:
                 CookedRecipe.__table__.create(self.engine, checkfirst=True)
 
+            if 'change_log' not in existing_tables:
+                ChangeLog.__table__.create(self.engine, checkfirst=True)
+
+            # create_all не добавляет индексы в уже существующие таблицы. Имена берем из
+            # sqlite_master: отражение индексов по выражениям SQLAlchemy не поддерживает
+            with self.engine.begin() as connection:
+                existing_indexes = {name for (name,) in connection.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'index'")
+                )}
+                if 'ux_favorites_user_recipe' not in existing_indexes:
+                    # Повторные строки избранного завышают счетчики и мешают созданию уникального индекса
+                    connection.execute(text(
+                        "DELETE FROM Favorites WHERE rowid NOT IN "
+                        "(SELECT MIN(rowid) FROM Favorites GROUP BY user_id, recipe_id)"
+                    ))
+                for table in (recipe_ingredients, Recipe.__table__, Nutrition.__table__, favorites):
+                    for index in table.indexes:
+                        if index.name not in existing_indexes:
+                            index.create(connection)
+
+                self._create_change_log_triggers(connection)
+                # Старые записи журнала нужны только экземплярам, отставшим больше чем на CHANGE_LOG_KEEP
+                connection.execute(text(
+                    "DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - :keep"
+                ), {'keep': self.CHANGE_LOG_KEEP})
+
         except Exception as e:
             print(f"Ошибка создания дополнительных таблиц: {e}")
             raise
@@ -464,6 +640,46 @@ class DataBase:
             session.close()
 
 
+    def _seed_ingredient_nutrition(self):
+        """Заполняет пищевую ценность ингредиентов из data/ingredient_nutrition.csv,
+        если таблица пуста. Строки сопоставляются с ингредиентами по названию."""
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        seed_path = os.path.join(os.path.dirname(current_dir), 'data', 'ingredient_nutrition.csv')
+        if not os.path.exists(seed_path):
+            return
+
+        session = self.Session()
+        try:
+            if session.query(IngredientNutrition.ingredient_id).first() is not None:
+                return
+
+            ingredient_ids = {name.strip().lower(): ingredient_id
+                              for ingredient_id, name in session.execute(select(Ingredient.id, Ingredient.name))}
+
+            def optional(value):
+                return float(value) if value else None
+
+            with open(seed_path, encoding='utf-8') as seed_file:
+                for row in csv.DictReader(seed_file):
+                    ingredient_id = ingredient_ids.get(row['name'].strip().lower())
+                    if ingredient_id is None:
+                        continue
+                    session.add(IngredientNutrition(
+                        ingredient_id=ingredient_id,
+                        calories=float(row['calories']),
+                        proteins=float(row['proteins']),
+                        fats=float(row['fats']),
+                        carbohydrates=float(row['carbohydrates']),
+                        density=optional(row['density']),
+                        piece_grams=optional(row['piece_grams'])
+                    ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Ошибка загрузки пищевой ценности ингредиентов: {e}")
+        finally:
+            session.close()
+
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С КАТЕГОРИЯМИ =====
     def get_dish_types(self):
         """Получает список типов блюд"""
@@ -530,48 +746,28 @@ class DataBase:
 
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С РЕЦЕПТАМИ =====
 
-    def get_recipe_image(self, recipe_id):
-        """Упрощенная загрузка изображения рецепта"""
+    def get_recipe_image_path(self, recipe_id):
+        """Абсолютный путь к файлу изображения рецепта; None, если изображения нет"""
+        session = self.Session()
         try:
-            session = self.Session()
-            recipe = session.query(Recipe).filter_by(id=recipe_id).first()
-
-            if recipe and recipe.image:
-                image_path = f"../img/recipe_img/{recipe.image}"
-                from PyQt6.QtGui import QPixmap
-                pixmap = QPixmap(image_path)
-                if not pixmap.isNull():
-                    session.close()
-                    return pixmap
-
-            recipe_name = recipe.name if recipe else "Рецепт"
-            session.close()
-            return self._create_text_pixmap(recipe_name)
-
+            image = session.query(Recipe.image).filter_by(id=recipe_id).scalar()
+            return self.image_file_path(image) if image else None
         except Exception as e:
-            return self._create_text_pixmap("Изображение")
-
-    def _create_text_pixmap(self, text):
-        """Создает QPixmap с текстовой заглушкой"""
-        from PyQt6.QtGui import QPixmap, QPainter, QColor, QFont
-        from PyQt6.QtCore import Qt
-
-        pixmap = QPixmap(200, 150)
-        pixmap.fill(QColor(240, 240, 240))
-
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-        font = QFont()
-        font.setPointSize(10)
-        font.setBold(True)
-        painter.setFont(font)
-
-        painter.setPen(QColor(100, 100, 100))
-        painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, text)
-        painter.end()
+            print(f"Ошибка получения изображения рецепта: {e}")
+            return None
+        finally:
+            session.close()
 
-        return pixmap
+    def get_recipe_image_bytes(self, recipe_id):
+        """Содержимое файла изображения рецепта; None, если изображения нет или файл не читается"""
+        path = self.get_recipe_image_path(recipe_id)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
 
     def _parse_quantity(self, quantity_str):
         """Парсит количество из строки в числовое значение и определяет единицу измерения"""
@@ -585,14 +781,15 @@ class DataBase:
                 unit = 'г'
                 quantity_lower = str(quantity_str).lower()
 
+                # Ложки проверяются раньше стакана: 'ст.л.' тоже содержит 'ст'
                 if 'шт' in quantity_lower or 'штук' in quantity_lower:
                     unit = 'шт'
-                elif 'ст' in quantity_lower or 'стакан' in quantity_lower:
-                    unit = 'стакан'
                 elif 'ст.л.' in quantity_lower or 'стол' in quantity_lower:
                     unit = 'ст.л.'
                 elif 'ч.л.' in quantity_lower or 'чай' in quantity_lower:
                     unit = 'ч.л.'
+                elif 'ст' in quantity_lower or 'стакан' in quantity_lower:
+                    unit = 'стакан'
                 elif 'мл' in quantity_lower:
                     unit = 'мл'
                 elif 'л' in quantity_lower and 'мл' not in quantity_lower:
@@ -609,42 +806,132 @@ class DataBase:
         except Exception as e:
             return 1.0, 'шт'
 
-    def save_recipe_image(self, image_data, recipe_id, recipe_name):
-        """Сохраняет изображение рецепта с уникальным именем и возвращает имя файла"""
+    def _format_quantity(self, quantity, unit):
+        """Количество в том же текстовом виде, что и у исходных рецептов ('100 г', '2 шт')"""
+        if isinstance(quantity, (int, float)):
+            quantity = f"{quantity:g}"
+        return f"{quantity} {unit}".strip() if unit else str(quantity)
+
+    # Каталог хранилища внутри img/recipe_img; файлы разложены по подкаталогам
+    # из первых IMAGE_SHARD_CHARS символов хэша, чтобы каталоги не разрастались
+    IMAGE_STORE_DIR = 'store'
+    IMAGE_SHARD_CHARS = 2
+
+    def images_dir(self):
+        """Абсолютный путь к img/recipe_img"""
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'img', 'recipe_img')
+
+    def image_file_path(self, path):
+        """Абсолютный путь к файлу изображения по значению Recipes.image"""
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.images_dir(), *path.split('/'))
+
+    def store_image(self, image_data):
+        """Кладет изображение (bytes или путь к файлу) в хранилище по SHA-256 содержимого.
+
+        Возвращает (путь для Recipes.image, размер) или None. Если файл с таким
+        содержимым уже есть, на диск ничего не пишется. Счетчик ссылок не
+        меняется - это делает транзакция рецепта через _acquire_image.
+        """
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)
-            images_dir = os.path.join(project_root, 'img', 'recipe_img')
-            os.makedirs(images_dir, exist_ok=True)
-
-            # Создаем уникальное имя файла на основе ID рецепта
-            import hashlib
-            recipe_hash = hashlib.md5(f"{recipe_id}_{recipe_name}".encode()).hexdigest()[:8]
-
-            # Определяем расширение файла
-            if isinstance(image_data, str) and os.path.exists(image_data):
-                extension = os.path.splitext(image_data)[1].lower()
-            else:
-                extension = '.jpg'
-
-            image_filename = f"user_{recipe_hash}{extension}"
-            image_path = os.path.join(images_dir, image_filename)
-
-            if isinstance(image_data, bytes):
-                with open(image_path, 'wb') as f:
-                    f.write(image_data)
-            elif isinstance(image_data, str) and os.path.exists(image_data):
-                shutil.copy2(image_data, image_path)
+            if isinstance(image_data, (bytes, bytearray)):
+                content, extension = bytes(image_data), '.jpg'
+            elif isinstance(image_data, str) and os.path.isfile(image_data):
+                with open(image_data, 'rb') as f:
+                    content = f.read()
+                extension = os.path.splitext(image_data)[1].lower() or '.jpg'
             else:
                 return None
 
-            return image_filename
+            digest = hashlib.sha256(content).hexdigest()
+            path = f"{self.IMAGE_STORE_DIR}/{digest[:self.IMAGE_SHARD_CHARS]}/{digest}{extension}"
+            file_path = os.path.join(self.images_dir(), *path.split('/'))
+            if not os.path.exists(file_path):
+                # Запись через временный файл: оборванная запись не оставит битый файл под хэшем
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                temp_path = f"{file_path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_path, file_path)
+            return path, len(content)
 
         except Exception as e:
+            print(f"Ошибка сохранения изображения: {e}")
             return None
 
+    def _stored_image_path(self, image_data):
+        """Путь хранилища (как в Recipes.image), если image_data - путь к файлу внутри хранилища.
+        Имя такого файла - хэш содержимого, поэтому файл не нужно читать"""
+        if not isinstance(image_data, str):
+            return None
+        store_dir = os.path.join(self.images_dir(), self.IMAGE_STORE_DIR)
+        relative = os.path.relpath(os.path.abspath(image_data), store_dir)
+        parts = relative.split(os.sep)
+        digest = os.path.splitext(parts[-1])[0]
+        if len(parts) != 2 or parts[0] != digest[:self.IMAGE_SHARD_CHARS] or len(digest) != 64:
+            return None
+        return f"{self.IMAGE_STORE_DIR}/{parts[0]}/{parts[1]}"
+
+    def _acquire_image(self, session, path, size, count=1):
+        """Добавляет count ссылок на файл хранилища в транзакции session"""
+        session.execute(
+            sqlite_insert(StoredImage.__table__)
+            .values(path=path, size=size, ref_count=count, created_at=datetime.now())
+            .on_conflict_do_update(index_elements=['path'],
+                                   set_={'ref_count': StoredImage.__table__.c.ref_count + count})
+        )
+
+    def _release_image(self, session, path):
+        """Убирает ссылку на файл хранилища в транзакции session. Если ссылок не осталось,
+        удаляет запись и возвращает путь - файл удаляется после commit (_remove_stored_images)"""
+        if not path or not path.startswith(f"{self.IMAGE_STORE_DIR}/"):
+            return None
+        table = StoredImage.__table__
+        session.execute(update(table).where(table.c.path == path).values(ref_count=table.c.ref_count - 1))
+        deleted = session.execute(table.delete().where(table.c.path == path, table.c.ref_count <= 0))
+        return path if deleted.rowcount else None
+
+    def _set_recipe_image(self, session, recipe, image_data, placeholder=None):
+        """Меняет изображение рецепта в транзакции session: сохраняет файл в хранилище
+        и переносит ссылку со старого файла. placeholder - заглушка нового изображения;
+        без нее берется заглушка того же файла у другого рецепта, а если ее нет, заглушку
+        позже досчитает фоновое заполнение. Возвращает путь файла, который нужно удалить
+        после commit, или None"""
+        path = self._stored_image_path(image_data)
+        if path is not None and path == recipe.image:
+            # Прежнее изображение рецепта: ни чтения, ни записи
+            return None
+        if path is not None and os.path.isfile(image_data):
+            stored = path, os.path.getsize(image_data)
+        else:
+            stored = self.store_image(image_data)
+        if stored is None or stored[0] == recipe.image:
+            return None
+        path, size = stored
+        self._acquire_image(session, path, size)
+        released = self._release_image(session, recipe.image)
+        recipe.image = path
+        recipe.image_placeholder = placeholder or session.query(Recipe.image_placeholder).filter(
+            Recipe.image == path, Recipe.image_placeholder.isnot(None)
+        ).limit(1).scalar()
+        return released
+
+    def _remove_stored_images(self, *paths):
+        """Удаляет файлы хранилища, на которые больше нет ссылок (после commit)"""
+        for path in paths:
+            if not path:
+                continue
+            try:
+                os.remove(os.path.join(self.images_dir(), *path.split('/')))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Ошибка удаления файла изображения {path}: {e}")
+
+    @retry_on_busy
     def add_recipe(self, user_id, name, instruction, description, dish_type_id, cuisine_id,
-                   cook_time, ingredients_list, nutrition_data, image=None):
+                   cook_time, ingredients_list, nutrition_data, image=None, image_placeholder=None):
         """Добавление нового рецепта"""
         session = self.Session()
         try:
@@ -673,21 +960,16 @@ class DataBase:
             session.add(new_recipe)
             session.flush()
 
-            # Обрабатываем изображение если оно есть
-            image_filename = None
+            # Изображение кладется в хранилище, ссылка на него считается в этой же транзакции
             if image:
-                image_filename = self.save_recipe_image(image, new_recipe.id, name)
-                new_recipe.image = image_filename
-            else:
-                # Если пользователь не загружено изображение, оставляем поле пустым
-                new_recipe.image = None
+                self._set_recipe_image(session, new_recipe, image, image_placeholder)
 
-            # Добавляем ингредиенты
+            # Добавляем ингредиенты (единица хранится вместе с количеством - нужна для расчета КБЖУ)
             for ing_id, quantity, unit in ingredients_list:
                 recipe_ingredient = recipe_ingredients.insert().values(
                     recipe_id=new_recipe.id,
                     ingredient_id=ing_id,
-                    quantity=quantity
+                    quantity=self._format_quantity(quantity, unit)
                 )
                 session.execute(recipe_ingredient)
 
@@ -703,10 +985,13 @@ class DataBase:
                 session.add(nutrition)
 
             session.commit()
+            self._notify_recipe_changed(new_recipe.id, [ing_id for ing_id, _, _ in ingredients_list])
             return new_recipe.id
 
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return None
         finally:
             session.close()
@@ -722,6 +1007,176 @@ class DataBase:
         finally:
             session.close()
 
+    def get_recipe_details(self, recipe_id):
+        """Рецепт по ID с загруженными кухней, типом блюда и КБЖУ (для окон рецепта)"""
+        session = self.Session()
+        try:
+            return session.query(Recipe).options(
+                joinedload(Recipe.cuisine),
+                joinedload(Recipe.dish_type),
+                joinedload(Recipe.nutrition)
+            ).filter(Recipe.id == recipe_id).first()
+        except Exception as e:
+            print(f"Ошибка получения рецепта: {e}")
+            return None
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def update_recipe_details(self, recipe_id, servings, external_url):
+        """Сохраняет количество порций и ссылку на видео рецепта"""
+        session = self.Session()
+        try:
+            recipe = session.query(Recipe).filter_by(id=recipe_id).first()
+            if not recipe:
+                return False
+            recipe.servings = servings
+            recipe.external_url = external_url
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка обновления доп. полей рецепта: {e}")
+            return False
+        finally:
+            session.close()
+
+    def add_recipe_listener(self, listener):
+        """Подписывает listener(recipe_id, ingredient_ids, previous_ids) на добавление,
+        изменение и удаление рецептов (ingredient_ids = None при удалении)"""
+        if listener not in self.recipe_listeners:
+            self.recipe_listeners.append(listener)
+
+    def remove_recipe_listener(self, listener):
+        if listener in self.recipe_listeners:
+            self.recipe_listeners.remove(listener)
+
+    def _notify_recipe_changed(self, recipe_id, ingredient_ids, previous_ids=()):
+        """Сообщает подписчикам об изменении рецепта (вызывается после commit)"""
+        self._notify_write(Recipe.__tablename__, [recipe_id])
+        for listener in list(self.recipe_listeners):
+            try:
+                listener(recipe_id, ingredient_ids, list(previous_ids))
+            except Exception as e:
+                print(f"Ошибка обработчика изменения рецепта: {e}")
+
+    def add_write_listener(self, listener):
+        """Подписывает listener(table, recipe_ids, user_id) на запись в таблицы Recipes,
+        Nutrition, Favorites, cooked_recipes и recipe_scores. recipe_ids = None - могли
+        измениться любые рецепты, user_id = None - запись не относится к одному пользователю"""
+        if listener not in self.write_listeners:
+            self.write_listeners.append(listener)
+
+    def remove_write_listener(self, listener):
+        if listener in self.write_listeners:
+            self.write_listeners.remove(listener)
+
+    def _notify_write(self, table, recipe_ids=None, user_id=None):
+        """Сообщает подписчикам о записи в таблицу (вызывается после commit)"""
+        self.write_version += 1
+        for listener in list(self.write_listeners):
+            try:
+                listener(table, recipe_ids, user_id)
+            except Exception as e:
+                print(f"Ошибка обработчика записи в {table}: {e}")
+
+    # ===== ПОВТОР ЗАПИСИ ПРИ ЗАНЯТОЙ БАЗЕ =====
+    # Приложение, импорт и сервис каталога могут писать в один файл из разных процессов.
+    # Подключение ждет блокировку до busy_timeout, но SQLite отказывает и сразу, если
+    # ожидание привело бы к взаимной блокировке транзакций. Тогда метод записи,
+    # отмеченный retry_on_busy, выполняется заново после паузы
+
+    def set_interactive_thread(self):
+        """Отмечает текущий поток как поток окна: запись из него ждет занятую базу не
+        дольше INTERACTIVE_BUSY_DEADLINE и повторяется без пауз"""
+        self.interactive_thread = threading.get_ident()
+
+    def _call_with_busy_retry(self, method, args, kwargs):
+        interactive = threading.get_ident() == self.interactive_thread
+        previous = (getattr(self._busy_local, 'retrying', False), getattr(self._busy_local, 'timeout', None),
+                    getattr(self._busy_local, 'deadline', None))
+        # Вложенный вызов метода записи укладывается в срок внешнего
+        deadline = previous[2] or time.monotonic() + (
+            self.INTERACTIVE_BUSY_DEADLINE if interactive else self.BUSY_RETRY_DEADLINE)
+        delay = self.BUSY_RETRY_DELAY
+        try:
+            self._busy_local.deadline = deadline
+            for attempt in range(self.BUSY_RETRIES + 1):
+                remaining = deadline - time.monotonic()
+                self._busy_local.retrying = attempt < self.BUSY_RETRIES and remaining > 0
+                # Попытка ждет блокировку не дольше, чем осталось от срока вызова
+                self._busy_local.timeout = max(0.0, min(self.busy_timeout, remaining))
+                self._busy_local.failed = False
+                try:
+                    result = method(self, *args, **kwargs)
+                except Exception as e:
+                    if not is_busy_error(e):
+                        raise
+                    # Поток окна не засыпает: ожидание блокировки в следующей попытке и есть пауза
+                    pause = 0.0 if interactive else min(random.uniform(delay / 2, delay),
+                                                        max(0.0, deadline - time.monotonic()))
+                    with self._busy_lock:
+                        self.busy_metrics['retried_calls'] += attempt == 0
+                        self.busy_metrics['retries'] += 1
+                        self.busy_metrics['wait'] += pause
+                    if pause:
+                        time.sleep(pause)
+                    delay = min(delay * 2, self.BUSY_RETRY_MAX_DELAY)
+                    continue
+                if attempt and not self._busy_local.failed:
+                    with self._busy_lock:
+                        self.busy_metrics['recovered'] += 1
+                return result
+        finally:
+            self._busy_local.retrying, self._busy_local.timeout, self._busy_local.deadline = previous
+
+    def _apply_busy_timeout(self, dbapi_connection, connection_record, connection_proxy):
+        """Ставит подключению, выданному из пула, время ожидания блокировки текущей попытки
+        записи (вне retry_on_busy - busy_timeout экземпляра)"""
+        timeout = getattr(self._busy_local, 'timeout', None)
+        if timeout is None:
+            timeout = self.busy_timeout
+        if connection_record.info.get('busy_timeout', self.busy_timeout) != timeout:
+            dbapi_connection.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+            connection_record.info['busy_timeout'] = timeout
+
+    def _busy_retryable(self, error):
+        """Вызывается из обработчиков исключений методов записи: True - база занята и
+        метод выполнится повторно, ошибку нужно пробросить. Ошибки занятой базы без
+        повтора учитываются в busy_metrics['failures']"""
+        if not is_busy_error(error):
+            return False
+        if getattr(self._busy_local, 'retrying', False):
+            return True
+        self._busy_local.failed = True
+        with self._busy_lock:
+            self.busy_metrics['failures'] += 1
+        print(f"База данных занята другим процессом, запись не выполнена: {getattr(error, 'orig', error)}")
+        return False
+
+    def get_busy_metrics(self):
+        """Счетчики повторов записи: retried_calls - вызовов с повторами, retries - повторов,
+        recovered - вызовов, выполненных после повтора, failures - отказов из-за занятой базы,
+        wait - суммарная пауза между повторами в секундах"""
+        with self._busy_lock:
+            return dict(self.busy_metrics)
+
+    def set_recipe_catalog(self, catalog):
+        """Подключает каталог рецептов в памяти (None - отключает).
+
+        Пока каталог подключен, get_recipes_with_filters и get_filter_facets
+        отбирают рецепты по его массивам, если фильтры это позволяют, и
+        обращаются к SQLite, если нет. Каталог получает изменения через
+        add_write_listener.
+        """
+        if self.recipe_catalog is not None:
+            self.remove_write_listener(self.recipe_catalog.on_write)
+        self.recipe_catalog = catalog
+        if catalog is not None:
+            self.add_write_listener(catalog.on_write)
+
     def get_dish_types_with_objects(self):
         """Получает список типов блюд как объекты (для обратной совместимости)"""
         session = self.Session()
@@ -746,11 +1201,11 @@ class DataBase:
 
     def add_to_favorites(self, user_id, recipe_id):
         """ Добавляет рецепт в избранное """
-        return self.toggle_favorite(user_id, recipe_id)
+        return self.set_favorite(user_id, recipe_id, True)
 
     def remove_from_favorites(self, user_id, recipe_id):
         """ Удаляет рецепт из избранного """
-        return self.toggle_favorite(user_id, recipe_id)
+        return self.set_favorite(user_id, recipe_id, False)
 
     def is_cooked(self, user_id, recipe_id):
         return self.is_recipe_cooked(user_id, recipe_id)
@@ -759,8 +1214,9 @@ class DataBase:
         """ Отмечает рецепт как приготовленный """
         return self.mark_recipe_as_cooked(user_id, recipe_id, cooked)
 
+    @retry_on_busy
     def update_recipe(self, recipe_id, name, instruction, description, dish_type_id, cuisine_id,
-                      cook_time, ingredients_list, nutrition_data, image=None):
+                      cook_time, ingredients_list, nutrition_data, image=None, image_placeholder=None):
         """Обновление существующего рецепта с раздельными полями для типа блюда и кухни"""
         session = self.Session()
         try:
@@ -776,12 +1232,11 @@ class DataBase:
             recipe.cuisine_id = cuisine_id
             recipe.cook_time = cook_time
 
-            # Обрабатываем изображение если оно есть
-            if image:
-                image_filename = self.save_recipe_image(image, recipe_id, name)
-                recipe.image = image_filename
+            # Новое изображение получает ссылку, старое ее теряет - в одной транзакции с рецептом
+            released_image = self._set_recipe_image(session, recipe, image, image_placeholder) if image else None
 
             # Обновляем ингредиенты
+            previous_ids = self._recipe_ingredient_ids(session, recipe_id)
             session.execute(
                 recipe_ingredients.delete().where(recipe_ingredients.c.recipe_id == recipe_id)
             )
@@ -790,7 +1245,7 @@ class DataBase:
                     recipe_ingredients.insert().values(
                         recipe_id=recipe_id,
                         ingredient_id=ing_id,
-                        quantity=quantity
+                        quantity=self._format_quantity(quantity, unit)
                     )
                 )
 
@@ -810,148 +1265,325 @@ class DataBase:
                 session.add(new_nutrition)
 
             session.commit()
+            self._remove_stored_images(released_image)
+            self._notify_recipe_changed(recipe_id, [ing_id for ing_id, _, _ in ingredients_list], previous_ids)
             return True
 
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
 
+    # Тип блюда, под которым показываются рецепты без категории
+    DEFAULT_DISH_TYPE = "Основные блюда"
+
+    # Режимы фильтра по ингредиентам: все выбранные, любой из выбранных, ни одного из выбранных
+    INGREDIENT_MODE_ALL = "all"
+    INGREDIENT_MODE_ANY = "any"
+    INGREDIENT_MODE_NONE = "none"
+
+    # Порядки сортировки списка рецептов
+    SORT_RELEVANCE = "relevance"
+    SORT_COOK_TIME = "cook_time"
+    SORT_CALORIES = "calories"
+    SORT_PROTEIN_DENSITY = "protein_density"
+    SORT_RECENT = "recent"
+    # Сортировки, для которых нужна известная пищевая ценность
+    NUTRITION_SORTS = (SORT_CALORIES, SORT_PROTEIN_DENSITY)
+
+    # Столбцы Nutrition, по которым задаются диапазоны в фильтре КБЖУ
+    NUTRITION_RANGE_COLUMNS = ('calories', 'proteins', 'fats', 'carbohydrates')
+
+    # Пороги фильтра по времени приготовления (минуты), они же границы групп в счетчиках фильтров
+    TIME_BUCKETS = (15, 30, 60, 90, 120)
+
+    def _dish_type_key(self):
+        """Выражение для имени типа блюда с подстановкой категории по умолчанию"""
+        return func.coalesce(Dish_types.name, self.DEFAULT_DISH_TYPE)
+
+    def _recipe_list_query(self, session, *columns):
+        """Базовый запрос списка рецептов с присоединенными типом блюда и кухней"""
+        return session.query(*columns).select_from(Recipe).outerjoin(
+            Dish_types, Recipe.dish_type_id == Dish_types.id
+        ).outerjoin(
+            Cuisines, Recipe.cuisine_id == Cuisines.id
+        )
+
+    def _relevance_key(self, query, user_id):
+        """Присоединяет персональные оценки пользователя и возвращает (запрос, выражение оценки).
+
+        Соединение идет по первичному ключу recipe_scores (user_id, recipe_id);
+        у рецептов без оценки релевантность 0.
+        """
+        query = query.outerjoin(
+            RecipeScore, (RecipeScore.user_id == user_id) & (RecipeScore.recipe_id == Recipe.id)
+        )
+        return query, func.coalesce(RecipeScore.score, 0.0)
+
+    def _sort_key(self, sort):
+        """Ключ страницы для сортировки sort: (столбцы ключа, по убыванию ли).
+
+        Все столбцы ключа идут в одном направлении, поэтому курсор
+        сравнивается с ключом одним сравнением кортежей. Последний столбец -
+        id рецепта, он делает ключ уникальным. Новизна определяется по id:
+        у рецептов из исходной базы created_at не заполнен.
+        """
+        if sort == self.SORT_COOK_TIME:
+            return [RECIPE_COOK_TIME_KEY, Recipe.name, Recipe.id], False
+        if sort == self.SORT_CALORIES:
+            return [Nutrition.calories, Nutrition.recipe_id], False
+        if sort == self.SORT_PROTEIN_DENSITY:
+            return [PROTEIN_DENSITY_KEY, Nutrition.recipe_id], True
+        if sort == self.SORT_RECENT:
+            return [Recipe.id], True
+        return None, False
+
+    def _dish_type_condition(self, session, dish_type, sort=SORT_RELEVANCE):
+        """Условие «рецепт относится к разделу dish_type».
+
+        Для обычного раздела это равенство по Recipe.dish_type_id, и страница
+        читается по индексу (тип блюда, ключ сортировки). В раздел по
+        умолчанию попадают и рецепты без типа блюда, для него остается
+        условие по выражению с подстановкой.
+        """
+        if dish_type != self.DEFAULT_DISH_TYPE:
+            dish_type_id = session.query(Dish_types.id).filter(Dish_types.name == dish_type).scalar()
+            if dish_type_id is not None:
+                column = Recipe.dish_type_id
+                if sort in self.NUTRITION_SORTS:
+                    # "+ 0" отключает индекс по типу блюда: страницу дешевле читать по индексу
+                    # Nutrition в порядке сортировки и проверять тип у каждой строки
+                    column = column + 0
+                return column == dish_type_id
+        return self._dish_type_key() == dish_type
+
+    def _ingredient_match_subquery(self, ingredient_filter, mode=INGREDIENT_MODE_ALL):
+        """Строит подзапрос ID рецептов, подходящих под выбранные ингредиенты.
+
+        Каждое название сравнивается с ингредиентами через ILIKE в одном
+        соединении с таблицей шаблонов. Для режима "all" рецепты группируются,
+        и остаются только те, у которых совпали все k шаблонов
+        (HAVING COUNT(DISTINCT term_index) = k). Для "any" и "none" достаточно
+        совпадения хотя бы одного шаблона; "none" применяется как NOT IN.
+        """
+        names = list(dict.fromkeys(name.strip() for name in ingredient_filter if name and name.strip()))
+        if not names:
+            return None
+
+        terms = union_all(*[
+            select(literal(index).label('term_index'), literal(f'%{name}%').label('pattern'))
+            for index, name in enumerate(names)
+        ]).subquery('terms')
+
+        # Порядок соединения: шаблоны -> подходящие ингредиенты -> их рецепты по индексу
+        # ix_recipe_ingredients_ingredient. "+ 0" не дает SQLite начать с полного
+        # просмотра Recipe_ingredients и искать ингредиенты по первичному ключу.
+        subquery = (
+            select(recipe_ingredients.c.recipe_id)
+            .select_from(terms)
+            .join(Ingredient, Ingredient.name.ilike(terms.c.pattern))
+            .join(recipe_ingredients, recipe_ingredients.c.ingredient_id == Ingredient.id + 0)
+        )
+
+        if mode == self.INGREDIENT_MODE_ALL:
+            subquery = subquery.group_by(recipe_ingredients.c.recipe_id).having(
+                func.count(terms.c.term_index.distinct()) == len(names)
+            )
+        else:
+            subquery = subquery.distinct()
+
+        return subquery
+
+    def _apply_recipe_filters(self, session, query, user_id, cuisine=None, max_time=None,
+                              favorites_only=False, cooked_only=False,
+                              ingredient_filter=None, name_filter=None,
+                              ingredient_mode=INGREDIENT_MODE_ALL,
+                              nutrition_ranges=None, sort=SORT_RELEVANCE):
+        """Накладывает фильтры главного окна на запрос рецептов.
+
+        ingredient_mode задает смысл фильтра по ингредиентам: "all" - рецепт
+        содержит все выбранные, "any" - хотя бы один, "none" - ни одного
+        (например, при аллергии). nutrition_ranges - {столбец КБЖУ: (от, до)},
+        любая граница может быть None. Диапазоны и сортировки по КБЖУ
+        оставляют только рецепты с известной пищевой ценностью. Возвращает
+        None, если по фильтру заведомо ничего не найдется.
+        """
+        # Фильтр по кухне
+        if cuisine and cuisine != "Любая кухня":
+            query = query.filter(Cuisines.name == cuisine)
+
+        # Фильтр по времени приготовления
+        if max_time:
+            query = query.filter(Recipe.cook_time <= max_time)
+
+        # Фильтр по избранному
+        if favorites_only:
+            favorite_subquery = session.query(favorites.c.recipe_id).filter(
+                favorites.c.user_id == user_id
+            ).subquery()
+            query = query.filter(Recipe.id.in_(favorite_subquery))
+
+        # Фильтр по приготовленным рецептам
+        if cooked_only:
+            cooked_subquery = session.query(CookedRecipe.recipe_id).filter_by(user_id=user_id).subquery()
+            query = query.filter(Recipe.id.in_(cooked_subquery))
+
+        # Фильтр по названию
+        if name_filter and name_filter.strip():
+            name_filter = name_filter.strip()
+            search_terms = [
+                f"%{name_filter}%",
+                f"%{name_filter.lower()}%",
+                f"%{name_filter.upper()}%",
+                f"%{name_filter.title()}%",
+            ]
+            search_terms = list(set(search_terms))
+            conditions = []
+            for term in search_terms:
+                conditions.append(Recipe.name.ilike(term))
+            query = query.filter(or_(*conditions))
+
+        # Фильтр по ингредиентам
+        if ingredient_filter and isinstance(ingredient_filter, list):
+            ingredient_subquery = self._ingredient_match_subquery(ingredient_filter, ingredient_mode)
+            if ingredient_subquery is not None:
+                if ingredient_mode == self.INGREDIENT_MODE_NONE:
+                    query = query.filter(Recipe.id.not_in(ingredient_subquery))
+                else:
+                    query = query.filter(Recipe.id.in_(ingredient_subquery))
+
+        # Фильтр по диапазонам КБЖУ
+        ranges = [
+            (getattr(Nutrition, column), low, high)
+            for column, (low, high) in (nutrition_ranges or {}).items()
+            if column in self.NUTRITION_RANGE_COLUMNS and (low is not None or high is not None)
+        ]
+        if ranges or sort in self.NUTRITION_SORTS:
+            query = query.join(Nutrition, Nutrition.recipe_id == Recipe.id)
+
+            for column, low, high in ranges:
+                if low is not None and high is not None and low > high:
+                    return None
+                if sort == self.SORT_PROTEIN_DENSITY:
+                    # Страницу читаем по индексу плотности белка, а не по диапазону калорийности
+                    column = column + 0
+                if low is not None:
+                    query = query.filter(column >= low)
+                if high is not None:
+                    query = query.filter(column <= high)
+
+            # Строки без значения ключа не попали бы в сравнение курсора
+            if sort == self.SORT_CALORIES:
+                query = query.filter(Nutrition.calories.isnot(None))
+            elif sort == self.SORT_PROTEIN_DENSITY:
+                query = query.filter(PROTEIN_DENSITY_KEY.isnot(None))
+
+        return query
+
+    def _build_recipe_tuples(self, session, user_id, rows):
+        """Собирает кортежи рецептов из строк (Recipe, dish_type, cuisine_name).
+
+        Статусы избранного, приготовления и КБЖУ загружаются одним запросом
+        на всю пачку, а не отдельными запросами на каждый рецепт.
+        """
+        recipe_ids = [recipe.id for recipe, _, _ in rows]
+        if not recipe_ids:
+            return []
+
+        favorite_ids = {row.recipe_id for row in session.execute(
+            favorites.select().where(
+                (favorites.c.user_id == user_id) & (favorites.c.recipe_id.in_(recipe_ids))
+            )
+        )}
+        cooked_ids = {recipe_id for (recipe_id,) in session.query(CookedRecipe.recipe_id).filter(
+            CookedRecipe.user_id == user_id, CookedRecipe.recipe_id.in_(recipe_ids)
+        )}
+        nutrition_by_id = {n.recipe_id: n for n in session.query(Nutrition).filter(
+            Nutrition.recipe_id.in_(recipe_ids)
+        )}
+
+        result = []
+        for recipe, dish_type, cuisine_name in rows:
+            nutrition = nutrition_by_id.get(recipe.id)
+            calories = nutrition.calories if nutrition else None
+            proteins = nutrition.proteins if nutrition else None
+            fats = nutrition.fats if nutrition else None
+            carbohydrates = nutrition.carbohydrates if nutrition else None
+
+            dish_type = dish_type or self.DEFAULT_DISH_TYPE
+
+            result.append((
+                recipe.id,
+                recipe.user_id,
+                recipe.name,
+                recipe.instruction,
+                recipe.description,
+                recipe.dish_type_id,
+                recipe.image,
+                recipe.external_url,
+                recipe.cook_time,
+                dish_type,
+                recipe.image_placeholder,
+                calories,
+                proteins,
+                fats,
+                carbohydrates,
+                recipe.id in favorite_ids,
+                recipe.id in cooked_ids,
+                cuisine_name,
+                dish_type
+            ))
+        return result
+
     def get_recipes_with_filters(self, user_id, cuisine=None, max_time=None,
                                  favorites_only=False, cooked_only=False,
-                                 ingredient_filter=None, name_filter=None):
-        """Получение рецептов с фильтрами с группировкой по типам блюд"""
+                                 ingredient_filter=None, name_filter=None,
+                                 ingredient_mode=INGREDIENT_MODE_ALL,
+                                 nutrition_ranges=None, sort=SORT_RELEVANCE):
+        """Получение рецептов с фильтрами с группировкой по типам блюд.
+
+        Если подключен каталог в памяти и фильтры ему по силам, рецепты
+        отбираются и упорядочиваются по его массивам, а из базы читаются
+        только строки найденных рецептов.
+        """
+        filters = dict(
+            cuisine=cuisine, max_time=max_time, favorites_only=favorites_only, cooked_only=cooked_only,
+            ingredient_filter=ingredient_filter, name_filter=name_filter, ingredient_mode=ingredient_mode,
+            nutrition_ranges=nutrition_ranges, sort=sort
+        )
+        catalog = self.recipe_catalog
+        recipe_ids = catalog.select_ids(user_id, **filters) if catalog is not None else None
+
         session = self.Session()
 
         grouped_recipes = {}
 
         try:
-            query = session.query(
-                Recipe,
-                Dish_types.name.label('dish_type_name'),
-                Cuisines.name.label('cuisine_name')
-            ).outerjoin(
-                Dish_types, Recipe.dish_type_id == Dish_types.id
-            ).outerjoin(
-                Cuisines, Recipe.cuisine_id == Cuisines.id
-            )
-
-            # Фильтр по кухне
-            if cuisine and cuisine != "Любая кухня":
-                query = query.filter(Cuisines.name == cuisine)
-
-            # Фильтр по времени приготовления
-            if max_time:
-                query = query.filter(Recipe.cook_time <= max_time)
-
-            # Фильтр по избранному
-            if favorites_only:
-                favorite_subquery = session.query(favorites.c.recipe_id).filter(
-                    favorites.c.user_id == user_id
-                ).subquery()
-                query = query.filter(Recipe.id.in_(favorite_subquery))
-
-            # Фильтр по приготовленным рецептам
-            if cooked_only:
-                cooked_subquery = session.query(CookedRecipe.recipe_id).filter_by(user_id=user_id).subquery()
-                query = query.filter(Recipe.id.in_(cooked_subquery))
-
-            # Фильтр по названию
-            if name_filter and name_filter.strip():
-                name_filter = name_filter.strip()
-                search_terms = [
-                    f"%{name_filter}%",
-                    f"%{name_filter.lower()}%",
-                    f"%{name_filter.upper()}%",
-                    f"%{name_filter.title()}%",
-                ]
-                search_terms = list(set(search_terms))
-                conditions = []
-                for term in search_terms:
-                    conditions.append(Recipe.name.ilike(term))
-                query = query.filter(or_(*conditions))
-
-            # Фильтр по ингредиентам
-            if ingredient_filter and isinstance(ingredient_filter, list) and ingredient_filter:
-
-                # Для каждого ингредиента создаем под запрос
-                subqueries = []
-                for ing_name in ingredient_filter:
-                    matching_ingredients = session.query(Ingredient).filter(
-                        Ingredient.name.ilike(f'%{ing_name}%')
+            if recipe_ids is not None:
+                results = self._recipe_rows_by_ids(session, recipe_ids.tolist())
+            else:
+                query = self._recipe_list_query(
+                    session, Recipe, Dish_types.name.label('dish_type_name'), Cuisines.name.label('cuisine_name')
+                )
+                query = self._apply_recipe_filters(session, query, user_id, **filters)
+                if query is None:
+                    return {}
+
+                key_columns, descending = self._sort_key(sort)
+                if key_columns is None:
+                    # Сначала рецепты с наибольшей персональной релевантностью
+                    query, relevance = self._relevance_key(query, user_id)
+                    results = query.order_by(relevance.desc(), Recipe.name, Recipe.id).all()
+                else:
+                    results = query.order_by(
+                        *[column.desc() if descending else column for column in key_columns]
                     ).all()
 
-                    if matching_ingredients:
-                        ing_ids = [ing.id for ing in matching_ingredients]
-
-                        # Создаем под запрос для текущего ингредиента
-                        ing_subquery = session.query(recipe_ingredients.c.recipe_id).filter(
-                            recipe_ingredients.c.ingredient_id.in_(ing_ids)
-                        ).subquery()
-
-                        # Добавляем в список под запросов
-                        subqueries.append(ing_subquery)
-                    else:
-                        # Если один ингредиент не найден, возвращаем пустой результат
-                        return {}
-
-                # Объединяем все под запросы - рецепт должен содержать ВСЕ указанные ингредиенты
-                if subqueries:
-                    # Начинаем с первого под запроса
-                    combined_subquery = subqueries[0]
-
-                    # Пересекаем со всеми остальными под запросами
-                    for subquery in subqueries[1:]:
-                        combined_subquery = session.query(combined_subquery.c.recipe_id).intersect(
-                            session.query(subquery.c.recipe_id)
-                        ).subquery()
-
-                    query = query.filter(Recipe.id.in_(combined_subquery))
-
-            # Выполняем запрос
-            results = query.all()
-
-            for recipe, dish_type_name, cuisine_name in results:
-                # Получаем данные о питательности
-                nutrition = recipe.nutrition
-                calories = nutrition.calories if nutrition else None
-                proteins = nutrition.proteins if nutrition else None
-                fats = nutrition.fats if nutrition else None
-                carbohydrates = nutrition.carbohydrates if nutrition else None
-
-                # Проверяем статусы
-                is_favorite = session.query(favorites).filter_by(
-                    user_id=user_id, recipe_id=recipe.id
-                ).first() is not None
-
-                is_cooked = session.query(CookedRecipe).filter_by(
-                    user_id=user_id, recipe_id=recipe.id
-                ).first() is not None
-
-                dish_type = dish_type_name or "Основные блюда"
-
-                recipe_tuple = (
-                    recipe.id,
-                    recipe.user_id,
-                    recipe.name,
-                    recipe.instruction,
-                    recipe.description,
-                    recipe.dish_type_id,
-                    recipe.image,
-                    recipe.external_url,
-                    recipe.cook_time,
-                    dish_type,
-                    None,
-                    calories,
-                    proteins,
-                    fats,
-                    carbohydrates,
-                    is_favorite,
-                    is_cooked,
-                    cuisine_name,
-                    dish_type
-                )
+            for recipe_tuple in self._build_recipe_tuples(session, user_id, results):
+                dish_type = recipe_tuple[9]
 
                 # Динамически создаем категорию если её нет
                 if dish_type not in grouped_recipes:
@@ -966,6 +1598,214 @@ class DataBase:
         finally:
             session.close()
 
+    def _recipe_rows_by_ids(self, session, recipe_ids):
+        """Строки (Recipe, dish_type_name, cuisine_name) для recipe_ids в том же порядке"""
+        rows = {}
+        for start in range(0, len(recipe_ids), 500):
+            query = self._recipe_list_query(
+                session, Recipe, Dish_types.name.label('dish_type_name'), Cuisines.name.label('cuisine_name')
+            ).filter(Recipe.id.in_(recipe_ids[start:start + 500]))
+            rows.update((row[0].id, row) for row in query)
+        return [rows[recipe_id] for recipe_id in recipe_ids if recipe_id in rows]
+
+    def get_recipes_page(self, user_id, dish_type=None, cursor=None, page_size=24, sort=SORT_RELEVANCE, **filters):
+        """Получает одну страницу рецептов с курсорной пагинацией.
+
+        По умолчанию рецепты упорядочены по ключу (тип блюда, релевантность
+        по убыванию, название, id). Для остальных сортировок ключ задает
+        _sort_key; раздел dish_type фиксируется равенством по типу блюда,
+        так что страница читается по индексу от позиции курсора. cursor -
+        ключ последнего рецепта предыдущей страницы (None для первой).
+        Фильтры передаются так же, как в get_recipes_with_filters.
+        Возвращает (список кортежей рецептов, курсор следующей страницы или None).
+        """
+        session = self.Session()
+        try:
+            dish_type_key = self._dish_type_key()
+            query = self._recipe_list_query(
+                session, Recipe, dish_type_key.label('dish_type_name'), Cuisines.name.label('cuisine_name')
+            )
+            query = self._apply_recipe_filters(session, query, user_id, sort=sort, **filters)
+            if query is None:
+                return [], None
+
+            key_columns, descending = self._sort_key(sort)
+            if key_columns is None:
+                query, relevance = self._relevance_key(query, user_id)
+                if dish_type is not None:
+                    query = query.filter(dish_type_key == dish_type)
+
+                # Релевантность идет по убыванию, поэтому в ключе курсора она со знаком минус
+                key_columns = [dish_type_key, -relevance, Recipe.name, Recipe.id]
+                order_by = [dish_type_key, relevance.desc(), Recipe.name, Recipe.id]
+            else:
+                if dish_type is not None:
+                    query = query.filter(self._dish_type_condition(session, dish_type, sort))
+                order_by = [column.desc() for column in key_columns] if descending else key_columns
+
+            query = query.add_columns(*[column.label(f'page_key_{i}') for i, column in enumerate(key_columns)])
+            if cursor is not None:
+                page_key = tuple_(*key_columns)
+                query = query.filter(page_key < tuple_(*cursor) if descending else page_key > tuple_(*cursor))
+
+            # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+            rows = query.order_by(*order_by).limit(page_size + 1).all()
+
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                next_cursor = tuple(rows[-1][3:])
+
+            rows = [(recipe, dish_type_name, cuisine_name) for recipe, dish_type_name, cuisine_name, *_ in rows]
+            return self._build_recipe_tuples(session, user_id, rows), next_cursor
+
+        except Exception as e:
+            print(f"Ошибка получения страницы рецептов: {e}")
+            return [], None
+        finally:
+            session.close()
+
+    def count_recipes_by_dish_type(self, user_id, **filters):
+        """Считает рецепты каждого типа блюда одним запросом COUNT ... GROUP BY"""
+        session = self.Session()
+        try:
+            dish_type_key = self._dish_type_key()
+            query = self._recipe_list_query(session, dish_type_key, func.count(Recipe.id))
+            query = self._apply_recipe_filters(session, query, user_id, **filters)
+            if query is None:
+                return {}
+
+            return {dish_type: count for dish_type, count in query.group_by(dish_type_key).all()}
+
+        except Exception as e:
+            print(f"Ошибка подсчета рецептов по типам блюд: {e}")
+            return {}
+        finally:
+            session.close()
+
+    def _facet_groups(self, session, user_id, filters):
+        """Группы счетчиков фильтров из SQLite: {(cuisine_id, dish_type_id, cook_time):
+        [всего, только избранные, только приготовленные, и то и другое]}.
+        None - по фильтрам заведомо ничего не найдется."""
+        dimensions = (Recipe.cuisine_id, Recipe.dish_type_id, Recipe.cook_time)
+
+        query = self._recipe_list_query(session, *dimensions, func.count(Recipe.id))
+        query = self._apply_recipe_filters(session, query, user_id, **filters)
+        if query is None:
+            return None
+        groups = {tuple(row[:3]): [row[3], 0, 0, 0] for row in query.group_by(*dimensions)}
+
+        # Для каждой группы - сколько в ней избранных, приготовленных и тех и других
+        marked_ids = union_all(
+            select(favorites.c.recipe_id).where(favorites.c.user_id == user_id),
+            select(CookedRecipe.recipe_id).where(CookedRecipe.user_id == user_id)
+        )
+        is_favorite = favorites.c.recipe_id.isnot(None)
+        is_cooked = CookedRecipe.recipe_id.isnot(None)
+        marked = self._recipe_list_query(
+            session, *dimensions, is_favorite, is_cooked, func.count(Recipe.id)
+        ).outerjoin(
+            favorites, (favorites.c.user_id == user_id) & (favorites.c.recipe_id == Recipe.id)
+        ).outerjoin(
+            CookedRecipe, (CookedRecipe.user_id == user_id) & (CookedRecipe.recipe_id == Recipe.id)
+        ).filter(Recipe.id.in_(marked_ids))
+        marked = self._apply_recipe_filters(session, marked, user_id, **filters)
+        for *key, favorite, cooked, count in marked.group_by(*dimensions, is_favorite, is_cooked):
+            groups[tuple(key)][bool(favorite) + 2 * bool(cooked)] += count
+
+        return groups
+
+    def get_filter_facets(self, user_id, cuisine=None, max_time=None, favorites_only=False,
+                          cooked_only=False, **filters):
+        """Счетчики для панели фильтров: сколько рецептов даст каждый вариант.
+
+        Рецепты, прошедшие остальные фильтры (название, ингредиенты, КБЖУ),
+        группируются по (кухня, тип блюда, время приготовления). Группировка
+        идет в порядке индекса ix_recipes_facets, без сортировки каталога.
+        Избранное и приготовленное - небольшие множества, их группы
+        считаются вторым запросом только по этим рецептам. Если подключен
+        каталог в памяти, группы считает он. Дальше счетчики
+        всех фильтров собираются из нескольких тысяч групп без обращения к
+        базе: для вариантов фильтра учитываются все остальные выбранные
+        фильтры, кроме него самого. Возвращает словарь:
+          cuisine   - {кухня: число} (None - рецепты без кухни),
+          time      - {порог из TIME_BUCKETS: число рецептов не дольше порога,
+                       None: число рецептов без ограничения времени},
+          dish_type - {тип блюда: число} с учетом всех фильтров,
+          favorites, cooked - число рецептов при включенном флажке,
+          total     - число рецептов с учетом всех фильтров.
+        """
+        facets = {'cuisine': {}, 'time': dict.fromkeys(self.TIME_BUCKETS + (None,), 0), 'dish_type': {},
+                  'favorites': 0, 'cooked': 0, 'total': 0}
+        if cuisine == "Любая кухня":
+            cuisine = None
+
+        # Каталог в памяти отдает те же группы без обращения к SQLite
+        catalog = self.recipe_catalog
+        groups = catalog.facet_groups(user_id, **filters) if catalog is not None else None
+
+        session = self.Session()
+        try:
+            if groups is None:
+                groups = self._facet_groups(session, user_id, filters)
+                if groups is None:
+                    return facets
+
+            cuisine_names = dict(session.query(Cuisines.id, Cuisines.name).all())
+            dish_type_names = dict(session.query(Dish_types.id, Dish_types.name).all())
+        except Exception as e:
+            print(f"Ошибка подсчета вариантов фильтров: {e}")
+            return facets
+        finally:
+            session.close()
+
+        for (cuisine_id, dish_type_id, cook_time), (count, favorite_only, cooked_only_count, both) in groups.items():
+            cuisine_name = cuisine_names.get(cuisine_id)
+            dish_type = dish_type_names.get(dish_type_id) or self.DEFAULT_DISH_TYPE
+            bucket = next((limit for limit in self.TIME_BUCKETS
+                           if cook_time is not None and cook_time <= limit), None)
+
+            # Группа делится на части по признакам (избранное, приготовленное)
+            parts = (
+                (False, False, count - favorite_only - cooked_only_count - both),
+                (True, False, favorite_only),
+                (False, True, cooked_only_count),
+                (True, True, both),
+            )
+            for favorite, cooked, part in parts:
+                if not part:
+                    continue
+
+                cuisine_ok = cuisine is None or cuisine_name == cuisine
+                time_ok = not max_time or (bucket is not None and bucket <= max_time)
+                favorite_ok = favorite or not favorites_only
+                cooked_ok = cooked or not cooked_only
+
+                if time_ok and favorite_ok and cooked_ok:
+                    facets['cuisine'][cuisine_name] = facets['cuisine'].get(cuisine_name, 0) + part
+                if cuisine_ok and favorite_ok and cooked_ok:
+                    facets['time'][None] += part
+                    if bucket is not None:
+                        facets['time'][bucket] += part
+                if cuisine_ok and time_ok and cooked_ok and favorite:
+                    facets['favorites'] += part
+                if cuisine_ok and time_ok and favorite_ok and cooked:
+                    facets['cooked'] += part
+                if cuisine_ok and time_ok and favorite_ok and cooked_ok:
+                    facets['dish_type'][dish_type] = facets['dish_type'].get(dish_type, 0) + part
+                    facets['total'] += part
+
+        # Разделы главной страницы идут в том же порядке, что и в GROUP BY по типу блюда
+        facets['dish_type'] = dict(sorted(facets['dish_type'].items()))
+
+        # Порог «до N минут» включает и более быстрые группы
+        running = 0
+        for limit in self.TIME_BUCKETS:
+            running += facets['time'][limit]
+            facets['time'][limit] = running
+
+        return facets
+
     def get_recipe_ingredients(self, recipe_id):
         """Получение ингредиентов рецепта"""
         session = self.Session()
@@ -989,32 +1829,76 @@ class DataBase:
         finally:
             session.close()
 
+    def get_recipes_ingredients(self, recipe_ids):
+        """Ингредиенты нескольких рецептов одним запросом на пачку:
+        {recipe_id: [(название, количество, единица)]}"""
+        session = self.Session()
+        try:
+            result = {}
+            recipe_ids = list(recipe_ids)
+            for start in range(0, len(recipe_ids), 500):
+                rows = session.query(
+                    recipe_ingredients.c.recipe_id, Ingredient.name, recipe_ingredients.c.quantity
+                ).join(
+                    Ingredient, Ingredient.id == recipe_ingredients.c.ingredient_id
+                ).filter(recipe_ingredients.c.recipe_id.in_(recipe_ids[start:start + 500]))
+                for recipe_id, name, quantity_text in rows:
+                    quantity, unit = self._parse_quantity(quantity_text)
+                    result.setdefault(recipe_id, []).append((name, quantity, unit))
+            return result
+        except Exception as e:
+            return {}
+        finally:
+            session.close()
+
+    def get_recipe_ingredient_pairs(self):
+        """Возвращает все пары (recipe_id, ingredient_id) одним запросом - для индекса кладовой"""
+        session = self.Session()
+        try:
+            stmt = select(recipe_ingredients.c.recipe_id, recipe_ingredients.c.ingredient_id)
+            return [tuple(row) for row in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    def _recipe_ingredient_ids(self, session, recipe_id):
+        """ID ингредиентов рецепта в рамках открытой сессии"""
+        stmt = select(recipe_ingredients.c.ingredient_id).where(recipe_ingredients.c.recipe_id == recipe_id)
+        return [ingredient_id for (ingredient_id,) in session.execute(stmt)]
+
+    def get_recipe_names(self, recipe_ids=None):
+        """Возвращает словарь {recipe_id: название} для всех рецептов или только для recipe_ids"""
+        session = self.Session()
+        try:
+            stmt = select(Recipe.id, Recipe.name)
+            if recipe_ids is not None:
+                stmt = stmt.where(Recipe.id.in_(list(recipe_ids)))
+            return dict(session.execute(stmt).all())
+        except Exception as e:
+            return {}
+        finally:
+            session.close()
+
+    @retry_on_busy
     def delete_recipe(self, recipe_id):
         """Удаление рецепта"""
         session = self.Session()
         try:
             recipe = session.query(Recipe).filter_by(id=recipe_id).first()
             if recipe:
-                # Проверяем, используется ли это изображение другими рецептами
-                can_delete_image = False
-                if recipe.image and isinstance(recipe.image, str):
-                    # Находим все рецепты с таким же именем файла изображения
-                    same_image_recipes = session.query(Recipe).filter(
-                        Recipe.image == recipe.image,
-                        Recipe.id != recipe_id
-                    ).count()
-
-                    # Удаляем файл только если это уникальное изображение
-                    if same_image_recipes == 0:
-                        can_delete_image = True
+                # Файл изображения теряет ссылку; удаляется, только если она была последней
+                released_image = self._release_image(session, recipe.image)
 
                 # Удаляем связанные записи
+                previous_ids = self._recipe_ingredient_ids(session, recipe_id)
                 session.execute(
                     recipe_ingredients.delete().where(recipe_ingredients.c.recipe_id == recipe_id)
                 )
                 session.execute(
                     favorites.delete().where(favorites.c.recipe_id == recipe_id)
                 )
+                session.query(RecipeScore).filter_by(recipe_id=recipe_id).delete()
 
                 nutrition = session.query(Nutrition).filter_by(recipe_id=recipe_id).first()
                 if nutrition:
@@ -1024,27 +1908,16 @@ class DataBase:
                 for cooked_recipe in cooked_recipes:
                     session.delete(cooked_recipe)
 
-                # Удаляем файл изображения если он существует и не используется другими рецептами
-                if can_delete_image:
-                    current_dir = os.path.dirname(os.path.abspath(__file__))
-                    project_root = os.path.dirname(current_dir)
-                    image_path = os.path.join(project_root, 'img', 'recipe_img', recipe.image)
-                    if os.path.exists(image_path):
-                        try:
-                            os.remove(image_path)
-                        except Exception as e:
-                            print(f"Ошибка удаления файла изображения: {e}")
-                    else:
-                        print(f"Файл изображения не найден: {recipe.image}")
-                else:
-                    print(f"Изображение '{recipe.image}' используется другими рецептами, не удаляем")
-
                 session.delete(recipe)
                 session.commit()
+                self._remove_stored_images(released_image)
+                self._notify_recipe_changed(recipe_id, None, previous_ids)
                 return True
             return False
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
@@ -1066,6 +1939,7 @@ class DataBase:
         finally:
             session.close()
 
+    @retry_on_busy
     def add_cart_item(self, user_id, ingredient_name, quantity, unit):
         """Добавляет элемент в корзину в БД"""
         session = self.Session()
@@ -1077,13 +1951,7 @@ class DataBase:
             ).first()
 
             if existing_item:
-                try:
-                    existing_quantity = float(existing_item.quantity) if existing_item.quantity.replace('.',
-                                                                                                        '').isdigit() else 0
-                    new_quantity = float(quantity) if str(quantity).replace('.', '').isdigit() else 0
-                    existing_item.quantity = str(existing_quantity + new_quantity)
-                except:
-                    pass
+                existing_item.quantity = self._sum_cart_quantity(existing_item.quantity, quantity)
             else:
                 cart_item = Cart(
                     user_id=user_id,
@@ -1097,10 +1965,66 @@ class DataBase:
             return True
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
 
+    @retry_on_busy
+    def add_cart_items(self, user_id, items):
+        """Добавляет в корзину пачку элементов (name, quantity, unit) одной транзакцией.
+
+        Количества одинаковых ингредиентов (в пачке и в корзине) суммируются
+        так же, как в add_cart_item. Возвращает число добавленных элементов
+        (0 при ошибке).
+        """
+        if not items:
+            return 0
+
+        session = self.Session()
+        try:
+            merged = {}
+            for name, quantity, unit in items:
+                key = (name, unit)
+                merged[key] = self._sum_cart_quantity(merged[key], quantity) if key in merged else str(quantity)
+
+            existing = {}
+            names = list({name for name, _ in merged})
+            for start in range(0, len(names), 500):
+                for item in session.query(Cart).filter(
+                    Cart.user_id == user_id, Cart.ingredient_name.in_(names[start:start + 500])
+                ):
+                    existing[(item.ingredient_name, item.unit)] = item
+
+            for (name, unit), quantity in merged.items():
+                item = existing.get((name, unit))
+                if item is not None:
+                    item.quantity = self._sum_cart_quantity(item.quantity, quantity)
+                else:
+                    session.add(Cart(user_id=user_id, ingredient_name=name, quantity=quantity, unit=unit))
+
+            session.commit()
+            return len(items)
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            return 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def _sum_cart_quantity(existing, quantity):
+        """Сумма количеств элемента корзины; нечисловое количество считается нулем"""
+        try:
+            existing_quantity = float(existing) if str(existing).replace('.', '').isdigit() else 0
+            new_quantity = float(quantity) if str(quantity).replace('.', '').isdigit() else 0
+            return str(existing_quantity + new_quantity)
+        except ValueError:
+            return existing
+
+    @retry_on_busy
     def remove_cart_items(self, user_id, items_to_remove):
         """Удаляет элементы из корзины в БД"""
         session = self.Session()
@@ -1118,10 +2042,13 @@ class DataBase:
             return removed_count > 0
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
 
+    @retry_on_busy
     def clear_cart(self, user_id):
         """Очищает корзину пользователя в БД"""
         session = self.Session()
@@ -1131,6 +2058,8 @@ class DataBase:
             return True
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
@@ -1138,18 +2067,22 @@ class DataBase:
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С ПОЛЬЗОВАТЕЛЯМИ =====
 
     def get_users(self, login, password):
-        """Аутентификация пользователя"""
+        """Аутентификация пользователя: [(id, логин)] или пустой список"""
+        user_id = self.authenticate_user(login, password)
+        return [(user_id, login)] if user_id is not None else []
+
+    def authenticate_user(self, login, password):
+        """ID пользователя с такими логином и паролем или None (пароль не возвращается)"""
         session = self.Session()
         try:
-            user = session.query(User).filter_by(login=login, password=password).first()
-            if user:
-                return [(user.id, user.login, user.password)]
-            return []
+            return session.query(User.id).filter_by(login=login, password=password).scalar()
         except Exception as e:
-            return []
+            print(f"Ошибка аутентификации: {e}")
+            return None
         finally:
             session.close()
 
+    @retry_on_busy
     def register_user(self, login, password):
         """Регистрация нового пользователя"""
         session = self.Session()
@@ -1164,6 +2097,8 @@ class DataBase:
             return True, "Пользователь успешно зарегистрирован"
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False, f"Ошибка при регистрации: {str(e)}"
         finally:
             session.close()
@@ -1205,6 +2140,7 @@ class DataBase:
         finally:
             session.close()
 
+    @retry_on_busy
     def add_ingredient(self, name):
         """Добавление нового ингредиента"""
         session = self.Session()
@@ -1219,12 +2155,15 @@ class DataBase:
             return new_ingredient.id
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return None
         finally:
             session.close()
 
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С ИЗБРАННЫМИ РЕЦЕПТАМИ =====
 
+    @retry_on_busy
     def toggle_favorite(self, user_id, recipe_id):
         """Добавление/удаление из избранного"""
         session = self.Session()
@@ -1248,10 +2187,51 @@ class DataBase:
                 )
                 session.execute(stmt)
 
+            self._count_interaction(session)
             session.commit()
+            self._notify_write(favorites.name, [recipe_id], user_id)
             return True
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
+            return False
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def set_favorite(self, user_id, recipe_id, favorite):
+        """Добавляет рецепт в избранное или убирает из него независимо от текущего состояния.
+
+        В отличие от toggle_favorite повторный вызов ничего не меняет, поэтому
+        устаревшее состояние в памяти (запись из другого окна или терминала)
+        не переключит избранное в обратную сторону.
+        """
+        session = self.Session()
+        try:
+            condition = (favorites.c.user_id == user_id) & (favorites.c.recipe_id == recipe_id)
+            if favorite:
+                # INSERT OR IGNORE по уникальному индексу: строку мог добавить другой процесс после проверки
+                stmt = sqlite_insert(favorites).values(user_id=user_id, recipe_id=recipe_id).on_conflict_do_nothing()
+            else:
+                stmt = favorites.delete().where(condition)
+            # rowcount вставки без изменений SQLite сообщает неверно, поэтому сравниваем наличие строки
+            existed = session.execute(select(literal(1)).where(condition).select_from(favorites)).first() is not None
+            changed = existed != favorite
+            if changed:
+                session.execute(stmt)
+
+            if changed:
+                self._count_interaction(session)
+            session.commit()
+            if changed:
+                self._notify_write(favorites.name, [recipe_id], user_id)
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка изменения избранного: {e}")
             return False
         finally:
             session.close()
@@ -1271,6 +2251,17 @@ class DataBase:
         finally:
             session.close()
 
+    def get_favorite_recipe_ids(self, user_id):
+        """Возвращает множество ID избранных рецептов пользователя"""
+        session = self.Session()
+        try:
+            stmt = select(favorites.c.recipe_id).where(favorites.c.user_id == user_id)
+            return set(session.execute(stmt).scalars())
+        except Exception as e:
+            return set()
+        finally:
+            session.close()
+
     def get_favorite_recipes(self, user_id):
         """Получает избранные рецепты пользователя"""
         session = self.Session()
@@ -1296,7 +2287,7 @@ class DataBase:
                         recipe.id, recipe.user_id, recipe.name, recipe.instruction,
                         recipe.description, recipe.dish_type_id, recipe.image,
                         recipe.external_url, recipe.cook_time, dish_type_name,
-                        None, calories, None, None, None, True, False,
+                        recipe.image_placeholder, calories, None, None, None, True, False,
                         cuisine_name, dish_type_name
                     )
                     recipes.append(recipe_tuple)
@@ -1308,6 +2299,7 @@ class DataBase:
             session.close()
 
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С ПРИГОТОВЛЕННЫМИ РЕЦЕПТАМИ =====
+    @retry_on_busy
     def mark_recipe_as_cooked(self, user_id, recipe_id, cooked=True):
         """Отмечает рецепт как приготовленный или снимает отметку"""
         session = self.Session()
@@ -1316,18 +2308,26 @@ class DataBase:
                 existing = session.query(CookedRecipe).filter_by(
                     user_id=user_id, recipe_id=recipe_id
                 ).first()
-                if not existing:
+                changed = not existing
+                if changed:
                     cooked_recipe = CookedRecipe(user_id=user_id, recipe_id=recipe_id)
                     session.add(cooked_recipe)
             else:
-                session.query(CookedRecipe).filter_by(
+                changed = session.query(CookedRecipe).filter_by(
                     user_id=user_id, recipe_id=recipe_id
-                ).delete()
+                ).delete() > 0
 
+            # Повторная отметка ничего не меняет: ни счетчик переобучения, ни подписчики ее не видят
+            if changed:
+                self._count_interaction(session)
             session.commit()
+            if changed:
+                self._notify_write(CookedRecipe.__tablename__, [recipe_id], user_id)
             return True
         except Exception as e:
             session.rollback()
+            if self._busy_retryable(e):
+                raise
             return False
         finally:
             session.close()
@@ -1345,6 +2345,17 @@ class DataBase:
         finally:
             session.close()
 
+    def get_cooked_recipe_ids(self, user_id):
+        """Возвращает множество ID приготовленных рецептов пользователя"""
+        session = self.Session()
+        try:
+            stmt = select(CookedRecipe.recipe_id).where(CookedRecipe.user_id == user_id)
+            return set(session.execute(stmt).scalars())
+        except Exception as e:
+            return set()
+        finally:
+            session.close()
+
     def get_cooked_recipes(self, user_id):
         """Получает приготовленные рецепты пользователя"""
         session = self.Session()
@@ -1364,7 +2375,7 @@ class DataBase:
                     recipe.id, recipe.user_id, recipe.name, recipe.instruction,
                     recipe.description, recipe.dish_type_id, recipe.image,
                     recipe.external_url, recipe.cook_time, dish_type_name,
-                    None, calories, proteins, fats, carbohydrates, False, True,
+                    recipe.image_placeholder, calories, proteins, fats, carbohydrates, False, True,
                     cuisine_name, dish_type_name
                 )
                 result.append(recipe_tuple)
@@ -1410,7 +2421,7 @@ class DataBase:
                     recipe.id, recipe.user_id, recipe.name, recipe.instruction,
                     recipe.description, recipe.dish_type_id, recipe.image,
                     recipe.external_url, recipe.cook_time, dish_type_name,
-                    None, calories, proteins, fats, carbohydrates, is_favorite, False,
+                    recipe.image_placeholder, calories, proteins, fats, carbohydrates, is_favorite, False,
                     cuisine_name, dish_type_name
                 )
                 result.append(recipe_tuple)
@@ -1423,3 +2434,725 @@ class DataBase:
 
     def is_favorite(self, user_id, recipe_id):
         return self.is_recipe_favorite(user_id, recipe_id)
+
+    # ===== МЕТОДЫ ДЛЯ ПЕРСОНАЛЬНЫХ РЕКОМЕНДАЦИЙ =====
+
+    # Вес взаимодействий: избранное говорит об интересе сильнее, чем отметка о приготовлении
+    FAVORITE_WEIGHT = 2.0
+    COOKED_WEIGHT = 1.0
+
+    def _count_interaction(self, session):
+        """Увеличивает счетчик взаимодействий с момента обучения (в транзакции вызывающего)"""
+        updated = session.query(RecommenderState).filter_by(id=1).update(
+            {RecommenderState.pending_interactions: RecommenderState.pending_interactions + 1}
+        )
+        if not updated:
+            session.add(RecommenderState(id=1, pending_interactions=1))
+
+    def get_recommender_status(self):
+        """Возвращает (изменений с момента обучения, время последнего обучения или None)"""
+        session = self.Session()
+        try:
+            state = session.query(RecommenderState).filter_by(id=1).first()
+            if state is None:
+                return 0, None
+            return state.pending_interactions or 0, state.trained_at
+        except Exception as e:
+            return 0, None
+        finally:
+            session.close()
+
+    def get_interactions(self):
+        """Возвращает неявные оценки всех пользователей: список (user_id, recipe_id, вес)"""
+        session = self.Session()
+        try:
+            events = union_all(
+                select(favorites.c.user_id, favorites.c.recipe_id,
+                       literal(self.FAVORITE_WEIGHT).label('weight')),
+                select(CookedRecipe.user_id, CookedRecipe.recipe_id,
+                       literal(self.COOKED_WEIGHT).label('weight'))
+            ).subquery()
+            stmt = select(events.c.user_id, events.c.recipe_id, func.sum(events.c.weight)).group_by(
+                events.c.user_id, events.c.recipe_id
+            )
+            return [tuple(row) for row in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def save_recipe_scores(self, scores, consumed_interactions):
+        """Заменяет все персональные оценки результатом обучения одной транзакцией.
+
+        scores - список (user_id, recipe_id, score); consumed_interactions -
+        значение счетчика, с которым начиналось обучение (изменения, сделанные
+        во время обучения, остаются в счетчике).
+        """
+        session = self.Session()
+        try:
+            session.query(RecipeScore).delete()
+            if scores:
+                session.execute(RecipeScore.__table__.insert(), [
+                    {'user_id': user_id, 'recipe_id': recipe_id, 'score': score}
+                    for user_id, recipe_id, score in scores
+                ])
+
+            state = session.query(RecommenderState).filter_by(id=1).first()
+            if state is None:
+                state = RecommenderState(id=1, pending_interactions=0)
+                session.add(state)
+            state.pending_interactions = max((state.pending_interactions or 0) - consumed_interactions, 0)
+            state.trained_at = datetime.now()
+
+            session.commit()
+            self._notify_write(RecipeScore.__tablename__)
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка сохранения персональных оценок: {e}")
+            return False
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ СОЧЕТАЕМОСТИ ИНГРЕДИЕНТОВ =====
+
+    def get_ingredient_cooccurrence(self, ingredient_ids):
+        """Совместная встречаемость ингредиентов ingredient_ids с остальными.
+
+        Возвращает список (ingredient_id, neighbor_id, число общих рецептов).
+        Левая сторона соединения идет по индексу (ingredient_id, recipe_id),
+        правая - по первичному ключу (recipe_id, ingredient_id).
+        """
+        session = self.Session()
+        try:
+            left = recipe_ingredients.alias('left_ri')
+            right = recipe_ingredients.alias('right_ri')
+            stmt = select(left.c.ingredient_id, right.c.ingredient_id, func.count()).select_from(left).join(
+                right, (right.c.recipe_id == left.c.recipe_id) & (right.c.ingredient_id != left.c.ingredient_id)
+            ).where(
+                left.c.ingredient_id.in_(list(ingredient_ids))
+            ).group_by(left.c.ingredient_id, right.c.ingredient_id)
+            return [tuple(row) for row in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    def get_ingredient_frequencies(self):
+        """Возвращает ({ingredient_id: число рецептов}, число рецептов с ингредиентами)"""
+        session = self.Session()
+        try:
+            frequencies = dict(session.execute(
+                select(recipe_ingredients.c.ingredient_id, func.count()).group_by(recipe_ingredients.c.ingredient_id)
+            ).all())
+            # GROUP BY идет по первичному ключу, COUNT(DISTINCT) потребовал бы временного B-дерева
+            recipe_count = session.execute(
+                select(func.count()).select_from(
+                    select(recipe_ingredients.c.recipe_id).group_by(recipe_ingredients.c.recipe_id).subquery()
+                )
+            ).scalar() or 0
+            return frequencies, recipe_count
+        except Exception as e:
+            return {}, 0
+        finally:
+            session.close()
+
+    def has_ingredient_pairings(self):
+        """Проверяет, заполнена ли таблица сочетаемости ингредиентов"""
+        session = self.Session()
+        try:
+            return session.query(IngredientPairing.ingredient_id).first() is not None
+        except Exception as e:
+            return False
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def replace_ingredient_pairings(self, rows, ingredient_ids=None):
+        """Записывает соседей ингредиентов: rows - список (ingredient_id, neighbor_id, score).
+
+        Если ingredient_ids не задан, заменяется вся таблица, иначе только
+        строки перечисленных ингредиентов.
+        """
+        session = self.Session()
+        try:
+            query = session.query(IngredientPairing)
+            if ingredient_ids is not None:
+                query = query.filter(IngredientPairing.ingredient_id.in_(list(ingredient_ids)))
+            query.delete(synchronize_session=False)
+
+            if rows:
+                session.execute(IngredientPairing.__table__.insert(), [
+                    {'ingredient_id': ingredient_id, 'neighbor_id': neighbor_id, 'score': score}
+                    for ingredient_id, neighbor_id, score in rows
+                ])
+
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка сохранения сочетаемости ингредиентов: {e}")
+            return False
+        finally:
+            session.close()
+
+    def get_ingredient_suggestions(self, selected_ids, limit=8):
+        """Ингредиенты, которые лучше всего дополняют выбранные: список (id, name).
+
+        Берутся соседи выбранных ингредиентов из ingredient_pairings (поиск по
+        первичному ключу); выше те, что сочетаются с большим числом выбранных,
+        затем - с большей суммарной PMI.
+        """
+        selected_ids = list(selected_ids)
+        if not selected_ids:
+            return []
+
+        session = self.Session()
+        try:
+            support = func.count().label('support')
+            total_score = func.sum(IngredientPairing.score).label('total_score')
+            neighbors = select(IngredientPairing.neighbor_id, support, total_score).where(
+                IngredientPairing.ingredient_id.in_(selected_ids),
+                IngredientPairing.neighbor_id.not_in(selected_ids)
+            ).group_by(IngredientPairing.neighbor_id).subquery()
+
+            stmt = select(Ingredient.id, Ingredient.name).join(
+                neighbors, neighbors.c.neighbor_id == Ingredient.id
+            ).order_by(neighbors.c.support.desc(), neighbors.c.total_score.desc(), Ingredient.name).limit(limit)
+            return [tuple(row) for row in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ РАСЧЕТА ПИЩЕВОЙ ЦЕННОСТИ =====
+
+    def get_ingredient_nutrition(self):
+        """Возвращает {ingredient_id: (ккал, белки, жиры, углеводы, плотность, масса штуки)} на 100 г"""
+        session = self.Session()
+        try:
+            rows = session.execute(select(
+                IngredientNutrition.ingredient_id, IngredientNutrition.calories, IngredientNutrition.proteins,
+                IngredientNutrition.fats, IngredientNutrition.carbohydrates,
+                IngredientNutrition.density, IngredientNutrition.piece_grams
+            ))
+            return {row[0]: tuple(row[1:]) for row in rows}
+        except Exception as e:
+            return {}
+        finally:
+            session.close()
+
+    def get_recipe_quantities(self, recipe_ids=None):
+        """Возвращает ингредиенты рецептов: список (recipe_id, ingredient_id, количество текстом)"""
+        session = self.Session()
+        try:
+            stmt = select(recipe_ingredients.c.recipe_id, recipe_ingredients.c.ingredient_id,
+                          recipe_ingredients.c.quantity)
+            if recipe_ids is not None:
+                stmt = stmt.where(recipe_ingredients.c.recipe_id.in_(list(recipe_ids)))
+            return [tuple(row) for row in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    def get_recipe_servings(self, recipe_ids=None):
+        """Возвращает {recipe_id: число порций} (None, если не указано)"""
+        session = self.Session()
+        try:
+            stmt = select(Recipe.id, Recipe.servings)
+            if recipe_ids is not None:
+                stmt = stmt.where(Recipe.id.in_(list(recipe_ids)))
+            return dict(session.execute(stmt).all())
+        except Exception as e:
+            return {}
+        finally:
+            session.close()
+
+    def get_recipes_without_nutrition(self):
+        """ID рецептов, для которых пищевая ценность еще не заполнена"""
+        session = self.Session()
+        try:
+            stmt = select(Recipe.id).where(~Recipe.id.in_(select(Nutrition.recipe_id)))
+            return [recipe_id for (recipe_id,) in session.execute(stmt)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def save_computed_nutrition(self, values):
+        """Записывает рассчитанную пищевую ценность одной пачкой.
+
+        values - {recipe_id: (ккал, белки, жиры, углеводы)}. Строки, введенные
+        вручную (computed = 0), не перезаписываются. В старых базах у таблицы
+        Nutrition нет первичного ключа, поэтому вместо ON CONFLICT -
+        пакетный UPDATE рассчитанных строк и пакетный INSERT недостающих.
+        """
+        if not values:
+            return True
+
+        session = self.Session()
+        try:
+            table = Nutrition.__table__
+            existing = set()
+            recipe_ids = list(values)
+            for start in range(0, len(recipe_ids), 500):
+                existing.update(row[0] for row in session.execute(
+                    select(table.c.recipe_id).where(table.c.recipe_id.in_(recipe_ids[start:start + 500]))
+                ))
+
+            rows = [
+                {'rid': recipe_id, 'recipe_id': recipe_id, 'calories': calories, 'proteins': proteins,
+                 'fats': fats, 'carbohydrates': carbohydrates, 'computed': True}
+                for recipe_id, (calories, proteins, fats, carbohydrates) in values.items()
+            ]
+            updates = [row for row in rows if row['rid'] in existing]
+            inserts = [row for row in rows if row['rid'] not in existing]
+
+            if updates:
+                session.execute(
+                    update(table)
+                    .where(table.c.recipe_id == bindparam('rid'), table.c.computed == True)
+                    .values(calories=bindparam('calories'), proteins=bindparam('proteins'),
+                            fats=bindparam('fats'), carbohydrates=bindparam('carbohydrates')),
+                    updates
+                )
+            if inserts:
+                session.execute(table.insert(), [
+                    {key: value for key, value in row.items() if key != 'rid'} for row in inserts
+                ])
+            session.commit()
+            self._notify_write(Nutrition.__tablename__, recipe_ids)
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка сохранения пищевой ценности: {e}")
+            return False
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ КАТАЛОГА РЕЦЕПТОВ В ПАМЯТИ =====
+
+    def get_recipe_catalog_rows(self, recipe_ids=None):
+        """Фильтруемые атрибуты рецептов (по умолчанию - всего каталога) одним запросом.
+
+        Строки: (id, dish_type_id, cuisine_id, cook_time, name, calories,
+        proteins, fats, carbohydrates, есть ли строка Nutrition). None - ошибка
+        чтения: каталог не должен принять ее за отсутствие рецептов.
+        """
+        session = self.Session()
+        try:
+            query = select(
+                Recipe.id, Recipe.dish_type_id, Recipe.cuisine_id, Recipe.cook_time, Recipe.name,
+                Nutrition.calories, Nutrition.proteins, Nutrition.fats, Nutrition.carbohydrates,
+                Nutrition.recipe_id.isnot(None)
+            ).outerjoin(Nutrition, Nutrition.recipe_id == Recipe.id)
+
+            if recipe_ids is None:
+                return [tuple(row) for row in session.execute(query)]
+
+            rows = []
+            recipe_ids = list(recipe_ids)
+            for start in range(0, len(recipe_ids), 500):
+                rows.extend(tuple(row) for row in session.execute(
+                    query.where(Recipe.id.in_(recipe_ids[start:start + 500]))
+                ))
+            return rows
+        except Exception as e:
+            print(f"Ошибка загрузки каталога рецептов: {e}")
+            return None
+        finally:
+            session.close()
+
+    def get_recipe_scores(self, user_id):
+        """Персональные оценки рецептов пользователя: [(recipe_id, score)]"""
+        session = self.Session()
+        try:
+            return [tuple(row) for row in session.query(RecipeScore.recipe_id, RecipeScore.score)
+                    .filter(RecipeScore.user_id == user_id)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ ПРОВЕРКИ КАТАЛОГА ИЗОБРАЖЕНИЙ =====
+
+    def get_image_scan_state(self):
+        """Возвращает (последний проверенный каталог или None, начало прохода, конец последнего
+        завершенного прохода, перемещено в карантин, не найдено файлов)"""
+        session = self.Session()
+        try:
+            state = session.query(ImageScanState).filter_by(id=1).first()
+            if state is None:
+                return None, None, None, 0, 0
+            return state.position, state.pass_started_at, state.finished_at, state.quarantined, state.missing
+        except Exception as e:
+            return None, None, None, 0, 0
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def save_image_scan_state(self, position, quarantined=0, missing=0, finished=False):
+        """Сохраняет прогресс прохода: position - последний проверенный каталог, quarantined и
+        missing прибавляются к итогам прохода. finished=True завершает проход"""
+        session = self.Session()
+        try:
+            state = session.query(ImageScanState).filter_by(id=1).first()
+            if state is None:
+                state = ImageScanState(id=1, quarantined=0, missing=0)
+                session.add(state)
+            if state.pass_started_at is None:
+                state.pass_started_at = datetime.now()
+                state.quarantined = state.missing = 0
+            state.quarantined += quarantined
+            state.missing += missing
+            state.position = None if finished else position
+            if finished:
+                state.finished_at = datetime.now()
+                state.pass_started_at = None
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка сохранения прогресса проверки изображений: {e}")
+            return False
+        finally:
+            session.close()
+
+    def get_referenced_images(self, paths):
+        """Какие из путей paths (как в Recipes.image) используются рецептами или хранилищем"""
+        session = self.Session()
+        try:
+            paths = list(paths)
+            referenced = set()
+            for start in range(0, len(paths), 500):
+                batch = paths[start:start + 500]
+                referenced.update(path for (path,) in session.query(Recipe.image).filter(Recipe.image.in_(batch)))
+                referenced.update(path for (path,) in session.query(StoredImage.path)
+                                  .filter(StoredImage.path.in_(batch)))
+            return referenced
+        except Exception as e:
+            # При ошибке все файлы считаются используемыми: лучше не удалить лишнего
+            print(f"Ошибка проверки ссылок на изображения: {e}")
+            return set(paths)
+        finally:
+            session.close()
+
+    def get_expected_images(self, directory):
+        """Пути файлов, которые должны лежать в каталоге directory (относительно img/recipe_img).
+
+        Для каталога хранилища это записи images с этим префиксом (чтение диапазона
+        первичного ключа), для корневого каталога ('') - изображения рецептов
+        старого формата, хранящиеся не в хранилище.
+        """
+        session = self.Session()
+        try:
+            if directory:
+                prefix = f"{directory}/"
+                query = session.query(StoredImage.path).filter(
+                    StoredImage.path >= prefix, StoredImage.path < prefix[:-1] + chr(ord('/') + 1)
+                )
+            else:
+                query = session.query(Recipe.image).filter(
+                    Recipe.image.isnot(None), Recipe.image != '',
+                    ~Recipe.image.startswith(f"{self.IMAGE_STORE_DIR}/")
+                ).distinct()
+            return {path for (path,) in query}
+        except Exception as e:
+            return set()
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ ЗАГЛУШЕК ИЗОБРАЖЕНИЙ =====
+
+    def get_images_without_placeholder(self, limit=200):
+        """Пути изображений (как в Recipes.image), у рецептов с которыми еще нет заглушки"""
+        session = self.Session()
+        try:
+            return [path for (path,) in session.query(Recipe.image).filter(
+                Recipe.image.isnot(None), Recipe.image != '', Recipe.image_placeholder.is_(None)
+            ).distinct().limit(limit)]
+        except Exception as e:
+            return []
+        finally:
+            session.close()
+
+    @retry_on_busy
+    def save_image_placeholders(self, placeholders):
+        """Записывает заглушки {путь изображения: заглушка} всем рецептам с этим изображением.
+        Пустая строка помечает файл, для которого заглушку построить не удалось"""
+        if not placeholders:
+            return 0
+        session = self.Session()
+        try:
+            table = Recipe.__table__
+            result = session.execute(
+                update(table).where(table.c.image == bindparam('path')).values(image_placeholder=bindparam('code')),
+                [{'path': path, 'code': code} for path, code in placeholders.items()]
+            )
+            session.commit()
+            return result.rowcount
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка сохранения заглушек изображений: {e}")
+            return 0
+        finally:
+            session.close()
+
+    # ===== МЕТОДЫ ДЛЯ ИМПОРТА РЕЦЕПТОВ =====
+
+    @retry_on_busy
+    def import_recipes(self, user_id, recipes):
+        """Добавляет пачку рецептов одной транзакцией (импорт из файла).
+
+        recipes - словари с ключами name, instruction, description, dish_type
+        и cuisine (названия), cook_time, servings, ingredients ([{'name',
+        'quantity'}], количество текстом), nutrition ({'calories', 'proteins',
+        'fats', 'carbohydrates'} или None) и image (путь к файлу или None).
+        Недостающие типы блюд, кухни и ингредиенты создаются. Возвращает ID
+        новых рецептов или None при ошибке - тогда не добавляется ничего.
+        """
+        session = self.Session()
+        try:
+            dish_type_ids = self._ids_by_name(session, Dish_types, {data.get('dish_type') for data in recipes})
+            cuisine_ids = self._ids_by_name(session, Cuisines, {data.get('cuisine') for data in recipes})
+            ingredient_ids = self._ids_by_name(session, Ingredient, {
+                ingredient['name'] for data in recipes for ingredient in data.get('ingredients') or []
+            })
+
+            created = []
+            quantity_rows = []
+            for data in recipes:
+                recipe = Recipe(
+                    user_id=user_id,
+                    name=data['name'],
+                    instruction=data.get('instruction'),
+                    description=data.get('description'),
+                    dish_type_id=dish_type_ids.get(data.get('dish_type')),
+                    cuisine_id=cuisine_ids.get(data.get('cuisine')),
+                    cook_time=data.get('cook_time'),
+                    servings=data.get('servings')
+                )
+                session.add(recipe)
+                session.flush()
+                if data.get('image'):
+                    self._set_recipe_image(session, recipe, data['image'])
+
+                # Повтор ингредиента в рецепте: остается последнее количество (ключ таблицы - пара ID)
+                quantities = {ingredient_ids[ingredient['name']]: str(ingredient.get('quantity') or '')
+                              for ingredient in data.get('ingredients') or []}
+                quantity_rows.extend({'recipe_id': recipe.id, 'ingredient_id': ingredient_id, 'quantity': quantity}
+                                     for ingredient_id, quantity in quantities.items())
+
+                nutrition = data.get('nutrition') or {}
+                if any(nutrition.get(column) for column in self.NUTRITION_RANGE_COLUMNS):
+                    session.add(Nutrition(recipe_id=recipe.id, **{
+                        column: nutrition.get(column) for column in self.NUTRITION_RANGE_COLUMNS
+                    }))
+                created.append((recipe.id, list(quantities)))
+
+            if quantity_rows:
+                session.execute(recipe_ingredients.insert(), quantity_rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            if self._busy_retryable(e):
+                raise
+            print(f"Ошибка импорта рецептов: {e}")
+            return None
+        finally:
+            session.close()
+
+        for recipe_id, recipe_ingredient_ids in created:
+            self._notify_recipe_changed(recipe_id, recipe_ingredient_ids)
+        return [recipe_id for recipe_id, _ in created]
+
+    def _ids_by_name(self, session, model, names):
+        """{название: id} записей model с названиями names; недостающие записи создаются"""
+        names = [name for name in names if name]
+        ids = {}
+        for start in range(0, len(names), 500):
+            ids.update(session.query(model.name, model.id).filter(model.name.in_(names[start:start + 500])).all())
+        for name in names:
+            if name not in ids:
+                item = model(name=name)
+                session.add(item)
+                session.flush()
+                ids[name] = item.id
+        return ids
+
+    # ===== МЕТОДЫ ДЛЯ ЖУРНАЛА ИЗМЕНЕНИЙ =====
+    # Другие экземпляры приложения (и задачи вроде импорта) пишут в тот же файл БД.
+    # Триггеры записывают их изменения в change_log, а экземпляр забирает новые записи,
+    # когда меняется PRAGMA data_version (см. src.modules.change_watcher)
+
+    # Таблицы под наблюдением: столбцы с recipe_id и user_id записи (None - столбца нет)
+    CHANGE_LOG_SOURCES = {
+        'Recipes': ('id', None),
+        'Nutrition': ('recipe_id', None),
+        'Favorites': ('recipe_id', 'user_id'),
+        'cooked_recipes': ('recipe_id', 'user_id'),
+        'cart': (None, 'user_id'),
+    }
+    # Столбцы, изменение которых не попадает в журнал: заглушки досчитывает каждый экземпляр сам
+    CHANGE_LOG_IGNORED_COLUMNS = {'Recipes': ('image_placeholder',)}
+    # Сколько последних записей журнала сохраняется при запуске; отставшие сильнее перечитывают все
+    CHANGE_LOG_KEEP = 5000
+    CHANGE_LOG_BATCH = 1000
+
+    def _create_change_log_triggers(self, connection):
+        """Создает недостающие триггеры, записывающие в change_log вставки, изменения и удаления"""
+        existing_triggers = {name for (name,) in connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        )}
+        for table_name, (recipe_column, user_column) in self.CHANGE_LOG_SOURCES.items():
+            ignored = self.CHANGE_LOG_IGNORED_COLUMNS.get(table_name, ())
+            columns = [column.name for column in Base.metadata.tables[table_name].columns
+                       if column.name not in ignored]
+            events = (('insert', 'INSERT', 'NEW'),
+                      ('update', f"UPDATE OF {', '.join(columns)}", 'NEW'),
+                      ('delete', 'DELETE', 'OLD'))
+            for operation, event, row in events:
+                name = f"change_log_{table_name.lower()}_{operation}"
+                if name in existing_triggers:
+                    continue
+                recipe_id = f"{row}.{recipe_column}" if recipe_column else "NULL"
+                user_id = f"{row}.{user_column}" if user_column else "NULL"
+                connection.execute(text(
+                    f"CREATE TRIGGER {name} AFTER {event} ON {table_name} BEGIN "
+                    f"INSERT INTO change_log (table_name, operation, recipe_id, user_id) "
+                    f"VALUES ('{table_name}', '{operation}', {recipe_id}, {user_id}); END"
+                ))
+
+    def track_own_changes(self):
+        """Начинает запоминать номера записей журнала, сделанных через этот экземпляр.
+
+        Каждое подключение пула получает временный (видимый только ему)
+        триггер на change_log, который складывает номера своих записей во
+        временную таблицу; при фиксации транзакции они переносятся в память.
+        skip_own_changes убирает эти записи из прочитанных: экземпляр уже
+        применил свои изменения и уведомил подписчиков при записи.
+        """
+        with self._own_changes_lock:
+            if self._own_changes is None:
+                self._own_changes = set()
+
+    def skip_own_changes(self, changes):
+        """Записи журнала (как в get_changes_since) без сделанных через этот экземпляр"""
+        if self._own_changes is None or not changes:
+            return changes
+        with self._own_changes_lock:
+            external = [change for change in changes if change[0] not in self._own_changes]
+            # Записи до последней прочитанной больше не встретятся
+            last = changes[-1][0]
+            self._own_changes = {change_id for change_id in self._own_changes if change_id > last}
+        return external
+
+    def _prepare_own_changes(self, dbapi_connection, connection_record, connection_proxy):
+        if self._own_changes is None or connection_record.info.get('own_changes'):
+            return
+        dbapi_connection.execute("CREATE TEMP TABLE IF NOT EXISTS own_changes (id INTEGER PRIMARY KEY)")
+        dbapi_connection.execute(
+            "CREATE TEMP TRIGGER IF NOT EXISTS own_change_log AFTER INSERT ON main.change_log "
+            "BEGIN INSERT INTO own_changes (id) VALUES (NEW.id); END"
+        )
+        connection_record.info['own_changes'] = True
+
+    def _collect_own_changes(self, connection):
+        """Перед фиксацией транзакции забирает номера ее записей журнала"""
+        if not connection.info.get('own_changes'):
+            return
+        dbapi_connection = connection.connection.driver_connection
+        change_ids = [change_id for (change_id,) in dbapi_connection.execute("SELECT id FROM own_changes")]
+        if not change_ids:
+            return
+        dbapi_connection.execute("DELETE FROM own_changes")
+        # Если сама фиксация не удастся, откат вернет номера (см. _discard_pending_own_changes)
+        connection.info['own_pending'] = change_ids
+        with self._own_changes_lock:
+            self._own_changes.update(change_ids)
+
+    def _forget_pending_own_changes(self, connection):
+        connection.info.pop('own_pending', None)
+
+    def _discard_pending_own_changes(self, connection):
+        change_ids = connection.info.pop('own_pending', None)
+        if change_ids:
+            with self._own_changes_lock:
+                self._own_changes.difference_update(change_ids)
+
+    def data_version(self):
+        """PRAGMA data_version: меняется, если файл БД изменило любое другое подключение.
+
+        Значение сравнивается только с прежним значением того же подключения,
+        поэтому для него держится отдельное подключение (запись через пул этого
+        экземпляра его тоже меняет). Запрос не читает таблиц и занимает микросекунды.
+        """
+        if self._version_connection is None:
+            self._version_connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._version_connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def get_change_log_position(self):
+        """Номер последней записи журнала изменений (0 - журнал пуст)"""
+        session = self.Session()
+        try:
+            return session.query(func.max(ChangeLog.id)).scalar() or 0
+        except Exception as e:
+            print(f"Ошибка чтения журнала изменений: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def get_changes_since(self, position, limit=CHANGE_LOG_BATCH):
+        """Записи журнала после position по возрастанию номера:
+        [(id, таблица, операция, recipe_id, user_id)].
+
+        None - записи сразу после position уже удалены очисткой журнала, и
+        данные нужно перечитать целиком.
+        """
+        session = self.Session()
+        try:
+            rows = session.query(
+                ChangeLog.id, ChangeLog.table_name, ChangeLog.operation, ChangeLog.recipe_id, ChangeLog.user_id
+            ).filter(ChangeLog.id > position).order_by(ChangeLog.id).limit(limit).all()
+            if rows and rows[0].id != position + 1:
+                return None
+            return [tuple(row) for row in rows]
+        except Exception as e:
+            print(f"Ошибка чтения журнала изменений: {e}")
+            return []
+        finally:
+            session.close()
+
+    def notify_logged_changes(self, changes):
+        """Сообщает подписчикам add_write_listener о записях журнала изменений так же,
+        как о записи через этот экземпляр (корзина подписчикам не нужна)"""
+        grouped = {}
+        for _, table_name, _, recipe_id, user_id in changes:
+            if table_name != Cart.__tablename__:
+                grouped.setdefault((table_name, user_id), set()).add(recipe_id)
+        for (table_name, user_id), recipe_ids in grouped.items():
+            self._notify_write(table_name, sorted(recipe_ids), user_id)
+
+    def get_recipes_by_ids(self, user_id, recipe_ids):
+        """Кортежи рецептов (как в get_recipes_with_filters) для существующих recipe_ids"""
+        session = self.Session()
+        try:
+            return self._build_recipe_tuples(session, user_id, self._recipe_rows_by_ids(session, list(recipe_ids)))
+        except Exception as e:
+            print(f"Ошибка получения рецептов: {e}")
+            return []
+        finally:
+            session.close()
@@ -146,9 +146,8 @@ class LoginWindow(QWidget):
             return
 
         # АУТЕНТИФИКАЦИЯ ПОЛЬЗОВАТЕЛЯ
-        users = self.db.get_users(username, password)
-        if users:
-            user_id = users[0][0]
+        user_id = self.db.authenticate_user(username, password)
+        if user_id is not None:
 
             # СОХРАНЕНИЕ НАСТРОЕК АВТОМАТИЧЕСКОГО ВХОДА
             if self.remember_me.isChecked():
@@ -1,24 +1,36 @@
+import time
+
+# Отметка начала запуска для --startup-trace (до импорта тяжелых модулей)
+STARTUP_TIME = time.perf_counter()
+
 import sys
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import QSettings
+from PyQt6.QtCore import QSettings, QTimer
 
 from database import DataBase
-from login_window import LoginWindow
-from main_window import MainWindow
+from modules.startup_trace import StartupTrace
+
+# Окна входа и главное окно импортируются по требованию: при авто-входе
+# окно входа не нужно, а при показе входа главное окно еще не нужно
 
 
 class PuzzleVkusovApp:
     """Главный класс приложения 'Пазл Вкусов'"""
-    def __init__(self):
+    def __init__(self, startup_trace=None, server_url=None):
         try:
+            self.startup_trace = startup_trace or StartupTrace()
+            self.startup_trace.mark("Импорт модулей")
+
             self.app = QApplication(sys.argv)
             self.settings = QSettings("PuzzleVkusov", "AppSettings")
 
             self.app.setWindowIcon(QIcon("../img/ico2.ico"))
+            self.startup_trace.mark("Создание QApplication")
 
-            self.db = DataBase()
+            self.db = self.connect_database(server_url)
             self.current_user_id = None
+            self.startup_trace.mark("Подключение к базе данных")
 
             self.check_auto_login()
 
@@ -27,6 +39,18 @@ class PuzzleVkusovApp:
             self.show_error_message(f"Критическая ошибка инициализации: {e}")
             sys.exit(1)
 
+    def connect_database(self, server_url=None):
+        """Локальная база или клиент сервиса каталога, если задан его адрес
+        (--server или настройка server_url)"""
+        server_url = server_url or self.settings.value("server_url", "", type=str)
+        if server_url:
+            from modules.remote_database import RemoteDataBase
+            return RemoteDataBase(server_url)
+        db = DataBase()
+        # Запись из окна не замирает надолго, если базу держит импорт в другом процессе
+        db.set_interactive_thread()
+        return db
+
     def show_error_message(self, message):
         """Показывает сообщение об ошибке"""
         error_box = QMessageBox()
@@ -53,6 +77,8 @@ class PuzzleVkusovApp:
     def show_login(self):
         """Метод для отображения окна входа"""
         try:
+            from login_window import LoginWindow
+
             self.login_window = LoginWindow(self.db, self.on_login_success)
             self.login_window.show()
         except Exception as e:
@@ -73,12 +99,22 @@ class PuzzleVkusovApp:
     def show_main_window(self):
         """Отображение главного окна приложения"""
         try:
-            # ЗАГРУЗКА КОРЗИНЫ ИЗ БАЗЫ ДАННЫХ ПЕРЕД СОЗДАНИЕМ ГЛАВНОГО ОКНА
-            cart_items = self.db.get_cart_items(self.current_user_id)
-            print(f"Загружено {len(cart_items)} элементов корзины для пользователя {self.current_user_id}")
+            from main_window import MainWindow
+            from modules.session_state import SessionState
+            self.startup_trace.mark("Импорт главного окна")
 
-            self.main_window = MainWindow(self.db, self.current_user_id, self.logout)
+            # Корзина, избранное и приготовленные рецепты загружаются один раз на сессию
+            session_state = SessionState(self.db, self.current_user_id)
+            self.startup_trace.mark("Состояние сессии")
+
+            self.main_window = MainWindow(self.db, self.current_user_id, self.logout,
+                                          startup_trace=self.startup_trace,
+                                          session_state=session_state)
             self.main_window.show()
+            self.startup_trace.mark("Каркас главного окна")
+
+            # Первый проход цикла событий - окно отрисовано
+            QTimer.singleShot(0, lambda: self.startup_trace.mark("Первый кадр"))
         except Exception as e:
             print(f"Ошибка создания главного окна: {e}")
             self.show_error_message(f"Ошибка создания главного окна: {e}")
@@ -110,7 +146,19 @@ class PuzzleVkusovApp:
 
 if __name__ == "__main__":
     try:
-        puzzle_app = PuzzleVkusovApp()
+        # --startup-trace печатает длительность каждого этапа запуска
+        trace_enabled = "--startup-trace" in sys.argv
+        if trace_enabled:
+            sys.argv.remove("--startup-trace")
+
+        # --server URL - работать с общим каталогом через сервис (python -m taste_puzzle serve)
+        server_url = None
+        if "--server" in sys.argv[:-1]:
+            index = sys.argv.index("--server")
+            server_url = sys.argv[index + 1]
+            del sys.argv[index:index + 2]
+
+        puzzle_app = PuzzleVkusovApp(StartupTrace(trace_enabled, STARTUP_TIME), server_url)
         sys.exit(puzzle_app.run())
     except Exception as e:
         print(f"Непредвиденная ошибка: {e}")
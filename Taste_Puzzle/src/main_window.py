@@ -1,16 +1,16 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit,
                              QLabel, QTabWidget, QCheckBox, QComboBox,
                              QMessageBox, QScrollArea, QFrame, QToolBar,
-                             QDialog, QLayout, QCompleter)
-from PyQt6.QtCore import Qt, QSettings, QSize, QTimer, QRect, QPoint, QStringListModel
+                             QDialog, QLayout, QCompleter, QGridLayout, QDoubleSpinBox, QWidgetItem)
+from PyQt6.QtCore import Qt, QSettings, QSize, QTimer, QRect, QPoint, QStringListModel, QThreadPool
 from PyQt6.QtGui import QAction, QIcon
 
-from src.database import Recipe
-from src.modules.recipe_dialog import RecipeDialog, RecipeCardDialog
-from src.modules.settings_dialog import SettingsDialog
-from src.modules.help_dialog import HelpDialog
-from src.modules.user_profile import ProfileWidget
-from src.modules.cart_manager import CartWidget
+from src.database import DataBase
+from src.modules.recipe_query_worker import RecipeQueryRunner, QueryTask, load_recipe_sections
+from src.modules.theme import apply_theme
+from src.modules.session_state import SessionState
+from src.modules.card_images import CardImageLoader
+from src.modules.image_service import recipe_pixmap
 
 
 class SmartSearchLineEdit(QLineEdit):
@@ -94,6 +94,17 @@ class FlowLayout(QLayout):
             return item
         return None
 
+    def replace_widget(self, old, new):
+        """Ставит виджет new на место old, не меняя порядок остальных элементов."""
+        for index, item in enumerate(self._items):
+            if item.widget() is old:
+                self.addChildWidget(new)
+                self._items[index] = QWidgetItem(new)
+                old.setParent(None)
+                self.invalidate()
+                return True
+        return False
+
     def expandingDirections(self):
         """Определяет направления расширения layout (в данном случае не расширяется)."""
         return Qt.Orientation(0)
@@ -192,23 +203,7 @@ class RecipeCard(QFrame):
         self.setMinimumHeight(280)
         self.setMaximumHeight(340)
 
-        self.setStyleSheet("""
-                    QFrame {
-                        background-color: white;
-                        border: 1px solid #dee2e6;
-                        border-radius: 12px;
-                        margin: 0px;
-                        box-shadow: 0 3px 10px rgba(0, 0, 0, 0.08);
-                        transition: all 0.25s cubic-bezier(0.4, 0, 0.2, 1);
-                    }
-                    QFrame:hover {
-                        box-shadow: 0 8px 25px rgba(52, 152, 219, 0.15);
-                        transform: translateY(-3px);
-                    }
-                    QFrame:pressed {
-                        transform: translateY(-1px);
-                    }
-                """)
+        self.setObjectName("recipeCard")
 
         # Создаем вертикальный layout для карточки
         layout = QVBoxLayout()
@@ -218,15 +213,7 @@ class RecipeCard(QFrame):
         # === ВЕРХНЯЯ ЧАСТЬ: Изображение рецепта ===
         image_container = QWidget()
         image_container.setFixedHeight(150)
-        image_container.setStyleSheet("""
-            QWidget {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,  /* Вертикальный градиент */
-                    stop:0 #f8f9fa, stop:1 #e9ecef);                /* От светлого к более темному серому */
-                border-top-left-radius: 12px;                        /* Закругление верхних углов */
-                border-top-right-radius: 12px;                       /* Закругление верхних углов */
-                border-bottom: 1px solid #e9ecef;                    /* Нижняя граница */
-            }
-        """)
+        image_container.setObjectName("recipeCardImage")
 
         # Создаем layout для изображения
         image_layout = QVBoxLayout(image_container)
@@ -234,40 +221,29 @@ class RecipeCard(QFrame):
         self.image_label = QLabel()
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
-        pixmap = self.db.get_recipe_image(self.recipe_data[0])
-        if pixmap and not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(248, 148, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-                                          Qt.TransformationMode.SmoothTransformation)
-            self.image_label.setPixmap(scaled_pixmap)
-            self.image_label.setScaledContents(True)  # Включаем масштабирование содержимого
+        # Окно с загрузчиком изображений: заглушка из строки списка сразу, картинка из
+        # фонового потока. Без загрузчика (например, в бенчмарке) - прежняя загрузка из БД
+        loader = getattr(self.parent, 'card_images', None)
+        image_path = self.recipe_data[6]
+        if loader is not None and image_path:
+            placeholder = loader.placeholder_pixmap(self.recipe_data[10])
+            if placeholder is not None:
+                self.set_image(placeholder)
+            loader.request(self, image_path)
         else:
-            # Текстовую заглушку с названием рецепта
-            recipe_name = self.recipe_data[2]
-            if len(recipe_name) > 22:
-                display_text = recipe_name[:22] + '...'
+            pixmap = recipe_pixmap(self.db, self.recipe_data[0], self.recipe_data[2]) if loader is None else None
+            if pixmap and not pixmap.isNull():
+                self.set_image(pixmap.scaled(248, 148, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                                             Qt.TransformationMode.SmoothTransformation))
             else:
-                display_text = recipe_name
-
-            self.image_label.setText(f"🍳\n{display_text}")
-            self.image_label.setStyleSheet("""
-                QLabel {
-                    color: #6c757d;          /* Серый цвет текста */
-                    font-size: 14px;         /* Размер шрифта */
-                    font-weight: 500;        /* Средняя жирность */
-                    padding: 20px;           /* Внутренние отступы */
-                    line-height: 1.4;        /* Межстрочный интервал */
-                    background: qlineargradient(x1:0, y1:0, x2:0, y2:1,  /* Градиентный фон */
-                        stop:0 #e3f2fd, stop:1 #bbdefb);                /* От голубого к светло-голубому */
-                }
-            """)
-            self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+                self.show_text_placeholder()
 
         image_layout.addWidget(self.image_label)
         layout.addWidget(image_container)
 
         # === ЦЕНТРАЛЬНАЯ ЧАСТЬ: Основная информация ===
         info_container = QWidget()
-        info_container.setStyleSheet("background-color: white;")
+        info_container.setObjectName("recipeCardInfo")
         info_layout = QVBoxLayout(info_container)
         info_layout.setContentsMargins(15, 15, 15, 15)
         info_layout.setSpacing(10)
@@ -275,16 +251,7 @@ class RecipeCard(QFrame):
         # Название рецепта
         name_label = QLabel(self.recipe_data[2])
         name_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
-        name_label.setStyleSheet("""
-            QLabel {
-                font-weight: 600;            /* Полужирный шрифт */
-                font-size: 16px;             /* Размер шрифта */
-                color: #2c3e50;              /* Темно-синий цвет */
-                line-height: 1.3;            /* Межстрочный интервал */
-                padding-bottom: 5px;         /* Нижний отступ */
-                border-bottom: 1px solid #f1f3f4;  /* Нижняя граница */
-            }
-        """)
+        name_label.setObjectName("recipeCardName")
         name_label.setWordWrap(True)
         name_label.setMinimumHeight(45)
         name_label.setMaximumHeight(60)
@@ -292,7 +259,7 @@ class RecipeCard(QFrame):
 
         # === БЛОК МЕТА-ИНФОРМАЦИИ ===
         meta_container = QWidget()
-        meta_container.setStyleSheet("background-color: white;")
+        meta_container.setObjectName("recipeCardMeta")
         meta_layout = QVBoxLayout(meta_container)
         meta_layout.setContentsMargins(0, 0, 0, 0)
         meta_layout.setSpacing(8)
@@ -307,18 +274,11 @@ class RecipeCard(QFrame):
         if cuisine:
             cuisine_widget = QWidget()
             cuisine_widget.setFixedHeight(24)
-            cuisine_widget.setStyleSheet("""
-                        QWidget {
-                            background-color: #e8f5e9;
-                            border-radius: 4px;
-                            border: 1px solid #c8e6c9;
-                        }
-                    """)
+            cuisine_widget.setProperty("chip", "cuisine")
 
             cuisine_layout = QHBoxLayout(cuisine_widget)
             cuisine_layout.setContentsMargins(6, 2, 6, 2)
             cuisine_label = QLabel(f"🌍 {cuisine[:12]}" if len(cuisine) > 12 else f"🌍 {cuisine}")
-            cuisine_label.setStyleSheet("font-size: 10px; font-weight: 500; color: #2e7d32;")
             cuisine_label.setToolTip(f"Кухня: {cuisine}")
             cuisine_layout.addWidget(cuisine_label)
             info_row.addWidget(cuisine_widget)
@@ -326,18 +286,11 @@ class RecipeCard(QFrame):
         # Время приготовления
         time_widget = QWidget()
         time_widget.setFixedHeight(24)
-        time_widget.setStyleSheet("""
-                    QWidget {
-                        background-color: #e3f2fd;
-                        border-radius: 4px;
-                        border: 1px solid #bbdefb;
-                    }
-                """)
+        time_widget.setProperty("chip", "time")
 
         time_layout = QHBoxLayout(time_widget)
         time_layout.setContentsMargins(6, 2, 6, 2)
         time_label = QLabel(f"⏱{self.recipe_data[8] or '?'}м")
-        time_label.setStyleSheet("font-size: 10px; font-weight: 500; color: #1976d2;")
         time_layout.addWidget(time_label)
         info_row.addWidget(time_widget)
 
@@ -355,50 +308,21 @@ class RecipeCard(QFrame):
         self.is_favorite = self.recipe_data[15] if len(self.recipe_data) > 15 else False
         self.favorite_btn = QPushButton("❤️" if self.is_favorite else "🤍")
         self.favorite_btn.setFixedSize(50, 50)
-        # Стили для кнопки избранного
-        self.favorite_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;      /* Прозрачный фон */
-                border: none;                       
-                border-radius: 2px;                /* Круглая кнопка */
-                font-size: 17px;                    /* Размер шрифта */
-            }
-            QPushButton:hover {
-                background-color: rgba(220, 53, 69, 0.1); 
-                transform: scale(1.1);                    
-            }
-        """)
+        self.favorite_btn.setObjectName("favoriteToggle")
         self.favorite_btn.setToolTip("В избранном" if self.is_favorite else "Добавить в избранное")
         self.favorite_btn.clicked.connect(self.toggle_favorite_status)
 
         self.is_cooked = self.recipe_data[16] if len(self.recipe_data) > 16 else False
         self.cooked_btn = QPushButton("✅" if self.is_cooked else "⏳")
         self.cooked_btn.setFixedSize(50, 50)
-        self.cooked_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;      /* Прозрачный фон */
-                border: none;                       /* Без рамки */
-                border-radius: 2px;                /* Круглая кнопка */
-                font-size: 18px;                    /* Размер шрифта */
-            }
-            QPushButton:hover {
-                background-color: rgba(40, 167, 69, 0.1);  /* Зеленый фон при наведении */
-                transform: scale(1.1);                     /* Увеличение при наведении */
-            }
-        """)
+        self.cooked_btn.setObjectName("cookedToggle")
         self.cooked_btn.setToolTip("Приготовлено" if self.is_cooked else "Отметить как приготовленное")
         self.cooked_btn.clicked.connect(self.toggle_cooked_status)
 
         dish_type = self.recipe_data[18] if len(self.recipe_data) > 18 else "Без категории"
         dish_type_widget = QWidget()
         dish_type_widget.setFixedHeight(24)
-        dish_type_widget.setStyleSheet("""
-                    QWidget {
-                        background-color: #f3e5f5;
-                        border-radius: 4px;
-                        border: 1px solid #e1bee7;
-                    }
-                """)
+        dish_type_widget.setProperty("chip", "dish_type")
 
         dish_type_layout = QHBoxLayout(dish_type_widget)
         dish_type_layout.setContentsMargins(6, 2, 6, 2)
@@ -414,7 +338,6 @@ class RecipeCard(QFrame):
         icon = type_icons.get(dish_type, "🍽️")
 
         dish_type_label = QLabel(f"{icon} {dish_type[:12]}" if len(dish_type) > 12 else f"{icon} {dish_type}")
-        dish_type_label.setStyleSheet("font-size: 10px; font-weight: 500; color: #7b1fa2;")
         dish_type_label.setToolTip(f"Тип блюда: {dish_type}")
         dish_type_layout.addWidget(dish_type_label)
 
@@ -431,14 +354,7 @@ class RecipeCard(QFrame):
         # === ОСНОВАНИЕ КАРТОЧКИ ===
         bottom_line = QWidget()
         bottom_line.setFixedHeight(4)
-        bottom_line.setStyleSheet("""
-            QWidget {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,  /* Горизонтальный градиент */
-                    stop:0 #3498db, stop:1 #2ecc71);                /* От синего к зеленому */
-                border-bottom-left-radius: 12px;                     /* Закругление нижних углов */
-                border-bottom-right-radius: 12px;                    /* Закругление нижних углов */
-            }
-        """)
+        bottom_line.setObjectName("recipeCardBottomLine")
         layout.addWidget(bottom_line)
 
         self.setLayout(layout)
@@ -447,23 +363,9 @@ class RecipeCard(QFrame):
         """Переключает статус избранного для рецепта."""
         try:
             if self.user_id:
-                new_status = not self.is_favorite
-                success = self.db.toggle_favorite(self.user_id, self.recipe_data[0])
-
-                if success:
-                    self.is_favorite = new_status
-                    self.favorite_btn.setText("❤️" if new_status else "🤍")
-                    self.favorite_btn.setToolTip("В избранном" if new_status else "Добавить в избранное")
-
-                    # Обновляем данные в recipe_data для синхронизации
-                    if len(self.recipe_data) > 15:
-                        self.recipe_data = list(self.recipe_data)
-                        self.recipe_data[15] = new_status
-                        self.recipe_data = tuple(self.recipe_data)
-
-                    # Обновляем статистику в профиле
-                    if self.parent and hasattr(self.parent, 'profile_widget'):
-                        self.parent.profile_widget.update_profile()
+                # Запись идет через состояние сессии; карточка, профиль и другие
+                # карточки того же рецепта обновятся по его сигналу
+                self.parent.session_state.set_favorite(self.recipe_data[0], not self.is_favorite)
 
         except Exception as e:
             print(f"Ошибка при переключении статуса избранного: {e}")
@@ -472,30 +374,154 @@ class RecipeCard(QFrame):
         """Переключает статус приготовленного для рецепта."""
         try:
             if self.user_id:
-                new_status = not self.is_cooked
-                success = self.db.mark_recipe_as_cooked(self.user_id, self.recipe_data[0], new_status)
+                self.parent.session_state.set_cooked(self.recipe_data[0], not self.is_cooked)
 
-                if success:
-                    self.is_cooked = new_status
-                    self.cooked_btn.setText("✅" if new_status else "⏳")
-                    self.cooked_btn.setToolTip("Приготовлено" if new_status else "Отметить как приготовленное")
+        except Exception as e:
+            print(f"Ошибка при переключении статуса приготовления: {e}")
 
-                    if len(self.recipe_data) > 16:
-                        self.recipe_data = list(self.recipe_data)
-                        self.recipe_data[16] = new_status
-                        self.recipe_data = tuple(self.recipe_data)
+    def set_image(self, pixmap):
+        """Показывает изображение (или заглушку) в верхней части карточки"""
+        self.image_label.setPixmap(pixmap)
+        self.image_label.setScaledContents(True)  # Включаем масштабирование содержимого
 
-                    # Обновляем статистику в профиле
-                    if self.parent and hasattr(self.parent, 'profile_widget'):
-                        self.parent.profile_widget.update_profile()
+    def show_text_placeholder(self):
+        """Текстовую заглушку с названием рецепта - если изображения нет или оно не читается"""
+        recipe_name = self.recipe_data[2]
+        if len(recipe_name) > 22:
+            display_text = recipe_name[:22] + '...'
+        else:
+            display_text = recipe_name
 
-        except Exception as e:
-            print(f"Ошибка при переключении статуса приготовления: {e}")
+        self.image_label.setScaledContents(False)
+        self.image_label.setText(f"🍳\n{display_text}")
+        self.image_label.setObjectName("recipeCardPlaceholder")
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+    def set_favorite_status(self, favorite):
+        """Отображает новый статус избранного."""
+        self.is_favorite = favorite
+        self.favorite_btn.setText("❤️" if favorite else "🤍")
+        self.favorite_btn.setToolTip("В избранном" if favorite else "Добавить в избранное")
+
+        # Обновляем данные в recipe_data для синхронизации
+        if len(self.recipe_data) > 15:
+            self.recipe_data = list(self.recipe_data)
+            self.recipe_data[15] = favorite
+            self.recipe_data = tuple(self.recipe_data)
+
+    def set_cooked_status(self, cooked):
+        """Отображает новый статус приготовления."""
+        self.is_cooked = cooked
+        self.cooked_btn.setText("✅" if cooked else "⏳")
+        self.cooked_btn.setToolTip("Приготовлено" if cooked else "Отметить как приготовленное")
+
+        if len(self.recipe_data) > 16:
+            self.recipe_data = list(self.recipe_data)
+            self.recipe_data[16] = cooked
+            self.recipe_data = tuple(self.recipe_data)
 
     def mouseDoubleClickEvent(self, event):
         self.parent.view_recipe(self.recipe_data)
 
 
+class RecipeCategorySection(QWidget):
+    """Секция категории на главной странице с постраничной подгрузкой карточек"""
+
+    # На каком расстоянии (в пикселях) от нижнего края окна прокрутки подгружать следующую страницу
+    PRELOAD_DISTANCE = 300
+
+    def __init__(self, category, total_count, filters, main_window, page_size, generation):
+        super().__init__()
+        self.category = category
+        self.total_count = total_count
+        self.filters = filters
+        self.main_window = main_window
+        self.page_size = page_size
+        self.generation = generation  # Поколение запроса RecipeQueryRunner, создавшего секцию
+
+        self.cursor = None  # Ключ страницы последнего загруженного рецепта (см. DataBase.get_recipes_page)
+        self.has_more = True
+        self.loading = False  # Следующая страница запрошена и еще не пришла
+        self.cards = []
+
+        self.init_ui()
+
+    def init_ui(self):
+        """Создает заголовок, контейнер карточек и разделитель секции"""
+        self.setObjectName("categorySection")
+
+        category_layout = QVBoxLayout(self)
+        category_layout.setContentsMargins(0, 0, 0, 0)
+        category_layout.setSpacing(10)
+
+        # Заголовок категории с количеством рецептов из COUNT ... GROUP BY
+        header = QLabel(f"{self.main_window.get_category_icon(self.category)} {self.category} ({self.total_count})")
+        header.setObjectName("categoryHeader")
+        category_layout.addWidget(header)
+
+        # Контейнер для карточек этой категории
+        cards_container = QWidget()
+        cards_container.setObjectName("categoryCards")
+
+        # Используем FlowLayout для карточек
+        self.flow_layout = FlowLayout(cards_container, margin=15, h_spacing=15, v_spacing=15)
+        cards_container.setLayout(self.flow_layout)
+        category_layout.addWidget(cards_container)
+
+        # Добавляем разделитель между категориями
+        separator = QFrame()
+        separator.setFrameShape(QFrame.Shape.HLine)
+        separator.setObjectName("categorySeparator")
+        category_layout.addWidget(separator)
+
+    def load_next_page(self):
+        """Запрашивает следующую страницу рецептов категории в рабочем потоке.
+
+        Страница приходит в MainWindow.on_recipe_page_loaded и отбрасывается,
+        если с тех пор фильтры сменились и секции создаются заново.
+        """
+        if not self.has_more or self.loading:
+            return
+
+        self.loading = self.main_window.query_runner.submit_page(
+            self.generation, self, self.main_window.db.get_recipes_page,
+            self.main_window.user_id,
+            dish_type=self.category,
+            cursor=self.cursor,
+            page_size=self.page_size,
+            **self.filters
+        )
+
+    def add_page(self, recipes, cursor):
+        """Добавляет карточки загруженной страницы и запоминает курсор следующей"""
+        self.loading = False
+        self.cursor = cursor
+        self.has_more = cursor is not None
+
+        for recipe in recipes:
+            card = RecipeCard(recipe, self.main_window.db, self.main_window)
+            self.flow_layout.addWidget(card)
+            self.cards.append(card)
+            self.main_window.current_recipe_cards.append(card)
+
+    def replace_card(self, card, recipe_data):
+        """Заменяет карточку новой с обновленными данными рецепта на том же месте"""
+        new_card = RecipeCard(recipe_data, self.main_window.db, self.main_window)
+        if not self.flow_layout.replace_widget(card, new_card):
+            new_card.deleteLater()
+            return
+        self.cards[self.cards.index(card)] = new_card
+        cards = self.main_window.current_recipe_cards
+        if card in cards:
+            cards[cards.index(card)] = new_card
+        card.deleteLater()
+
+    def is_near_viewport_bottom(self, viewport):
+        """Проверяет, находится ли нижний край секции в области прокрутки или рядом с ее нижним краем"""
+        bottom = self.mapTo(viewport, QPoint(0, self.height())).y()
+        return 0 <= bottom <= viewport.height() + self.PRELOAD_DISTANCE
+
+
 class AutoCompleteComboBox(QComboBox):
     """ComboBox с автодополнением и возможностью ввода нескольких значений"""
 
@@ -529,23 +555,75 @@ class AutoCompleteComboBox(QComboBox):
 class MainWindow(QMainWindow):
     """Главное окно приложения с вкладками рецептов, профиля и корзины."""
 
-    def __init__(self, db, user_id, logout_callback):
+    # Количество карточек, загружаемых в секцию категории за один раз
+    RECIPES_PAGE_SIZE = 12
+
+    # Индексы вкладок, создаваемых при первом открытии
+    PROFILE_TAB_INDEX = 1
+    CART_TAB_INDEX = 2
+
+    def __init__(self, db, user_id, logout_callback, startup_trace=None, session_state=None):
         super().__init__()
         self.db = db
         self.user_id = user_id
         self.logout_callback = logout_callback
+        self.startup_trace = startup_trace
+
+        # Корзина, избранное и приготовленные рецепты пользователя - общий источник для всех вкладок
+        self.session_state = session_state or SessionState(db, user_id)
+        self.session_state.setParent(self)
+        self.session_state.favorite_changed.connect(self.on_favorite_changed)
+        self.session_state.cooked_changed.connect(self.on_cooked_changed)
 
         self.settings = QSettings("PuzzleVkusov", "AppSettings")
         self.current_recipe_cards = []
+        self.category_sections = []
+        self.pantry_index = None
+        self.nutrition_ranges = {}  # {столбец КБЖУ: (от, до)} для фильтра по пищевой ценности
+        self.recipe_similarity = None
+        self.recommender = None
+        self.ingredient_pairings = None
+        self.nutrition_pool = None
+        self.image_maintenance = None
+        self.change_watcher = None
+        self.nutrition_dirty = set()
+        self.nutrition_tasks = {}
+        self.nutrition_generation = 0
+        self.catalog_pool = None
+        self.catalog_task = None
+
+        # Изображения карточек декодируются в фоне, до этого видна заглушка из списка рецептов
+        self.card_images = CardImageLoader(db, self)
 
         self.filter_timer = QTimer()
         self.filter_timer.setSingleShot(True)
         self.filter_timer.timeout.connect(self.load_recipes)
 
+        # Запросы фильтрации выполняются вне GUI-потока, применяется только последний результат
+        self.query_runner = RecipeQueryRunner(self)
+        self.query_runner.result_ready.connect(self.on_recipes_loaded)
+        self.query_runner.error.connect(
+            lambda message: self.show_error_message(f"Ошибка загрузки рецептов: {message}")
+        )
+        self.query_runner.page_ready.connect(self.on_recipe_page_loaded)
+        self.query_runner.page_failed.connect(self.on_recipe_page_failed)
+
         self.init_ui()
         self.load_initial_settings()
         self.load_recipes()
-        self.update_profile()
+
+        # Персональные рекомендации, сочетаемость ингредиентов, каталог рецептов и КБЖУ считаются в фоне;
+        # NumPy загружается уже после первого кадра
+        QTimer.singleShot(0, self.start_recommender)
+        QTimer.singleShot(0, self.start_ingredient_pairings)
+        QTimer.singleShot(0, self.start_nutrition_calculator)
+        if not getattr(self.db, 'is_remote', False):
+            # С сервисом каталога каталог в памяти держит сервер, а файлы изображений
+            # и их заглушки обслуживаются там, где лежит база
+            QTimer.singleShot(0, self.start_recipe_catalog)
+            QTimer.singleShot(0, self.start_image_maintenance)
+            QTimer.singleShot(0, self.card_images.start_placeholder_backfill)
+            QTimer.singleShot(0, self.start_change_watcher)
 
     def init_ui(self):
         self.setWindowTitle("Пазл Вкусов")
@@ -555,85 +633,8 @@ class MainWindow(QMainWindow):
         font_size = self.settings.value("font_size", 14, type=int)
         title_font_size = self.settings.value("title_font_size", 16, type=int)
 
-        self.setStyleSheet(f"""
-            QMainWindow {{
-                background-color: #f8f9fa;
-            }}
-            QWidget {{
-                font-family: 'Segoe UI', Arial, sans-serif;
-                font-size: {font_size}px;
-            }}
-            /* Стили для полей поиска */
-            QLineEdit {{
-                padding: 8px;
-                border: 1px solid #dee2e6;
-                border-radius: 4px;
-                background-color: white;
-            }}
-            QLineEdit:focus {{
-                border: 1px solid #007bff;
-                outline: none;
-            }}
-            QComboBox {{
-                padding: 8px;
-                border: 1px solid #dee2e6;
-                border-radius: 4px;
-                background-color: white;
-            }}
-            QComboBox:focus {{
-                border: 1px solid #007bff;
-                outline: none;
-            }}
-            QComboBox QAbstractItemView {{
-                border: 1px solid #dee2e6;
-                border-radius: 4px;
-                background-color: white;
-                selection-background-color: #007bff;
-                selection-color: white;
-            }}
-            QWidget {{
-                font-family: 'Segoe UI', Arial, sans-serif;
-                font-size: {font_size}px;
-            }}
-            QTabWidget::pane {{
-                border: 1px solid #dee2e6;
-                background-color: white;
-                border-radius: 8px;
-            }}
-            QTabBar::tab {{
-                background-color: #e9ecef;
-                color: #495057;
-                padding: 8px 16px;
-                margin-right: 2px;
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-                font-size: {font_size}px;
-            }}
-            QTabBar::tab:selected {{
-                background-color: white;
-                color: #495057;
-                border-bottom: 2px solid #007bff;
-            }}
-            QPushButton {{
-                background-color: #007bff;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: 500;
-                font-size: {font_size}px;
-            }}
-            QPushButton:hover {{
-                background-color: #0056b3;
-            }}
-            QScrollArea {{
-                border: none;
-                background-color: transparent;
-            }}
-            QScrollArea > QWidget > QWidget {{
-                background-color: transparent;
-            }}
-        """)
+        # Общая таблица стилей окна, включая стили карточек и секций категорий
+        apply_theme(self, font_size, title_font_size)
 
         self.setMenuBar(None)
         self.create_toolbar()
@@ -683,6 +684,11 @@ class MainWindow(QMainWindow):
 
         self.recipes_scroll.setWidget(self.recipes_container)
 
+        # Подгружаем следующие страницы по мере прокрутки
+        scroll_bar = self.recipes_scroll.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.load_more_recipes_if_needed)
+        scroll_bar.rangeChanged.connect(self.load_more_recipes_if_needed)
+
         # Устанавливаем стили для скролла
         self.recipes_scroll.setStyleSheet("""
             QScrollArea {
@@ -707,19 +713,57 @@ class MainWindow(QMainWindow):
 
         recipes_layout.addWidget(self.recipes_scroll, 1)
 
-        # === ВКЛАДКА ПРОФИЛЯ ===
-        self.profile_widget = ProfileWidget(self.db, self.user_id, self)
-
-        # === ВКЛАДКА КОРЗИНЫ ===
-        self.cart_widget = CartWidget(self.db, self.user_id, self)
+        # === ВКЛАДКИ ПРОФИЛЯ И КОРЗИНЫ ===
+        # Создаются при первом открытии вкладки, до этого на их месте пустые заглушки
+        self.profile_widget = None
+        self.cart_widget = None
 
         self.tabs.addTab(recipes_tab, "📖 Рецепты")
-        self.tabs.addTab(self.profile_widget, "👤 Профиль")
-        self.tabs.addTab(self.cart_widget, "🛒 Корзина")
+        self.tabs.addTab(QWidget(), "👤 Профиль")
+        self.tabs.addTab(QWidget(), "🛒 Корзина")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
 
         layout.addWidget(self.tabs, 1)
         central_widget.setLayout(layout)
 
+    def on_tab_changed(self, index):
+        """Создает вкладку профиля или корзины при первом переходе на нее"""
+        if index == self.PROFILE_TAB_INDEX:
+            self.ensure_profile_widget()
+        elif index == self.CART_TAB_INDEX:
+            self.ensure_cart_widget()
+
+    def ensure_profile_widget(self):
+        """Возвращает виджет профиля, создавая его при первом обращении"""
+        if self.profile_widget is None:
+            from src.modules.user_profile import ProfileWidget
+
+            self.profile_widget = ProfileWidget(self.db, self.user_id, self, self.session_state)
+            self.replace_tab(self.PROFILE_TAB_INDEX, self.profile_widget, "👤 Профиль")
+        return self.profile_widget
+
+    def ensure_cart_widget(self):
+        """Возвращает виджет корзины, создавая его при первом обращении"""
+        if self.cart_widget is None:
+            from src.modules.cart_manager import CartWidget
+
+            self.cart_widget = CartWidget(self.db, self.user_id, self, self.session_state)
+            self.replace_tab(self.CART_TAB_INDEX, self.cart_widget, "🛒 Корзина")
+        return self.cart_widget
+
+    def replace_tab(self, index, widget, title):
+        """Заменяет заглушку вкладки настоящим виджетом, сохраняя текущую вкладку"""
+        placeholder = self.tabs.widget(index)
+        current_index = self.tabs.currentIndex()
+
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, widget, title)
+        self.tabs.setCurrentIndex(current_index)
+        self.tabs.blockSignals(False)
+
+        placeholder.deleteLater()
+
     def load_initial_settings(self):
         # Загружает начальные настройки приложения при запуске
         try:
@@ -796,16 +840,19 @@ class MainWindow(QMainWindow):
         row1_layout.addWidget(QLabel("Кухня:"))
         self.cuisine_filter = QComboBox()
         self.cuisine_filter.setMinimumWidth(150)
-        self.cuisine_filter.addItem("Любая кухня")
+        self.cuisine_filter.addItem("Любая кухня", None)
         self.load_cuisines_to_filter()
-        self.cuisine_filter.currentTextChanged.connect(lambda: self.apply_filters(immediate=True))
+        # Текст вариантов меняется вместе со счетчиками, поэтому следим за индексом
+        self.cuisine_filter.currentIndexChanged.connect(lambda: self.apply_filters(immediate=True))
         row1_layout.addWidget(self.cuisine_filter)
 
         row1_layout.addWidget(QLabel("Время:"))
         self.time_filter = QComboBox()
         self.time_filter.setMinimumWidth(120)
-        self.time_filter.addItems(["Любое", "15 мин", "30 мин", "60 мин", "90 мин", "120 мин"])
-        self.time_filter.currentTextChanged.connect(lambda: self.apply_filters(immediate=True))
+        self.time_filter.addItem("Любое", None)
+        for minutes in DataBase.TIME_BUCKETS:
+            self.time_filter.addItem(f"{minutes} мин", minutes)
+        self.time_filter.currentIndexChanged.connect(lambda: self.apply_filters(immediate=True))
         row1_layout.addWidget(self.time_filter)
 
         self.favorites_only = QCheckBox("Только избранное")
@@ -827,15 +874,33 @@ class MainWindow(QMainWindow):
         self.name_filter = SmartSearchLineEdit()
         self.name_filter.setMinimumWidth(250)
         self.name_filter.textChanged.connect(lambda: self.apply_filters(debounced=True))
-        self.load_search_suggestions()
+        # Подсказки не нужны для первого кадра: загружаем их после показа окна
+        QTimer.singleShot(0, self.load_search_suggestions)
 
         clear_name_btn = QPushButton("🗑️")
         clear_name_btn.setFixedSize(50, 40)
         clear_name_btn.setToolTip("Очистить поле названия")
         clear_name_btn.clicked.connect(self.clear_name_filter)
 
+        # Сортировка и диапазоны КБЖУ выполняются в запросе к базе данных
+        self.sort_filter = QComboBox()
+        self.sort_filter.addItem("По релевантности", DataBase.SORT_RELEVANCE)
+        self.sort_filter.addItem("Быстрые сначала", DataBase.SORT_COOK_TIME)
+        self.sort_filter.addItem("Менее калорийные", DataBase.SORT_CALORIES)
+        self.sort_filter.addItem("Больше белка на ккал", DataBase.SORT_PROTEIN_DENSITY)
+        self.sort_filter.addItem("Сначала новые", DataBase.SORT_RECENT)
+        self.sort_filter.setToolTip("Сортировки по КБЖУ показывают только рецепты с указанной пищевой ценностью")
+        self.sort_filter.currentIndexChanged.connect(lambda: self.apply_filters(immediate=True))
+
+        self.nutrition_filter_btn = QPushButton("⚖️ КБЖУ")
+        self.nutrition_filter_btn.setToolTip("Диапазоны калорий, белков, жиров и углеводов на порцию")
+        self.nutrition_filter_btn.clicked.connect(self.show_nutrition_filter)
+
         row2_layout.addWidget(self.name_filter)
         row2_layout.addWidget(clear_name_btn)
+        row2_layout.addWidget(QLabel("Сортировка:"))
+        row2_layout.addWidget(self.sort_filter)
+        row2_layout.addWidget(self.nutrition_filter_btn)
         row2_layout.addStretch()
 
         filters_layout.addLayout(row2_layout)
@@ -880,9 +945,28 @@ class MainWindow(QMainWindow):
         clear_ingredients_btn.setToolTip("Очистить выбор ингредиентов")
         clear_ingredients_btn.clicked.connect(self.clear_ingredients_filter)
 
+        pantry_btn = QPushButton("🧺 Что приготовить?")
+        pantry_btn.setToolTip("Подобрать рецепты по продуктам, которые есть дома")
+        pantry_btn.clicked.connect(self.open_pantry)
+
+        meal_plan_btn = QPushButton("📅 План питания")
+        meal_plan_btn.setToolTip("Составить план на неделю под цели КБЖУ и отправить продукты в корзину")
+        meal_plan_btn.clicked.connect(self.open_meal_plan)
+
+        # Как применять выбранные ингредиенты: все сразу, любой из них или исключить
+        self.ingredient_mode_filter = QComboBox()
+        self.ingredient_mode_filter.addItem("Все выбранные", DataBase.INGREDIENT_MODE_ALL)
+        self.ingredient_mode_filter.addItem("Любой из выбранных", DataBase.INGREDIENT_MODE_ANY)
+        self.ingredient_mode_filter.addItem("Без выбранных", DataBase.INGREDIENT_MODE_NONE)
+        self.ingredient_mode_filter.setToolTip("«Без выбранных» исключает рецепты с этими ингредиентами, например при аллергии")
+        self.ingredient_mode_filter.currentIndexChanged.connect(self.on_ingredient_mode_changed)
+
         row3_layout.addWidget(self.ingredient_filter_btn)
+        row3_layout.addWidget(self.ingredient_mode_filter)
         row3_layout.addWidget(self.ingredients_filter_container, 1)
         row3_layout.addWidget(clear_ingredients_btn)
+        row3_layout.addWidget(pantry_btn)
+        row3_layout.addWidget(meal_plan_btn)
 
         filters_layout.addLayout(row3_layout)
 
@@ -901,6 +985,18 @@ class MainWindow(QMainWindow):
         search_input.setPlaceholderText("Поиск ингредиентов...")
         search_layout.addWidget(search_input)
 
+        # Подсказки «хорошо сочетается с» для уже отмеченных ингредиентов
+        self.ingredient_suggestions_widget = QWidget()
+        self.ingredient_suggestions_layout = QHBoxLayout(self.ingredient_suggestions_widget)
+        self.ingredient_suggestions_layout.setContentsMargins(0, 0, 0, 0)
+        self.ingredient_suggestions_widget.hide()
+
+        # Пересчет подсказок откладывается, чтобы «Выбрать все» не вызывал запрос на каждый чекбокс
+        self.ingredient_suggestions_timer = QTimer(dialog)
+        self.ingredient_suggestions_timer.setSingleShot(True)
+        self.ingredient_suggestions_timer.setInterval(150)
+        self.ingredient_suggestions_timer.timeout.connect(self.update_ingredient_suggestions)
+
         # Область с чекбоксами
         scroll_area = QScrollArea()
         scroll_widget = QWidget()
@@ -928,11 +1024,312 @@ class MainWindow(QMainWindow):
         button_layout.addWidget(cancel_btn)
 
         layout.addLayout(search_layout)
+        layout.addWidget(self.ingredient_suggestions_widget)
         layout.addWidget(scroll_area)
         layout.addLayout(button_layout)
 
         dialog.exec()
 
+    def show_nutrition_filter(self):
+        """Диалог диапазонов КБЖУ на порцию; 0 в поле означает «без ограничения»."""
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Фильтр по пищевой ценности")
+        dialog.setModal(True)
+
+        layout = QVBoxLayout(dialog)
+        grid = QGridLayout()
+        grid.addWidget(QLabel("от"), 0, 1)
+        grid.addWidget(QLabel("до"), 0, 2)
+
+        fields = [
+            ('calories', "Калории, ккал", 5000),
+            ('proteins', "Белки, г", 500),
+            ('fats', "Жиры, г", 500),
+            ('carbohydrates', "Углеводы, г", 500),
+        ]
+        inputs = {}
+        for row, (column, title, maximum) in enumerate(fields, start=1):
+            grid.addWidget(QLabel(title), row, 0)
+            bounds = []
+            for position, value in enumerate(self.nutrition_ranges.get(column, (None, None))):
+                spin_box = QDoubleSpinBox()
+                spin_box.setRange(0, maximum)
+                spin_box.setDecimals(0 if column == 'calories' else 1)
+                spin_box.setSpecialValueText("—")
+                spin_box.setValue(value or 0)
+                grid.addWidget(spin_box, row, position + 1)
+                bounds.append(spin_box)
+            inputs[column] = bounds
+        layout.addLayout(grid)
+
+        button_layout = QHBoxLayout()
+        reset_btn = QPushButton("Сбросить")
+        reset_btn.clicked.connect(lambda: [spin_box.setValue(0) for bounds in inputs.values() for spin_box in bounds])
+        apply_btn = QPushButton("Применить")
+        apply_btn.clicked.connect(dialog.accept)
+        cancel_btn = QPushButton("Отмена")
+        cancel_btn.clicked.connect(dialog.reject)
+        button_layout.addWidget(reset_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(apply_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+
+        ranges = {}
+        for column, (low_input, high_input) in inputs.items():
+            low, high = low_input.value() or None, high_input.value() or None
+            if low is not None or high is not None:
+                ranges[column] = (low, high)
+        self.set_nutrition_ranges(ranges)
+
+    def set_nutrition_ranges(self, ranges):
+        """Применяет диапазоны КБЖУ и показывает их число на кнопке фильтра"""
+        self.nutrition_ranges = ranges
+        self.nutrition_filter_btn.setText(f"⚖️ КБЖУ ({len(ranges)})" if ranges else "⚖️ КБЖУ")
+        self.apply_filters(immediate=True)
+
+    def open_pantry(self):
+        """Открывает подбор рецептов по кладовой."""
+        try:
+            from src.modules.pantry_dialog import PantryDialog
+            from src.modules.pantry_matcher import PantryIndex
+
+            # Индекс строится одним запросом и живет до следующего изменения рецептов
+            if self.pantry_index is None:
+                self.pantry_index = PantryIndex.from_database(self.db)
+
+            dialog = PantryDialog(self.db, self.user_id, self.pantry_index, self)
+            dialog.recipe_selected.connect(self.view_recipe)
+            dialog.exec()
+        except Exception as e:
+            print(f"Ошибка открытия подбора по кладовой: {e}")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть подбор рецептов: {e}")
+
+    def open_meal_plan(self):
+        """Открывает составление плана питания."""
+        try:
+            from src.modules.meal_plan_dialog import MealPlanDialog
+            from src.modules.meal_planner import MealPlanner
+
+            planner = MealPlanner.from_database(self.db, self.user_id)
+            dialog = MealPlanDialog(self.db, self.user_id, planner, self)
+            dialog.recipe_selected.connect(self.view_recipe)
+            dialog.add_to_cart.connect(self.add_to_cart)
+            dialog.exec()
+        except Exception as e:
+            print(f"Ошибка открытия плана питания: {e}")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть план питания: {e}")
+
+    def invalidate_pantry_index(self):
+        """Сбрасывает индекс кладовой после изменения рецептов."""
+        self.pantry_index = None
+
+    def start_recommender(self):
+        """Запускает фоновое переобучение персональной релевантности рецептов."""
+        try:
+            from src.modules.recommender import RecommenderTrainer
+        except ImportError as e:
+            print(f"Персональные рекомендации недоступны: {e}")
+            return
+
+        self.recommender = RecommenderTrainer(self.db, self)
+        self.session_state.favorite_changed.connect(self.recommender.note_interaction)
+        self.session_state.cooked_changed.connect(self.recommender.note_interaction)
+        self.recommender.maybe_train()
+
+    def start_image_maintenance(self):
+        """Планирует фоновую проверку каталога изображений (начнется после задержки)."""
+        try:
+            from src.modules.image_maintenance import ImageMaintenance
+        except ImportError as e:
+            print(f"Проверка изображений недоступна: {e}")
+            return
+
+        self.image_maintenance = ImageMaintenance(self.db, self)
+        self.image_maintenance.start()
+
+    def start_change_watcher(self):
+        """Начинает следить за изменениями базы, сделанными другими окнами приложения."""
+        from src.modules.change_watcher import ChangeWatcher
+
+        self.change_watcher = ChangeWatcher(self.db, self.user_id, self)
+        self.change_watcher.recipes_changed.connect(self.on_external_recipes_changed)
+        self.change_watcher.nutrition_changed.connect(self.on_external_nutrition_changed)
+        self.change_watcher.user_data_changed.connect(self.session_state.sync)
+        self.change_watcher.changes_lost.connect(self.refresh_data)
+        self.change_watcher.start()
+
+    def on_external_recipes_changed(self, operations):
+        """Применяет изменения рецептов из журнала базы: {recipe_id: insert, update или delete}.
+
+        Добавление и удаление меняют состав и счетчики разделов - они
+        перезагружаются. Измененные рецепты, карточки которых показаны, без
+        активных фильтров заменяются на месте; с фильтрами рецепт мог выпасть
+        из выборки или попасть в нее, и разделы перезагружаются.
+        """
+        self.invalidate_pantry_index()
+        self.drop_recipe_similarity()
+        self.load_search_suggestions()
+        self.update_profile()
+
+        filters = self.get_current_filters()
+        filtered = any(value for key, value in filters.items() if key not in ('ingredient_mode', 'sort'))
+        if filtered or any(operation != 'update' for operation in operations.values()):
+            self.load_recipes()
+            return
+
+        shown = [(section, card) for section in self.category_sections for card in section.cards
+                 if card.recipe_data[0] in operations]
+        if not shown:
+            return
+        recipes = {recipe[0]: recipe for recipe in self.db.get_recipes_by_ids(
+            self.user_id, {card.recipe_data[0] for _, card in shown}
+        )}
+        for section, card in shown:
+            recipe = recipes.get(card.recipe_data[0])
+            if recipe is None or recipe[18] != section.category:
+                # Рецепт удален или перешел в другой раздел
+                self.load_recipes()
+                return
+        for section, card in shown:
+            section.replace_card(card, recipes[card.recipe_data[0]])
+
+    def on_external_nutrition_changed(self, recipe_ids):
+        """Перезагружает разделы, если их состав или порядок зависит от КБЖУ.
+
+        Каталог в памяти уже получил изменения через notify_logged_changes;
+        карточки пищевую ценность не показывают.
+        """
+        if self.nutrition_ranges or self.sort_filter.currentData() in (DataBase.SORT_CALORIES,
+                                                                      DataBase.SORT_PROTEIN_DENSITY):
+            self.filter_timer.start(100)
+
+    def start_ingredient_pairings(self):
+        """Строит таблицу сочетаемости ингредиентов (если она пуста) и подписывает ее
+        на изменения рецептов. Пересчеты идут в отдельном потоке по одному."""
+        try:
+            from src.modules.ingredient_pairing import IngredientPairings
+        except ImportError as e:
+            print(f"Сочетаемость ингредиентов недоступна: {e}")
+            return
+
+        self.ingredient_pairings = IngredientPairings(self.db)
+        self.pairings_pool = QThreadPool(self)
+        self.pairings_pool.setMaxThreadCount(1)
+        self.pairings_pool.start(self.ingredient_pairings.ensure_built)
+        self.db.add_recipe_listener(self.on_recipe_ingredients_changed)
+
+    def on_recipe_ingredients_changed(self, recipe_id, ingredient_ids, previous_ids):
+        """Ставит в очередь пересчет соседей ингредиентов измененного рецепта."""
+        self.pairings_pool.start(
+            lambda: self.ingredient_pairings.on_recipe_changed(recipe_id, ingredient_ids, previous_ids)
+        )
+
+    def start_nutrition_calculator(self):
+        """Рассчитывает КБЖУ рецептов, у которых его нет, и подписывается на изменения
+        рецептов. Расчеты идут в отдельном потоке; введенные вручную значения не меняются."""
+        try:
+            from src.modules.nutrition_calculator import recompute_nutrition
+        except ImportError as e:
+            print(f"Расчет пищевой ценности недоступен: {e}")
+            return
+
+        self.nutrition_pool = QThreadPool(self)
+        self.nutrition_pool.setMaxThreadCount(1)
+        self.db.add_recipe_listener(self.on_recipe_nutrition_changed)
+        self.run_nutrition_task(recompute_nutrition, self.db.get_recipes_without_nutrition())
+
+    def on_recipe_nutrition_changed(self, recipe_id, ingredient_ids, previous_ids):
+        """Копит измененные рецепты и пересчитывает их КБЖУ одной пачкой."""
+        if ingredient_ids is None:
+            self.nutrition_dirty.discard(recipe_id)
+            return
+
+        if not self.nutrition_dirty:
+            QTimer.singleShot(0, self.flush_nutrition)
+        self.nutrition_dirty.add(recipe_id)
+
+    def flush_nutrition(self):
+        from src.modules.nutrition_calculator import recompute_nutrition
+
+        recipe_ids, self.nutrition_dirty = self.nutrition_dirty, set()
+        if recipe_ids:
+            self.run_nutrition_task(recompute_nutrition, recipe_ids)
+
+    def run_nutrition_task(self, func, recipe_ids):
+        self.nutrition_generation += 1
+        generation = self.nutrition_generation
+        task = QueryTask(generation, func, (self.db, recipe_ids), {})
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self.on_nutrition_computed)
+        task.signals.failed.connect(self.on_nutrition_failed)
+
+        # Храним ссылку на задачу, пока не придет ее результат
+        self.nutrition_tasks[generation] = task
+        self.nutrition_pool.start(task)
+
+    def on_nutrition_computed(self, generation, saved):
+        """Перерисовывает карточки, если у рецептов появились рассчитанные КБЖУ."""
+        self.nutrition_tasks.pop(generation, None)
+        if saved:
+            self.filter_timer.start(100)
+
+    def on_nutrition_failed(self, generation, message):
+        self.nutrition_tasks.pop(generation, None)
+        print(f"Ошибка расчета пищевой ценности: {message}")
+
+    def start_recipe_catalog(self):
+        """Загружает фильтруемые атрибуты рецептов в память в отдельном потоке и подключает
+        каталог к DataBase: дальше фильтры и счетчики без названия и ингредиентов
+        считаются по массивам NumPy, а не запросами к SQLite."""
+        try:
+            from src.modules.recipe_catalog import RecipeCatalog
+        except ImportError as e:
+            print(f"Каталог рецептов в памяти недоступен: {e}")
+            return
+
+        if self.catalog_pool is None:
+            self.catalog_pool = QThreadPool(self)
+            self.catalog_pool.setMaxThreadCount(1)
+
+        task = QueryTask(self.db.write_version, RecipeCatalog.from_database, (self.db,), {})
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self.on_recipe_catalog_loaded)
+        task.signals.failed.connect(
+            lambda generation, message: print(f"Ошибка загрузки каталога рецептов: {message}")
+        )
+        # Храним ссылку на задачу, пока не придет ее результат
+        self.catalog_task = task
+        self.catalog_pool.start(task)
+
+    def on_recipe_catalog_loaded(self, generation, catalog):
+        """Подключает загруженный каталог, если за время загрузки в базу ничего не записали."""
+        self.catalog_task = None
+        if catalog.version != self.db.write_version:
+            # Запись могла пройти мимо каталога - загружаем заново
+            self.start_recipe_catalog()
+            return
+        self.db.set_recipe_catalog(catalog)
+
+    def get_recipe_similarity(self):
+        """Матрица похожести рецептов: строится при первом обращении и дальше
+        обновляется точечно по уведомлениям DataBase об изменении рецептов."""
+        if self.recipe_similarity is None:
+            from src.modules.recipe_similarity import RecipeSimilarity
+
+            self.recipe_similarity = RecipeSimilarity.from_database(self.db)
+            self.db.add_recipe_listener(self.recipe_similarity.on_recipe_changed)
+        return self.recipe_similarity
+
+    def drop_recipe_similarity(self):
+        """Отключает матрицу похожести от DataBase; при следующем обращении она строится заново."""
+        if self.recipe_similarity is not None:
+            self.db.remove_recipe_listener(self.recipe_similarity.on_recipe_changed)
+            self.recipe_similarity = None
+
     def load_ingredients_for_checkboxes(self):
         """Загружает ингредиенты для чекбоксов"""
         try:
@@ -950,11 +1347,14 @@ class MainWindow(QMainWindow):
 
             # Создаем чекбоксы
             self.ingredient_checkboxes = {}
+            self.ingredient_checkbox_ids = {}
             for ing_id, ing_name in ingredients:
                 checkbox = QCheckBox(ing_name)
                 checkbox.setObjectName(f"ing_{ing_id}")
+                checkbox.toggled.connect(self.ingredient_suggestions_timer.start)
                 self.ingredients_list_layout.addWidget(checkbox)
                 self.ingredient_checkboxes[ing_name] = checkbox
+                self.ingredient_checkbox_ids[ing_name] = ing_id
 
             # Добавляем растягивающийся элемент
             self.ingredients_list_layout.addStretch()
@@ -962,6 +1362,30 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"Ошибка загрузки ингредиентов для чекбоксов: {e}")
 
+    def update_ingredient_suggestions(self):
+        """Показывает ингредиенты, которые хорошо сочетаются с отмеченными"""
+        while self.ingredient_suggestions_layout.count():
+            item = self.ingredient_suggestions_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+
+        selected_ids = [self.ingredient_checkbox_ids[name]
+                        for name, checkbox in self.ingredient_checkboxes.items() if checkbox.isChecked()]
+        suggestions = self.db.get_ingredient_suggestions(selected_ids, limit=6)
+
+        self.ingredient_suggestions_widget.setVisible(bool(suggestions))
+        if not suggestions:
+            return
+
+        self.ingredient_suggestions_layout.addWidget(QLabel("Сочетается с выбранными:"))
+        for ing_id, ing_name in suggestions:
+            suggestion_btn = QPushButton(f"+ {ing_name}")
+            suggestion_btn.clicked.connect(
+                lambda checked=False, name=ing_name: self.ingredient_checkboxes[name].setChecked(True)
+            )
+            self.ingredient_suggestions_layout.addWidget(suggestion_btn)
+        self.ingredient_suggestions_layout.addStretch()
+
     def select_all_ingredients(self):
         """Выбирает все ингредиенты"""
         for checkbox in self.ingredient_checkboxes.values():
@@ -1037,10 +1461,7 @@ class MainWindow(QMainWindow):
         """Загружает подсказки для поиска по названиям рецептов"""
         try:
             # Получаем все рецепты для подсказок
-            session = self.db.Session()
-            recipes = session.query(Recipe).all()
-            recipe_names = [recipe.name for recipe in recipes]
-            session.close()
+            recipe_names = list(self.db.get_recipe_names().values())
 
             # Устанавливаем подсказки
             self.name_filter.set_search_suggestions(recipe_names)
@@ -1054,20 +1475,25 @@ class MainWindow(QMainWindow):
             cuisines = self.db.get_cuisines()
 
             self.cuisine_filter.clear()
-            self.cuisine_filter.addItem("Любая кухня")
+            self.cuisine_filter.addItem("Любая кухня", None)
 
             if cuisines:
                 for cuisine_id, cuisine_name in cuisines:
-                    self.cuisine_filter.addItem(cuisine_name)
+                    self.cuisine_filter.addItem(cuisine_name, cuisine_name)
             else:
                 default_cuisines = ["Русская", "Итальянская", "Японская",
                                     "Китайская", "Мексиканская", "Французская"]
                 for cuisine in default_cuisines:
-                    self.cuisine_filter.addItem(cuisine)
+                    self.cuisine_filter.addItem(cuisine, cuisine)
 
         except Exception as e:
             print(f"Ошибка загрузки кухонь: {e}")
 
+    def on_ingredient_mode_changed(self):
+        """Перезапрашивает рецепты при смене режима, если ингредиенты выбраны"""
+        if getattr(self, 'selected_ingredients', None):
+            self.apply_filters(immediate=True)
+
     def clear_ingredients_filter(self):
         """Очищает выбор ингредиентов"""
         self.selected_ingredients = []
@@ -1084,7 +1510,7 @@ class MainWindow(QMainWindow):
         if debounced:
             if hasattr(self, 'filter_timer'):
                 self.filter_timer.stop()
-                self.filter_timer.start(500)
+                self.filter_timer.start(100)
         else:
             self.load_recipes()
 
@@ -1094,68 +1520,62 @@ class MainWindow(QMainWindow):
         self.time_filter.setCurrentIndex(0)
         self.favorites_only.setChecked(False)
         self.cooked_only.setChecked(False)
+        self.sort_filter.setCurrentIndex(0)
+        self.nutrition_ranges = {}
+        self.nutrition_filter_btn.setText("⚖️ КБЖУ")
         self.ingredient_filter.lineEdit().clear()
         self.name_filter.clear()
         self.load_recipes()
 
+    def get_current_filters(self):
+        """Собирает значения фильтров панели в аргументы запросов к базе данных"""
+        # Названия вариантов содержат счетчики, значения фильтров хранятся в данных элементов
+        cuisine = self.cuisine_filter.currentData()
+        max_time = self.time_filter.currentData()
+
+        # Используем выбранные ингредиенты
+        ingredient_filter = list(self.selected_ingredients) if hasattr(self, 'selected_ingredients') else []
+
+        return {
+            'cuisine': cuisine,
+            'max_time': max_time,
+            'favorites_only': self.favorites_only.isChecked(),
+            'cooked_only': self.cooked_only.isChecked(),
+            'ingredient_filter': ingredient_filter,
+            'ingredient_mode': self.ingredient_mode_filter.currentData(),
+            'name_filter': self.name_filter.text().strip(),
+            'nutrition_ranges': dict(self.nutrition_ranges),
+            'sort': self.sort_filter.currentData()
+        }
+
     def load_recipes(self):
-        """Загружает рецепты с учетом фильтров и группирует по типам блюд"""
+        """Запускает загрузку рецептов с учетом фильтров в рабочем потоке"""
         try:
-            # Получаем значения фильтров
-            cuisine = self.cuisine_filter.currentText()
-            if cuisine == "Любая кухня":
-                cuisine = None
-
-            time_filter = self.time_filter.currentText()
-            max_time = None
-            if time_filter != "Любое":
-                time_map = {
-                    "15 мин": 15,
-                    "30 мин": 30,
-                    "60 мин": 60,
-                    "90 мин": 90,
-                    "120 мин": 120
-                }
-                max_time = time_map.get(time_filter)
-
-            favorites_only = self.favorites_only.isChecked()
-            cooked_only = self.cooked_only.isChecked()
-
-            # Используем выбранные ингредиенты
-            ingredient_filter = self.selected_ingredients if hasattr(self, 'selected_ingredients') else []
-
-            name_filter = self.name_filter.text().strip()
-
-            # Получаем сгруппированные рецепты
-            grouped_recipes = self.db.get_recipes_with_filters(
-                self.user_id,
-                cuisine=cuisine,
-                max_time=max_time,
-                favorites_only=favorites_only,
-                cooked_only=cooked_only,
-                ingredient_filter=ingredient_filter,
-                name_filter=name_filter
+            filters = self.get_current_filters()
+            self.query_runner.submit(
+                load_recipe_sections, self.db, self.user_id, filters, self.RECIPES_PAGE_SIZE
             )
 
-            # Проверяем, что grouped_recipes не является None
-            if grouped_recipes is None:
-                grouped_recipes = {}
+        except Exception as e:
+            self.show_error_message(f"Ошибка загрузки рецептов: {str(e)}")
 
-            self.display_recipes_by_category(grouped_recipes)
+    def on_recipes_loaded(self, result):
+        """Применяет результат последнего запроса: счетчики категорий и первые страницы секций"""
+        try:
+            filters, facets, first_pages = result
+            self.update_filter_facets(facets)
+            self.display_category_sections(facets['dish_type'], filters, first_pages)
 
-            self.load_search_suggestions()
+            if self.startup_trace:
+                self.startup_trace.mark("Первые страницы рецептов")
+                self.startup_trace.report()
+                self.startup_trace = None
 
         except Exception as e:
             self.show_error_message(f"Ошибка загрузки рецептов: {str(e)}")
 
-    def display_recipes_by_category(self, grouped_recipes):
-        """Отображает рецепты, сгруппированные по категориям"""
-        self.clear_recipe_container()
-
-        if not grouped_recipes:
-            self.show_no_recipes_message()
-            return
-
+    def order_categories(self, categories):
+        """Упорядочивает категории: сначала приоритетные, затем остальные по алфавиту"""
         priority_categories = [
             "Салаты",
             "Десерты",
@@ -1168,93 +1588,80 @@ class MainWindow(QMainWindow):
             "Соусы"
         ]
 
-        total_recipes = 0
-
-        # Сначала показываем приоритетные категории в заданном порядке
-        for category in priority_categories:
-            if category in grouped_recipes and grouped_recipes[category]:
-                recipes = grouped_recipes[category]
-                total_recipes += len(recipes)
-                self.create_category_section(category, recipes)
-                # Удаляем категорию из grouped_recipes, чтобы не показывать её дважды
-                del grouped_recipes[category]
-
-        # Затем показываем оставшиеся категории в алфавитном порядке
-        other_categories = sorted(grouped_recipes.keys())
-        for category in other_categories:
-            if grouped_recipes[category]:
-                recipes = grouped_recipes[category]
-                total_recipes += len(recipes)
-                self.create_category_section(category, recipes)
-
-        self.recipes_container_layout.addStretch()
+        ordered = [category for category in priority_categories if category in categories]
+        ordered += sorted(category for category in categories if category not in priority_categories)
+        return ordered
 
-    def create_category_section(self, category, recipes):
-        """Создает секцию для категории с рецептами"""
-        category_section = QWidget()
-        category_section.setStyleSheet("""
-            QWidget {
-                background-color: transparent;
-                border: none;
-            }
-        """)
-
-        category_layout = QVBoxLayout(category_section)
-        category_layout.setContentsMargins(0, 0, 0, 0)
-        category_layout.setSpacing(10)
+    def update_filter_facets(self, facets):
+        """Показывает рядом с вариантами фильтров, сколько рецептов они дадут.
 
-        # Заголовок категории
-        header = QLabel(f"{self.get_category_icon(category)} {category} ({len(recipes)})")
-        header.setStyleSheet("""
-            QLabel {
-                font-size: 18px;
-                font-weight: bold;
-                color: #2c3e50;
-                padding: 10px 15px;
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 rgba(52, 152, 219, 0.1), 
-                    stop:1 rgba(46, 204, 113, 0.1));
-                border-radius: 8px;
-                border-left: 4px solid #3498db;
-            }
-        """)
-        category_layout.addWidget(header)
-
-        # Контейнер для карточек этой категории
-        cards_container = QWidget()
-        cards_container.setStyleSheet("""
-            QWidget {
-                background-color: transparent;
-                border: none;
-            }
-        """)
+        Варианты без рецептов отключаются, кроме выбранного сейчас, чтобы
+        выбор можно было снять.
+        """
+        def set_item(combo, index, text, count):
+            combo.setItemText(index, f"{text} ({count})")
+            item = combo.model().item(index)
+            if item is not None:
+                item.setEnabled(bool(count) or index == combo.currentIndex())
+
+        cuisine_total = sum(facets['cuisine'].values())
+        self.cuisine_filter.setItemText(0, f"Любая кухня ({cuisine_total})")
+        for index in range(1, self.cuisine_filter.count()):
+            cuisine = self.cuisine_filter.itemData(index)
+            set_item(self.cuisine_filter, index, cuisine, facets['cuisine'].get(cuisine, 0))
+
+        self.time_filter.setItemText(0, f"Любое ({facets['time'][None]})")
+        for index in range(1, self.time_filter.count()):
+            minutes = self.time_filter.itemData(index)
+            set_item(self.time_filter, index, f"{minutes} мин", facets['time'].get(minutes, 0))
+
+        self.favorites_only.setText(f"Только избранное ({facets['favorites']})")
+        self.cooked_only.setText(f"Только приготовленные ({facets['cooked']})")
+
+    def display_category_sections(self, category_counts, filters, first_pages):
+        """Создает секции категорий и заполняет их уже загруженными первыми страницами"""
+        self.clear_recipe_container()
 
-        # Используем FlowLayout для карточек
-        flow_layout = FlowLayout(cards_container, margin=15, h_spacing=15, v_spacing=15)
-        cards_container.setLayout(flow_layout)
+        categories = [category for category, count in category_counts.items() if count]
+        if not categories:
+            self.show_no_recipes_message()
+            return
 
-        # Добавляем карточки
-        for recipe in recipes:
-            card = RecipeCard(recipe, self.db, self)
-            flow_layout.addWidget(card)
-            self.current_recipe_cards.append(card)
+        for category in self.order_categories(categories):
+            section = RecipeCategorySection(
+                category, category_counts[category], filters, self, self.RECIPES_PAGE_SIZE,
+                self.query_runner.generation
+            )
+            recipes, cursor = first_pages.get(category, ([], None))
+            section.add_page(recipes, cursor)
+            self.category_sections.append(section)
+            self.recipes_container_layout.addWidget(section)
 
-        category_layout.addWidget(cards_container)
+        self.recipes_container_layout.addStretch()
 
-        # Добавляем разделитель между категориями
-        separator = QFrame()
-        separator.setFrameShape(QFrame.Shape.HLine)
-        separator.setStyleSheet("""
-            QFrame {
-                background-color: #dee2e6;
-                max-height: 1px;
-                margin: 20px 0;
-            }
-        """)
-        category_layout.addWidget(separator)
+    def load_more_recipes_if_needed(self, *args):
+        """Подгружает следующую страницу в секцию, нижний край которой показался в области прокрутки"""
+        viewport = self.recipes_scroll.viewport()
+        for section in self.category_sections:
+            if section.has_more and not section.loading and section.is_near_viewport_bottom(viewport):
+                section.load_next_page()
+                break
+
+    def on_recipe_page_loaded(self, section, page):
+        """Добавляет в секцию пришедшую следующую страницу рецептов"""
+        if section not in self.category_sections:
+            # Секции уже убраны с экрана (например, сообщением об ошибке)
+            return
+        recipes, cursor = page
+        section.add_page(recipes, cursor)
+        # Если край секции и после раскладки новых карточек виден, подгружаем дальше, не дожидаясь прокрутки
+        QTimer.singleShot(0, self.load_more_recipes_if_needed)
 
-        # Добавляем всю секцию в основной контейнер
-        self.recipes_container_layout.addWidget(category_section)
+    def on_recipe_page_failed(self, section, message):
+        if section not in self.category_sections:
+            return
+        section.loading = False
+        self.show_error_message(f"Ошибка загрузки рецептов: {message}")
 
     def get_category_icon(self, category):
         icons = {
@@ -1282,6 +1689,7 @@ class MainWindow(QMainWindow):
                     widget.setParent(None)
 
         self.current_recipe_cards = []
+        self.category_sections = []
 
     def show_no_recipes_message(self):
         """Показывает сообщение об отсутствии рецептов"""
@@ -1434,14 +1842,16 @@ class MainWindow(QMainWindow):
         try:
             cuisines = self.db.get_cuisines()
             self.cuisine_filter.clear()
-            self.cuisine_filter.addItem("Любая кухня")
+            self.cuisine_filter.addItem("Любая кухня", None)
 
             for cuisine_id, cuisine_name in cuisines:
-                self.cuisine_filter.addItem(cuisine_name)
+                self.cuisine_filter.addItem(cuisine_name, cuisine_name)
 
         except Exception:
-            self.cuisine_filter.addItems(["Любая кухня", "Русская", "Итальянская", "Японская",
-                                          "Китайская", "Мексиканская", "Французская", "Американская"])
+            self.cuisine_filter.addItem("Любая кухня", None)
+            for cuisine in ["Русская", "Итальянская", "Японская", "Китайская",
+                            "Мексиканская", "Французская", "Американская"]:
+                self.cuisine_filter.addItem(cuisine, cuisine)
 
     def logout(self):
         """ Обрабатывает выход пользователя """
@@ -1453,6 +1863,16 @@ class MainWindow(QMainWindow):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
+            self.drop_recipe_similarity()
+            self.db.set_recipe_catalog(None)
+            if self.change_watcher is not None:
+                self.change_watcher.stop()
+            if self.image_maintenance is not None:
+                self.image_maintenance.stop()
+            if self.ingredient_pairings is not None:
+                self.db.remove_recipe_listener(self.on_recipe_ingredients_changed)
+            if self.nutrition_pool is not None:
+                self.db.remove_recipe_listener(self.on_recipe_nutrition_changed)
             self.logout_callback()
 
     def clear_recipe_cards(self):
@@ -1482,14 +1902,28 @@ class MainWindow(QMainWindow):
             self.clear_recipe_cards()
             self.flow_layout.addWidget(container)
 
+    def on_favorite_changed(self, recipe_id, favorite):
+        """Синхронизирует карточки рецепта после изменения избранного."""
+        for card in self.current_recipe_cards:
+            if card.recipe_data[0] == recipe_id:
+                card.set_favorite_status(favorite)
+
+    def on_cooked_changed(self, recipe_id, cooked):
+        """Синхронизирует карточки рецепта после изменения отметки приготовления."""
+        for card in self.current_recipe_cards:
+            if card.recipe_data[0] == recipe_id:
+                card.set_cooked_status(cooked)
+
     def update_profile(self):
-        """Обновляет данные профиля пользователя."""
-        if hasattr(self, 'profile_widget'):
+        """Обновляет данные профиля пользователя (если вкладка профиля уже создана)."""
+        if self.profile_widget is not None:
             self.profile_widget.update_profile()
 
     def open_settings(self):
         """Открывает диалог настроек приложения."""
         try:
+            from src.modules.settings_dialog import SettingsDialog
+
             dialog = SettingsDialog(self.db, self.user_id, self)
             dialog.settings_updated.connect(self.apply_settings)
             dialog.exec()
@@ -1514,58 +1948,7 @@ class MainWindow(QMainWindow):
     def update_styles(self, font_size=10, title_font_size=14):
         """Обновляет стили приложения с новыми размерами шрифтов."""
         try:
-            base_style = f"""
-                QMainWindow {{
-                    background-color: #f8f9fa;          
-                }}
-                QWidget {{
-                    font-family: 'Segoe UI', Arial, sans-serif;  
-                    font-size: {font_size}px;                    
-                }}
-                QTabWidget::pane {{
-                    border: 1px solid #dee2e6;          
-                    background-color: white;            
-                    border-radius: 8px;                 
-                }}
-                QTabBar::tab {{
-                    background-color: #e9ecef;          
-                    color: #495057;                     
-                    padding: 8px 16px;                  
-                    margin-right: 2px;                  
-                    border-top-left-radius: 4px;        
-                    border-top-right-radius: 4px;       
-                    font-size: {font_size}px;           
-                }}
-                QTabBar::tab:selected {{
-                    background-color: white;            
-                    color: #495057;                     
-                    border-bottom: 2px solid #007bff;   
-                }}
-                QPushButton {{
-                    background-color: #007bff;          
-                    color: white;                       
-                    border: none;                       
-                    padding: 8px 16px;                  
-                    border-radius: 4px;                 
-                    font-weight: 500;                  
-                    font-size: {font_size}px;           
-                }}
-                QPushButton:hover {{
-                    background-color: #0056b3;          
-                }}
-                QLabel {{
-                    font-size: {font_size}px;          
-                }}
-                QLineEdit, QTextEdit, QSpinBox, QComboBox {{
-                    font-size: {font_size}px;           
-                    padding: 6px;                       
-                }}
-                .header {{
-                    font-size: {title_font_size}px;     
-                    font-weight: bold;                  
-                }}
-            """
-            self.setStyleSheet(base_style)
+            apply_theme(self, font_size, title_font_size)
 
         except Exception as e:
             print(f"Ошибка обновления стилей: {e}")
@@ -1573,6 +1956,8 @@ class MainWindow(QMainWindow):
     def open_help(self):
         """Открывает диалог справки приложения."""
         try:
+            from src.modules.help_dialog import HelpDialog
+
             # Создаем диалог справки
             dialog = HelpDialog(self)
             dialog.exec()  # Показываем диалог
@@ -1586,16 +1971,22 @@ class MainWindow(QMainWindow):
 
     def refresh_data(self):
         """Обновляет все данные приложения (рецепты, профиль, корзину)."""
+        self.invalidate_pantry_index()
+        self.drop_recipe_similarity()
         self.load_recipes()
+        self.load_search_suggestions()
+        self.session_state.reload()
         self.update_profile()
-        if hasattr(self, 'cart_widget'):
-            self.cart_widget.update_cart()
 
     def add_recipe(self):
         """Открывает диалог добавления нового рецепта и обновляет автодополнение"""
         try:
+            from src.modules.recipe_dialog import RecipeDialog
+
             dialog = RecipeDialog(self.db, self.user_id)
+            dialog.recipe_saved.connect(self.invalidate_pantry_index)
             dialog.recipe_saved.connect(self.load_recipes)
+            dialog.recipe_saved.connect(self.load_search_suggestions)
             dialog.recipe_saved.connect(self.update_profile)
             dialog.exec()
         except Exception as e:
@@ -1605,8 +1996,19 @@ class MainWindow(QMainWindow):
     def view_recipe(self, recipe_data):
         """Открывает диалог просмотра рецепта в виде карточки."""
         try:
-            dialog = RecipeCardDialog(recipe_data, self.db, self.user_id)
+            from src.modules.recipe_dialog import RecipeCardDialog
+
+            try:
+                similarity = self.get_recipe_similarity()
+            except Exception as e:
+                # Без NumPy или при ошибке построения карточка открывается без похожих рецептов
+                print(f"Похожие рецепты недоступны: {e}")
+                similarity = None
+
+            dialog = RecipeCardDialog(recipe_data, self.db, self.user_id, self.session_state, similarity)
             dialog.add_to_cart.connect(self.add_to_cart)
+            dialog.recipe_selected.connect(self.view_recipe)
+            dialog.recipe_updated.connect(self.invalidate_pantry_index)
             dialog.recipe_updated.connect(self.load_recipes)
             dialog.recipe_deleted.connect(self.on_recipe_deleted)
             dialog.exec()
@@ -1616,19 +2018,19 @@ class MainWindow(QMainWindow):
 
     def on_recipe_deleted(self, recipe_id):
         """Обработчик удаления рецепта."""
+        self.invalidate_pantry_index()
         self.load_recipes()
+        self.load_search_suggestions()
         self.update_profile()
         QMessageBox.information(self, "Успех", "Рецепт успешно удален!")
 
     def add_to_cart(self, ingredients):
         """Добавляет ингредиенты в корзину."""
-        if hasattr(self, 'cart_widget'):
-            self.cart_widget.add_to_cart(ingredients)
+        self.ensure_cart_widget().add_to_cart(ingredients)
 
     def export_cart(self):
         """Экспортирует список покупок в текстовый файл."""
-        if hasattr(self, 'cart_widget'):
-            self.cart_widget.export_cart()
+        self.ensure_cart_widget().export_cart()
 
     def update_stats(self):
         """Обновление статистики (псевдоним для update_profile)."""
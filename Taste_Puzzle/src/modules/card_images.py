@@ -0,0 +1,193 @@
+import os
+from collections import OrderedDict
+
+from PyQt6.QtCore import QObject, QRect, QSize, QThreadPool, Qt
+from PyQt6.QtGui import QImageReader, QPixmap
+
+from src.modules.image_processing import backfill_placeholders, placeholder_image
+from src.modules.recipe_query_worker import QueryTask
+from src.modules.thumbnail_pack import ThumbnailPack, pack_image
+
+
+# Размер области изображения в карточке рецепта
+CARD_IMAGE_SIZE = QSize(248, 148)
+# Каталог внутри img/recipe_img с файлом миниатюр (проверка изображений смотрит только файлы корня)
+THUMBNAILS_DIR = 'thumbs'
+
+
+def decode_card_image(file_path, size=CARD_IMAGE_SIZE):
+    """Читает файл сразу в размере карточки: уменьшение идет при декодировании (JPEG
+    декодируется в 1/2-1/8 размера), лишнее по краям обрезается. QImage или None"""
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    source = reader.size()
+    if source.isValid():
+        scaled = source.scaled(size, Qt.AspectRatioMode.KeepAspectRatioByExpanding)
+        reader.setScaledSize(scaled)
+        reader.setScaledClipRect(QRect((scaled.width() - size.width()) // 2,
+                                       (scaled.height() - size.height()) // 2, size.width(), size.height()))
+    image = reader.read()
+    return None if image.isNull() else image
+
+
+def decode_card_thumbnail(file_path, size=CARD_IMAGE_SIZE):
+    """decode_card_image, сразу приведенное к формату файла миниатюр"""
+    return pack_image(decode_card_image(file_path, size))
+
+
+def decode_recipe_thumbnail(db, path):
+    """decode_card_thumbnail по значению Recipes.image (у удаленной базы файл может скачиваться)"""
+    return decode_card_thumbnail(db.image_file_path(path))
+
+
+class CardImageLoader(QObject):
+    """Изображения карточек рецептов: заглушка сразу, картинка - после фонового декодирования.
+
+    Заглушка (сетка средних цветов из списка рецептов) растягивается до
+    размера карточки за микросекунды, поэтому карточки выглядят заполненными
+    с первой отрисовки. Файлы декодируются в пуле потоков как QImage; один
+    файл декодируется один раз, даже если его ждут несколько карточек, и
+    последние CACHE_SIZE картинок хранятся готовыми QPixmap.
+
+    Декодированные картинки дописываются в файл миниатюр (ThumbnailPack), и
+    при следующих показах берутся оттуда синхронно - из отображенной в
+    память области, без чтения файлов и декодирования.
+    """
+
+    THREADS = 2
+    CACHE_SIZE = 100
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.THREADS)
+
+        self.pixmaps = OrderedDict()  # путь -> QPixmap (LRU)
+        self.placeholders = OrderedDict()  # (заглушка, ширина, высота) -> QPixmap
+        self.waiting = {}  # путь -> карточки, ожидающие декодирования
+        self.tasks = {}  # номер запроса -> (путь, задача)
+        self.request_number = 0
+        self.backfill_task = None
+        self.prune_task = None
+
+        try:
+            size = CARD_IMAGE_SIZE
+            self.pack = ThumbnailPack(os.path.join(db.images_dir(), THUMBNAILS_DIR,
+                                                   f"card-{size.width()}x{size.height()}"))
+        except OSError as e:
+            print(f"Файл миниатюр недоступен, изображения будут декодироваться из файлов: {e}")
+            self.pack = None
+
+    def placeholder_pixmap(self, code, size=CARD_IMAGE_SIZE):
+        """Заглушка, растянутая до size; None, если заглушки нет"""
+        key = (code, size.width(), size.height())
+        pixmap = self.placeholders.get(key)
+        if pixmap is None:
+            image = placeholder_image(code)
+            if image is None:
+                return None
+            # Сглаживание при растяжении сетки 4×3 дает плавный размытый градиент
+            pixmap = QPixmap.fromImage(image.scaled(size, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                    Qt.TransformationMode.SmoothTransformation))
+            self._remember(self.placeholders, key, pixmap)
+        return pixmap
+
+    def request(self, card, path):
+        """Загружает изображение path для карточки: card.set_image(QPixmap) будет вызван
+        сразу (если картинка в кэше) или после декодирования, card.show_text_placeholder() -
+        если файл не читается"""
+        if not path:
+            return
+        pixmap = self.pixmaps.get(path)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(path)
+            card.set_image(pixmap)
+            return
+        if self.pack is not None and path in self.pack:
+            # Отображенные байты копируются в QPixmap сразу, пока файл не дописан
+            pixmap = QPixmap.fromImage(self.pack.image(path))
+            self._remember(self.pixmaps, path, pixmap)
+            card.set_image(pixmap)
+            return
+        if path in self.waiting:
+            self.waiting[path].append(card)
+            return
+
+        self.waiting[path] = [card]
+        self.request_number += 1
+        task = QueryTask(self.request_number, decode_recipe_thumbnail, (self.db, path), {})
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self._on_decoded)
+        task.signals.failed.connect(self._on_failed)
+        self.tasks[self.request_number] = (path, task)
+        self.pool.start(task)
+
+    def start_placeholder_backfill(self):
+        """Досчитывает в фоне заглушки рецептов, у которых их еще нет"""
+        if self.backfill_task is not None:
+            return
+        self.backfill_task = QueryTask(0, backfill_placeholders, (self.db,), {})
+        self.backfill_task.setAutoDelete(False)
+        self.backfill_task.signals.finished.connect(self._on_backfill_done)
+        self.backfill_task.signals.failed.connect(self._on_backfill_done)
+        self.pool.start(self.backfill_task, -1)  # после декодирования видимых карточек
+
+    def _on_decoded(self, number, image):
+        path, _ = self.tasks.pop(number)
+        pixmap = QPixmap.fromImage(image) if image is not None else None
+        if pixmap is not None:
+            self._remember(self.pixmaps, path, pixmap)
+            if self.pack is not None:
+                try:
+                    self.pack.put(path, image)
+                except OSError as e:
+                    print(f"Ошибка записи миниатюры {path}: {e}")
+        self._deliver(path, pixmap)
+
+    def _on_failed(self, number, message):
+        path, _ = self.tasks.pop(number)
+        print(f"Ошибка загрузки изображения {path}: {message}")
+        self._deliver(path, None)
+
+    def _deliver(self, path, pixmap):
+        """Передает картинку ждавшим ее карточкам; без картинки они показывают текстовую заглушку"""
+        for card in self.waiting.pop(path, []):
+            try:
+                if pixmap is not None:
+                    card.set_image(pixmap)
+                else:
+                    card.show_text_placeholder()
+            except RuntimeError:
+                # Карточку удалили, пока файл декодировался
+                pass
+
+    def _on_backfill_done(self, generation, result):
+        self.backfill_task = None
+        if isinstance(result, int) and result:
+            print(f"Заглушки изображений рассчитаны для {result} файлов")
+        self.start_pack_prune()
+
+    def start_pack_prune(self):
+        """Ищет в фоне миниатюры изображений, на которые больше нет ссылок, и удаляет их из индекса"""
+        if self.pack is None or self.prune_task is not None or not len(self.pack):
+            return
+        self.prune_task = QueryTask(0, self.db.get_referenced_images, (self.pack.keys(),), {})
+        self.prune_task.setAutoDelete(False)
+        self.prune_task.signals.finished.connect(self._on_prune_done)
+        self.prune_task.signals.failed.connect(self._on_prune_failed)
+        self.pool.start(self.prune_task, -1)
+
+    def _on_prune_done(self, generation, referenced):
+        keys = self.prune_task.args[0]
+        self.prune_task = None
+        self.pack.discard(set(keys) - referenced)
+
+    def _on_prune_failed(self, generation, message):
+        self.prune_task = None
+        print(f"Ошибка проверки миниатюр: {message}")
+
+    def _remember(self, cache, key, pixmap):
+        cache[key] = pixmap
+        if len(cache) > self.CACHE_SIZE:
+            cache.popitem(last=False)
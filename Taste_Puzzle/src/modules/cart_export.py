@@ -0,0 +1,26 @@
+def format_shopping_list(items):
+    """Текст списка покупок из элементов корзины ({'name', 'quantity', 'unit'}).
+
+    Одинаковые ингредиенты с одной единицей складываются, если количества -
+    числа; иначе остается последнее количество. Не зависит от Qt: используется
+    и окном корзины, и командной строкой.
+    """
+    ingredient_groups = {}
+    for item in items:
+        key = (item['name'], item['unit'])
+        quantity = item['quantity']
+        try:
+            quantity = float(quantity)
+            if isinstance(ingredient_groups.get(key), float):
+                quantity += ingredient_groups[key]
+        except (TypeError, ValueError):
+            pass
+        ingredient_groups[key] = quantity
+
+    lines = ["Список покупок:", "=" * 50, ""]
+    for (name, unit), total_quantity in ingredient_groups.items():
+        if isinstance(total_quantity, float):
+            lines.append(f"• {name}: {total_quantity:.1f} {unit}")
+        else:
+            lines.append(f"• {name}: {total_quantity} {unit}")
+    return "\n".join(lines) + "\n"
@@ -5,6 +5,9 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QColor
 
+from src.modules.cart_export import format_shopping_list
+from src.modules.session_state import SessionState
+
 
 class CartItemWidget(QWidget):
     """Виджет для отображения элемента корзины с чекбоксом"""
@@ -173,15 +176,23 @@ class CartWidget(QWidget):
 
     add_to_cart_signal = pyqtSignal(list)
 
-    def __init__(self, db, user_id, main_window):
+    def __init__(self, db, user_id, main_window, session_state=None):
         super().__init__()
         self.db = db
         self.user_id = user_id
         self.main_window = main_window
-        self.cart = []
+
+        # Корзина хранится в общем состоянии сессии; виджет только отображает ее
+        self.session_state = session_state or SessionState(db, user_id, self)
+        self.session_state.cart_changed.connect(self.update_display)
+        self.session_state.reloaded.connect(self.update_display)
 
         self.init_ui()
-        self.update_cart()
+        self.update_display()
+
+    @property
+    def cart(self):
+        return self.session_state.cart
 
     def init_ui(self):
         """Инициализация пользовательского интерфейса корзины"""
@@ -247,8 +258,8 @@ class CartWidget(QWidget):
     def update_cart(self):
         """Обновляет корзину из базы данных"""
         try:
-            self.cart = self.db.get_cart_items(self.user_id)
-            self.update_display()
+            # Состояние сессии перечитает данные и вызовет update_display по сигналу
+            self.session_state.reload()
         except Exception as e:
             print(f"Ошибка обновления корзины: {e}")
 
@@ -297,11 +308,6 @@ class CartWidget(QWidget):
         if dialog.exec() == QDialog.DialogCode.Accepted:
             ingredient_data = dialog.get_ingredient_data()
             if ingredient_data:
-                self.cart.append({
-                    'name': ingredient_data['name'],
-                    'quantity': ingredient_data['quantity'],
-                    'unit': ingredient_data['unit']
-                })
                 self.add_to_cart([(
                     ingredient_data['name'],
                     ingredient_data['quantity'],
@@ -311,18 +317,9 @@ class CartWidget(QWidget):
     def add_to_cart(self, ingredients):
         """Добавляет ингредиенты в корзину"""
         try:
-            success_count = 0
-            for name, quantity, unit in ingredients:
-                success = self.db.add_cart_item(
-                    self.user_id, name, quantity, unit
-                )
-                if success:
-                    success_count += 1
+            success_count = self.session_state.add_cart_items(ingredients)
 
             if success_count > 0:
-                self.update_cart()
-                if self.main_window and hasattr(self.main_window, 'update_profile'):
-                    self.main_window.update_profile()
                 QMessageBox.information(self, "Успех", f"Добавлено {success_count} ингредиентов в корзину!")
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось добавить ингредиенты в корзину")
@@ -344,11 +341,8 @@ class CartWidget(QWidget):
                     })
 
             if items_to_remove:
-                success = self.db.remove_cart_items(self.user_id, items_to_remove)
+                success = self.session_state.remove_cart_items(items_to_remove)
                 if success:
-                    self.update_cart()
-                    if self.main_window and hasattr(self.main_window, 'update_profile'):
-                        self.main_window.update_profile()
                     QMessageBox.information(self, "Успех", f"Удалено {len(items_to_remove)} ингредиентов")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось удалить элементы из корзины")
@@ -374,12 +368,8 @@ class CartWidget(QWidget):
             )
 
             if reply == QMessageBox.StandardButton.Yes:
-                success = self.db.clear_cart(self.user_id)
+                success = self.session_state.clear_cart()
                 if success:
-                    self.cart = []
-                    self.update_display()
-                    if self.main_window and hasattr(self.main_window, 'update_profile'):
-                        self.main_window.update_profile()
                     QMessageBox.information(self, "Успех", "Корзина очищена!")
                 else:
                     QMessageBox.warning(self, "Ошибка", "Не удалось очистить корзину")
@@ -400,31 +390,7 @@ class CartWidget(QWidget):
 
             if file_name:
                 with open(file_name, 'w', encoding='utf-8') as f:
-                    f.write("Список покупок:\n")
-                    f.write("=" * 50 + "\n\n")
-
-                    ingredient_groups = {}
-                    for item in self.cart:
-                        name = item['name']
-                        quantity = item['quantity']
-                        unit = item['unit']
-                        key = (name, unit)
-                        if key in ingredient_groups:
-                            try:
-                                ingredient_groups[key] += float(quantity)
-                            except:
-                                ingredient_groups[key] = quantity
-                        else:
-                            try:
-                                ingredient_groups[key] = float(quantity)
-                            except:
-                                ingredient_groups[key] = quantity
-
-                    for (name, unit), total_quantity in ingredient_groups.items():
-                        if isinstance(total_quantity, float):
-                            f.write(f"• {name}: {total_quantity:.1f} {unit}\n")
-                        else:
-                            f.write(f"• {name}: {total_quantity} {unit}\n")
+                    f.write(format_shopping_list(self.cart))
 
                 QMessageBox.information(self, "Успех", f"Список сохранен в файл: {file_name}")
 
@@ -0,0 +1,118 @@
+import base64
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+
+
+# Методы DataBase, доступные через сервис каталога (src.modules.catalog_server).
+# Чтение идет по GET и кэшируется по ETag, запись - по POST через одно подключение
+READ_METHODS = frozenset({
+    'get_dish_types', 'get_cuisines', 'get_dish_type_by_name', 'get_cuisine_by_name',
+    'get_categories', 'get_categories_by_type', 'get_dish_types_with_objects', 'get_cuisines_with_objects',
+    'get_recipe_image_path', 'get_recipe_image_bytes', 'get_recipe_by_id', 'get_recipe_details',
+    'is_cooked', 'is_favorite', 'is_recipe_favorite', 'is_recipe_cooked',
+    'get_recipes_with_filters', 'get_recipes_page', 'count_recipes_by_dish_type', 'get_filter_facets',
+    'get_recipe_ingredients', 'get_recipes_ingredients', 'get_recipe_ingredient_pairs', 'get_recipe_names',
+    'get_cart_items', 'get_user_profile', 'get_ingredients',
+    'get_favorite_recipe_ids', 'get_favorite_recipes', 'get_cooked_recipe_ids', 'get_cooked_recipes',
+    'search_recipes', 'get_recommender_status', 'get_interactions',
+    'get_ingredient_cooccurrence', 'get_ingredient_frequencies', 'has_ingredient_pairings',
+    'get_ingredient_suggestions', 'get_ingredient_nutrition', 'get_recipe_quantities', 'get_recipe_servings',
+    'get_recipes_without_nutrition', 'get_recipe_catalog_rows', 'get_recipe_scores',
+    'get_referenced_images',
+})
+WRITE_METHODS = frozenset({
+    'add_recipe', 'update_recipe', 'update_recipe_details', 'delete_recipe',
+    'add_to_favorites', 'remove_from_favorites', 'mark_as_cooked', 'toggle_favorite', 'set_favorite',
+    'mark_recipe_as_cooked',
+    'add_cart_item', 'add_cart_items', 'remove_cart_items', 'clear_cart',
+    'register_user', 'add_ingredient', 'import_recipes',
+    'save_recipe_scores', 'replace_ingredient_pairings', 'save_computed_nutrition',
+})
+# Методы с паролями в аргументах: идут по POST (не попадают в строку запроса и журнал
+# доступа), выполняются экземпляром для чтения и никогда не кэшируются
+AUTH_METHODS = frozenset({'authenticate_user'})
+
+# Ключ, по которому в JSON отличаются значения, не представимые в нем напрямую
+TYPE_KEY = '$t'
+
+
+class RemoteRecord(SimpleNamespace):
+    """Объект модели, полученный от сервиса: столбцы и загруженные связи как атрибуты"""
+
+
+def encode(value):
+    """Приводит результат или аргументы метода DataBase к виду, пригодному для json.
+
+    Кортежи становятся списками, множества, даты, байты и словари с
+    нестроковыми ключами - объектами с TYPE_KEY, объекты моделей - словарем
+    столбцов и уже загруженных связей (незагруженные связи не передаются).
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and TYPE_KEY not in value:
+            return {key: encode(item) for key, item in value.items()}
+        return {TYPE_KEY: 'map', 'items': [[encode(key), encode(item)] for key, item in value.items()]}
+    if isinstance(value, (set, frozenset)):
+        return {TYPE_KEY: 'set', 'items': [encode(item) for item in value]}
+    if isinstance(value, datetime):
+        return {TYPE_KEY: 'datetime', 'value': value.isoformat()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {TYPE_KEY: 'bytes', 'value': base64.b64encode(bytes(value)).decode('ascii')}
+    if hasattr(value, '__table__'):
+        return _encode_record(value)
+    if hasattr(value, 'item'):
+        return value.item()  # скаляры NumPy
+    raise TypeError(f"Значение типа {type(value).__name__} не передается через сервис каталога")
+
+
+def _encode_record(record, depth=1):
+    state = inspect(record)
+    fields = {attr.key: encode(getattr(record, attr.key)) for attr in state.mapper.column_attrs}
+    if depth > 0:
+        for relationship in state.mapper.relationships:
+            # Только связи, загруженные до закрытия сессии (joinedload), и только один уровень
+            if relationship.key in state.dict and not relationship.uselist:
+                related = state.dict[relationship.key]
+                fields[relationship.key] = None if related is None else _encode_record(related, depth - 1)
+    return {TYPE_KEY: 'record', 'model': type(record).__name__, 'fields': fields}
+
+
+def decode(value):
+    """Обратное преобразование encode: объекты моделей становятся RemoteRecord"""
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get(TYPE_KEY)
+    if kind is None:
+        return {key: decode(item) for key, item in value.items()}
+    if kind == 'map':
+        return {_key(decode(key)): decode(item) for key, item in value['items']}
+    if kind == 'set':
+        return {_key(decode(item)) for item in value['items']}
+    if kind == 'datetime':
+        return datetime.fromisoformat(value['value'])
+    if kind == 'bytes':
+        return base64.b64decode(value['value'])
+    if kind == 'record':
+        return RemoteRecord(**{key: decode(item) for key, item in value['fields'].items()})
+    raise ValueError(f"Неизвестный тип значения: {kind}")
+
+
+def _key(value):
+    # Ключи словарей и элементы множеств были кортежами: списки снова делаются кортежами
+    return tuple(_key(item) for item in value) if isinstance(value, list) else value
+
+
+def dumps(value):
+    return json.dumps(encode(value), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    return decode(json.loads(data))
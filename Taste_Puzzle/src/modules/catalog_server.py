@@ -0,0 +1,328 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from src.database import DataBase
+from src.modules.catalog_protocol import AUTH_METHODS, READ_METHODS, WRITE_METHODS, dumps, loads
+
+
+API_PREFIX = '/api/'
+IMAGES_PREFIX = '/images/'
+# Готовые ответы на чтение: пока данные не менялись, повторный запрос не доходит до SQLite
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+# Ответы больше этого размера (каталог целиком и т. п.) не кэшируются
+RESPONSE_CACHE_MAX_ITEM = 4 * 1024 * 1024
+
+
+class CatalogServer(ThreadingHTTPServer):
+    """HTTP/JSON сервис над DataBase для нескольких терминалов с одним каталогом.
+
+    GET /api/<метод>?q=<json {"args": [...], "kwargs": {...}}> - методы чтения
+    (READ_METHODS): выполняются параллельно, каждый поток берет подключение из
+    пула отдельного экземпляра DataBase. Ответ несет ETag - хэш тела, и на
+    запрос с совпадающим If-None-Match приходит 304 без тела.
+
+    POST /api/<метод> из AUTH_METHODS (вход по логину и паролю) выполняется
+    экземпляром для чтения без кэша: пароль не попадает ни в строку запроса,
+    ни в журнал доступа, ни в кэш ответов.
+
+    POST /api/<метод> с телом {"args": [...], "kwargs": {...}} - методы записи
+    (WRITE_METHODS): идут по одному через единственный экземпляр DataBase для
+    записи, так что SQLite не видит конкурирующих писателей. В ответе, кроме
+    результата, - уведомления подписчиков DataBase, вызванные этой записью
+    (changes): клиент повторяет их у своих подписчиков.
+
+    GET /images/<путь из Recipes.image> - файлы изображений с ETag (для
+    хранилища - SHA-256 из имени файла, такие файлы не меняются).
+
+    База переводится в режим WAL: чтение не ждет записи. Кэш ответов
+    сбрасывается при записи через сервис и при изменении файлов базы другими
+    процессами (по времени изменения и размеру файлов). Каталог в памяти
+    получает записи других процессов (приложение, импорт, второй сервис) из
+    журнала изменений перед чтением, если PRAGMA data_version изменилась.
+    Сервис рассчитан на локальную сеть кухни: аутентификации нет.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, db_path=None, verbose=False, prepare=True):
+        # Миграции и подготовка базы (prepare, см. DataBase) - один раз, через экземпляр для записи
+        self.writer = DataBase(db_path, prepare)
+        self.reader = DataBase(self.writer.db_path, prepare=False)
+        with self.writer.engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        self.verbose = verbose
+
+        self.write_lock = threading.Lock()
+        self.write_count = 0
+        self.changes = []  # уведомления текущей записи (под write_lock)
+        self.writer.add_write_listener(self._on_write)
+        self.writer.add_recipe_listener(self._on_recipe_changed)
+        # Записи через сервис каталог получает сразу и не перечитывает из журнала (см. _sync_changes)
+        self.writer.track_own_changes()
+
+        self.cache_lock = threading.Lock()
+        self.responses = OrderedDict()  # метод?запрос -> (версия данных, etag, тело)
+        self.responses_size = 0
+
+        self.catalog = None
+        self.change_lock = threading.Lock()
+        # Журнал изменений читается с позиции до загрузки каталога: записи во время загрузки не теряются
+        self.change_version = self.reader.data_version()
+        self.change_position = self.reader.get_change_log_position()
+        self._attach_recipe_catalog()
+        super().__init__(address, CatalogRequestHandler)
+
+    def _attach_recipe_catalog(self):
+        """Подключает каталог рецептов в памяти к экземпляру для чтения, если доступен NumPy"""
+        try:
+            from src.modules.recipe_catalog import RecipeCatalog
+        except ImportError as e:
+            print(f"Каталог рецептов в памяти недоступен: {e}")
+            return
+        self.catalog = RecipeCatalog.from_database(self.reader)
+        self.reader.set_recipe_catalog(self.catalog)
+        # Запись идет через другой экземпляр: каталог подписывается на его уведомления
+        self.writer.add_write_listener(self.catalog.on_write)
+
+    def _sync_changes(self):
+        """Передает каталогу в памяти записи журнала изменений, сделанные после прошлой проверки"""
+        if self.catalog is None:
+            return
+        with self.change_lock:
+            version = self.reader.data_version()
+            if version == self.change_version:
+                return
+            self.change_version = version
+            while True:
+                changes = self.reader.get_changes_since(self.change_position, self.reader.CHANGE_LOG_BATCH)
+                if changes is None:
+                    # Нужные записи уже удалены очисткой журнала - каталог перечитывается целиком
+                    self.change_position = self.reader.get_change_log_position()
+                    self.catalog.reload_recipes()
+                    return
+                if not changes:
+                    return
+                self.change_position = changes[-1][0]
+                last_batch = len(changes) < self.reader.CHANGE_LOG_BATCH
+                self.reader.notify_logged_changes(self.writer.skip_own_changes(changes))
+                if last_batch:
+                    return
+
+    # ===== ЧТЕНИЕ И ЗАПИСЬ =====
+
+    def data_version(self):
+        """Метка состояния данных: меняется при записи через сервис и при изменении файлов базы"""
+        stamps = [self.write_count]
+        for suffix in ('', '-wal'):
+            try:
+                stat = os.stat(self.reader.db_path + suffix)
+                stamps += [stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                stamps += [0, 0]
+        return '-'.join(map(str, stamps))
+
+    def read(self, method, query):
+        """Ответ на чтение (etag, тело): из кэша, если данные с тех пор не менялись"""
+        key = f"{method}?{query}"
+        self._sync_changes()
+        # Версия берется до запроса: закэшированный ответ не старше своей версии
+        version = self.data_version()
+        with self.cache_lock:
+            cached = self.responses.get(key)
+            if cached is not None and cached[0] == version:
+                self.responses.move_to_end(key)
+                return cached[1], cached[2]
+
+        args, kwargs = parse_call(parse_qs(query).get('q', ['{}'])[0])
+        result = getattr(self.reader, method)(*args, **kwargs)
+        if method == 'get_recipe_image_path' and result:
+            # Клиенту нужен не путь на сервере, а путь для /images/
+            result = os.path.relpath(result, self.reader.images_dir()).replace(os.sep, '/')
+        body = dumps({'result': result})
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+
+        if len(body) <= RESPONSE_CACHE_MAX_ITEM:
+            with self.cache_lock:
+                previous = self.responses.pop(key, None)
+                if previous is not None:
+                    self.responses_size -= len(previous[2])
+                self.responses[key] = (version, etag, body)
+                self.responses_size += len(body)
+                while self.responses_size > RESPONSE_CACHE_BYTES:
+                    _, (_, _, evicted) = self.responses.popitem(last=False)
+                    self.responses_size -= len(evicted)
+        return etag, body
+
+    def write(self, method, args, kwargs):
+        """Выполняет запись через единственное подключение для записи; (результат, уведомления)"""
+        with self.write_lock:
+            self.changes = []
+            try:
+                result = getattr(self.writer, method)(*args, **kwargs)
+            finally:
+                self.write_count += 1
+                changes, self.changes = self.changes, []
+        return result, changes
+
+    def _on_write(self, table, recipe_ids, user_id):
+        self.changes.append(['write', table, recipe_ids, user_id])
+
+    def _on_recipe_changed(self, recipe_id, ingredient_ids, previous_ids):
+        self.changes.append(['recipe', recipe_id, ingredient_ids, previous_ids])
+
+    def image_file(self, path):
+        """Абсолютный путь к файлу изображения внутри каталога изображений; None - если вне его"""
+        root = os.path.realpath(self.reader.images_dir())
+        full_path = os.path.realpath(os.path.join(root, *path.split('/')))
+        if not full_path.startswith(root + os.sep) or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+
+def parse_call(data):
+    """Аргументы вызова из JSON {"args": [...], "kwargs": {...}}"""
+    call = loads(data)
+    if not isinstance(call, dict):
+        raise ValueError("Ожидается объект с args и kwargs")
+    return call.get('args', []), call.get('kwargs', {})
+
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: подключение клиента переиспользуется между запросами
+    protocol_version = 'HTTP/1.1'
+    server_version = 'TastePuzzleCatalog/1'
+    # Заголовки и тело уходят отдельными записями: без TCP_NODELAY второй пакет ждет ACK (~40 мс)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith(API_PREFIX):
+            self._read(url.path[len(API_PREFIX):], url.query)
+        elif url.path.startswith(IMAGES_PREFIX):
+            self._image(unquote(url.path[len(IMAGES_PREFIX):]))
+        elif url.path == '/health':
+            self._send(200, dumps({'version': self.server.data_version(), 'busy': self.server.writer.get_busy_metrics()}))
+        else:
+            self._send_error(404, f"Нет ресурса {url.path}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        method = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else None
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if method in AUTH_METHODS:
+            self._authenticate(method, body)
+            return
+        if method not in WRITE_METHODS:
+            self._send_error(404, f"Нет метода записи {method}")
+            return
+        try:
+            args, kwargs = parse_call(body)
+        except ValueError as e:
+            self._send_error(400, f"Некорректный запрос: {e}")
+            return
+        try:
+            result, changes = self.server.write(method, args, kwargs)
+        except Exception as e:
+            self._send_error(500, f"Ошибка {method}: {e}")
+            return
+        self._send(200, dumps({'result': result, 'changes': changes}))
+
+    def _authenticate(self, method, body):
+        try:
+            args, kwargs = parse_call(body)
+        except ValueError as e:
+            self._send_error(400, f"Некорректный запрос: {e}")
+            return
+        try:
+            result = getattr(self.server.reader, method)(*args, **kwargs)
+        except Exception as e:
+            self._send_error(500, f"Ошибка {method}: {e}")
+            return
+        self._send(200, dumps({'result': result}), headers={'Cache-Control': 'no-store'})
+
+    def _read(self, method, query):
+        if method not in READ_METHODS:
+            self._send_error(404, f"Нет метода чтения {method}")
+            return
+        try:
+            etag, body = self.server.read(method, query)
+        except ValueError as e:
+            self._send_error(400, f"Некорректный запрос: {e}")
+            return
+        except Exception as e:
+            self._send_error(500, f"Ошибка {method}: {e}")
+            return
+        self._send_conditional(etag, body, 'application/json; charset=utf-8', 'no-cache')
+
+    def _image(self, path):
+        full_path = self.server.image_file(path)
+        if full_path is None:
+            self._send_error(404, f"Нет изображения {path}")
+            return
+        stat = os.stat(full_path)
+        if path.startswith(DataBase.IMAGE_STORE_DIR + '/'):
+            # Имя файла в хранилище - SHA-256 содержимого: файл по этому пути не меняется
+            etag = '"%s"' % os.path.splitext(os.path.basename(full_path))[0]
+            cache_control = 'max-age=31536000, immutable'
+        else:
+            etag = '"%x-%x"' % (stat.st_size, stat.st_mtime_ns)
+            cache_control = 'no-cache'
+        if self._not_modified(etag):
+            self._send_not_modified(etag, cache_control)
+            return
+        with open(full_path, 'rb') as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        self._send(200, body, content_type, {'ETag': etag, 'Cache-Control': cache_control})
+
+    # ===== ОТВЕТЫ =====
+
+    def _not_modified(self, etag):
+        header = self.headers.get('If-None-Match')
+        return header is not None and (header.strip() == '*' or etag in (tag.strip() for tag in header.split(',')))
+
+    def _send_conditional(self, etag, body, content_type, cache_control):
+        if self._not_modified(etag):
+            self._send_not_modified(etag, cache_control)
+        else:
+            self._send(200, body, content_type, {'ETag': etag, 'Cache-Control': cache_control})
+
+    def _send_not_modified(self, etag, cache_control):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send(status, dumps({'error': message}))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host='127.0.0.1', port=8765, db_path=None, verbose=False):
+    """Запускает сервис и обслуживает запросы до Ctrl+C"""
+    server = CatalogServer((host, port), db_path, verbose)
+    print(f"Сервис каталога: http://{host}:{server.server_port}/ (база {server.writer.db_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,95 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+# Как часто проверяется PRAGMA data_version: проверка не читает таблиц и почти ничего не стоит
+POLL_INTERVAL_MS = 1000
+# Таблицы журнала с данными пользователя (см. SessionState.sync)
+USER_TABLES = {'Favorites', 'cooked_recipes', 'cart'}
+
+
+class ChangeWatcher(QObject):
+    """Следит за изменениями файла БД, сделанными другими экземплярами приложения.
+
+    Раз в POLL_INTERVAL_MS сравнивает PRAGMA data_version с прежним значением
+    и, если файл менялся, забирает из журнала изменений (change_log) только
+    новые записи. Подписчики DataBase (каталог в памяти, кэши фильтров)
+    получают их через notify_logged_changes, а окно - сигналами:
+      * recipes_changed({recipe_id: последняя операция}) - рецепты добавлены,
+        изменены или удалены;
+      * nutrition_changed({recipe_id}) - изменилась пищевая ценность рецептов
+        (в том числе рассчитанная в фоне другим экземпляром);
+      * user_data_changed({имена таблиц}) - избранное, приготовленные рецепты
+        или корзина текущего пользователя;
+      * changes_lost() - нужные записи журнала уже удалены, данные нужно
+        перечитать целиком.
+    Собственные записи экземпляра тоже попадают в журнал, но пропускаются
+    (DataBase.track_own_changes): их экземпляр уже применил при записи.
+    """
+
+    recipes_changed = pyqtSignal(object)
+    nutrition_changed = pyqtSignal(object)
+    user_data_changed = pyqtSignal(object)
+    changes_lost = pyqtSignal()
+
+    def __init__(self, db, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        db.track_own_changes()
+        self.version = db.data_version()
+        self.position = db.get_change_log_position()
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(POLL_INTERVAL_MS)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def poll(self):
+        """Забирает новые записи журнала, если файл БД менялся с прошлой проверки"""
+        try:
+            version = self.db.data_version()
+        except Exception as e:
+            print(f"Ошибка проверки изменений БД: {e}")
+            return
+        if version == self.version:
+            return
+        self.version = version
+
+        recipes = {}
+        nutrition = set()
+        tables = set()
+        while True:
+            changes = self.db.get_changes_since(self.position, self.db.CHANGE_LOG_BATCH)
+            if changes is None:
+                self.position = self.db.get_change_log_position()
+                self.changes_lost.emit()
+                return
+            if not changes:
+                break
+            self.position = changes[-1][0]
+            last_batch = len(changes) < self.db.CHANGE_LOG_BATCH
+            changes = self.db.skip_own_changes(changes)
+            self.db.notify_logged_changes(changes)
+            for _, table_name, operation, recipe_id, user_id in changes:
+                if table_name == 'Recipes':
+                    # Вставка и удаление важнее изменения: от них зависит состав разделов
+                    if recipes.get(recipe_id) in (None, 'update'):
+                        recipes[recipe_id] = operation
+                elif table_name == 'Nutrition':
+                    nutrition.add(recipe_id)
+                elif table_name in USER_TABLES and user_id == self.user_id:
+                    tables.add(table_name)
+            if last_batch:
+                break
+
+        if recipes:
+            self.recipes_changed.emit(recipes)
+        if nutrition:
+            self.nutrition_changed.emit(nutrition)
+        if tables:
+            self.user_data_changed.emit(tables)
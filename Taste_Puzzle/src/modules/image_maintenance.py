@@ -0,0 +1,210 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QObject, QThread, QThreadPool, QTimer, pyqtSignal
+
+from src.modules.recipe_query_worker import QueryTask
+
+
+# Каталог внутри img/recipe_img, куда переносятся файлы без ссылок
+QUARANTINE_DIR = 'quarantine'
+# Файлы моложе этого срока не трогаются: их может записывать еще не завершенная транзакция рецепта
+GRACE_PERIOD = timedelta(hours=1)
+# Через сколько файлы из карантина удаляются окончательно
+QUARANTINE_PERIOD = timedelta(days=30)
+# Как часто начинать новый проход по каталогу
+SCAN_INTERVAL = timedelta(days=1)
+
+
+def scan_units(db):
+    """Каталоги одного прохода в порядке проверки: корень, карантин, подкаталоги хранилища.
+
+    В проход входят все возможные подкаталоги хранилища, а не только
+    существующие: ссылку на файл из удаленного подкаталога тоже нужно найти.
+    Порядок совпадает с сортировкой строк, поэтому прерванный проход
+    продолжается с первого каталога после сохраненного.
+    """
+    shards = {f"{db.IMAGE_STORE_DIR}/{shard:0{db.IMAGE_SHARD_CHARS}x}" for shard in range(16 ** db.IMAGE_SHARD_CHARS)}
+    store_path = os.path.join(db.images_dir(), db.IMAGE_STORE_DIR)
+    if os.path.isdir(store_path):
+        with os.scandir(store_path) as entries:
+            shards.update(f"{db.IMAGE_STORE_DIR}/{entry.name}" for entry in entries if entry.is_dir())
+    return sorted(['', QUARANTINE_DIR, *shards])
+
+
+def _list_files(path):
+    """{имя: время изменения} файлов каталога (без подкаталогов); пусто, если каталога нет"""
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name: entry.stat().st_mtime for entry in entries
+                    if entry.is_file() and not entry.name.startswith('.')}
+    except FileNotFoundError:
+        return {}
+
+
+def _quarantine(db, unit, name, now):
+    """Переносит файл без ссылок в карантин; время изменения отсчитывает срок хранения"""
+    images_dir = db.images_dir()
+    target_dir = os.path.join(images_dir, QUARANTINE_DIR, now.strftime('%Y%m%d'))
+    os.makedirs(target_dir, exist_ok=True)
+    target = os.path.join(target_dir, f"{unit.replace('/', '_')}_{name}" if unit else name)
+    os.replace(os.path.join(images_dir, *unit.split('/'), name), target)
+    os.utime(target)
+
+
+def _purge_quarantine(db, now):
+    """Удаляет из карантина файлы старше QUARANTINE_PERIOD и пустые каталоги. Возвращает число файлов"""
+    quarantine_path = os.path.join(db.images_dir(), QUARANTINE_DIR)
+    cutoff = (now - QUARANTINE_PERIOD).timestamp()
+    purged = 0
+    try:
+        with os.scandir(quarantine_path) as days:
+            day_paths = [entry.path for entry in days if entry.is_dir()]
+    except FileNotFoundError:
+        return 0
+
+    for day_path in day_paths:
+        for name, mtime in _list_files(day_path).items():
+            if mtime < cutoff:
+                os.remove(os.path.join(day_path, name))
+                purged += 1
+        try:
+            os.rmdir(day_path)
+        except OSError:
+            pass
+    return purged
+
+
+def scan_unit(db, unit, now):
+    """Проверяет один каталог. Возвращает (перенесено в карантин, удалено из карантина,
+    пути файлов, на которые есть ссылки, но которых нет на диске)"""
+    if unit == QUARANTINE_DIR:
+        return 0, _purge_quarantine(db, now), []
+
+    files = _list_files(os.path.join(db.images_dir(), *unit.split('/')) if unit else db.images_dir())
+    if unit:
+        expected = db.get_expected_images(unit)
+        found = {f"{unit}/{name}": name for name in files}
+    else:
+        # Старые изображения лежат в корне; стоковые картинки - исходники для новых рецептов
+        expected = {os.path.basename(path) for path in db.get_expected_images('')}
+        expected.update(db.STOCK_IMAGES)
+        found = {name: name for name in files}
+
+    missing = sorted(path for path in expected if path not in found and path not in db.STOCK_IMAGES)
+    young = (now - GRACE_PERIOD).timestamp()
+    candidates = [path for path, name in found.items() if path not in expected and files[name] < young]
+    # Ссылку мог оставить и рецепт без записи в images (например, до сверки счетчиков)
+    orphans = set(candidates) - db.get_referenced_images(candidates) if candidates else set()
+
+    for path in sorted(orphans):
+        _quarantine(db, unit, found[path], now)
+    return len(orphans), 0, missing
+
+
+def run_image_maintenance(db, time_budget=1.0, now=None):
+    """Проверяет каталог изображений порциями, продолжая прерванный проход.
+
+    Проверяет каталоги по порядку scan_units, пока не истечет time_budget
+    секунд (каталог всегда проверяется целиком), и после каждого сохраняет
+    прогресс в БД - проход переживает перезапуск приложения. Новый проход
+    начинается не раньше чем через SCAN_INTERVAL после предыдущего.
+
+    Возвращает None, если проверять пока нечего, иначе отчет {'done': проход
+    завершен, 'quarantined', 'purged', 'missing': [пути]} по этой порции.
+    """
+    now = now or datetime.now()
+    position, pass_started_at, finished_at, _, _ = db.get_image_scan_state()
+    if position is None and pass_started_at is None and finished_at and now - finished_at < SCAN_INTERVAL:
+        return None
+
+    deadline = time.perf_counter() + time_budget
+    report = {'done': False, 'quarantined': 0, 'purged': 0, 'missing': []}
+    units = [unit for unit in scan_units(db) if position is None or unit > position]
+    for unit in units:
+        quarantined, purged, missing = scan_unit(db, unit, now)
+        report['quarantined'] += quarantined
+        report['purged'] += purged
+        report['missing'].extend(missing)
+        db.save_image_scan_state(unit, quarantined, len(missing))
+        if time.perf_counter() > deadline:
+            break
+    else:
+        db.save_image_scan_state(None, finished=True)
+        report['done'] = True
+    return report
+
+
+def _run_low_priority(db, time_budget):
+    # Поток пула свой у ImageMaintenance, поэтому приоритет не влияет на другие задачи
+    QThread.currentThread().setPriority(QThread.Priority.LowestPriority)
+    return run_image_maintenance(db, time_budget)
+
+
+class ImageMaintenance(QObject):
+    """Фоновая проверка каталога изображений: файлы без ссылок уходят в карантин,
+    отсутствующие файлы попадают в отчет.
+
+    Первая порция запускается через START_DELAY_MS после старта, следующие -
+    с паузой CHUNK_PAUSE_MS, каждая работает около TIME_BUDGET секунд в
+    потоке с наименьшим приоритетом. Итог прохода передается сигналом finished.
+    """
+
+    finished = pyqtSignal(dict)  # итог прохода: quarantined, purged, missing
+
+    START_DELAY_MS = 30000
+    CHUNK_PAUSE_MS = 5000
+    TIME_BUDGET = 1.0
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self._task = None
+        self._stopped = False
+        self._report = {'quarantined': 0, 'purged': 0, 'missing': []}
+
+    def start(self, delay_ms=None):
+        QTimer.singleShot(self.START_DELAY_MS if delay_ms is None else delay_ms, self._run_chunk)
+
+    def stop(self):
+        """Не запускать новые порции (текущая доработает и сохранит прогресс)"""
+        self._stopped = True
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _run_chunk(self):
+        if self._stopped or self._task is not None:
+            return
+        self._task = QueryTask(0, _run_low_priority, (self.db, self.TIME_BUDGET), {})
+        self._task.setAutoDelete(False)
+        self._task.signals.finished.connect(self._on_finished)
+        self._task.signals.failed.connect(self._on_failed)
+        self.pool.start(self._task)
+
+    def _on_finished(self, generation, report):
+        self._task = None
+        if report is None:
+            return
+
+        for key in ('quarantined', 'purged'):
+            self._report[key] += report[key]
+        self._report['missing'].extend(report['missing'])
+        if not report['done']:
+            QTimer.singleShot(self.CHUNK_PAUSE_MS, self._run_chunk)
+            return
+
+        summary, self._report = self._report, {'quarantined': 0, 'purged': 0, 'missing': []}
+        print(f"Проверка изображений: в карантин {summary['quarantined']}, удалено из карантина "
+              f"{summary['purged']}, не найдено файлов {len(summary['missing'])}")
+        for path in summary['missing']:
+            print(f"  - нет файла {path}")
+        self.finished.emit(summary)
+
+    def _on_failed(self, generation, message):
+        self._task = None
+        print(f"Ошибка проверки изображений: {message}")
@@ -0,0 +1,118 @@
+import os
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QSize, Qt
+from PyQt6.QtGui import QColor, QImage, QImageIOHandler, QImageReader, QPainter
+
+
+# Наибольшая сторона сохраняемого изображения рецепта (карточка и просмотр не больше)
+MAX_IMAGE_SIDE = 1280
+JPEG_QUALITY = 85
+# JPEG не больше этого размера и в пределах MAX_IMAGE_SIDE сохраняется как есть, без перекодирования
+MAX_UNCHANGED_BYTES = 400 * 1024
+# Размер превью в диалоге редактирования
+PREVIEW_SIDE = 140
+# Заглушка изображения - средние цвета ячеек сетки PLACEHOLDER_SIZE (36 байт RGB, 72 символа hex)
+PLACEHOLDER_SIZE = QSize(4, 3)
+# До какого размера уменьшать файл при чтении для расчета заглушки (JPEG уменьшается прямо при декодировании)
+PLACEHOLDER_SOURCE_SIDE = 64
+
+
+def prepare_recipe_image(file_name, max_side=MAX_IMAGE_SIDE, quality=JPEG_QUALITY):
+    """Готовит выбранный пользователем файл к сохранению: уменьшает до max_side по
+    большей стороне и перекодирует в JPEG.
+
+    Работает с QImage, поэтому может выполняться вне GUI-потока. Возвращает
+    (байты JPEG, превью QImage, заглушка) или вызывает ValueError, если файл
+    не читается.
+    """
+    reader = QImageReader(file_name)
+    reader.setAutoTransform(True)  # поворот по EXIF, иначе фото с телефона ляжет боком
+    size = reader.size()
+    source_format = bytes(reader.format()).lower()
+    if size.isValid() and max(size.width(), size.height()) > max_side:
+        # Декодер JPEG умеет уменьшать при чтении - полноразмерный кадр в память не попадает
+        reader.setScaledSize(size.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Не удалось прочитать изображение: {reader.errorString()}")
+    if max(image.width(), image.height()) > max_side:
+        image = image.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+
+    preview = image.scaled(PREVIEW_SIDE, PREVIEW_SIDE, Qt.AspectRatioMode.KeepAspectRatio,
+                           Qt.TransformationMode.SmoothTransformation)
+
+    unchanged = (source_format in (b'jpeg', b'jpg') and not reader.scaledSize().isValid()
+                 and reader.transformation() == QImageIOHandler.Transformation.TransformationNone)
+    if unchanged:
+        with open(file_name, 'rb') as f:
+            content = f.read(MAX_UNCHANGED_BYTES + 1)
+        if len(content) <= MAX_UNCHANGED_BYTES:
+            return content, preview, image_placeholder(image)
+
+    if image.hasAlphaChannel():
+        # У JPEG нет прозрачности: прозрачные области PNG/GIF становятся белыми
+        background = QImage(image.size(), QImage.Format.Format_RGB32)
+        background.fill(QColor(255, 255, 255))
+        painter = QPainter(background)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = background
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    if not image.save(buffer, 'JPEG', quality):
+        raise ValueError("Не удалось сохранить изображение в JPEG")
+    buffer.close()
+    return bytes(data), preview, image_placeholder(image)
+
+
+def image_placeholder(image):
+    """Заглушка для QImage: hex средних цветов ячеек сетки PLACEHOLDER_SIZE по строкам.
+
+    Сглаженное уменьшение Qt усредняет все пиксели каждой ячейки, так что
+    цвет ячейки - честное среднее, а не случайный пиксель.
+    """
+    grid = image.convertToFormat(QImage.Format.Format_RGB32).scaled(
+        PLACEHOLDER_SIZE, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation
+    )
+    return ''.join(QColor(grid.pixel(x, y)).name()[1:]
+                   for y in range(grid.height()) for x in range(grid.width()))
+
+
+def placeholder_image(code):
+    """QImage размером с сетку из заглушки; None, если заглушки нет или она повреждена"""
+    try:
+        data = bytes.fromhex(code or '')
+    except ValueError:
+        return None
+    width, height = PLACEHOLDER_SIZE.width(), PLACEHOLDER_SIZE.height()
+    if len(data) != width * height * 3:
+        return None
+    # copy(): QImage не владеет переданным буфером
+    return QImage(data, width, height, width * 3, QImage.Format.Format_RGB888).copy()
+
+
+def file_placeholder(file_path):
+    """Заглушка для файла изображения; пустая строка, если файл не читается"""
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > PLACEHOLDER_SOURCE_SIDE:
+        reader.setScaledSize(size.scaled(PLACEHOLDER_SOURCE_SIDE, PLACEHOLDER_SOURCE_SIDE,
+                                         Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    return '' if image.isNull() else image_placeholder(image)
+
+
+def backfill_placeholders(db, batch_size=200):
+    """Досчитывает заглушки изображений рецептов пачками (по одному чтению на файл,
+    сколько бы рецептов на него ни ссылалось). Возвращает число обработанных файлов"""
+    done = 0
+    while True:
+        paths = db.get_images_without_placeholder(batch_size)
+        if not paths:
+            return done
+        db.save_image_placeholders({path: file_placeholder(db.image_file_path(path)) for path in paths})
+        done += len(paths)
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QFont, QPainter, QPixmap
+
+
+# Сколько изображений рецептов (до 1280 px по большей стороне) держать готовыми QPixmap
+PIXMAP_CACHE_SIZE = 16
+# Текстовые заглушки по (текст, ширина, высота): рисуются один раз, дальше берутся из кэша
+TEXT_PIXMAP_CACHE_SIZE = 256
+
+_pixmaps = OrderedDict()  # путь -> QPixmap
+_text_pixmaps = OrderedDict()  # (текст, ширина, высота) -> QPixmap
+
+
+def recipe_pixmap(db, recipe_id, name=None):
+    """QPixmap изображения рецепта для окон приложения (только из GUI-потока).
+
+    Путь к файлу берется из БД, декодированные изображения кэшируются. Если
+    изображения нет или файл не читается, возвращается текстовая заглушка с
+    названием рецепта.
+    """
+    try:
+        path = db.get_recipe_image_path(recipe_id)
+        if path:
+            pixmap = _pixmaps.get(path)
+            if pixmap is None:
+                pixmap = QPixmap(path)
+                if not pixmap.isNull():
+                    _remember(_pixmaps, path, pixmap, PIXMAP_CACHE_SIZE)
+            else:
+                _pixmaps.move_to_end(path)
+            if not pixmap.isNull():
+                return pixmap
+        return text_pixmap(name or "Рецепт")
+    except Exception as e:
+        print(f"Ошибка загрузки изображения рецепта: {e}")
+        return text_pixmap("Изображение")
+
+
+def text_pixmap(text, width=200, height=150):
+    """QPixmap с текстовой заглушкой (из кэша, если такая уже рисовалась)"""
+    key = (text, width, height)
+    pixmap = _text_pixmaps.get(key)
+    if pixmap is None:
+        pixmap = _draw_text_pixmap(text, width, height)
+        _remember(_text_pixmaps, key, pixmap, TEXT_PIXMAP_CACHE_SIZE)
+    return pixmap
+
+
+def _draw_text_pixmap(text, width, height):
+    pixmap = QPixmap(width, height)
+    pixmap.fill(QColor(240, 240, 240))
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+    font = QFont()
+    font.setPointSize(10)
+    font.setBold(True)
+    painter.setFont(font)
+
+    painter.setPen(QColor(100, 100, 100))
+    painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, text)
+    painter.end()
+
+    return pixmap
+
+
+def _remember(cache, key, pixmap, size):
+    cache[key] = pixmap
+    if len(cache) > size:
+        cache.popitem(last=False)
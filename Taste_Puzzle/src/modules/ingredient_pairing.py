@@ -0,0 +1,132 @@
+import numpy as np
+
+
+# Сколько соседей хранить для каждого ингредиента
+TOP_NEIGHBORS = 20
+
+
+def top_neighbors(left, right, counts, left_frequency, right_frequency, recipe_count, top_n=TOP_NEIGHBORS):
+    """Отбирает top_n соседей каждого ингредиента по дисконтированной PMI.
+
+    Входы - параллельные массивы по парам (left, right): число общих рецептов
+    и число рецептов с каждым из ингредиентов. PMI = log(n·N / (n_a·n_b))
+    умножается на n / (n + 1), чтобы пары, встретившиеся один-два раза, не
+    вытесняли устойчивые сочетания. Пары с неположительной оценкой
+    отбрасываются. Возвращает список (ingredient_id, neighbor_id, score).
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if not len(counts):
+        return []
+
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    pmi = np.log(counts * recipe_count / (np.asarray(left_frequency, dtype=np.float64) *
+                                         np.asarray(right_frequency, dtype=np.float64)))
+    scores = pmi * counts / (counts + 1)
+
+    positive = scores > 0
+    left, right, scores = left[positive], right[positive], scores[positive]
+
+    # Внутри каждого ингредиента - по убыванию оценки; ранг - позиция от начала группы
+    order = np.lexsort((right, -scores, left))
+    left, right, scores = left[order], right[order], scores[order]
+    group_starts = np.flatnonzero(np.concatenate(([True], left[1:] != left[:-1])))
+    ranks = np.arange(len(left)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(left))))
+    keep = ranks < top_n
+
+    return list(zip(left[keep].tolist(), right[keep].tolist(), scores[keep].tolist()))
+
+
+def build_pairings(pairs, top_n=TOP_NEIGHBORS):
+    """Строит таблицу соседей по всем парам (recipe_id, ingredient_id).
+
+    Матрица совместной встречаемости XᵀX собирается без плотной матрицы:
+    пары ингредиентов одного рецепта перечисляются векторно сдвигами на
+    d = 1, 2, ... позиций внутри отсортированного по рецепту списка, после
+    чего одинаковые пары сводятся через np.unique.
+    """
+    data = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    if not len(data):
+        return []
+
+    keys = np.sort((data[:, 0] << 32) | data[:, 1])
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    recipes = keys >> 32
+    ingredients = keys & 0xFFFFFFFF
+
+    ingredient_ids = np.unique(ingredients)
+    columns = np.searchsorted(ingredient_ids, ingredients)
+    frequency = np.bincount(columns, minlength=len(ingredient_ids))
+    recipe_count = int(np.count_nonzero(np.concatenate(([True], recipes[1:] != recipes[:-1]))))
+
+    longest = int(np.max(np.unique(recipes, return_counts=True)[1]))
+    left_parts, right_parts = [], []
+    for shift in range(1, longest):
+        same_recipe = recipes[shift:] == recipes[:-shift]
+        left_parts.append(columns[:-shift][same_recipe])
+        right_parts.append(columns[shift:][same_recipe])
+
+    if not left_parts:
+        return []
+
+    left = np.concatenate(left_parts)
+    right = np.concatenate(right_parts)
+    width = len(ingredient_ids)
+    # Каждую пару учитываем в обе стороны: соседи нужны для обоих ингредиентов
+    pair_keys, counts = np.unique(np.concatenate((left * width + right, right * width + left)), return_counts=True)
+    left, right = pair_keys // width, pair_keys % width
+
+    return top_neighbors(ingredient_ids[left], ingredient_ids[right], counts,
+                         frequency[left], frequency[right], recipe_count, top_n)
+
+
+class IngredientPairings:
+    """Подсказки «хорошо сочетается с» поверх таблицы ingredient_pairings.
+
+    Подсказки - это поиск по первичному ключу таблицы, а не пересчет. Таблица
+    строится целиком при первом обращении (ensure_built) и дальше
+    обновляется точечно: после изменения рецепта пересчитываются соседи
+    только его ингредиентов (прежних и новых). Частоты остальных
+    ингредиентов при этом сдвигаются незначительно, и их строки остаются
+    до следующей полной перестройки.
+    """
+
+    def __init__(self, db, top_n=TOP_NEIGHBORS):
+        self.db = db
+        self.top_n = top_n
+
+    def rebuild(self):
+        """Полностью перестраивает таблицу соседей"""
+        rows = build_pairings(self.db.get_recipe_ingredient_pairs(), self.top_n)
+        return self.db.replace_ingredient_pairings(rows)
+
+    def ensure_built(self):
+        """Строит таблицу, если она еще пуста"""
+        if not self.db.has_ingredient_pairings():
+            self.rebuild()
+
+    def refresh(self, ingredient_ids):
+        """Пересчитывает соседей перечисленных ингредиентов"""
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return
+
+        cooccurrence = self.db.get_ingredient_cooccurrence(ingredient_ids)
+        frequencies, recipe_count = self.db.get_ingredient_frequencies()
+
+        rows = []
+        if cooccurrence:
+            left, right, counts = zip(*cooccurrence)
+            rows = top_neighbors(left, right, counts,
+                                 [frequencies.get(i, 1) for i in left],
+                                 [frequencies.get(i, 1) for i in right],
+                                 recipe_count, self.top_n)
+        self.db.replace_ingredient_pairings(rows, ingredient_ids)
+
+    def on_recipe_changed(self, recipe_id, ingredient_ids, previous_ids=()):
+        """Обработчик изменений рецептов из DataBase"""
+        self.refresh(set(ingredient_ids or ()) | set(previous_ids or ()))
+
+    def suggest(self, selected_ids, limit=8):
+        """Ингредиенты (id, name), дополняющие выбранные"""
+        return self.db.get_ingredient_suggestions(selected_ids, limit)
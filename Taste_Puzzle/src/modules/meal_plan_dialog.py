@@ -0,0 +1,162 @@
+import time
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QSpinBox,
+                             QCheckBox, QPushButton, QTreeWidget, QTreeWidgetItem, QMessageBox)
+from PyQt6.QtCore import Qt, QSettings, pyqtSignal
+
+from src.modules.meal_planner import shopping_list
+
+
+class MealPlanDialog(QDialog):
+    """Диалог «План питания»: пользователь задает дневные цели КБЖУ и время готовки,
+    получает план на неделю без повторов и может отправить все продукты плана в корзину."""
+
+    recipe_selected = pyqtSignal(int)
+    add_to_cart = pyqtSignal(list)
+
+    # Поле -> (подпись, максимум, значение по умолчанию); 0 означает «без цели»
+    FIELDS = {
+        'days': ("Дней", 14, 7),
+        'meals_per_day': ("Приемов пищи в день", 6, 3),
+        'calories': ("Ккал в день", 6000, 2000),
+        'proteins': ("Белки, г в день", 400, 100),
+        'fats': ("Жиры, г в день", 300, 70),
+        'carbohydrates': ("Углеводы, г в день", 800, 250),
+        'max_day_minutes': ("Минут готовки в день", 600, 120),
+    }
+
+    def __init__(self, db, user_id, planner, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        self.planner = planner
+        self.settings = QSettings("PuzzleVkusov", "AppSettings")
+        self.inputs = {}
+        self.plan = None
+        self.seed = None
+
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle("План питания")
+        self.resize(800, 650)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+
+        title_label = QLabel("📅 План питания под ваши цели")
+        title_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #2c3e50;")
+        layout.addWidget(title_label)
+
+        grid = QGridLayout()
+        for index, (field, (label, maximum, default)) in enumerate(self.FIELDS.items()):
+            spin = QSpinBox()
+            spin.setRange(1 if field in ('days', 'meals_per_day') else 0, maximum)
+            spin.setSpecialValueText("—" if field not in ('days', 'meals_per_day') else "")
+            spin.setValue(int(self.settings.value(f"{self.settings_key()}/{field}", default)))
+            self.inputs[field] = spin
+            grid.addWidget(QLabel(label), index // 2, (index % 2) * 2)
+            grid.addWidget(spin, index // 2, (index % 2) * 2 + 1)
+        layout.addLayout(grid)
+
+        self.favorites_check = QCheckBox("Предпочитать избранные рецепты")
+        self.favorites_check.setChecked(True)
+        layout.addWidget(self.favorites_check)
+
+        plan_buttons = QHBoxLayout()
+        plan_btn = QPushButton("Составить план")
+        plan_btn.clicked.connect(lambda: self.build_plan(seed=None))
+        another_btn = QPushButton("🔀 Другой вариант")
+        another_btn.clicked.connect(lambda: self.build_plan(seed=(self.seed or 0) + 1))
+        plan_buttons.addWidget(plan_btn)
+        plan_buttons.addWidget(another_btn)
+        plan_buttons.addStretch()
+        layout.addLayout(plan_buttons)
+
+        self.plan_tree = QTreeWidget()
+        self.plan_tree.setHeaderLabels(["Рецепт", "Ккал", "Б / Ж / У", "Минут"])
+        self.plan_tree.setColumnWidth(0, 360)
+        self.plan_tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        layout.addWidget(self.plan_tree, 1)
+
+        self.summary_label = QLabel("Задайте цели и нажмите «Составить план»")
+        self.summary_label.setStyleSheet("color: #6c757d;")
+        layout.addWidget(self.summary_label)
+
+        button_layout = QHBoxLayout()
+        self.cart_btn = QPushButton("🛒 Продукты плана в корзину")
+        self.cart_btn.setEnabled(False)
+        self.cart_btn.clicked.connect(self.send_to_cart)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(self.cart_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+    def settings_key(self):
+        return f"meal_plan/{self.user_id}"
+
+    def build_plan(self, seed=None):
+        """Составляет план по введенным целям и показывает его по дням"""
+        values = {field: spin.value() for field, spin in self.inputs.items()}
+        for field, value in values.items():
+            self.settings.setValue(f"{self.settings_key()}/{field}", value)
+
+        targets = {macro: values[macro] for macro in ('calories', 'proteins', 'fats', 'carbohydrates')}
+        start = time.perf_counter()
+        try:
+            self.plan = self.planner.plan(
+                days=values['days'], meals_per_day=values['meals_per_day'], targets=targets,
+                max_day_minutes=values['max_day_minutes'] or None,
+                prefer_favorites=self.favorites_check.isChecked(), seed=seed
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "План питания", str(e))
+            return
+        elapsed = time.perf_counter() - start
+        self.seed = seed
+
+        self.plan_tree.clear()
+        favorite_ids = set(self.planner.recipe_ids[self.planner.favorites].tolist())
+        for day_index, (recipe_ids, totals) in enumerate(zip(self.plan['days'], self.plan['totals']), start=1):
+            day_item = QTreeWidgetItem([
+                f"День {day_index}", f"{totals['calories']:.0f}",
+                f"{totals['proteins']:.0f} / {totals['fats']:.0f} / {totals['carbohydrates']:.0f}",
+                f"{totals['minutes']:.0f}"
+            ])
+            day_item.setFlags(day_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            for recipe_id in recipe_ids:
+                row = self.planner.nutrition[self.planner.recipe_ids == recipe_id][0]
+                cook_time = self.planner.cook_times[self.planner.recipe_ids == recipe_id][0]
+                name = self.planner.names.get(recipe_id, str(recipe_id))
+                recipe_item = QTreeWidgetItem([
+                    f"★ {name}" if recipe_id in favorite_ids else name,
+                    f"{row[0]:.0f}", " / ".join("—" if value != value else f"{value:.0f}" for value in row[1:]),
+                    "—" if cook_time != cook_time else f"{cook_time:.0f}"
+                ])
+                recipe_item.setData(0, Qt.ItemDataRole.UserRole, recipe_id)
+                day_item.addChild(recipe_item)
+            self.plan_tree.addTopLevelItem(day_item)
+            day_item.setExpanded(True)
+
+        recipes_count = sum(len(day) for day in self.plan['days'])
+        self.summary_label.setText(f"Рецептов в плане: {recipes_count}, составлен за {elapsed * 1000:.0f} мс")
+        self.cart_btn.setEnabled(True)
+
+    def send_to_cart(self):
+        """Отправляет суммарный список продуктов плана в корзину одной пачкой"""
+        if not self.plan:
+            return
+        recipe_ids = [recipe_id for day in self.plan['days'] for recipe_id in day]
+        ingredients = shopping_list(self.db, recipe_ids)
+        if not ingredients:
+            QMessageBox.warning(self, "План питания", "У рецептов плана не указаны ингредиенты")
+            return
+        self.add_to_cart.emit(ingredients)
+
+    def on_item_double_clicked(self, item, column):
+        recipe_id = item.data(0, Qt.ItemDataRole.UserRole)
+        if recipe_id is not None:
+            self.recipe_selected.emit(recipe_id)
@@ -0,0 +1,184 @@
+import time
+
+import numpy as np
+
+from src.modules.recipe_catalog import RecipeCatalog
+
+
+# Нутриенты плана в порядке столбцов матрицы и их вес в отклонении дня от цели
+MACROS = ('calories', 'proteins', 'fats', 'carbohydrates')
+MACRO_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0])
+
+
+class MealPlanner:
+    """Составление плана питания на несколько дней под дневные цели КБЖУ и времени.
+
+    План - days × meals_per_day разных рецептов (по одной порции). Качество
+    плана - сумма по дням взвешенных квадратов относительных отклонений
+    КБЖУ дня от цели плюс штраф за превышение времени готовки в день, минус
+    небольшой бонус за каждый избранный рецепт.
+
+    Сначала весь каталог оценивается векторно: насколько рецепт близок к
+    доле дневной цели на один прием пищи. Лучшие кандидаты (несколько
+    десятков на место в плане) отбираются через np.argpartition, из лучших
+    составляется начальный план. Дальше идет локальный поиск: на каждом шаге
+    одним вычислением по массивам оцениваются все замены «место в плане ->
+    неиспользованный кандидат» и все обмены рецептами между днями, и
+    применяется лучший ход, пока он улучшает план.
+    """
+
+    # Кандидатов для локального поиска на одно место плана, но не меньше MIN_CANDIDATES
+    CANDIDATES_PER_SLOT = 40
+    MIN_CANDIDATES = 400
+    # Ограничения локального поиска
+    MAX_ITERATIONS = 300
+    TIME_LIMIT = 0.5
+    # Вес штрафа за превышение времени и бонус за избранный рецепт
+    TIME_WEIGHT = 10.0
+    FAVORITE_BONUS = 0.01
+
+    def __init__(self, recipe_ids, nutrition, cook_times, names=None, favorite_ids=()):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.nutrition = np.asarray(nutrition, dtype=np.float64).reshape(-1, len(MACROS))
+        self.cook_times = np.asarray(cook_times, dtype=np.float64)
+        self.names = dict(zip(self.recipe_ids.tolist(), names)) if names is not None else {}
+        self.favorites = np.isin(self.recipe_ids, np.fromiter(favorite_ids, dtype=np.int64))
+
+    @classmethod
+    def from_database(cls, db, user_id):
+        """Данные для плана из каталога в памяти (если подключен) или одним запросом к базе"""
+        catalog = db.recipe_catalog or RecipeCatalog.from_database(db)
+        columns = catalog.column_arrays('ids', 'names', 'cook_times', 'has_nutrition', *MACROS)
+
+        known = columns['has_nutrition'] & (np.nan_to_num(columns['calories']) > 0)
+        nutrition = np.column_stack([columns[macro][known] for macro in MACROS])
+        return cls(columns['ids'][known], nutrition, columns['cook_times'][known],
+                   columns['names'][known].tolist(), db.get_favorite_recipe_ids(user_id))
+
+    def plan(self, days=7, meals_per_day=3, targets=None, max_day_minutes=None,
+             prefer_favorites=True, seed=None):
+        """Составляет план.
+
+        targets - дневные цели {нутриент из MACROS: значение}, нутриенты без
+        цели не учитываются; max_day_minutes - бюджет времени готовки в день
+        (None - без ограничения); seed - случайная добавка к оценкам
+        кандидатов, чтобы получить другой вариант плана.
+
+        Возвращает словарь: days - список дней со списками recipe_id, totals -
+        КБЖУ и минуты по дням, cost - итоговая оценка плана. ValueError, если
+        подходящих рецептов меньше, чем мест в плане.
+        """
+        slots = days * meals_per_day
+        targets = {macro: value for macro, value in (targets or {}).items() if macro in MACROS and value}
+        target = np.array([targets.get(macro, 1.0) for macro in MACROS], dtype=np.float64)
+        weights = np.array([MACRO_WEIGHTS[i] if macro in targets else 0.0 for i, macro in enumerate(MACROS)])
+
+        # Подходят рецепты с известными целевыми нутриентами и (при бюджете времени) временем
+        eligible = ~np.isnan(self.nutrition[:, weights > 0]).any(axis=1)
+        if max_day_minutes:
+            eligible &= ~np.isnan(self.cook_times) & (self.cook_times <= max_day_minutes)
+        eligible = np.flatnonzero(eligible)
+        if len(eligible) < slots:
+            raise ValueError(f"Подходящих рецептов {len(eligible)}, а в плане {slots} мест")
+
+        nutrition = np.nan_to_num(self.nutrition[eligible])
+        cook_times = np.nan_to_num(self.cook_times[eligible])
+        bonus = self.FAVORITE_BONUS * self.favorites[eligible] if prefer_favorites else np.zeros(len(eligible))
+
+        def day_cost(totals, minutes):
+            cost = (((totals - target) / target) ** 2 * weights).sum(axis=-1)
+            if max_day_minutes:
+                cost = cost + self.TIME_WEIGHT * (np.maximum(minutes - max_day_minutes, 0) / max_day_minutes) ** 2
+            return cost
+
+        # Оценка каждого рецепта как одного приема пищи из meals_per_day
+        scores = day_cost(nutrition * meals_per_day, cook_times * meals_per_day) - bonus
+        if seed is not None:
+            scores = scores + np.random.default_rng(seed).random(len(scores)) * scores.std() * 0.5
+
+        count = min(len(eligible), max(self.MIN_CANDIDATES, self.CANDIDATES_PER_SLOT * slots))
+        candidates = np.argpartition(scores, count - 1)[:count]
+        candidates = candidates[np.argsort(scores[candidates], kind='stable')]
+        nutrition, cook_times, bonus = nutrition[candidates], cook_times[candidates], bonus[candidates]
+
+        plan = self._initial_plan(nutrition, days, meals_per_day)
+        plan = self._local_search(plan, nutrition, cook_times, bonus, day_cost)
+
+        recipe_ids = self.recipe_ids[eligible[candidates]]
+        totals = nutrition[plan].sum(axis=1)
+        minutes = cook_times[plan].sum(axis=1)
+        return {
+            'days': recipe_ids[plan].tolist(),
+            'totals': [dict(zip(MACROS, day.tolist()), minutes=day_minutes)
+                       for day, day_minutes in zip(totals, minutes.tolist())],
+            'cost': float(day_cost(totals, minutes).sum() - bonus[plan].sum()),
+        }
+
+    @staticmethod
+    def _initial_plan(nutrition, days, meals_per_day):
+        """Лучшие кандидаты, разложенные по дням «змейкой» по калорийности"""
+        chosen = np.arange(days * meals_per_day)
+        chosen = chosen[np.argsort(-nutrition[chosen, 0], kind='stable')]
+        order = np.arange(days * meals_per_day).reshape(meals_per_day, days)
+        order[1::2] = order[1::2, ::-1]
+        plan = np.empty(days * meals_per_day, dtype=np.int64)
+        plan[order.ravel()] = chosen
+        return plan.reshape(meals_per_day, days).T.copy()
+
+    def _local_search(self, plan, nutrition, cook_times, bonus, day_cost):
+        """Улучшает план лучшими заменами и обменами, пока они уменьшают оценку"""
+        days, meals = plan.shape
+        deadline = time.perf_counter() + self.TIME_LIMIT
+        used = np.zeros(len(nutrition), dtype=bool)
+        used[plan.ravel()] = True
+
+        for _ in range(self.MAX_ITERATIONS):
+            totals = nutrition[plan].sum(axis=1)
+            minutes = cook_times[plan].sum(axis=1)
+            current = day_cost(totals, minutes)
+
+            # Замены: место (день, прием) -> любой неиспользованный кандидат
+            base = totals[:, None, :] - nutrition[plan]
+            base_minutes = minutes[:, None] - cook_times[plan]
+            replace = (day_cost(base[:, :, None, :] + nutrition, base_minutes[:, :, None] + cook_times)
+                       - current[:, None, None] - bonus + bonus[plan][:, :, None])
+            replace[:, :, used] = np.inf
+            best_replace = np.unravel_index(np.argmin(replace), replace.shape)
+
+            # Обмены рецептами между днями: (день a, прием i) <-> (день b, прием j)
+            slots = plan.ravel()
+            slot_days = np.repeat(np.arange(days), meals)
+            delta = nutrition[slots][None, :, :] - nutrition[slots][:, None, :]  # [откуда, куда]
+            delta_minutes = cook_times[slots][None, :] - cook_times[slots][:, None]
+            swap = (day_cost(totals[slot_days][:, None, :] + delta, minutes[slot_days][:, None] + delta_minutes)
+                    + day_cost(totals[slot_days][None, :, :] - delta, minutes[slot_days][None, :] - delta_minutes)
+                    - current[slot_days][:, None] - current[slot_days][None, :])
+            swap[slot_days[:, None] == slot_days[None, :]] = np.inf
+            best_swap = np.unravel_index(np.argmin(swap), swap.shape)
+
+            if min(replace[best_replace], swap[best_swap]) >= -1e-9:
+                break
+
+            if replace[best_replace] <= swap[best_swap]:
+                day, meal, candidate = best_replace
+                used[plan[day, meal]] = False
+                used[candidate] = True
+                plan[day, meal] = candidate
+            else:
+                first, second = best_swap
+                slots[first], slots[second] = slots[second], slots[first]
+                plan = slots.reshape(days, meals)
+
+            if time.perf_counter() > deadline:
+                break
+
+        return plan
+
+
+def shopping_list(db, recipe_ids):
+    """Продукты для рецептов плана: [(название, количество, единица)] с суммой одинаковых"""
+    combined = {}
+    for ingredients in db.get_recipes_ingredients(recipe_ids).values():
+        for name, quantity, unit in ingredients:
+            combined[(name, unit)] = combined.get((name, unit), 0.0) + quantity
+    return [(name, round(quantity, 2), unit) for (name, unit), quantity in combined.items()]
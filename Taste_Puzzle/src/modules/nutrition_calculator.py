@@ -0,0 +1,167 @@
+import re
+
+import numpy as np
+
+
+# Виды единиц: масса (коэффициент - граммы), объем (коэффициент - миллилитры,
+# переводится в граммы через плотность ингредиента), штуки (через массу одной
+# штуки) и «незначительное количество», которое в расчет не входит
+MASS, VOLUME, PIECE, NEGLIGIBLE = range(4)
+
+# Единица должна совпасть целым словом: «г» не начало «головки», «л» - не «ломтика»
+_UNIT_END = r'(?:\b|\.|$)'
+# Шаблоны единиц в порядке проверки: штуки и ложки раньше коротких единиц массы и объема
+UNIT_PATTERNS = [(re.compile(rf'^(?:{pattern}){_UNIT_END}'), kind, factor) for pattern, kind, factor in [
+    (r'ст\.?\s*л|стол\w*(?:\s+ложк\w*)?', VOLUME, 15.0),
+    (r'ч\.?\s*л|чайн\w*(?:\s+ложк\w*)?', VOLUME, 5.0),
+    (r'стакан\w*', VOLUME, 250.0),
+    (r'шт|штук\w*|зубч\w*|зубок|банк\w*|пуч\w*|головк\w*|ломт\w*', PIECE, 1.0),
+    (r'щепот\w*', MASS, 0.5),
+    (r'кг|килограмм\w*', MASS, 1000.0),
+    (r'мг|миллиграмм\w*', MASS, 0.001),
+    (r'г|гр|грамм\w*', MASS, 1.0),
+    (r'мл|миллилитр\w*', VOLUME, 1.0),
+    (r'л|литр\w*', VOLUME, 1000.0),
+]]
+
+_FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3}
+# Целая часть и/или дробь: '2', '1,5', '1/2', '1 1/2', '½', '1½'
+_AMOUNT = re.compile(r'^\s*(?:(\d+(?:[.,]\d+)?)(?!\s*/)\s*)?(?:(\d+)\s*/\s*(\d+)|([½¼¾⅓⅔]))?\s*(.*)$')
+
+NUTRIENTS = 4  # ккал, белки, жиры, углеводы
+
+
+def parse_quantity(text):
+    """Разбирает количество вида '30 мл', '1 чайная ложка', '½ ч.л.', '1,5 кг'.
+
+    Возвращает (количество, вид единицы, коэффициент) или None, если
+    количество не удалось понять. 'по вкусу' считается незначительным.
+    Число без единицы трактуется как граммы (так сохранялись старые рецепты),
+    единица без числа - как одна единица.
+    """
+    text = str(text).strip().lower()
+    if not text or 'по вкусу' in text:
+        return 0.0, NEGLIGIBLE, 0.0
+
+    match = _AMOUNT.match(text)
+    whole, numerator, denominator, fraction_sign, unit = match.groups()
+
+    amount = float(whole.replace(',', '.')) if whole else 0.0
+    if numerator is not None:
+        amount += float(numerator) / float(denominator)
+    elif fraction_sign is not None:
+        amount += _FRACTIONS[fraction_sign]
+    elif whole is None:
+        # 'щепотка', 'банка' без числа - одна единица
+        amount = 1.0
+
+    unit = unit.strip()
+    if not unit:
+        return amount, MASS, 1.0
+
+    for pattern, kind, factor in UNIT_PATTERNS:
+        if pattern.match(unit):
+            return amount, kind, factor
+    return None
+
+
+class NutritionCalculator:
+    """Расчет КБЖУ рецептов по ингредиентам.
+
+    Количества переводятся в граммы, после чего пищевая ценность всех
+    рецептов считается одним произведением разреженной матрицы
+    «рецепт × ингредиент» (граммы / 100) на плотную матрицу «ингредиент ×
+    нутриент» (на 100 г). Матрица хранится в координатном виде, а
+    произведение сводится к np.bincount по строкам для каждого нутриента.
+    Рецепт считается, только если у всех его ингредиентов известна пищевая
+    ценность и понятна единица; иначе его КБЖУ не трогаем.
+    """
+
+    def __init__(self, ingredient_nutrition):
+        self.columns = {ingredient_id: column for column, ingredient_id in enumerate(ingredient_nutrition)}
+        values = list(ingredient_nutrition.values())
+        self.per_100g = np.array([value[:NUTRIENTS] for value in values], dtype=np.float64).reshape(-1, NUTRIENTS)
+        # Неизвестная плотность у жидкостей ближе всего к воде; неизвестная масса штуки - не угадываем
+        self.density = np.array([value[4] if value[4] else 1.0 for value in values], dtype=np.float64)
+        self.piece_grams = np.array([value[5] if value[5] else np.nan for value in values], dtype=np.float64)
+        self._parsed = {}
+
+    @classmethod
+    def from_database(cls, db):
+        return cls(db.get_ingredient_nutrition())
+
+    def _parse(self, text):
+        # Одинаковые строки количества ('100 г', '1 штука') встречаются тысячи раз
+        parsed = self._parsed.get(text)
+        if parsed is None:
+            parsed = parse_quantity(text) or (np.nan, MASS, 1.0)
+            self._parsed[text] = parsed
+        return parsed
+
+    def compute(self, quantities, servings=None):
+        """Считает КБЖУ на порцию: {recipe_id: (ккал, белки, жиры, углеводы)}.
+
+        quantities - список (recipe_id, ingredient_id, количество текстом),
+        servings - {recipe_id: число порций} (нет данных - одна порция).
+        """
+        if not quantities:
+            return {}
+
+        servings = servings or {}
+        recipe_ids, recipe_rows = np.unique(np.array([row[0] for row in quantities], dtype=np.int64),
+                                            return_inverse=True)
+        columns = np.array([self.columns.get(row[1], -1) for row in quantities], dtype=np.int64)
+        # Разбираем каждую различную строку один раз, строки кодируем номерами
+        text_codes = {}
+        codes = np.array([text_codes.setdefault(row[2], len(text_codes)) for row in quantities], dtype=np.int64)
+        parsed = np.array([self._parse(text) for text in text_codes], dtype=np.float64).reshape(-1, 3)[codes]
+        amounts, kinds, factors = parsed[:, 0], parsed[:, 1].astype(np.int64), parsed[:, 2]
+
+        known = columns >= 0
+        safe_columns = np.where(known, columns, 0)
+
+        # Граммы каждой ячейки разреженной матрицы; NaN - перевести не удалось
+        grams = amounts * factors
+        grams = np.where(kinds == VOLUME, grams * self.density[safe_columns] if len(self.density) else np.nan, grams)
+        grams = np.where(kinds == PIECE, amounts * self.piece_grams[safe_columns] if len(self.piece_grams) else np.nan,
+                         grams)
+        grams = np.where(kinds == NEGLIGIBLE, 0.0, grams)
+        # Незначительное количество неизвестного ингредиента расчету не мешает
+        covered = (known | (kinds == NEGLIGIBLE)) & ~np.isnan(grams)
+
+        weights = np.where(covered, grams / 100.0, 0.0)
+        per_100g = self.per_100g[safe_columns] if len(self.per_100g) else np.zeros((len(columns), NUTRIENTS))
+        per_100g = np.where(known[:, None], per_100g, 0.0)
+
+        totals = np.column_stack([
+            np.bincount(recipe_rows, weights=weights * per_100g[:, nutrient], minlength=len(recipe_ids))
+            for nutrient in range(NUTRIENTS)
+        ])
+        complete = np.bincount(recipe_rows, weights=~covered, minlength=len(recipe_ids)) == 0
+
+        portions = np.array([servings.get(recipe_id) or 1 for recipe_id in recipe_ids.tolist()], dtype=np.float64)
+        totals /= portions[:, None]
+
+        result = {}
+        for row in np.flatnonzero(complete).tolist():
+            calories, proteins, fats, carbohydrates = totals[row]
+            result[int(recipe_ids[row])] = (int(round(calories)), round(float(proteins), 1),
+                                            round(float(fats), 1), round(float(carbohydrates), 1))
+        return result
+
+
+def recompute_nutrition(db, recipe_ids=None):
+    """Пересчитывает КБЖУ рецептов (по умолчанию - всего каталога) и записывает одной пачкой.
+
+    Введенные вручную значения не перезаписываются. Возвращает число
+    рассчитанных рецептов.
+    """
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return 0
+
+    calculator = NutritionCalculator.from_database(db)
+    values = calculator.compute(db.get_recipe_quantities(recipe_ids), db.get_recipe_servings(recipe_ids))
+    db.save_computed_nutrition(values)
+    return len(values)
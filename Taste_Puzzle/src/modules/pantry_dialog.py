@@ -0,0 +1,170 @@
+from PyQt6.QtWidgets import (QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QListWidget, QListWidgetItem, QTreeWidget, QTreeWidgetItem,
+                             QPushButton, QSplitter)
+from PyQt6.QtCore import Qt, QSettings, pyqtSignal
+
+
+class PantryDialog(QDialog):
+    """Диалог «Что приготовить?»: пользователь отмечает продукты, которые у него есть,
+    и получает рецепты, упорядоченные по покрытию кладовой."""
+
+    recipe_selected = pyqtSignal(int)
+
+    # Сколько недостающих ингредиентов допускается в выдаче
+    MAX_MISSING = 2
+    # Сколько рецептов показывать в каждой группе
+    GROUP_LIMIT = 200
+
+    GROUP_TITLES = {
+        0: "✅ Можно приготовить",
+        1: "🛒 Не хватает 1 ингредиента",
+        2: "🛒 Не хватает 2 ингредиентов",
+    }
+
+    def __init__(self, db, user_id, pantry_index, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        self.pantry_index = pantry_index
+        self.settings = QSettings("PuzzleVkusov", "AppSettings")
+        self.ingredient_names = {}
+
+        self.init_ui()
+        self.load_ingredients()
+        self.update_results()
+
+    def init_ui(self):
+        self.setWindowTitle("Что приготовить?")
+        self.resize(900, 600)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+
+        title_label = QLabel("🧺 Отметьте продукты, которые есть дома")
+        title_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #2c3e50;")
+        layout.addWidget(title_label)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+
+        # === КЛАДОВАЯ ===
+        self.pantry_list = QListWidget()
+        self.pantry_list.itemChanged.connect(self.on_pantry_changed)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск ингредиентов...")
+        self.search_input.textChanged.connect(self.filter_ingredients)
+
+        left_widget = QWidget()
+        left_layout = QVBoxLayout(left_widget)
+        left_layout.setContentsMargins(0, 0, 0, 0)
+        left_layout.addWidget(self.search_input)
+        left_layout.addWidget(self.pantry_list)
+
+        clear_btn = QPushButton("Снять все")
+        clear_btn.clicked.connect(self.clear_pantry)
+        left_layout.addWidget(clear_btn)
+
+        # === РЕЗУЛЬТАТЫ ===
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["Рецепт", "Чего не хватает"])
+        self.results_tree.setColumnWidth(0, 260)
+        self.results_tree.itemDoubleClicked.connect(self.on_result_double_clicked)
+
+        splitter.addWidget(left_widget)
+        splitter.addWidget(self.results_tree)
+        splitter.setSizes([300, 600])
+        layout.addWidget(splitter, 1)
+
+        self.summary_label = QLabel()
+        self.summary_label.setStyleSheet("color: #6c757d;")
+        layout.addWidget(self.summary_label)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+    def settings_key(self):
+        return f"pantry/{self.user_id}"
+
+    def load_ingredients(self):
+        """Заполняет список продуктов и отмечает сохраненную кладовую"""
+        saved_ids = {int(ingredient_id) for ingredient_id in self.settings.value(self.settings_key(), [], type=list)}
+
+        ingredients = sorted(self.db.get_ingredients(), key=lambda x: x[1].lower())
+
+        self.pantry_list.blockSignals(True)
+        for ingredient_id, name in ingredients:
+            self.ingredient_names[ingredient_id] = name
+            item = QListWidgetItem(name)
+            item.setData(Qt.ItemDataRole.UserRole, ingredient_id)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if ingredient_id in saved_ids else Qt.CheckState.Unchecked)
+            self.pantry_list.addItem(item)
+        self.pantry_list.blockSignals(False)
+
+    def pantry_ids(self):
+        """ID отмеченных продуктов"""
+        return [
+            self.pantry_list.item(i).data(Qt.ItemDataRole.UserRole)
+            for i in range(self.pantry_list.count())
+            if self.pantry_list.item(i).checkState() == Qt.CheckState.Checked
+        ]
+
+    def filter_ingredients(self, text):
+        """Скрывает продукты, не подходящие под строку поиска"""
+        text = text.strip().lower()
+        for i in range(self.pantry_list.count()):
+            item = self.pantry_list.item(i)
+            item.setHidden(bool(text) and text not in item.text().lower())
+
+    def clear_pantry(self):
+        self.pantry_list.blockSignals(True)
+        for i in range(self.pantry_list.count()):
+            self.pantry_list.item(i).setCheckState(Qt.CheckState.Unchecked)
+        self.pantry_list.blockSignals(False)
+        self.on_pantry_changed()
+
+    def on_pantry_changed(self, item=None):
+        """Сохраняет кладовую и пересчитывает подбор"""
+        self.settings.setValue(self.settings_key(), self.pantry_ids())
+        self.update_results()
+
+    def update_results(self):
+        """Перестраивает дерево результатов по текущей кладовой"""
+        pantry_ids = self.pantry_ids()
+        groups = self.pantry_index.group_by_missing(pantry_ids, self.MAX_MISSING,
+                                                    self.GROUP_LIMIT) if pantry_ids else {}
+
+        self.results_tree.clear()
+        total = 0
+        for missing_count, title in self.GROUP_TITLES.items():
+            recipes = groups.get(missing_count, [])
+            if not recipes:
+                continue
+
+            total += len(recipes)
+            group_item = QTreeWidgetItem([title])
+            group_item.setFlags(group_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+            for recipe_id, missing_ids in recipes:
+                missing_names = ", ".join(self.ingredient_names.get(i, str(i)) for i in missing_ids)
+                recipe_item = QTreeWidgetItem([self.pantry_index.recipe_names.get(recipe_id, str(recipe_id)),
+                                               missing_names])
+                recipe_item.setData(0, Qt.ItemDataRole.UserRole, recipe_id)
+                group_item.addChild(recipe_item)
+
+            self.results_tree.addTopLevelItem(group_item)
+            group_item.setExpanded(True)
+
+        if not pantry_ids:
+            self.summary_label.setText("Отметьте хотя бы один продукт")
+        else:
+            self.summary_label.setText(f"Продуктов в кладовой: {len(pantry_ids)}, подходящих рецептов: {total}")
+
+    def on_result_double_clicked(self, item, column):
+        recipe_id = item.data(0, Qt.ItemDataRole.UserRole)
+        if recipe_id is not None:
+            self.recipe_selected.emit(recipe_id)
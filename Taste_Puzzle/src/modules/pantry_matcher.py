@@ -0,0 +1,141 @@
+import re
+from array import array
+
+
+_SET_BIT = re.compile('1')
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> рецепты для режима «Что приготовить?».
+
+    Рецепты пронумерованы позициями 0..N-1. Для каждого ингредиента хранится
+    отсортированный массив позиций его рецептов (array('i')), из которого при
+    первом обращении строится битовое множество (int). Оценка кладовой идет
+    побитово по всему каталогу сразу: число имеющихся ингредиентов каждого
+    рецепта накапливается в «битовых срезах» (i-й срез - i-й бит счетчика),
+    после чего срезы сравниваются с заранее подготовленными срезами
+    «всего ингредиентов - k». На каталоге в 100 тысяч рецептов это десятки
+    операций над целыми длиной 12 КБ вместо цикла по рецептам.
+    """
+
+    def __init__(self, pairs, recipe_names=None):
+        recipe_ingredients = {}
+        for recipe_id, ingredient_id in pairs:
+            recipe_ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+
+        self.recipe_ids = array('i', sorted(recipe_ingredients))
+        self.recipe_ingredients = [frozenset(recipe_ingredients[recipe_id]) for recipe_id in self.recipe_ids]
+        self.totals = [len(ingredients) for ingredients in self.recipe_ingredients]
+
+        postings = {}
+        for position, ingredients in enumerate(self.recipe_ingredients):
+            for ingredient_id in ingredients:
+                postings.setdefault(ingredient_id, []).append(position)
+        self.postings = {ingredient_id: array('i', positions) for ingredient_id, positions in postings.items()}
+
+        self.recipe_names = recipe_names or {}
+
+        self._byte_count = (len(self.recipe_ids) + 7) // 8
+        # Разрядность счетчиков с запасом, чтобы «всего - k» < 0 не совпало ни с одним счетчиком
+        self._plane_count = (max(self.totals, default=0) + 1).bit_length()
+        self._ingredient_masks = {}
+        self._target_planes = {}
+
+    @classmethod
+    def from_database(cls, db):
+        """Строит индекс по текущему содержимому базы данных"""
+        return cls(db.get_recipe_ingredient_pairs(), db.get_recipe_names())
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def _positions_to_mask(self, positions):
+        data = bytearray(self._byte_count)
+        for position in positions:
+            data[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(data, 'little')
+
+    def _mask_to_positions(self, mask):
+        # Двоичная запись в обратном порядке: индекс символа '1' равен позиции рецепта
+        bits = bin(mask)[:1:-1]
+        return [match.start() for match in _SET_BIT.finditer(bits)]
+
+    def _ingredient_mask(self, ingredient_id):
+        """Битовое множество рецептов с данным ингредиентом (строится один раз)"""
+        mask = self._ingredient_masks.get(ingredient_id)
+        if mask is None:
+            mask = self._positions_to_mask(self.postings.get(ingredient_id, ()))
+            self._ingredient_masks[ingredient_id] = mask
+        return mask
+
+    def _targets(self, missing):
+        """Битовые срезы значений «всего ингредиентов - missing» по всем рецептам"""
+        planes = self._target_planes.get(missing)
+        if planes is None:
+            unreachable = (1 << self._plane_count) - 1
+            values = [total - missing if total >= missing else unreachable for total in self.totals]
+            planes = [
+                self._positions_to_mask([position for position, value in enumerate(values) if value >> plane & 1])
+                for plane in range(self._plane_count)
+            ]
+            self._target_planes[missing] = planes
+        return planes
+
+    def _missing_masks(self, pantry, max_missing):
+        """Битовые множества рецептов, которым не хватает ровно 0, 1, ..., max_missing ингредиентов"""
+        planes = [0] * self._plane_count
+        touched = 0
+        for ingredient_id in pantry:
+            carry = self._ingredient_mask(ingredient_id)
+            touched |= carry
+            # Побитовое сложение счетчиков всех рецептов с переносом между срезами
+            for plane in range(self._plane_count):
+                if not carry:
+                    break
+                planes[plane], carry = planes[plane] ^ carry, planes[plane] & carry
+
+        masks = []
+        for missing in range(max_missing + 1):
+            # Рецепт подходит, если все срезы счетчика совпали со срезами «всего - missing»
+            mismatch = 0
+            for have_plane, target_plane in zip(planes, self._targets(missing)):
+                mismatch |= have_plane ^ target_plane
+            masks.append(touched & ~mismatch)
+        return masks
+
+    def match(self, pantry_ids, max_missing=2, limit=None):
+        """Подбирает рецепты по кладовой.
+
+        Возвращает список (recipe_id, missing_ids), где missing_ids - кортеж
+        недостающих ингредиентов. Учитываются рецепты, в которых есть хотя бы
+        один продукт из кладовой. Сначала идут рецепты, которые можно
+        приготовить полностью, затем с 1 и 2 недостающими ингредиентами;
+        внутри группы - по доле имеющихся ингредиентов и по названию.
+        limit ограничивает число рецептов в каждой группе.
+        """
+        pantry = frozenset(ingredient_id for ingredient_id in pantry_ids if ingredient_id in self.postings)
+        if not pantry:
+            return []
+
+        result = []
+        for missing, mask in enumerate(self._missing_masks(pantry, max_missing)):
+            positions = self._mask_to_positions(mask)
+            # При равном числе недостающих выше рецепты, где они составляют меньшую долю
+            positions.sort(key=lambda position: (-self.totals[position],
+                                                 self.recipe_names.get(self.recipe_ids[position], "")))
+            if limit is not None:
+                positions = positions[:limit]
+            result.extend((position, missing) for position in positions)
+
+        # Сами недостающие ингредиенты вычисляем только для отобранных рецептов
+        return [
+            (self.recipe_ids[position], tuple(sorted(self.recipe_ingredients[position] - pantry)))
+            for position, _ in result
+        ]
+
+    def group_by_missing(self, pantry_ids, max_missing=2, limit=None):
+        """Результат match, разложенный по числу недостающих ингредиентов: {0: [...], 1: [...], 2: [...]}"""
+        groups = {missing: [] for missing in range(max_missing + 1)}
+        for recipe_id, missing_ids in self.match(pantry_ids, max_missing, limit):
+            groups[len(missing_ids)].append((recipe_id, missing_ids))
+        return groups
@@ -0,0 +1,347 @@
+import threading
+
+import numpy as np
+
+from src.database import DataBase, Recipe, Nutrition, RecipeScore
+
+
+# Код отсутствующего типа блюда или кухни и время «не указано» в ключе группировки
+MISSING = -1
+NO_COOK_TIME = np.iinfo(np.int64).min
+
+# Столбец каталога -> (позиция в строке DataBase.get_recipe_catalog_rows, тип, значение вместо NULL)
+COLUMNS = {
+    'ids': (0, np.int64, None),
+    'dish_type_ids': (1, np.int64, MISSING),
+    'cuisine_ids': (2, np.int64, MISSING),
+    'cook_times': (3, np.float64, np.nan),
+    'names': (4, object, ''),
+    'calories': (5, np.float64, np.nan),
+    'proteins': (6, np.float64, np.nan),
+    'fats': (7, np.float64, np.nan),
+    'carbohydrates': (8, np.float64, np.nan),
+    'has_nutrition': (9, bool, False),
+}
+
+
+def _columns(rows):
+    """Столбцы NumPy из строк каталога, упорядоченные по id без повторов"""
+    # В старых базах у Nutrition нет первичного ключа - оставляем последнюю строку рецепта
+    rows = sorted({row[0]: row for row in rows}.values(), key=lambda row: row[0])
+    return {
+        name: np.array([missing if row[index] is None else row[index] for row in rows], dtype=dtype)
+        for name, (index, dtype, missing) in COLUMNS.items()
+    }
+
+
+class RecipeCatalog:
+    """Каталог рецептов в памяти: фильтруемые атрибуты в столбцах NumPy.
+
+    Рецепту соответствует позиция в массивах, упорядоченных по id: коды
+    типа блюда и кухни, время приготовления и КБЖУ (NaN - не указаны).
+    Избранное, приготовленное и персональные оценки хранятся по
+    пользователям - маски и массив той же длины, загружаемые при первом
+    запросе пользователя. Фильтры главного окна сводятся к логическим
+    операциям над масками, сортировка - к np.lexsort по тем же ключам,
+    что и в SQL.
+
+    Каталог следит за записью через DataBase.add_write_listener: измененные
+    рецепты перечитываются из базы точечно, данные пользователя
+    сбрасываются и загружаются заново. Названия и ингредиенты в каталоге не
+    индексируются - для запросов с такими фильтрами методы возвращают None,
+    и DataBase выполняет запрос в SQLite.
+    """
+
+    def __init__(self, db, rows, cuisines, version=0):
+        self.db = db
+        # db.write_version на момент загрузки
+        self.version = version
+        self.columns = _columns(rows)
+        self.cuisines_by_name = {}
+        for cuisine_id, name in cuisines:
+            self.cuisines_by_name.setdefault(name, []).append(cuisine_id)
+
+        self._lock = threading.Lock()
+        self._users = {}
+        self._name_ranks = None
+        self._protein_density = None
+        # После ошибки чтения каталог перестает отвечать, все запросы идут в SQLite
+        self._broken = False
+
+    @classmethod
+    def from_database(cls, db):
+        """Загружает каталог одним запросом к базе"""
+        version = db.write_version
+        rows = db.get_recipe_catalog_rows()
+        if rows is None:
+            raise RuntimeError("не удалось прочитать рецепты")
+        return cls(db, rows, db.get_cuisines(), version)
+
+    def __len__(self):
+        return len(self.columns['ids'])
+
+    # ----- Запросы -----
+
+    def column_arrays(self, *names):
+        """Копии столбцов каталога для расчетов вне его блокировки"""
+        with self._lock:
+            return {name: self.columns[name].copy() for name in names}
+
+    def select_ids(self, user_id, cuisine=None, max_time=None, favorites_only=False, cooked_only=False,
+                   ingredient_filter=None, name_filter=None, ingredient_mode=DataBase.INGREDIENT_MODE_ALL,
+                   nutrition_ranges=None, sort=DataBase.SORT_RELEVANCE):
+        """ID рецептов, подходящих под фильтры, в порядке сортировки sort.
+
+        Аргументы те же, что у DataBase.get_recipes_with_filters. Возвращает
+        None, если запрос должен выполняться в SQLite.
+        """
+        if self._needs_sql(ingredient_filter, name_filter):
+            return None
+
+        with self._lock:
+            if self._broken:
+                return None
+            mask = self._filter_mask(user_id, cuisine, max_time, favorites_only, cooked_only,
+                                     nutrition_ranges, sort)
+            if mask is None:
+                return None
+
+            positions = np.flatnonzero(mask)
+            return self.columns['ids'][positions[self._order(user_id, positions, sort)]]
+
+    def facet_groups(self, user_id, ingredient_filter=None, name_filter=None,
+                     ingredient_mode=DataBase.INGREDIENT_MODE_ALL, nutrition_ranges=None,
+                     sort=DataBase.SORT_RELEVANCE):
+        """Группы для счетчиков фильтров в формате DataBase.get_filter_facets.
+
+        {(cuisine_id, dish_type_id, cook_time): [всего, только избранные,
+        только приготовленные, и то и другое]} по рецептам, прошедшим
+        остальные фильтры; None - запрос должен выполняться в SQLite.
+        """
+        if self._needs_sql(ingredient_filter, name_filter):
+            return None
+
+        with self._lock:
+            if self._broken:
+                return None
+            mask = self._filter_mask(user_id, nutrition_ranges=nutrition_ranges, sort=sort)
+            if not mask.any():
+                return {}
+            user = self._user(user_id)
+
+            cook_times = self.columns['cook_times'][mask]
+            known = ~np.isnan(cook_times)
+            times = np.full(len(cook_times), NO_COOK_TIME, dtype=np.int64)
+            times[known] = cook_times[known].astype(np.int64)
+            flags = user['favorites'][mask].astype(np.int64) + 2 * user['cooked'][mask]
+
+            # Ключ группы - одно целое число из номеров значений каждого столбца
+            values, codes = zip(*(np.unique(column, return_inverse=True) for column in
+                                  (self.columns['cuisine_ids'][mask], self.columns['dish_type_ids'][mask], times)))
+            keys = np.ravel_multi_index(tuple(code.ravel() for code in codes) + (flags,),
+                                        tuple(len(value) for value in values) + (4,))
+            keys, counts = np.unique(keys, return_counts=True)
+            positions = np.unravel_index(keys, tuple(len(value) for value in values) + (4,))
+            rows = zip(*(value[position].tolist() for value, position in zip(values, positions)),
+                       positions[3].tolist(), counts.tolist())
+
+        groups = {}
+        for cuisine_id, dish_type_id, cook_time, flag, count in rows:
+            key = (None if cuisine_id == MISSING else cuisine_id,
+                   None if dish_type_id == MISSING else dish_type_id,
+                   None if cook_time == NO_COOK_TIME else cook_time)
+            group = groups.setdefault(key, [0, 0, 0, 0])
+            group[0] += count
+            if flag:
+                group[flag] += count
+        return groups
+
+    @staticmethod
+    def _needs_sql(ingredient_filter, name_filter):
+        """Фильтры по названию и ингредиентам каталог не обслуживает"""
+        if name_filter and name_filter.strip():
+            return True
+        return bool(isinstance(ingredient_filter, list)
+                    and any(name and name.strip() for name in ingredient_filter))
+
+    def _filter_mask(self, user_id, cuisine=None, max_time=None, favorites_only=False, cooked_only=False,
+                     nutrition_ranges=None, sort=DataBase.SORT_RELEVANCE):
+        """Маска рецептов по фильтрам с той же логикой, что DataBase._apply_recipe_filters"""
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+
+        if cuisine and cuisine != "Любая кухня":
+            cuisine_ids = self.cuisines_by_name.get(cuisine)
+            if cuisine_ids is None:
+                # Кухня добавлена после загрузки каталога
+                return None
+            mask &= np.isin(columns['cuisine_ids'], cuisine_ids)
+
+        if max_time:
+            mask &= columns['cook_times'] <= max_time
+
+        if favorites_only:
+            mask &= self._user(user_id)['favorites']
+        if cooked_only:
+            mask &= self._user(user_id)['cooked']
+
+        ranges = [
+            (column, low, high)
+            for column, (low, high) in (nutrition_ranges or {}).items()
+            if column in DataBase.NUTRITION_RANGE_COLUMNS and (low is not None or high is not None)
+        ]
+        if ranges or sort in DataBase.NUTRITION_SORTS:
+            mask &= columns['has_nutrition']
+
+            for column, low, high in ranges:
+                if low is not None and high is not None and low > high:
+                    mask[:] = False
+                    return mask
+                if low is not None:
+                    mask &= columns[column] >= low
+                if high is not None:
+                    mask &= columns[column] <= high
+
+            if sort == DataBase.SORT_CALORIES:
+                mask &= ~np.isnan(columns['calories'])
+            elif sort == DataBase.SORT_PROTEIN_DENSITY:
+                mask &= ~np.isnan(self._density())
+
+        return mask
+
+    def _order(self, user_id, positions, sort):
+        """Перестановка позиций в порядке сортировки DataBase._sort_key"""
+        columns = self.columns
+        ids = columns['ids'][positions]
+
+        if sort == DataBase.SORT_COOK_TIME:
+            cook_times = np.nan_to_num(columns['cook_times'][positions], nan=0.0)
+            return np.lexsort((ids, self._names()[positions], cook_times))
+        if sort == DataBase.SORT_CALORIES:
+            return np.lexsort((ids, columns['calories'][positions]))
+        if sort == DataBase.SORT_PROTEIN_DENSITY:
+            return np.lexsort((ids, self._density()[positions]))[::-1]
+        if sort == DataBase.SORT_RECENT:
+            return np.arange(len(positions))[::-1]
+
+        # Релевантность по убыванию, затем название и id
+        scores = self._scores(user_id)[positions]
+        return np.lexsort((ids, self._names()[positions], -scores))
+
+    def _names(self):
+        """Ранги названий: тот же порядок, что у сравнения строк в SQLite (по кодам символов)"""
+        if self._name_ranks is None:
+            self._name_ranks = np.unique(self.columns['names'], return_inverse=True)[1].ravel()
+        return self._name_ranks
+
+    def _density(self):
+        """Граммы белка на килокалорию, NaN - калорийность не указана или равна нулю"""
+        if self._protein_density is None:
+            calories, proteins = self.columns['calories'], self.columns['proteins']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._protein_density = np.where(calories != 0, proteins / calories, np.nan)
+        return self._protein_density
+
+    def _user(self, user_id):
+        """Маски избранного и приготовленного пользователя (загружаются при первом обращении)"""
+        user = self._users.get(user_id)
+        if user is None:
+            user = {
+                'favorites': self._mask(self.db.get_favorite_recipe_ids(user_id)),
+                'cooked': self._mask(self.db.get_cooked_recipe_ids(user_id)),
+                'scores': None,
+            }
+            self._users[user_id] = user
+        return user
+
+    def _scores(self, user_id):
+        user = self._user(user_id)
+        if user['scores'] is None:
+            scores = np.zeros(len(self))
+            rows = self.db.get_recipe_scores(user_id)
+            if rows:
+                recipe_ids, values = zip(*rows)
+                positions, found = self._positions(np.array(recipe_ids, dtype=np.int64))
+                scores[positions[found]] = np.array(values, dtype=np.float64)[found]
+            user['scores'] = scores
+        return user['scores']
+
+    def _mask(self, recipe_ids):
+        mask = np.zeros(len(self), dtype=bool)
+        positions, found = self._positions(np.fromiter(recipe_ids, dtype=np.int64, count=len(recipe_ids)))
+        mask[positions[found]] = True
+        return mask
+
+    def _positions(self, recipe_ids):
+        """Позиции рецептов в массивах и маска найденных"""
+        ids = self.columns['ids']
+        positions = np.searchsorted(ids, recipe_ids)
+        found = positions < len(ids)
+        found[found] = ids[positions[found]] == recipe_ids[found]
+        return positions, found
+
+    # ----- Изменения -----
+
+    def on_write(self, table, recipe_ids, user_id):
+        """Обработчик DataBase.add_write_listener"""
+        if table in (Recipe.__tablename__, Nutrition.__tablename__):
+            self.reload_recipes(recipe_ids)
+        elif table == RecipeScore.__tablename__:
+            with self._lock:
+                for user in self._users.values():
+                    user['scores'] = None
+        else:
+            with self._lock:
+                if user_id is None:
+                    self._users.clear()
+                else:
+                    self._users.pop(user_id, None)
+
+    def reload_recipes(self, recipe_ids=None):
+        """Перечитывает рецепты recipe_ids (None - весь каталог) из базы.
+
+        Рецепты, которых больше нет в базе, удаляются из каталога, новые
+        добавляются. Если изменилась заметная часть каталога, он
+        перечитывается целиком.
+        """
+        if recipe_ids is not None:
+            recipe_ids = np.unique(np.array(list(recipe_ids), dtype=np.int64))
+            if len(recipe_ids) > len(self) // 4:
+                recipe_ids = None
+
+        rows = self.db.get_recipe_catalog_rows(None if recipe_ids is None else recipe_ids.tolist())
+        with self._lock:
+            if rows is None:
+                self._broken = True
+                return
+
+            if recipe_ids is None:
+                self.columns = _columns(rows)
+                self._users.clear()
+            else:
+                self._apply_rows(recipe_ids, _columns(rows))
+
+            self._name_ranks = None
+            self._protein_density = None
+
+    def _apply_rows(self, recipe_ids, fresh):
+        """Записывает перечитанные строки recipe_ids в столбцы каталога"""
+        positions, found = self._positions(fresh['ids'])
+        for name, values in fresh.items():
+            self.columns[name][positions[found]] = values[found]
+
+        removed_positions, removed = self._positions(recipe_ids[~np.isin(recipe_ids, fresh['ids'])])
+        added = ~found
+        if not removed.any() and not added.any():
+            return
+
+        # Состав каталога изменился: удаляем и добавляем строки, маски пользователей строятся заново
+        keep = np.ones(len(self), dtype=bool)
+        keep[removed_positions[removed]] = False
+        columns = {
+            name: np.concatenate((values[keep], fresh[name][added]))
+            for name, values in self.columns.items()
+        }
+        order = np.argsort(columns['ids'], kind='stable')
+        self.columns = {name: values[order] for name, values in columns.items()}
+        self._users.clear()
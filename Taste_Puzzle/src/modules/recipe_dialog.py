@@ -3,10 +3,11 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QLineEdit, QTextEdit, QComboBox, QSpinBox,
                              QPushButton, QLabel, QMessageBox, QFileDialog, QScrollArea, QTableWidget, QTableWidgetItem,
                              QHeaderView, QDoubleSpinBox, QWidget)
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QPixmap, QIcon
 
-from src.database import Recipe
+from src.modules.image_service import recipe_pixmap
+from src.modules.recipe_query_worker import QueryTask
 
 
 class ClickableLabel(QLabel):
@@ -37,8 +38,16 @@ class RecipeDialog(QDialog):
         self.user_id = user_id
         self.recipe_data = recipe_data
         self.ingredients_data = []
+        self.computed_nutrition = None  # рассчитанные по ингредиентам КБЖУ редактируемого рецепта
+        # Новое изображение (байты JPEG после уменьшения); None - изображение не менялось
         self.image_data = None
+        self.image_placeholder = None
         self.temp_image_path = None
+        # Уменьшение выбранного изображения идет в отдельном потоке
+        self.image_pool = QThreadPool(self)
+        self.image_pool.setMaxThreadCount(1)
+        self.image_tasks = {}  # поколение -> задача; ссылка нужна, пока задача не завершится
+        self.image_generation = 0
 
         self.init_ui()
         if self.recipe_data:
@@ -249,6 +258,9 @@ class RecipeDialog(QDialog):
         add_ingredient_layout.addWidget(self.unit_combo)
         add_ingredient_layout.addWidget(add_ingredient_btn)
 
+        # Подсказки ингредиентов, которые хорошо сочетаются с уже добавленными
+        self.suggestions_layout = QHBoxLayout()
+
         self.ingredients_table = QTableWidget()
         self.ingredients_table.setColumnCount(3)
         self.ingredients_table.setHorizontalHeaderLabels(["Ингредиент", "Количество", "Единица"])
@@ -258,6 +270,7 @@ class RecipeDialog(QDialog):
         remove_ingredient_btn.clicked.connect(self.remove_ingredient)
 
         ingredients_layout.addLayout(add_ingredient_layout)
+        ingredients_layout.addLayout(self.suggestions_layout)
         ingredients_layout.addWidget(self.ingredients_table)
         ingredients_layout.addWidget(remove_ingredient_btn)
 
@@ -289,12 +302,18 @@ class RecipeDialog(QDialog):
         kbju_layout.addWidget(self.proteins_input)
         kbju_layout.addWidget(self.fats_input)
         kbju_layout.addWidget(self.carbs_input)
+
+        calculate_nutrition_btn = QPushButton('🧮 Рассчитать по ингредиентам')
+        calculate_nutrition_btn.setToolTip('Заполнить КБЖУ на порцию по составу и числу порций')
+        calculate_nutrition_btn.clicked.connect(self.calculate_nutrition)
+        kbju_layout.addWidget(calculate_nutrition_btn)
         kbju_layout.addStretch()
 
         # ПАНЕЛЬ КНОПОК УПРАВЛЕНИЯ
         buttons_layout = QHBoxLayout()
         save_btn = QPushButton('Сохранить')
         save_btn.clicked.connect(self.save_recipe)
+        self.save_btn = save_btn
         cancel_btn = QPushButton("Отмена")
         cancel_btn.clicked.connect(self.reject)
 
@@ -325,30 +344,41 @@ class RecipeDialog(QDialog):
             )
 
             if file_name:
-                # Размер файла (максимум 5 МБ)
-                file_size = os.path.getsize(file_name)
-                if file_size > 5 * 1024 * 1024:
-                    QMessageBox.warning(self, "Ошибка", "Файл слишком большой (макс. 5 МБ)")
-                    return
-
-                # Оригинальный путь к файлу
-                self.image_data = file_name
-
-                # Показываем превью
-                pixmap = QPixmap(file_name)
-                if not pixmap.isNull():
-                    # Масштабируем для отображения в метке
-                    scaled_pixmap = pixmap.scaled(
-                        140, 140,
-                        Qt.AspectRatioMode.KeepAspectRatio,
-                        Qt.TransformationMode.SmoothTransformation
-                    )
-                    self.image_label.setPixmap(scaled_pixmap)
-                    self.image_label.setText("")
+                # Файл уменьшается и перекодируется в JPEG вне GUI-потока; до конца
+                # обработки сохранение рецепта недоступно
+                from src.modules.image_processing import prepare_recipe_image
+
+                self.image_generation += 1
+                task = QueryTask(self.image_generation, prepare_recipe_image, (file_name,), {})
+                task.setAutoDelete(False)
+                task.signals.finished.connect(self.on_image_prepared)
+                task.signals.failed.connect(self.on_image_failed)
+                self.image_tasks[self.image_generation] = task
+                self.image_label.setText("Обработка...")
+                self.save_btn.setEnabled(False)
+                self.image_pool.start(task)
 
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки изображения: {str(e)}")
 
+    def on_image_prepared(self, generation, result):
+        """Принимает уменьшенное изображение; результаты прежнего выбора файла отбрасываются"""
+        self.image_tasks.pop(generation, None)
+        if generation != self.image_generation:
+            return
+        self.save_btn.setEnabled(True)
+        self.image_data, preview, self.image_placeholder = result
+        self.image_label.setPixmap(QPixmap.fromImage(preview))
+        self.image_label.setText("")
+
+    def on_image_failed(self, generation, message):
+        self.image_tasks.pop(generation, None)
+        if generation != self.image_generation:
+            return
+        self.save_btn.setEnabled(True)
+        self.image_label.setText("Изображение\nне выбрано" if self.image_data is None else "")
+        QMessageBox.critical(self, "Ошибка", f"Ошибка загрузки изображения: {message}")
+
     def add_ingredient(self):
         # Метод добавления ингредиента в таблицу
         try:
@@ -379,10 +409,37 @@ class RecipeDialog(QDialog):
 
             # Очистка полей ввода
             self.quantity_input.setValue(100)
+            self.update_ingredient_suggestions()
 
         except Exception as e:
             QMessageBox.critical(self, 'Ошибка', f'Ошибка при добавлении ингредиента: {e}')
 
+    def update_ingredient_suggestions(self):
+        """Показывает ингредиенты, которые часто встречаются вместе с уже добавленными"""
+        while self.suggestions_layout.count():
+            item = self.suggestions_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+
+        suggestions = self.db.get_ingredient_suggestions([ing[0] for ing in self.ingredients_data], limit=5)
+        if not suggestions:
+            return
+
+        self.suggestions_layout.addWidget(QLabel('Сочетается:'))
+        for ing_id, ing_name in suggestions:
+            suggestion_btn = QPushButton(ing_name)
+            suggestion_btn.setToolTip('Выбрать ингредиент для добавления')
+            suggestion_btn.clicked.connect(lambda checked=False, ing_id=ing_id: self.select_suggested_ingredient(ing_id))
+            self.suggestions_layout.addWidget(suggestion_btn)
+        self.suggestions_layout.addStretch()
+
+    def select_suggested_ingredient(self, ing_id):
+        """Выбирает подсказанный ингредиент в списке, чтобы осталось указать количество"""
+        index = self.ingredient_combo.findData(ing_id)
+        if index >= 0:
+            self.ingredient_combo.setCurrentIndex(index)
+            self.quantity_input.setFocus()
+
     def remove_ingredient(self):
         # Метод удаления выбранного ингредиента из таблицы
         try:
@@ -390,6 +447,7 @@ class RecipeDialog(QDialog):
             if current_row >= 0:
                 self.ingredients_data.pop(current_row)
                 self.ingredients_table.removeRow(current_row)
+                self.update_ingredient_suggestions()
             else:
                 QMessageBox.warning(self, 'Ошибка', 'Выберите ингредиент для удаления')
         except Exception as e:
@@ -408,12 +466,10 @@ class RecipeDialog(QDialog):
                 return
 
             # Получаем рецепт из базы
-            session = self.db.Session()
-            recipe = session.query(Recipe).filter_by(id=recipe_id).first()
+            recipe = self.db.get_recipe_details(recipe_id)
 
             if not recipe:
                 QMessageBox.warning(self, 'Ошибка', 'Рецепт не найден')
-                session.close()
                 return
 
             # Загрузка основных данных рецепта
@@ -447,20 +503,14 @@ class RecipeDialog(QDialog):
 
             # Загрузка изображения если есть
             if recipe.image:
-                # get_recipe_image возвращает QPixmap
-                pixmap = self.db.get_recipe_image(recipe.id)
+                pixmap = recipe_pixmap(self.db, recipe.id, recipe.name)
                 if pixmap and not pixmap.isNull():
                     scaled_pixmap = pixmap.scaled(140, 140,
                                                   Qt.AspectRatioMode.KeepAspectRatio,
                                                   Qt.TransformationMode.SmoothTransformation)
                     self.image_label.setPixmap(scaled_pixmap)
                     self.image_label.setText("")
-                    # Сохраняем путь к изображению для возможного пересохранения
-                    current_dir = os.path.dirname(os.path.abspath(__file__))
-                    project_root = os.path.dirname(current_dir)
-                    image_path = os.path.join(project_root, 'img', 'recipe_img', recipe.image)
-                    if os.path.exists(image_path):
-                        self.image_data = image_path
+                    # image_data остается None: без нового выбора изображение не пересохраняется
 
             ingredients = self.db.get_recipe_ingredients(recipe.id)
             for ing in ingredients:  # ing - это кортеж (name, quantity, unit)
@@ -489,8 +539,10 @@ class RecipeDialog(QDialog):
                 self.proteins_input.setValue(recipe.nutrition.proteins or 0)
                 self.fats_input.setValue(recipe.nutrition.fats or 0)
                 self.carbs_input.setValue(recipe.nutrition.carbohydrates or 0)
+                if recipe.nutrition.computed:
+                    self.computed_nutrition = self.nutrition_values()
 
-            session.close()
+            self.update_ingredient_suggestions()
 
         except Exception as e:
             QMessageBox.critical(self, 'Ошибка', f'Ошибка при загрузке данных рецепта: {e}')
@@ -527,6 +579,45 @@ class RecipeDialog(QDialog):
 
         return True
 
+    def nutrition_values(self):
+        return (
+            self.calories_input.value(),
+            self.proteins_input.value(),
+            self.fats_input.value(),
+            self.carbs_input.value()
+        )
+
+    def calculate_nutrition(self):
+        """Заполняет КБЖУ на порцию по ингредиентам рецепта"""
+        if not self.ingredients_data:
+            QMessageBox.warning(self, 'Ошибка', 'Добавьте хотя бы один ингредиент')
+            return
+
+        try:
+            from src.modules.nutrition_calculator import NutritionCalculator
+        except ImportError as e:
+            QMessageBox.warning(self, 'Ошибка', f'Расчет пищевой ценности недоступен: {e}')
+            return
+
+        calculator = NutritionCalculator.from_database(self.db)
+        quantities = [(0, ing_id, self.db._format_quantity(quantity, unit))
+                      for ing_id, quantity, unit in self.ingredients_data]
+        values = calculator.compute(quantities, {0: self.servings_input.value()}).get(0)
+        if values is None:
+            QMessageBox.information(
+                self, 'Пищевая ценность',
+                'Не для всех ингредиентов известна пищевая ценность или единица измерения'
+            )
+            return
+
+        calories, proteins, fats, carbohydrates = values
+        self.calories_input.setValue(calories)
+        self.proteins_input.setValue(proteins)
+        self.fats_input.setValue(fats)
+        self.carbs_input.setValue(carbohydrates)
+        # Нетронутые рассчитанные значения сохраняются как рассчитанные (см. save_recipe)
+        self.computed_nutrition = self.nutrition_values()
+
     def save_recipe(self):
         """Метод сохранения рецепта"""
         try:
@@ -564,13 +655,11 @@ class RecipeDialog(QDialog):
                 if reply == QMessageBox.StandardButton.No:
                     return
 
-            # Формируем данные КБЖУ
-            nutrition_data = (
-                self.calories_input.value(),
-                self.proteins_input.value(),
-                self.fats_input.value(),
-                self.carbs_input.value()
-            )
+            # Формируем данные КБЖУ. Нетронутые рассчитанные значения не сохраняем
+            # как ручные: после сохранения они пересчитаются по новому составу
+            nutrition_data = self.nutrition_values()
+            if self.computed_nutrition is not None and nutrition_data == self.computed_nutrition:
+                nutrition_data = (0, 0, 0, 0)
 
             # Формируем ингредиенты в правильном формате для БД
             ingredients_list = []
@@ -610,23 +699,13 @@ class RecipeDialog(QDialog):
                     cook_time=self.cook_time_input.value(),
                     ingredients_list=ingredients_list,
                     nutrition_data=nutrition_data,
-                    image=image_data
+                    image=image_data,
+                    image_placeholder=self.image_placeholder
                 )
 
                 # Обновляем дополнительные поля
-                if success:
-                    session = self.db.Session()
-                    try:
-                        recipe = session.query(Recipe).filter_by(id=recipe_id).first()
-                        if recipe:
-                            recipe.servings = servings
-                            recipe.external_url = video_url
-                            session.commit()
-                            print("Дополнительные поля обновлены")
-                    except Exception as e:
-                        print(f"Ошибка обновления доп. полей: {e}")
-                    finally:
-                        session.close()
+                if success and self.db.update_recipe_details(recipe_id, servings, video_url):
+                    print("Дополнительные поля обновлены")
 
             else:
                 # Режим добавления нового рецепта
@@ -640,23 +719,14 @@ class RecipeDialog(QDialog):
                     cook_time=self.cook_time_input.value(),
                     ingredients_list=ingredients_list,
                     nutrition_data=nutrition_data,
-                    image=image_data
+                    image=image_data,
+                    image_placeholder=self.image_placeholder
                 )
                 success = recipe_id is not None
 
                 # Обновляем дополнительные поля
                 if success:
-                    session = self.db.Session()
-                    try:
-                        recipe = session.query(Recipe).filter_by(id=recipe_id).first()
-                        if recipe:
-                            recipe.servings = servings
-                            recipe.external_url = video_url
-                            session.commit()
-                    except Exception as e:
-                        print(f"Ошибка добавления доп. полей: {e}")
-                    finally:
-                        session.close()
+                    self.db.update_recipe_details(recipe_id, servings, video_url)
 
             if success:
                 print("✅ РЕЦЕПТ УСПЕШНО СОХРАНЕН!")
@@ -694,11 +764,15 @@ class RecipeCardDialog(QDialog):
     recipe_updated = pyqtSignal()
     recipe_deleted = pyqtSignal(int)
     add_to_cart = pyqtSignal(list)
+    # Пользователь выбрал рецепт в блоке «Похожие рецепты»
+    recipe_selected = pyqtSignal(int)
 
-    def __init__(self, recipe_data, db, user_id):
+    def __init__(self, recipe_data, db, user_id, session_state=None, similarity=None):
         super().__init__()
         self.db = db
         self.user_id = user_id
+        self.session_state = session_state
+        self.similarity = similarity
 
         # Получаем объект рецепта по ID
         if isinstance(recipe_data, int):
@@ -710,18 +784,7 @@ class RecipeCardDialog(QDialog):
             self.reject()
             return
 
-        # Используем прямой запрос к сессии
-        session = self.db.Session()
-        try:
-            from sqlalchemy.orm import joinedload
-
-            self.recipe = session.query(Recipe).options(
-                joinedload(Recipe.cuisine),
-                joinedload(Recipe.dish_type),
-                joinedload(Recipe.nutrition)
-            ).filter(Recipe.id == self.recipe_id).first()
-        finally:
-            session.close()
+        self.recipe = self.db.get_recipe_details(self.recipe_id)
 
         if not self.recipe:
             QMessageBox.warning(None, 'Ошибка', 'Рецепт не найден')
@@ -870,7 +933,7 @@ class RecipeCardDialog(QDialog):
             }
         """)
 
-        pixmap = self.db.get_recipe_image(self.recipe.id)
+        pixmap = recipe_pixmap(self.db, self.recipe.id, self.recipe.name)
         if pixmap and not pixmap.isNull():
             scaled_pixmap = pixmap.scaled(210, 170, Qt.AspectRatioMode.KeepAspectRatio,
                                           Qt.TransformationMode.SmoothTransformation)
@@ -1116,6 +1179,14 @@ class RecipeCardDialog(QDialog):
             nutrition_layout.addStretch()
             layout.addWidget(nutrition_box)
 
+        # === БЛОК: Похожие рецепты ===
+        similar_box = self.create_similar_recipes_box()
+        if similar_box is not None:
+            similar_label = QLabel("🔎 Похожие рецепты")
+            similar_label.setProperty("class", "section-header")
+            layout.addWidget(similar_label)
+            layout.addWidget(similar_box)
+
         # === ШЕСТОЙ БЛОК ===
         buttons_label = QLabel("⚡ Действия")
         buttons_label.setProperty("class", "section-header")
@@ -1153,7 +1224,7 @@ class RecipeCardDialog(QDialog):
         delete_btn.setFixedSize(70, 70)
         delete_btn.clicked.connect(self.delete_recipe)
 
-        is_favorite = self.db.is_favorite(self.user_id, self.recipe.id)
+        is_favorite = self.is_recipe_favorite()
         favorite_icon = "❤️" if is_favorite else "🤍"
         self.favorite_btn = QPushButton(favorite_icon)
         self.favorite_btn.setObjectName("favorite_btn")
@@ -1161,7 +1232,7 @@ class RecipeCardDialog(QDialog):
         self.favorite_btn.setFixedSize(70, 70)
         self.favorite_btn.clicked.connect(self.toggle_favorite)
 
-        is_cooked = self.db.is_cooked(self.user_id, self.recipe.id)
+        is_cooked = self.is_recipe_cooked()
         cooked_icon = "✅" if is_cooked else "⏳"
         self.cooked_btn = QPushButton(cooked_icon)
         self.cooked_btn.setObjectName("cooked_btn")
@@ -1187,6 +1258,55 @@ class RecipeCardDialog(QDialog):
         main_layout.addWidget(scroll)
         self.setLayout(main_layout)
 
+    def create_similar_recipes_box(self):
+        """Список рецептов с похожим составом (None, если показывать нечего)"""
+        if self.similarity is None:
+            return None
+
+        try:
+            similar = self.similarity.similar(self.recipe.id)
+            names = self.db.get_recipe_names([recipe_id for recipe_id, _ in similar]) if similar else {}
+        except Exception as e:
+            print(f"Ошибка подбора похожих рецептов: {e}")
+            return None
+
+        similar = [(recipe_id, score) for recipe_id, score in similar if recipe_id in names]
+        if not similar:
+            return None
+
+        similar_box = QWidget()
+        similar_box.setStyleSheet("""
+            QWidget {
+                background-color: white;
+                border-radius: 10px;
+                border: 1px solid #dee2e6;
+            }
+            QLabel {
+                border: none;
+                font-size: 14px;
+            }
+        """)
+        similar_layout = QVBoxLayout(similar_box)
+        similar_layout.setContentsMargins(15, 10, 15, 10)
+
+        for recipe_id, score in similar:
+            row_layout = QHBoxLayout()
+            name_label = ClickableLabel(names[recipe_id])
+            name_label.clicked.connect(lambda rid=recipe_id: self.open_similar_recipe(rid))
+            score_label = QLabel(f"совпадение {score:.0%}")
+            score_label.setStyleSheet("color: #6c757d;")
+            row_layout.addWidget(name_label)
+            row_layout.addStretch()
+            row_layout.addWidget(score_label)
+            similar_layout.addLayout(row_layout)
+
+        return similar_box
+
+    def open_similar_recipe(self, recipe_id):
+        """Закрывает карточку и просит открыть выбранный похожий рецепт"""
+        self.accept()
+        self.recipe_selected.emit(recipe_id)
+
     def edit_recipe(self):
         """Открывает диалог редактирования рецепта"""
         try:
@@ -1246,17 +1366,27 @@ class RecipeCardDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", "Не удалось добавить ингредиенты в корзину")
 
+    def is_recipe_favorite(self):
+        """Проверяет, находится ли рецепт в избранном (по состоянию сессии, если оно передано)"""
+        if self.session_state is not None:
+            return self.session_state.is_favorite(self.recipe.id)
+        return self.db.is_recipe_favorite(self.user_id, self.recipe.id)
+
+    def is_recipe_cooked(self):
+        """Проверяет, отмечен ли рецепт как приготовленный (по состоянию сессии, если оно передано)"""
+        if self.session_state is not None:
+            return self.session_state.is_cooked(self.recipe.id)
+        return self.db.is_recipe_cooked(self.user_id, self.recipe.id)
+
     def toggle_favorite(self):
         """Добавляет или убирает рецепт из избранного"""
         try:
-            is_favorite = self.db.is_recipe_favorite(self.user_id, self.recipe.id)
+            new_status = not self.is_recipe_favorite()
 
-            if is_favorite:
-                success = self.db.toggle_favorite(self.user_id, self.recipe.id)
-                new_status = False
+            if self.session_state is not None:
+                success = self.session_state.set_favorite(self.recipe.id, new_status)
             else:
-                success = self.db.toggle_favorite(self.user_id, self.recipe.id)
-                new_status = True
+                success = self.db.set_favorite(self.user_id, self.recipe.id, new_status)
 
             if success:
                 favorite_icon = "❤️" if new_status else "🤍"
@@ -1275,8 +1405,11 @@ class RecipeCardDialog(QDialog):
     def toggle_cooked_status(self):
         """Переключает статус приготовления рецепта"""
         try:
-            is_cooked = self.db.is_recipe_cooked(self.user_id, self.recipe.id)
-            success = self.db.mark_recipe_as_cooked(self.user_id, self.recipe.id, not is_cooked)
+            is_cooked = self.is_recipe_cooked()
+            if self.session_state is not None:
+                success = self.session_state.set_cooked(self.recipe.id, not is_cooked)
+            else:
+                success = self.db.mark_recipe_as_cooked(self.user_id, self.recipe.id, not is_cooked)
 
             if success:
                 new_status = not is_cooked
@@ -0,0 +1,147 @@
+from functools import partial
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+def load_recipe_sections(db, user_id, filters, page_size):
+    """Выполняет запросы главной страницы: счетчики фильтров, категорий и первые страницы секций.
+
+    Вызывается в рабочем потоке, поэтому не трогает виджеты. Каждый метод
+    DataBase открывает собственную сессию, так что поток не делит сессию с GUI.
+    Счетчики категорий берутся из того же прохода, что и счетчики фильтров.
+    """
+    facets = db.get_filter_facets(user_id, **filters)
+    category_counts = facets['dish_type']
+
+    first_pages = {}
+    for category, count in category_counts.items():
+        if count:
+            first_pages[category] = db.get_recipes_page(
+                user_id, dish_type=category, page_size=page_size, **filters
+            )
+
+    return filters, facets, first_pages
+
+
+class QuerySignals(QObject):
+    """Сигналы задачи запроса (QRunnable не может объявлять сигналы сам)"""
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class QueryTask(QRunnable):
+    """Задача пула потоков, выполняющая функцию запроса с номером поколения"""
+
+    def __init__(self, generation, func, args, kwargs):
+        super().__init__()
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = QuerySignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        else:
+            self.signals.finished.emit(self.generation, result)
+
+
+class RecipeQueryRunner(QObject):
+    """Выполняет запросы фильтрации вне GUI-потока и отбрасывает устаревшие результаты.
+
+    Каждый вызов submit увеличивает счетчик поколений; результат применяется
+    только если он относится к последнему запросу. Еще не начатые задачи
+    предыдущих поколений снимаются из очереди пула.
+
+    Дозапросы к уже примененному результату (следующие страницы секций)
+    ставятся через submit_page с поколением, к которому они относятся, и не
+    меняют счетчик: их результат отбрасывается, если с тех пор был новый submit.
+    """
+
+    result_ready = pyqtSignal(object)
+    error = pyqtSignal(str)
+    page_ready = pyqtSignal(object, object)  # ключ дозапроса, результат
+    page_failed = pyqtSignal(object, str)  # ключ дозапроса, сообщение об ошибке
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.generation = 0
+        self._tasks = {}
+        self._page_tasks = {}
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит запрос в очередь и возвращает его номер поколения"""
+        self.generation += 1
+        # Дозапросы прежних поколений, еще не начатые, больше не нужны
+        for key, task in list(self._page_tasks.items()):
+            if self.pool.tryTake(task):
+                del self._page_tasks[key]
+        self.pool.clear()
+
+        task = QueryTask(self.generation, func, args, kwargs)
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+
+        # Храним ссылку на задачу, пока не придет ее результат
+        self._tasks[self.generation] = task
+        self.pool.start(task)
+        return self.generation
+
+    def submit_page(self, generation, key, func, *args, **kwargs):
+        """Ставит в очередь дозапрос к результату поколения generation.
+
+        key - хешируемый ключ дозапроса (например, секция), он возвращается
+        в page_ready/page_failed. Возвращает False, если поколение уже устарело
+        и запрос не поставлен.
+        """
+        if not self.is_current(generation):
+            return False
+
+        task = QueryTask(generation, func, args, kwargs)
+        task.setAutoDelete(False)
+        task.signals.finished.connect(partial(self._on_page_finished, key))
+        task.signals.failed.connect(partial(self._on_page_failed, key))
+
+        # Как и для submit, ссылка на задачу хранится до ее результата
+        self._page_tasks[key] = task
+        self.pool.start(task)
+        return True
+
+    def is_current(self, generation):
+        """Проверяет, относится ли результат к последнему запросу"""
+        return generation == self.generation
+
+    def wait_for_done(self, msecs=-1):
+        """Ожидает завершения всех запущенных запросов"""
+        return self.pool.waitForDone(msecs)
+
+    def _on_finished(self, generation, result):
+        self._forget_stale_tasks(generation)
+        if self.is_current(generation):
+            self.result_ready.emit(result)
+
+    def _on_failed(self, generation, message):
+        self._forget_stale_tasks(generation)
+        if self.is_current(generation):
+            self.error.emit(message)
+
+    def _on_page_finished(self, key, generation, result):
+        self._page_tasks.pop(key, None)
+        if self.is_current(generation):
+            self.page_ready.emit(key, result)
+
+    def _on_page_failed(self, key, generation, message):
+        self._page_tasks.pop(key, None)
+        if self.is_current(generation):
+            self.page_failed.emit(key, message)
+
+    def _forget_stale_tasks(self, generation):
+        """Освобождает задачи поколений, предшествующих завершившемуся"""
+        for task_generation in [g for g in self._tasks if g < generation]:
+            del self._tasks[task_generation]
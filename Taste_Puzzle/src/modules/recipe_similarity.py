@@ -0,0 +1,195 @@
+import numpy as np
+
+
+class RecipeSimilarity:
+    """Похожие рецепты по составу: TF-IDF векторы ингредиентов и косинусная близость.
+
+    Матрица рецепт×ингредиент хранится разреженно по столбцам: для каждого
+    ингредиента - массив позиций рецептов, в которых он встречается. TF у
+    ингредиента рецепта бинарный, поэтому вес ячейки равен IDF столбца.
+    Близость к рецепту q считается одним np.bincount по позициям из
+    столбцов его ингредиентов с весами idf², после чего делится на нормы
+    строк, а лучшие top_k выбираются через np.argpartition без сортировки
+    всего каталога.
+
+    Изменения рецептов применяются точечно (update_recipe / remove_recipe):
+    меняются только столбцы ингредиентов рецепта, веса и нормы строк
+    пересчитываются векторно при следующем запросе. Результаты кэшируются
+    по рецепту; после изменения сбрасываются записи рецептов с общими
+    ингредиентами и тех, в чьей выдаче был измененный рецепт.
+    """
+
+    def __init__(self, pairs, top_k=6):
+        self.top_k = top_k
+
+        self.recipe_ids = []        # позиция -> recipe_id (None для удаленных)
+        self.positions = {}         # recipe_id -> позиция
+        self.recipe_columns = []    # позиция -> массив столбцов ингредиентов
+        self.columns = {}           # ingredient_id -> столбец
+        self.postings = []          # столбец -> массив позиций рецептов
+
+        self._idf = np.zeros(0)
+        self._norms = np.zeros(0)
+        self._weights_dirty = True
+        self._cache = {}
+
+        self._build(pairs)
+
+    @classmethod
+    def from_database(cls, db, top_k=6):
+        """Строит матрицу по текущему содержимому базы данных"""
+        return cls(db.get_recipe_ingredient_pairs(), top_k)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _build(self, pairs):
+        """Векторная сборка столбцов из пар (recipe_id, ingredient_id)"""
+        data = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        if not len(data):
+            return
+
+        # Пары упорядочены по рецепту и очищены от повторов через сортировку одного ключа
+        keys = np.sort((data[:, 0] << 32) | data[:, 1])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        recipe_keys = keys >> 32
+        ingredient_keys = keys & 0xFFFFFFFF
+
+        row_starts = np.concatenate(([True], recipe_keys[1:] != recipe_keys[:-1]))
+        recipe_ids = recipe_keys[row_starts]
+        recipe_positions = (np.cumsum(row_starts) - 1).astype(np.int32)
+
+        ingredient_ids = np.sort(ingredient_keys)
+        ingredient_ids = ingredient_ids[np.concatenate(([True], ingredient_ids[1:] != ingredient_ids[:-1]))]
+        ingredient_columns = np.searchsorted(ingredient_ids, ingredient_keys).astype(np.int32)
+
+        self.recipe_ids = recipe_ids.tolist()
+        self.positions = {recipe_id: position for position, recipe_id in enumerate(self.recipe_ids)}
+        self.columns = {ingredient_id: column for column, ingredient_id in enumerate(ingredient_ids.tolist())}
+
+        # Строки рецептов - непрерывные отрезки отсортированных пар
+        row_bounds = np.flatnonzero(row_starts[1:]) + 1
+        self.recipe_columns = np.split(ingredient_columns, row_bounds)
+
+        order = np.argsort(ingredient_columns, kind='stable')
+        column_bounds = np.flatnonzero(np.diff(ingredient_columns[order])) + 1
+        self.postings = np.split(recipe_positions[order], column_bounds)
+
+        self._weights_dirty = True
+        self._cache.clear()
+
+    def _column(self, ingredient_id):
+        column = self.columns.get(ingredient_id)
+        if column is None:
+            column = len(self.postings)
+            self.columns[ingredient_id] = column
+            self.postings.append(np.zeros(0, dtype=np.int32))
+        return column
+
+    def _ensure_weights(self):
+        """Пересчитывает IDF столбцов и нормы строк после изменений"""
+        if not self._weights_dirty:
+            return
+
+        document_frequency = np.array([len(positions) for positions in self.postings], dtype=np.float64)
+        # Сглаженный IDF: ингредиенты из каждого второго рецепта почти не влияют на близость
+        self._idf = np.log((1 + len(self.positions)) / (1 + document_frequency)) + 1
+
+        if self.postings:
+            lengths = document_frequency.astype(np.int64)
+            squared = np.bincount(np.concatenate(self.postings),
+                                  weights=np.repeat(self._idf ** 2, lengths),
+                                  minlength=len(self.recipe_ids))
+        else:
+            squared = np.zeros(len(self.recipe_ids))
+        self._norms = np.sqrt(squared)
+        self._weights_dirty = False
+
+    def similar(self, recipe_id):
+        """Список (recipe_id, близость) до top_k рецептов, похожих на данный, по убыванию близости"""
+        cached = self._cache.get(recipe_id)
+        if cached is not None:
+            return cached
+
+        position = self.positions.get(recipe_id)
+        if position is None or not len(self.recipe_columns[position]):
+            return []
+
+        self._ensure_weights()
+        columns = self.recipe_columns[position]
+        postings = [self.postings[column] for column in columns]
+        scores = np.bincount(np.concatenate(postings),
+                             weights=np.repeat(self._idf[columns] ** 2, [len(p) for p in postings]),
+                             minlength=len(self.recipe_ids))
+        scores /= np.maximum(self._norms * self._norms[position], 1e-12)
+        scores[position] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > self.top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], self.top_k - 1)[:self.top_k]]
+        # Среди отобранных: по убыванию близости, при равенстве - по позиции
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        result = [(self.recipe_ids[candidate], float(scores[candidate])) for candidate in candidates]
+        self._cache[recipe_id] = result
+        return result
+
+    def _invalidate(self, recipe_id, columns):
+        """Сбрасывает кэш рецептов, на выдачу которых могло повлиять изменение recipe_id"""
+        self._cache.pop(recipe_id, None)
+        if len(columns):
+            for position in np.unique(np.concatenate([self.postings[column] for column in columns])).tolist():
+                self._cache.pop(self.recipe_ids[position], None)
+
+        stale = [key for key, result in self._cache.items()
+                 if any(similar_id == recipe_id for similar_id, _ in result)]
+        for key in stale:
+            del self._cache[key]
+
+        self._weights_dirty = True
+
+    def _detach(self, position):
+        """Убирает строку рецепта из столбцов, возвращает ее прежние столбцы"""
+        old_columns = self.recipe_columns[position]
+        for column in old_columns.tolist():
+            positions = self.postings[column]
+            self.postings[column] = positions[positions != position]
+        return old_columns
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        """Добавляет рецепт или заменяет его набор ингредиентов"""
+        position = self.positions.get(recipe_id)
+        if position is None:
+            position = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+            self.positions[recipe_id] = position
+            self.recipe_columns.append(np.zeros(0, dtype=np.int32))
+            old_columns = self.recipe_columns[position]
+        else:
+            old_columns = self._detach(position)
+
+        new_columns = np.array(sorted({self._column(ingredient_id) for ingredient_id in ingredient_ids}),
+                               dtype=np.int32)
+        for column in new_columns.tolist():
+            self.postings[column] = np.append(self.postings[column], np.int32(position))
+        self.recipe_columns[position] = new_columns
+
+        self._invalidate(recipe_id, np.union1d(old_columns, new_columns).astype(np.int32))
+
+    def remove_recipe(self, recipe_id):
+        """Удаляет рецепт из матрицы; его позиция остается пустой строкой"""
+        position = self.positions.pop(recipe_id, None)
+        if position is None:
+            return
+
+        old_columns = self._detach(position)
+        self.recipe_ids[position] = None
+        self.recipe_columns[position] = np.zeros(0, dtype=np.int32)
+        self._invalidate(recipe_id, old_columns)
+
+    def on_recipe_changed(self, recipe_id, ingredient_ids, previous_ids=()):
+        """Обработчик изменений рецептов из DataBase (ingredient_ids = None при удалении)"""
+        if ingredient_ids is None:
+            self.remove_recipe(recipe_id)
+        else:
+            self.update_recipe(recipe_id, ingredient_ids)
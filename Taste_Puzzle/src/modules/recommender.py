@@ -0,0 +1,144 @@
+import numpy as np
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+
+from src.modules.recipe_query_worker import QueryTask
+
+
+# Сколько лучших оценок хранить на пользователя; остальные рецепты идут с релевантностью 0
+MAX_SCORES_PER_USER = 500
+# Сколько пользователей обрабатывать за один матричный шаг
+USER_BATCH = 256
+
+
+def item_item_scores(interactions, max_per_user=MAX_SCORES_PER_USER):
+    """Item-item коллаборативная фильтрация по неявным оценкам.
+
+    interactions - список (user_id, recipe_id, вес). Близость рецептов i и j -
+    косинус их столбцов в матрице пользователь×рецепт X, оценка рецепта j
+    для пользователя u - сумма X[u, i] * cos(i, j) по его рецептам. В
+    матричном виде это (X[u] @ Nᵀ) @ N, где N - X с нормированными столбцами,
+    так что промежуточный результат имеет размер «пользователи», а не
+    «рецепты × рецепты». Матрица строится только по рецептам, с которыми
+    кто-то взаимодействовал: у остальных оценка все равно нулевая.
+
+    Возвращает список (user_id, recipe_id, score) - до max_per_user лучших
+    рецептов каждого пользователя.
+    """
+    if not interactions:
+        return []
+
+    data = np.array(interactions, dtype=np.float64).reshape(-1, 3)
+    user_ids, users = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    recipe_ids, recipes = np.unique(data[:, 1].astype(np.int64), return_inverse=True)
+
+    matrix = np.zeros((len(user_ids), len(recipe_ids)), dtype=np.float32)
+    np.add.at(matrix, (users, recipes), data[:, 2].astype(np.float32))
+
+    norms = np.sqrt((matrix ** 2).sum(axis=0))
+    normalized = matrix / np.maximum(norms, 1e-12)
+
+    result = []
+    for start in range(0, len(user_ids), USER_BATCH):
+        batch = matrix[start:start + USER_BATCH]
+        scores = (batch @ normalized.T) @ normalized
+
+        for offset, user_scores in enumerate(scores):
+            candidates = np.flatnonzero(user_scores > 0)
+            if len(candidates) > max_per_user:
+                candidates = candidates[np.argpartition(-user_scores[candidates], max_per_user - 1)[:max_per_user]]
+
+            user_id = int(user_ids[start + offset])
+            result.extend(
+                (user_id, int(recipe_ids[candidate]), float(user_scores[candidate]))
+                for candidate in candidates
+            )
+
+    return result
+
+
+def train_recipe_scores(db, min_pending=0):
+    """Обучает рекомендации и сохраняет оценки в recipe_scores.
+
+    Обучение пропускается, если модель уже обучалась и с тех пор накопилось
+    меньше min_pending изменений. Возвращает число сохраненных оценок или
+    None, если обучение не понадобилось.
+    """
+    pending, trained_at = db.get_recommender_status()
+    if trained_at is not None and pending < min_pending:
+        return None
+
+    scores = item_item_scores(db.get_interactions())
+    if not db.save_recipe_scores(scores, pending):
+        return None
+    return len(scores)
+
+
+class RecommenderTrainer(QObject):
+    """Переобучает персональные рекомендации в фоновом потоке.
+
+    При запуске проверяет, накопилось ли достаточно новых взаимодействий
+    (счетчик хранится в БД), и по ходу сессии повторяет проверку после
+    каждых RETRAIN_THRESHOLD изменений избранного или приготовленных.
+    Одновременно выполняется не больше одного обучения.
+    """
+
+    trained = pyqtSignal(int)  # число сохраненных оценок
+
+    # Сколько новых взаимодействий оправдывают переобучение
+    RETRAIN_THRESHOLD = 10
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.session_interactions = 0
+        self._task = None
+        self._rerun = False
+
+    def maybe_train(self):
+        """Запускает обучение, если с прошлого раза накопилось достаточно взаимодействий"""
+        self._start(self.RETRAIN_THRESHOLD)
+
+    def train_now(self):
+        """Запускает обучение независимо от счетчика взаимодействий"""
+        self._start(0)
+
+    def note_interaction(self, *args):
+        """Учитывает изменение избранного или приготовленных (аргументы сигнала не нужны)"""
+        self.session_interactions += 1
+        if self.session_interactions >= self.RETRAIN_THRESHOLD:
+            self.session_interactions = 0
+            self.maybe_train()
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _start(self, min_pending):
+        if self._task is not None:
+            # Изменения во время обучения проверим сразу после него
+            self._rerun = True
+            return
+
+        self._task = QueryTask(0, train_recipe_scores, (self.db,), {'min_pending': min_pending})
+        self._task.setAutoDelete(False)
+        self._task.signals.finished.connect(self._on_finished)
+        self._task.signals.failed.connect(self._on_failed)
+        self.pool.start(self._task)
+
+    def _on_finished(self, generation, saved):
+        self._task = None
+        if saved is not None:
+            self.trained.emit(saved)
+        self._continue()
+
+    def _on_failed(self, generation, message):
+        self._task = None
+        print(f"Ошибка обучения рекомендаций: {message}")
+        self._continue()
+
+    def _continue(self):
+        if self._rerun:
+            self._rerun = False
+            self.maybe_train()
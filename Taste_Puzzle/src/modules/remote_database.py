@@ -0,0 +1,269 @@
+import copy
+import http.client
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, urlencode, urlsplit
+
+from src.database import DataBase
+from src.modules.catalog_protocol import AUTH_METHODS, READ_METHODS, WRITE_METHODS, dumps, loads
+
+
+# Тела ответов на чтение по (метод, запрос): повторное чтение отправляет If-None-Match
+ETAG_CACHE_SIZE = 256
+# Методы записи, которым можно передать изображение путем к файлу: на сервер уходит содержимое
+IMAGE_ARGUMENT_METHODS = {'add_recipe', 'update_recipe'}
+# Что методы DataBase возвращают при ошибке (нет в словаре - None). Если сервис недоступен
+# или ответил ошибкой, клиент возвращает то же: вызывающий код рассчитан на эти значения
+FAILURE_RESULTS = {
+    'get_dish_types': [], 'get_cuisines': [], 'get_categories': [], 'get_categories_by_type': [],
+    'get_dish_types_with_objects': [], 'get_cuisines_with_objects': [],
+    'is_cooked': False, 'is_favorite': False, 'is_recipe_favorite': False, 'is_recipe_cooked': False,
+    'get_recipes_with_filters': {}, 'get_recipes_page': ([], None), 'count_recipes_by_dish_type': {},
+    'get_filter_facets': {'cuisine': {}, 'time': dict.fromkeys(DataBase.TIME_BUCKETS + (None,), 0),
+                          'dish_type': {}, 'favorites': 0, 'cooked': 0, 'total': 0},
+    'get_recipe_ingredients': [], 'get_recipes_ingredients': {}, 'get_recipe_ingredient_pairs': [],
+    'get_recipe_names': {}, 'get_cart_items': [], 'get_ingredients': [],
+    'get_favorite_recipe_ids': set(), 'get_favorite_recipes': [],
+    'get_cooked_recipe_ids': set(), 'get_cooked_recipes': [], 'search_recipes': [],
+    'get_recommender_status': (0, None), 'get_interactions': [], 'get_ingredient_cooccurrence': [],
+    'get_ingredient_frequencies': ({}, 0), 'has_ingredient_pairings': False, 'get_ingredient_suggestions': [],
+    'get_ingredient_nutrition': {}, 'get_recipe_quantities': [], 'get_recipe_servings': {},
+    'get_recipes_without_nutrition': [], 'get_recipe_scores': [],
+    # Без ответа сервера все изображения считаются используемыми: ничего не удаляется
+    'get_referenced_images': lambda paths: set(paths),
+    'update_recipe_details': False, 'update_recipe': False, 'delete_recipe': False,
+    'add_to_favorites': False, 'remove_from_favorites': False, 'mark_as_cooked': False,
+    'toggle_favorite': False, 'set_favorite': False, 'mark_recipe_as_cooked': False,
+    'add_cart_item': False, 'add_cart_items': 0, 'remove_cart_items': False, 'clear_cart': False,
+    'register_user': (False, "Сервис каталога недоступен"),
+    'save_recipe_scores': False, 'replace_ingredient_pairings': False, 'save_computed_nutrition': False,
+}
+
+
+class RemoteDataBaseError(OSError):
+    """Сервис каталога недоступен или вернул ошибку"""
+
+
+class RemoteDataBase:
+    """Клиент сервиса каталога (src.modules.catalog_server) с интерфейсом DataBase.
+
+    Методы из READ_METHODS и WRITE_METHODS вызываются на сервере, вход
+    (AUTH_METHODS) - по POST без кэширования. Ответы на чтение хранятся
+    вместе с ETag, и повторный запрос получает 304 без тела, если данные
+    не менялись. Уведомления подписчиков, вызванные записью этого
+    клиента, сервер возвращает в ответе, и они повторяются у локальных
+    подписчиков (add_recipe_listener, add_write_listener); о записи с других
+    терминалов подписчики не узнают.
+
+    Если сервис недоступен или ответил ошибкой, метод возвращает то же
+    значение ошибки, что DataBase (FAILURE_RESULTS), а не исключение:
+    окно рассчитано на [] / False / None. Исключение дает только проверка
+    связи при создании клиента.
+
+    Изображения скачиваются в локальный каталог cache_dir, и image_file_path
+    возвращает путь к копии. Подключения к серверу свои у каждого потока.
+    """
+
+    is_remote = True
+
+    # Разбор и запись количеств не обращаются к базе
+    _parse_quantity = DataBase._parse_quantity
+    _format_quantity = DataBase._format_quantity
+
+    def __init__(self, url, cache_dir=None, timeout=30):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        self.url = f"http://{parts.netloc}"
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser('~'), '.cache', 'taste_puzzle',
+                                                   f"{self.host}-{self.port}")
+        self.db_path = self.url
+
+        self.recipe_listeners = []
+        self.write_listeners = []
+        self.write_version = 0
+        self.recipe_catalog = None
+
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._responses = OrderedDict()  # путь запроса -> (etag, тело)
+        self._checked_images = set()  # изображения не из хранилища, сверенные с сервером в этом сеансе
+        # Проверка связи: недоступный сервер дает ошибку сразу, а не при первом запросе окна
+        self.request('GET', '/health')
+
+    def __getattr__(self, name):
+        if name in READ_METHODS:
+            return lambda *args, **kwargs: self._call(self._read, name, args, kwargs)
+        if name in WRITE_METHODS or name in AUTH_METHODS:
+            return lambda *args, **kwargs: self._call(self._write, name, args, kwargs)
+        if name.isupper() and hasattr(DataBase, name):
+            return getattr(DataBase, name)  # константы (SORT_*, TIME_BUCKETS и т. п.)
+        raise AttributeError(f"{type(self).__name__} не поддерживает {name}")
+
+    def __getstate__(self):
+        return {'url': self.url, 'cache_dir': self.cache_dir, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['url'], state['cache_dir'], state['timeout'])
+
+    # ===== ЗАПРОСЫ =====
+
+    def request(self, method, path, body=None, headers=None):
+        """(статус, заголовки, тело) ответа; соединение переиспользуется и открывается заново при обрыве"""
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self._local.connection = connection
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                self._local.connection = None
+                # Сервер мог закрыть простаивавшее соединение - повторяем один раз на новом
+                if attempt == 1 or not isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError,
+                                                      BrokenPipeError)):
+                    raise RemoteDataBaseError(f"Сервис каталога {self.url} недоступен: {e}") from e
+
+    def _call(self, func, method, args, kwargs):
+        """Вызов метода на сервере; при ошибке связи или сервера - значение ошибки метода DataBase"""
+        try:
+            return func(method, args, kwargs)
+        except RemoteDataBaseError as e:
+            print(f"Ошибка {method}: {e}")
+            failure = FAILURE_RESULTS.get(method)
+            if callable(failure):
+                return failure(*args, **kwargs)
+            return copy.deepcopy(failure)
+
+    def _read(self, method, args, kwargs):
+        query = {'q': dumps({'args': args, 'kwargs': kwargs}).decode('utf-8')} if args or kwargs else {}
+        path = f"/api/{method}" + (f"?{urlencode(query)}" if query else '')
+        with self._cache_lock:
+            cached = self._responses.get(path)
+        headers = {'If-None-Match': cached[0]} if cached is not None else {}
+
+        status, response_headers, body = self.request('GET', path, headers=headers)
+        if status == 304 and cached is not None:
+            body = cached[1]
+            with self._cache_lock:
+                if path in self._responses:
+                    self._responses.move_to_end(path)
+        elif status == 200:
+            etag = response_headers.get('ETag')
+            if etag:
+                with self._cache_lock:
+                    self._responses[path] = (etag, body)
+                    self._responses.move_to_end(path)
+                    if len(self._responses) > ETAG_CACHE_SIZE:
+                        self._responses.popitem(last=False)
+        else:
+            raise RemoteDataBaseError(self._error_message(method, status, body))
+
+        result = loads(body)['result']
+        if method == 'get_recipe_image_path' and result:
+            return self.image_file_path(result)
+        return result
+
+    def _write(self, method, args, kwargs):
+        if method in IMAGE_ARGUMENT_METHODS:
+            args, kwargs = self._inline_image(args, kwargs)
+        status, _, body = self.request('POST', f"/api/{method}", dumps({'args': args, 'kwargs': kwargs}),
+                                       {'Content-Type': 'application/json'})
+        if status != 200:
+            raise RemoteDataBaseError(self._error_message(method, status, body))
+        response = loads(body)
+        self._replay(response.get('changes', []))
+        return response['result']
+
+    @staticmethod
+    def _inline_image(args, kwargs):
+        """Изображение, переданное путем к локальному файлу, заменяется его содержимым"""
+        image = kwargs.get('image')
+        if isinstance(image, str) and os.path.isfile(image):
+            with open(image, 'rb') as f:
+                kwargs = dict(kwargs, image=f.read())
+        elif len(args) > 9 and isinstance(args[9], str) and os.path.isfile(args[9]):
+            with open(args[9], 'rb') as f:
+                args = args[:9] + (f.read(),) + args[10:]
+        return args, kwargs
+
+    @staticmethod
+    def _error_message(method, status, body):
+        try:
+            return json.loads(body)['error']
+        except (ValueError, KeyError, TypeError):
+            return f"Сервис каталога ответил {status} на {method}"
+
+    # ===== ПОДПИСЧИКИ =====
+
+    add_recipe_listener = DataBase.add_recipe_listener
+    remove_recipe_listener = DataBase.remove_recipe_listener
+    add_write_listener = DataBase.add_write_listener
+    remove_write_listener = DataBase.remove_write_listener
+    _notify_write = DataBase._notify_write
+
+    def set_recipe_catalog(self, catalog):
+        # Фильтры выполняет сервер (со своим каталогом в памяти) - локальный каталог не подключается
+        self.recipe_catalog = None
+
+    def _replay(self, changes):
+        """Повторяет у локальных подписчиков уведомления, которые запись вызвала на сервере"""
+        for change in changes:
+            if change[0] == 'write':
+                self._notify_write(*change[1:])
+                continue
+            _, recipe_id, ingredient_ids, previous_ids = change
+            for listener in list(self.recipe_listeners):
+                try:
+                    listener(recipe_id, ingredient_ids, previous_ids)
+                except Exception as e:
+                    print(f"Ошибка обработчика изменения рецепта: {e}")
+
+    # ===== ИЗОБРАЖЕНИЯ =====
+
+    def images_dir(self):
+        """Локальный каталог копий изображений (и файла миниатюр карточек)"""
+        return self.cache_dir
+
+    def image_file_path(self, path):
+        """Путь к локальной копии изображения по значению Recipes.image; скачивает ее при необходимости.
+
+        Файлы хранилища не меняются, и скачанная копия используется без
+        запросов; остальные проверяются у сервера по ETag раз за сеанс.
+        """
+        local_path = os.path.join(self.cache_dir, *path.split('/'))
+        stored = path.startswith(DataBase.IMAGE_STORE_DIR + '/')
+        with self._cache_lock:
+            checked = path in self._checked_images
+        if os.path.exists(local_path) and (stored or checked):
+            return local_path
+
+        headers = {}
+        etag_path = local_path + '.etag'
+        if not stored and os.path.exists(local_path) and os.path.exists(etag_path):
+            with open(etag_path, encoding='utf-8') as f:
+                headers['If-None-Match'] = f.read()
+        try:
+            status, response_headers, body = self.request('GET', '/images/' + quote(path), headers=headers)
+        except RemoteDataBaseError as e:
+            print(f"Изображение {path} недоступно: {e}")
+            return local_path
+        if status == 200:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            with open(local_path + '.tmp', 'wb') as f:
+                f.write(body)
+            os.replace(local_path + '.tmp', local_path)
+            if not stored and response_headers.get('ETag'):
+                with open(etag_path, 'w', encoding='utf-8') as f:
+                    f.write(response_headers['ETag'])
+        elif status != 304:
+            return local_path  # файла нет: вызывающий покажет заглушку, как для отсутствующего файла
+        with self._cache_lock:
+            self._checked_images.add(path)
+        return local_path
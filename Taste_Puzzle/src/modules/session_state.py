@@ -0,0 +1,132 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class SessionState(QObject):
+    """Данные пользователя на время сессии: корзина, избранное и приготовленные рецепты.
+
+    Создается при входе и загружает данные из БД один раз. Виджеты читают
+    состояние отсюда, а изменения проводят через методы этого класса: они
+    записывают данные в БД, обновляют память и рассылают сигналы, по которым
+    остальные виджеты синхронизируются без повторных запросов.
+    """
+
+    cart_changed = pyqtSignal()
+    favorite_changed = pyqtSignal(int, bool)  # recipe_id, в избранном
+    cooked_changed = pyqtSignal(int, bool)  # recipe_id, приготовлен
+    reloaded = pyqtSignal()
+
+    def __init__(self, db, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+
+        self.cart = []
+        self.favorite_ids = set()
+        self.cooked_ids = set()
+
+        self.reload()
+
+    def reload(self):
+        """Перечитывает корзину, избранное и приготовленные рецепты из БД"""
+        self.cart = self.db.get_cart_items(self.user_id)
+        self.favorite_ids = self.db.get_favorite_recipe_ids(self.user_id)
+        self.cooked_ids = self.db.get_cooked_recipe_ids(self.user_id)
+        self.reloaded.emit()
+
+    def sync(self, tables):
+        """Перечитывает из БД данные, измененные другим экземпляром приложения.
+
+        tables - имена измененных таблиц (cart, Favorites, cooked_recipes).
+        Сигналы рассылаются только о действительных расхождениях с памятью,
+        поэтому собственные записи, вернувшиеся через журнал, ничего не вызывают.
+        """
+        if 'Favorites' in tables:
+            favorite_ids = self.db.get_favorite_recipe_ids(self.user_id)
+            added, removed = favorite_ids - self.favorite_ids, self.favorite_ids - favorite_ids
+            self.favorite_ids = favorite_ids
+            for recipe_id in added:
+                self.favorite_changed.emit(recipe_id, True)
+            for recipe_id in removed:
+                self.favorite_changed.emit(recipe_id, False)
+
+        if 'cooked_recipes' in tables:
+            cooked_ids = self.db.get_cooked_recipe_ids(self.user_id)
+            added, removed = cooked_ids - self.cooked_ids, self.cooked_ids - cooked_ids
+            self.cooked_ids = cooked_ids
+            for recipe_id in added:
+                self.cooked_changed.emit(recipe_id, True)
+            for recipe_id in removed:
+                self.cooked_changed.emit(recipe_id, False)
+
+        if 'cart' in tables:
+            cart = self.db.get_cart_items(self.user_id)
+            if cart != self.cart:
+                self.cart = cart
+                self.cart_changed.emit()
+
+    # ===== ИЗБРАННОЕ И ПРИГОТОВЛЕННЫЕ =====
+
+    def is_favorite(self, recipe_id):
+        return recipe_id in self.favorite_ids
+
+    def is_cooked(self, recipe_id):
+        return recipe_id in self.cooked_ids
+
+    def set_favorite(self, recipe_id, favorite):
+        """Добавляет рецепт в избранное или убирает из него"""
+        # Запись идет всегда: состояние в памяти могло устареть после записи из другого
+        # окна или терминала, а set_favorite в БД идемпотентен
+        if not self.db.set_favorite(self.user_id, recipe_id, favorite):
+            return False
+
+        if favorite:
+            self.favorite_ids.add(recipe_id)
+        else:
+            self.favorite_ids.discard(recipe_id)
+        self.favorite_changed.emit(recipe_id, favorite)
+        return True
+
+    def set_cooked(self, recipe_id, cooked):
+        """Отмечает рецепт как приготовленный или снимает отметку"""
+        if not self.db.mark_recipe_as_cooked(self.user_id, recipe_id, cooked):
+            return False
+
+        if cooked:
+            self.cooked_ids.add(recipe_id)
+        else:
+            self.cooked_ids.discard(recipe_id)
+        self.cooked_changed.emit(recipe_id, cooked)
+        return True
+
+    # ===== КОРЗИНА =====
+
+    def add_cart_items(self, ingredients):
+        """Добавляет ингредиенты (name, quantity, unit) в корзину одной записью в БД,
+        возвращает число добавленных"""
+        success_count = self.db.add_cart_items(self.user_id, list(ingredients))
+
+        if success_count:
+            # БД суммирует количества одинаковых ингредиентов, поэтому берем итог оттуда
+            # одним запросом на всю пачку
+            self.cart = self.db.get_cart_items(self.user_id)
+            self.cart_changed.emit()
+        return success_count
+
+    def remove_cart_items(self, items_to_remove):
+        """Удаляет из корзины элементы, заданные словарями с ключами name и unit"""
+        if not self.db.remove_cart_items(self.user_id, items_to_remove):
+            return False
+
+        removed_keys = {(item['name'], item['unit']) for item in items_to_remove}
+        self.cart = [item for item in self.cart if (item['name'], item['unit']) not in removed_keys]
+        self.cart_changed.emit()
+        return True
+
+    def clear_cart(self):
+        """Очищает корзину пользователя"""
+        if not self.db.clear_cart(self.user_id):
+            return False
+
+        self.cart = []
+        self.cart_changed.emit()
+        return True
@@ -0,0 +1,36 @@
+import time
+
+
+class StartupTrace:
+    """Поэтапный замер времени запуска приложения (флаг --startup-trace).
+
+    Каждый вызов mark фиксирует длительность этапа с момента предыдущей
+    отметки. Если трассировка выключена, отметки ничего не делают.
+    """
+
+    def __init__(self, enabled=False, started=None):
+        self.enabled = enabled
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        """Отмечает завершение этапа запуска"""
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        """Печатает таблицу этапов запуска (только один раз)"""
+        if not self.enabled or self.reported:
+            return
+
+        self.reported = True
+        print("Этапы запуска:")
+        for phase, duration in self.phases:
+            print(f"  {phase:<32} {duration * 1000:8.1f} мс")
+        print(f"  {'Итого':<32} {(self.last - self.started) * 1000:8.1f} мс")
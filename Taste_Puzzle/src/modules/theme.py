@@ -0,0 +1,233 @@
+from functools import lru_cache
+
+
+# ====================================================================================
+# Общая таблица стилей приложения.
+# Карточки рецептов и секции категорий не вызывают setStyleSheet сами: их элементы
+# помечаются objectName или динамическим свойством, а оформление задается здесь
+# селекторами. Так Qt разбирает CSS один раз на окно, а не на каждый виджет.
+# ====================================================================================
+
+# Базовые стили окна; зависят от размеров шрифтов из настроек
+BASE_STYLE_TEMPLATE = """
+    QMainWindow {{
+        background-color: #f8f9fa;
+    }}
+    QWidget {{
+        font-family: 'Segoe UI', Arial, sans-serif;
+        font-size: {font_size}px;
+    }}
+    QTabWidget::pane {{
+        border: 1px solid #dee2e6;
+        background-color: white;
+        border-radius: 8px;
+    }}
+    QTabBar::tab {{
+        background-color: #e9ecef;
+        color: #495057;
+        padding: 8px 16px;
+        margin-right: 2px;
+        border-top-left-radius: 4px;
+        border-top-right-radius: 4px;
+        font-size: {font_size}px;
+    }}
+    QTabBar::tab:selected {{
+        background-color: white;
+        color: #495057;
+        border-bottom: 2px solid #007bff;
+    }}
+    QPushButton {{
+        background-color: #007bff;
+        color: white;
+        border: none;
+        padding: 8px 16px;
+        border-radius: 4px;
+        font-weight: 500;
+        font-size: {font_size}px;
+    }}
+    QPushButton:hover {{
+        background-color: #0056b3;
+    }}
+    QLabel {{
+        font-size: {font_size}px;
+    }}
+    QLineEdit, QTextEdit, QSpinBox, QComboBox {{
+        font-size: {font_size}px;
+        padding: 6px;
+    }}
+    .header {{
+        font-size: {title_font_size}px;
+        font-weight: bold;
+    }}
+"""
+
+# Стили карточки рецепта главного окна (RecipeCard)
+RECIPE_CARD_STYLE = """
+    QFrame#recipeCard {
+        background-color: white;
+        border: 1px solid #dee2e6;
+        border-radius: 12px;
+        margin: 0px;
+    }
+    QWidget#recipeCardImage {
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #f8f9fa, stop:1 #e9ecef);
+        border-top-left-radius: 12px;
+        border-top-right-radius: 12px;
+        border-bottom: 1px solid #e9ecef;
+    }
+    QLabel#recipeCardPlaceholder {
+        color: #6c757d;
+        font-size: 14px;
+        font-weight: 500;
+        padding: 20px;
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #e3f2fd, stop:1 #bbdefb);
+    }
+    QWidget#recipeCardInfo, QWidget#recipeCardMeta {
+        background-color: white;
+    }
+    QLabel#recipeCardName {
+        font-weight: 600;
+        font-size: 16px;
+        color: #2c3e50;
+        padding-bottom: 5px;
+        border-bottom: 1px solid #f1f3f4;
+    }
+    QWidget[chip="cuisine"] {
+        background-color: #e8f5e9;
+        border-radius: 4px;
+        border: 1px solid #c8e6c9;
+    }
+    QWidget[chip="time"] {
+        background-color: #e3f2fd;
+        border-radius: 4px;
+        border: 1px solid #bbdefb;
+    }
+    QWidget[chip="dish_type"] {
+        background-color: #f3e5f5;
+        border-radius: 4px;
+        border: 1px solid #e1bee7;
+    }
+    QWidget[chip] QLabel {
+        background: transparent;
+        border: none;
+        font-size: 10px;
+        font-weight: 500;
+    }
+    QWidget[chip="cuisine"] QLabel {
+        color: #2e7d32;
+    }
+    QWidget[chip="time"] QLabel {
+        color: #1976d2;
+    }
+    QWidget[chip="dish_type"] QLabel {
+        color: #7b1fa2;
+    }
+    QPushButton#favoriteToggle, QPushButton#cookedToggle {
+        background-color: transparent;
+        border: none;
+        border-radius: 2px;
+        padding: 0px;
+    }
+    QPushButton#favoriteToggle {
+        font-size: 17px;
+    }
+    QPushButton#cookedToggle {
+        font-size: 18px;
+    }
+    QPushButton#favoriteToggle:hover {
+        background-color: rgba(220, 53, 69, 0.1);
+    }
+    QPushButton#cookedToggle:hover {
+        background-color: rgba(40, 167, 69, 0.1);
+    }
+    QWidget#recipeCardBottomLine {
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 #3498db, stop:1 #2ecc71);
+        border-bottom-left-radius: 12px;
+        border-bottom-right-radius: 12px;
+    }
+"""
+
+# Стили секций категорий на главной странице
+CATEGORY_SECTION_STYLE = """
+    QWidget#categorySection, QWidget#categoryCards {
+        background-color: transparent;
+        border: none;
+    }
+    QLabel#categoryHeader {
+        font-size: 18px;
+        font-weight: bold;
+        color: #2c3e50;
+        padding: 10px 15px;
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 rgba(52, 152, 219, 0.1),
+            stop:1 rgba(46, 204, 113, 0.1));
+        border-radius: 8px;
+        border-left: 4px solid #3498db;
+    }
+    QFrame#categorySeparator {
+        background-color: #dee2e6;
+        max-height: 1px;
+        margin: 20px 0;
+    }
+"""
+
+# Стили карточки рецепта в профиле (ProfileRecipeCard)
+PROFILE_CARD_STYLE = """
+    QFrame#profileRecipeCard {
+        background-color: white;
+        border: none;
+        border-radius: 10px;
+        margin: 5px;
+    }
+    QWidget#profileCardImage {
+        background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+            stop:0 #f5f7fa, stop:1 #e4e7eb);
+        border-top-left-radius: 10px;
+        border-top-right-radius: 10px;
+        border-bottom: 1px solid #e9ecef;
+    }
+    QLabel#profileCardPlaceholder {
+        font-size: 32px;
+        color: #6c757d;
+    }
+    QWidget#profileCardInfo {
+        background-color: white;
+    }
+    QLabel#profileCardName {
+        font-size: 12px;
+        font-weight: 500;
+        color: #2c3e50;
+    }
+    QLabel#profileCardStatus {
+        font-size: 10px;
+    }
+"""
+
+
+@lru_cache(maxsize=None)
+def build_stylesheet(font_size=14, title_font_size=16):
+    """Собирает таблицу стилей окна для заданных размеров шрифтов.
+
+    Результат кэшируется: повторное применение тех же настроек не
+    пересобирает строку CSS.
+    """
+    base_style = BASE_STYLE_TEMPLATE.format(font_size=font_size, title_font_size=title_font_size)
+    return base_style + RECIPE_CARD_STYLE + CATEGORY_SECTION_STYLE + PROFILE_CARD_STYLE
+
+
+def apply_theme(widget, font_size=14, title_font_size=16):
+    """Применяет общую таблицу стилей к окну, если она изменилась.
+
+    Повторный setStyleSheet с тем же текстом все равно заставляет Qt
+    заново применять стили ко всем дочерним виджетам, поэтому он пропускается.
+    Возвращает True, если таблица стилей была заменена.
+    """
+    stylesheet = build_stylesheet(font_size, title_font_size)
+    if widget.styleSheet() == stylesheet:
+        return False
+
+    widget.setStyleSheet(stylesheet)
+    return True
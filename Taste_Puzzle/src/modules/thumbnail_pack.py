@@ -0,0 +1,312 @@
+import mmap
+import os
+import struct
+import uuid
+from contextlib import contextmanager
+
+from PyQt6.QtCore import QLockFile
+from PyQt6.QtGui import QImage
+
+
+PACK_MAGIC = b'TPPK'
+INDEX_MAGIC = b'TPIX'
+VERSION = 1
+# Заголовок обоих файлов: сигнатура, версия и метка, общая для pack и idx одной записи.
+# Заголовок занимает 32 байта, поэтому пиксели в pack выровнены по 4 байта, как требует QImage
+HEADER = struct.Struct('<4sH16s10x')
+# Запись журнала idx: операция и длина ключа, затем ключ в UTF-8 и (для OP_PUT) PUT_RECORD
+INDEX_RECORD = struct.Struct('<BH')
+# Смещение в pack, ширина, высота, байт в строке, формат
+PUT_RECORD = struct.Struct('<QHHIB')
+OP_DISCARD, OP_PUT = 0, 1
+# Форматы хранения: непрозрачные миниатюры - 3 байта на пиксель, с прозрачностью - 4
+FORMATS = {1: QImage.Format.Format_RGB888, 2: QImage.Format.Format_ARGB32_Premultiplied}
+FORMAT_CODES = {image_format: code for code, image_format in FORMATS.items()}
+# Файл переписывается без мертвых записей, когда они занимают больше этой доли и не меньше COMPACT_MIN_BYTES
+COMPACT_RATIO = 0.25
+COMPACT_MIN_BYTES = 8 * 1024 * 1024
+# Сколько ждать блокировку файла другим процессом; не дождавшись, миниатюра просто не сохраняется
+LOCK_TIMEOUT_MS = 2000
+
+
+def pack_image(image):
+    """Приводит QImage к формату хранения в пачке (можно вызывать вне GUI-потока)"""
+    if image is None:
+        return None
+    if image.hasAlphaChannel():
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    return image.convertToFormat(QImage.Format.Format_RGB888)
+
+
+class ThumbnailPack:
+    """Миниатюры в одном файле: несжатые пиксели подряд (.pack) и журнал смещений (.idx).
+
+    Оба файла только дописываются: новая миниатюра добавляется в конец .pack,
+    ее смещение - в конец .idx. Замененные и удаленные миниатюры остаются
+    мертвым местом; если при открытии его доля больше COMPACT_RATIO, живые
+    записи переписываются в новый файл. .pack отображается в память, и image()
+    строит QImage прямо поверх отображенных байт - без открытия файлов, чтения
+    и декодирования.
+
+    Пару файлов могут дописывать несколько процессов (окна приложения над
+    одной базой, сервис каталога): запись, сжатие и создание файлов идут под
+    межпроцессной блокировкой (QLockFile), смещение новой миниатюры берется
+    из настоящего размера .pack, а перед записью дочитываются записи журнала,
+    добавленные другими процессами. Если другой процесс пересоздал файлы,
+    экземпляр открывает их заново.
+
+    Это кэш: поврежденная или несогласованная пара файлов просто создается
+    заново. Класс не потокобезопасен и используется из GUI-потока.
+    """
+
+    def __init__(self, path):
+        self.path = path  # путь без расширения
+        self.entries = {}  # ключ -> (смещение, ширина, высота, байт в строке, формат)
+        self.size = 0  # размер .pack
+        self.token = None  # метка текущей пары файлов
+        self.index_position = 0  # сколько байт журнала уже прочитано
+        self.map = None
+        self.view = None
+        self.pack_file = None
+        self.index_file = None
+        os.makedirs(os.path.dirname(self.pack_path), exist_ok=True)
+        self.lock_file = QLockFile(self.path + '.lock')
+        with self._locked():
+            self._open()
+
+    @property
+    def pack_path(self):
+        return self.path + '.pack'
+
+    @property
+    def index_path(self):
+        return self.path + '.idx'
+
+    @property
+    def live_bytes(self):
+        return sum(height * bytes_per_line for _, _, height, bytes_per_line, _ in self.entries.values())
+
+    @property
+    def dead_bytes(self):
+        return self.size - HEADER.size - self.live_bytes
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        if key not in self.entries:
+            # Миниатюру мог добавить другой процесс
+            self._refresh()
+        return key in self.entries
+
+    def keys(self):
+        return list(self.entries)
+
+    def image(self, key):
+        """QImage миниатюры поверх отображенного файла; None, если миниатюры нет.
+
+        QImage не копирует пиксели и действителен только до следующего put()
+        или close(): преобразуйте его в QPixmap (или copy()) сразу.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        offset, width, height, bytes_per_line, format_code = entry
+        end = offset + height * bytes_per_line
+        if end > len(self.map):
+            self._remap()
+        return QImage(self.view[offset:end], width, height, bytes_per_line, FORMATS[format_code])
+
+    def put(self, key, image):
+        """Дописывает миниатюру в конец файла; прежняя миниатюра с тем же ключом становится мертвой"""
+        image = pack_image(image)
+        data = image.constBits().asstring(image.sizeInBytes())
+        with self._locked() as locked:
+            if not locked:
+                return
+            self._sync()
+            # Конец файла, а не self.size: файл мог дописать другой процесс
+            offset = os.fstat(self.pack_file.fileno()).st_size
+            self.pack_file.write(data)
+            self.pack_file.flush()
+            entry = (offset, image.width(), image.height(), image.bytesPerLine(), FORMAT_CODES[image.format()])
+            self._write_index(OP_PUT, key, entry)
+            self.size = offset + len(data)
+            self.entries[key] = entry
+
+    def discard(self, keys):
+        """Удаляет миниатюры из индекса; место освободится при следующем сжатии"""
+        with self._locked() as locked:
+            if not locked:
+                return
+            self._sync()
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self._write_index(OP_DISCARD, key)
+            self.index_file.flush()
+            self.index_position = os.fstat(self.index_file.fileno()).st_size
+
+    def close(self):
+        for file in (self.pack_file, self.index_file):
+            if file is not None:
+                file.close()
+        self.pack_file = self.index_file = None
+        # Отображение освобождается вместе с последним QImage поверх него
+        self.map = self.view = None
+
+    # ===== ХРАНЕНИЕ =====
+
+    @contextmanager
+    def _locked(self):
+        """Межпроцессная блокировка пары файлов; выдает False, если ее не удалось получить"""
+        locked = self.lock_file.tryLock(LOCK_TIMEOUT_MS)
+        try:
+            yield locked
+        finally:
+            if locked:
+                self.lock_file.unlock()
+
+    def _open(self):
+        if not self._load():
+            self._create()
+        elif self.dead_bytes >= COMPACT_MIN_BYTES and self.dead_bytes > self.size * COMPACT_RATIO:
+            self._compact()
+
+        self.pack_file = open(self.pack_path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+        self.index_position = os.fstat(self.index_file.fileno()).st_size
+        self._remap()
+
+    def _refresh(self):
+        """Дочитывает журнал без блокировки, если он вырос (для чтения миниатюр)"""
+        try:
+            grown = os.path.getsize(self.index_path) != self.index_position
+        except OSError:
+            return
+        if grown:
+            self._sync()
+
+    def _sync(self):
+        """Применяет записи журнала, дописанные другими процессами. Если файлы
+        пересоздали (сжатие, новый кэш), открывает новую пару"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size or HEADER.unpack(header)[2] != self.token:
+                    data = None
+                else:
+                    f.seek(self.index_position)
+                    data = f.read()
+            size = os.path.getsize(self.pack_path)
+        except OSError:
+            data = None
+        if data is None:
+            if self.lock_file.isLocked():
+                self.close()
+                self._open()
+            return
+        self.size = size
+        self.index_position += self._apply_records(data, 0)
+
+    def _load(self):
+        """Читает журнал и сверяет его с .pack. False, если пару файлов нужно создать заново"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            with open(self.pack_path, 'rb') as f:
+                pack_header = f.read(HEADER.size)
+            self.size = os.path.getsize(self.pack_path)
+        except OSError:
+            return False
+        if len(data) < HEADER.size or len(pack_header) < HEADER.size:
+            return False
+        index_magic, index_version, index_token = HEADER.unpack_from(data)
+        pack_magic, pack_version, pack_token = HEADER.unpack(pack_header)
+        if (index_magic, pack_magic) != (INDEX_MAGIC, PACK_MAGIC) or index_version != VERSION \
+                or pack_version != VERSION or index_token != pack_token:
+            return False
+
+        self.token = index_token
+        self.entries = {}
+        position = self._apply_records(data, HEADER.size)
+        if position < len(data):
+            os.truncate(self.index_path, position)
+        return True
+
+    def _apply_records(self, data, position):
+        """Применяет к entries записи журнала data начиная с position; возвращает
+        позицию после последней целой записи"""
+        entries = self.entries
+        while position + INDEX_RECORD.size <= len(data):
+            operation, key_length = INDEX_RECORD.unpack_from(data, position)
+            end = position + INDEX_RECORD.size + key_length + (PUT_RECORD.size if operation == OP_PUT else 0)
+            if end > len(data):
+                break  # запись оборвалась при сбое - она и все после нее не учитываются
+            key = data[position + INDEX_RECORD.size:position + INDEX_RECORD.size + key_length].decode('utf-8')
+            if operation == OP_PUT:
+                entry = PUT_RECORD.unpack_from(data, end - PUT_RECORD.size)
+                offset, width, height, bytes_per_line, format_code = entry
+                if format_code in FORMATS and HEADER.size <= offset and offset + height * bytes_per_line <= self.size:
+                    entries[key] = entry
+            else:
+                entries.pop(key, None)
+            position = end
+        return position
+
+    def _create(self):
+        """Создает пустую пару файлов"""
+        self.token = uuid.uuid4().bytes
+        self._replace_files(self.token, b'', [])
+        self.entries = {}
+        self.size = HEADER.size
+
+    def _compact(self):
+        """Переписывает живые миниатюры подряд в новый файл (до отображения в память)"""
+        chunks = []
+        entries = {}
+        offset = HEADER.size
+        with open(self.pack_path, 'rb') as f:
+            for key, entry in sorted(self.entries.items(), key=lambda item: item[1][0]):
+                old_offset, width, height, bytes_per_line, format_code = entry
+                f.seek(old_offset)
+                chunks.append(f.read(height * bytes_per_line))
+                entries[key] = (offset, width, height, bytes_per_line, format_code)
+                offset += height * bytes_per_line
+        self.token = uuid.uuid4().bytes
+        self._replace_files(self.token, b''.join(chunks), entries.items())
+        self.entries = entries
+        self.size = offset
+
+    def _replace_files(self, token, pixels, entries):
+        """Записывает .pack и .idx во временные файлы и подменяет ими текущие.
+
+        Сбой между двумя подменами оставит файлы с разными метками - при
+        следующем открытии кэш просто начнется заново.
+        """
+        header = HEADER.pack(PACK_MAGIC, VERSION, token)
+        with open(self.pack_path + '.tmp', 'wb') as f:
+            f.write(header)
+            f.write(pixels)
+        with open(self.index_path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, VERSION, token))
+            f.write(b''.join(self._index_record(OP_PUT, key, entry) for key, entry in entries))
+        os.replace(self.pack_path + '.tmp', self.pack_path)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def _remap(self):
+        # Прежнее отображение не закрывается явно: оно освободится, когда на него не останется ссылок
+        with open(self.pack_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+    def _write_index(self, operation, key, entry=None):
+        self.index_file.write(self._index_record(operation, key, entry))
+        if operation == OP_PUT:
+            self.index_file.flush()
+            self.index_position = os.fstat(self.index_file.fileno()).st_size
+
+    @staticmethod
+    def _index_record(operation, key, entry=None):
+        key = key.encode('utf-8')
+        record = INDEX_RECORD.pack(operation, len(key)) + key
+        return record + PUT_RECORD.pack(*entry) if entry is not None else record
@@ -3,6 +3,9 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QFrame)
 from PyQt6.QtCore import Qt
 
+from src.modules.image_service import recipe_pixmap
+from src.modules.session_state import SessionState
+
 
 class ProfileRecipeCard(QFrame):
     """Виджет карточки рецепта для отображения в профиле пользователя"""
@@ -28,20 +31,8 @@ class ProfileRecipeCard(QFrame):
     def init_ui(self):
         """Инициализация пользовательского интерфейса карточки профиля"""
         self.setFixedSize(180, 220)
-        self.setStyleSheet("""
-            QFrame {
-                background-color: white;
-                border: none;
-                border-radius: 10px;
-                margin: 5px;
-                box-shadow: 0 2px 8px rgba(0, 0, 0, 0.06);
-                transition: all 0.2s ease;
-            }
-            QFrame:hover {
-                box-shadow: 0 4px 15px rgba(52, 152, 219, 0.12);
-                transform: translateY(-2px);
-            }
-        """)
+        # Оформление задается общей таблицей стилей окна (src/modules/theme.py)
+        self.setObjectName("profileRecipeCard")
 
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -50,15 +41,7 @@ class ProfileRecipeCard(QFrame):
         # Контейнер для изображения
         image_container = QWidget()
         image_container.setFixedHeight(120)
-        image_container.setStyleSheet("""
-            QWidget {
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 #f5f7fa, stop:1 #e4e7eb);
-                border-top-left-radius: 10px;
-                border-top-right-radius: 10px;
-                border-bottom: 1px solid #e9ecef;
-            }
-        """)
+        image_container.setObjectName("profileCardImage")
 
         image_layout = QVBoxLayout(image_container)
         image_layout.setContentsMargins(0, 0, 0, 0)
@@ -71,7 +54,7 @@ class ProfileRecipeCard(QFrame):
 
         # Контейнер для информации
         info_container = QWidget()
-        info_container.setStyleSheet("background-color: white;")
+        info_container.setObjectName("profileCardInfo")
         info_layout = QVBoxLayout(info_container)
         info_layout.setContentsMargins(12, 12, 12, 12)
         info_layout.setSpacing(8)
@@ -79,14 +62,7 @@ class ProfileRecipeCard(QFrame):
         # Название рецепта
         self.name_label = QLabel(self.recipe_data[2] if len(self.recipe_data) > 2 else "Без названия")
         self.name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.name_label.setStyleSheet("""
-            QLabel {
-                font-size: 12px;
-                font-weight: 500;
-                color: #2c3e50;
-                line-height: 1.3;
-            }
-        """)
+        self.name_label.setObjectName("profileCardName")
         self.name_label.setWordWrap(True)
         self.name_label.setMaximumHeight(40)
         info_layout.addWidget(self.name_label)
@@ -109,7 +85,7 @@ class ProfileRecipeCard(QFrame):
         """Загружает изображение рецепта"""
         recipe_id = self.recipe_data[0] if len(self.recipe_data) > 0 else None
         if recipe_id:
-            pixmap = self.db.get_recipe_image(recipe_id)
+            pixmap = recipe_pixmap(self.db, recipe_id, self.recipe_data[2])
             if pixmap and not pixmap.isNull():
                 scaled_pixmap = pixmap.scaled(178, 118, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
                                               Qt.TransformationMode.SmoothTransformation)
@@ -119,7 +95,7 @@ class ProfileRecipeCard(QFrame):
 
         # Если нет изображения, показываем иконку
         self.image_label.setText("🍳")
-        self.image_label.setStyleSheet("font-size: 32px; color: #6c757d;")
+        self.image_label.setObjectName("profileCardPlaceholder")
 
     def update_status_icons(self):
         """Обновляет иконки статусов"""
@@ -135,12 +111,12 @@ class ProfileRecipeCard(QFrame):
 
         if is_cooked:
             cooked_icon = QLabel("✅")
-            cooked_icon.setStyleSheet("font-size: 10px;")
+            cooked_icon.setObjectName("profileCardStatus")
             self.status_layout.addWidget(cooked_icon)
 
         if is_favorite:
             favorite_icon = QLabel("❤️")
-            favorite_icon.setStyleSheet("font-size: 10px;")
+            favorite_icon.setObjectName("profileCardStatus")
             self.status_layout.addWidget(favorite_icon)
 
     def mouseDoubleClickEvent(self, event):
@@ -168,11 +144,19 @@ class ProfileRecipeCard(QFrame):
 class ProfileWidget(QWidget):
     """Виджет профиля пользователя"""
 
-    def __init__(self, db, user_id, main_window):
+    def __init__(self, db, user_id, main_window, session_state=None):
         super().__init__()
         self.db = db
         self.user_id = user_id
         self.main_window = main_window
+        self.profile_data = None
+
+        # Счетчики избранного, приготовленного и корзины берутся из состояния сессии
+        self.session_state = session_state or SessionState(db, user_id, self)
+        self.session_state.favorite_changed.connect(self.on_favorite_changed)
+        self.session_state.cooked_changed.connect(self.on_cooked_changed)
+        self.session_state.cart_changed.connect(self.update_stats)
+        self.session_state.reloaded.connect(self.update_stats)
 
         self.init_ui()
         self.update_profile()
@@ -318,30 +302,46 @@ class ProfileWidget(QWidget):
         """Обновляет данные профиля пользователя"""
         try:
             # Загружаем данные профиля из базы данных
-            profile_data = self.db.get_user_profile(self.user_id)
-            if profile_data:
+            self.profile_data = self.db.get_user_profile(self.user_id)
+            if self.profile_data:
                 profile_text = f"""
                     <div style="text-align: center; padding: 10px;">
-                        <h2 style="margin: 0; color: #2c3e50;">👤 {profile_data['login']}</h2>
+                        <h2 style="margin: 0; color: #2c3e50;">👤 {self.profile_data['login']}</h2>
                     </div>
                     """
                 self.profile_info.setText(profile_text)
 
-                stats_text = f"""
-                    <b>📊 Ваша статистика:</b><br><br>
-                    📖 <b>Всего рецептов:</b> {profile_data['recipes_count']}<br>
-                    ❤️ <b>В избранном:</b> {profile_data['favorites_count']}<br>
-                    ✅ <b>Приготовлено:</b> {profile_data['cooked_count']}<br>
-                    🛒 <b>В корзине:</b> {profile_data['cart_count']}<br>
-                    """
-                self.stats_label.setText(stats_text)
-
+            self.update_stats()
             self.load_favorite_recipes()
             self.load_cooked_recipes()
 
         except Exception as e:
             print(f"Ошибка при обновлении профиля: {e}")
 
+    def update_stats(self):
+        """Обновляет блок статистики без обращения к базе данных"""
+        if not self.profile_data:
+            return
+
+        stats_text = f"""
+            <b>📊 Ваша статистика:</b><br><br>
+            📖 <b>Всего рецептов:</b> {self.profile_data['recipes_count']}<br>
+            ❤️ <b>В избранном:</b> {len(self.session_state.favorite_ids)}<br>
+            ✅ <b>Приготовлено:</b> {len(self.session_state.cooked_ids)}<br>
+            🛒 <b>В корзине:</b> {len(self.session_state.cart)}<br>
+            """
+        self.stats_label.setText(stats_text)
+
+    def on_favorite_changed(self, recipe_id, favorite):
+        """Обновляет статистику и список избранного после изменения в состоянии сессии"""
+        self.update_stats()
+        self.load_favorite_recipes()
+
+    def on_cooked_changed(self, recipe_id, cooked):
+        """Обновляет статистику и список приготовленных после изменения в состоянии сессии"""
+        self.update_stats()
+        self.load_cooked_recipes()
+
     def load_favorite_recipes(self):
         """Загружает избранные рецепты пользователя"""
         # Очищаем предыдущие карточки избранных рецептов
@@ -0,0 +1,5 @@
+import sys
+
+from taste_puzzle.cli import main
+
+sys.exit(main())
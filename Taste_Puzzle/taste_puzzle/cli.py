@@ -0,0 +1,478 @@
+"""Командная строка каталога рецептов без графического интерфейса.
+
+Запуск из корня проекта:
+    python -m taste_puzzle [--db ПУТЬ] команда [параметры]
+
+Команды чтения работают через sqlite3 напрямую и не импортируют ни Qt, ни
+SQLAlchemy, поэтому запуск занимает десятки миллисекунд. Импорт рецептов и
+bench используют слой данных приложения (src.database), который
+импортируется только для них; serve запускает поверх него HTTP/JSON сервис
+каталога (src.modules.catalog_server).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(PROJECT_ROOT, 'data', 'Taste_Pazzle.db')
+IMAGES_DIR = os.path.join(PROJECT_ROOT, 'img', 'recipe_img')
+EXPORT_FORMAT = 'taste_puzzle.recipes'
+EXPORT_VERSION = 1
+NUTRITION_COLUMNS = ('calories', 'proteins', 'fats', 'carbohydrates')
+
+RECIPE_LIST_SQL = """
+    SELECT r.id, r.name, d.name, c.name, r.cook_time, n.calories
+    FROM Recipes r
+    LEFT JOIN Dish_types d ON d.id = r.dish_type_id
+    LEFT JOIN Cuisines c ON c.id = r.cuisine_id
+    LEFT JOIN Nutrition n ON n.recipe_id = r.id
+"""
+RECIPE_LIST_FIELDS = ('id', 'name', 'dish_type', 'cuisine', 'cook_time', 'calories')
+# Рецепты, где есть ингредиент с названием по шаблону (LIKE)
+INGREDIENT_MATCH_SQL = """
+    SELECT ri.recipe_id FROM Recipe_ingredients ri
+    JOIN Ingredients i ON i.id = ri.ingredient_id
+    WHERE i.name LIKE ?
+"""
+
+
+class CliError(Exception):
+    """Ошибка, о которой достаточно сообщить одной строкой"""
+
+
+def connect(db_path, readonly=True):
+    """Подключение к существующей базе (командная строка новую базу не создает)"""
+    if not os.path.isfile(db_path):
+        raise CliError(f"База данных не найдена: {db_path}")
+    if readonly:
+        return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    return sqlite3.connect(db_path)
+
+
+def open_database(db_path):
+    """Слой данных приложения (импорт SQLAlchemy - только здесь). Схема базы
+    приводится к текущей версии так же, как при запуске приложения"""
+    if not os.path.isfile(db_path):
+        raise CliError(f"База данных не найдена: {db_path}")
+    sys.path.insert(0, PROJECT_ROOT)
+    from src.database import DataBase
+    return DataBase(db_path)
+
+
+def name_patterns(text):
+    """Шаблоны поиска по названию, как в главном окне: LIKE в SQLite не сравнивает
+    кириллицу без учета регистра, поэтому ищем и в нижнем, верхнем и заглавном виде"""
+    text = text.strip()
+    return list(dict.fromkeys(f"%{variant}%" for variant in (text, text.lower(), text.upper(), text.title())))
+
+
+def query_value(connection, sql):
+    """Первое значение запроса; None, если таблицы нет (база еще не открывалась новой версией приложения)"""
+    try:
+        return connection.execute(sql).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def print_recipes(rows, as_json):
+    if as_json:
+        print(json.dumps([dict(zip(RECIPE_LIST_FIELDS, row)) for row in rows], ensure_ascii=False, indent=2))
+        return
+    for recipe_id, name, dish_type, cuisine, cook_time, calories in rows:
+        details = [value for value in (dish_type, cuisine) if value]
+        if cook_time:
+            details.append(f"{cook_time} мин")
+        if calories is not None:
+            details.append(f"{calories} ккал")
+        print(f"{recipe_id:>6}  {name}" + (f"  ({', '.join(details)})" if details else ""))
+    print(f"Найдено: {len(rows)}", file=sys.stderr)
+
+
+def write_output(text, output):
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Сохранено в {output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+
+
+# ===== КОМАНДЫ =====
+
+def cmd_search(args):
+    patterns = name_patterns(args.text)
+    with closing(connect(args.db)) as connection:
+        rows = connection.execute(
+            RECIPE_LIST_SQL + " WHERE " + " OR ".join("r.name LIKE ?" for _ in patterns) +
+            " ORDER BY r.name, r.id LIMIT ?",
+            [*patterns, args.limit]
+        ).fetchall()
+    print_recipes(rows, args.json)
+
+
+def cmd_filter(args):
+    conditions, parameters = [], []
+    if args.dish_type:
+        conditions.append("d.name = ?")
+        parameters.append(args.dish_type)
+    if args.cuisine:
+        conditions.append("c.name = ?")
+        parameters.append(args.cuisine)
+    if args.max_time:
+        conditions.append("r.cook_time <= ?")
+        parameters.append(args.max_time)
+    if args.ingredient:
+        subqueries = [f"r.id IN ({INGREDIENT_MATCH_SQL})" for _ in args.ingredient]
+        if args.mode == 'all':
+            conditions.append(" AND ".join(subqueries))
+        elif args.mode == 'any':
+            conditions.append("(" + " OR ".join(subqueries) + ")")
+        else:
+            conditions.append("NOT (" + " OR ".join(subqueries) + ")")
+        parameters.extend(f"%{name.strip()}%" for name in args.ingredient)
+    for column in NUTRITION_COLUMNS:
+        for bound, operator in (('min', '>='), ('max', '<=')):
+            value = getattr(args, f"{bound}_{column}")
+            if value is not None:
+                conditions.append(f"n.{column} {operator} ?")
+                parameters.append(value)
+    if args.favorites or args.cooked:
+        if args.user is None:
+            raise CliError("--favorites и --cooked требуют --user")
+        if args.favorites:
+            conditions.append("r.id IN (SELECT recipe_id FROM Favorites WHERE user_id = ?)")
+            parameters.append(args.user)
+        if args.cooked:
+            conditions.append("r.id IN (SELECT recipe_id FROM cooked_recipes WHERE user_id = ?)")
+            parameters.append(args.user)
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    with closing(connect(args.db)) as connection:
+        rows = connection.execute(RECIPE_LIST_SQL + where + " ORDER BY r.name, r.id LIMIT ?",
+                                  [*parameters, args.limit]).fetchall()
+    print_recipes(rows, args.json)
+
+
+def load_recipes(connection, recipe_ids=None):
+    """Рецепты в формате экспорта: список словарей (по ID или весь каталог)"""
+    recipe_where, ingredient_where, parameters = "", "", []
+    if recipe_ids is not None:
+        placeholders = ', '.join('?' * len(recipe_ids))
+        recipe_where = f"WHERE r.id IN ({placeholders})"
+        ingredient_where = f"WHERE ri.recipe_id IN ({placeholders})"
+        parameters = list(recipe_ids)
+    rows = connection.execute(f"""
+        SELECT r.id, r.name, r.description, r.instruction, d.name, c.name, r.cook_time, r.servings, r.image,
+               n.calories, n.proteins, n.fats, n.carbohydrates, n.recipe_id IS NOT NULL
+        FROM Recipes r
+        LEFT JOIN Dish_types d ON d.id = r.dish_type_id
+        LEFT JOIN Cuisines c ON c.id = r.cuisine_id
+        LEFT JOIN Nutrition n ON n.recipe_id = r.id
+        {recipe_where}
+        ORDER BY r.id
+    """, parameters).fetchall()
+
+    ingredients = {}
+    for recipe_id, name, quantity in connection.execute(f"""
+        SELECT ri.recipe_id, i.name, ri.quantity FROM Recipe_ingredients ri
+        JOIN Ingredients i ON i.id = ri.ingredient_id
+        {ingredient_where}
+        ORDER BY ri.recipe_id, i.name
+    """, parameters):
+        ingredients.setdefault(recipe_id, []).append({'name': name, 'quantity': quantity})
+
+    recipes = []
+    for row in rows:
+        recipe_id, name, description, instruction, dish_type, cuisine, cook_time, servings, image = row[:9]
+        recipes.append({
+            'id': recipe_id,
+            'name': name,
+            'description': description,
+            'instruction': instruction,
+            'dish_type': dish_type,
+            'cuisine': cuisine,
+            'cook_time': cook_time,
+            'servings': servings,
+            'ingredients': ingredients.get(recipe_id, []),
+            'nutrition': dict(zip(NUTRITION_COLUMNS, row[9:13])) if row[13] else None,
+            'image': os.path.join(IMAGES_DIR, *image.split('/')) if image else None,
+        })
+    return recipes
+
+
+def cmd_show(args):
+    with closing(connect(args.db)) as connection:
+        recipes = load_recipes(connection, [args.recipe_id])
+    if not recipes:
+        raise CliError(f"Рецепт {args.recipe_id} не найден")
+    recipe = recipes[0]
+    if args.json:
+        print(json.dumps(recipe, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{recipe['name']} (#{recipe['id']})")
+    details = [value for value in (recipe['dish_type'], recipe['cuisine']) if value]
+    if recipe['cook_time']:
+        details.append(f"{recipe['cook_time']} мин")
+    if recipe['servings']:
+        details.append(f"порций: {recipe['servings']}")
+    if details:
+        print(", ".join(details))
+    nutrition = recipe['nutrition']
+    if nutrition:
+        print("КБЖУ на порцию: " + " / ".join("—" if nutrition[column] is None else f"{nutrition[column]:g}"
+                                              for column in NUTRITION_COLUMNS))
+    if recipe['description']:
+        print(f"\n{recipe['description']}")
+    if recipe['ingredients']:
+        print("\nИнгредиенты:")
+        for ingredient in recipe['ingredients']:
+            print(f"  • {ingredient['name']}: {ingredient['quantity']}")
+    if recipe['instruction']:
+        print(f"\nПриготовление:\n{recipe['instruction']}")
+    if recipe['image']:
+        print(f"\nИзображение: {recipe['image']}")
+
+
+def cmd_export(args):
+    with closing(connect(args.db)) as connection:
+        recipes = load_recipes(connection, args.ids or None)
+    document = {'format': EXPORT_FORMAT, 'version': EXPORT_VERSION, 'recipes': recipes}
+    write_output(json.dumps(document, ensure_ascii=False, indent=2) + "\n", args.output)
+    print(f"Экспортировано рецептов: {len(recipes)}", file=sys.stderr)
+
+
+def cmd_import(args):
+    with open(args.file, encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('format') != EXPORT_FORMAT or document.get('version') != EXPORT_VERSION:
+        raise CliError(f"{args.file}: ожидается файл экспорта {EXPORT_FORMAT} версии {EXPORT_VERSION}")
+
+    base_dir = os.path.dirname(os.path.abspath(args.file))
+    recipes = []
+    for recipe in document.get('recipes', []):
+        recipe = dict(recipe)
+        if not recipe.get('name'):
+            raise CliError(f"{args.file}: у рецепта нет названия")
+        image = recipe.get('image')
+        if image:
+            image = os.path.join(base_dir, image)  # абсолютный путь join не меняет
+            recipe['image'] = image if os.path.isfile(image) else None
+        recipes.append(recipe)
+
+    db = open_database(args.db)
+    try:
+        recipe_ids = db.import_recipes(args.user, recipes)
+    finally:
+        db.engine.dispose()
+    if recipe_ids is None:
+        raise CliError("Импорт не выполнен, база не изменилась")
+    print(f"Импортировано рецептов: {len(recipe_ids)}")
+
+
+def cmd_cart_export(args):
+    sys.path.insert(0, PROJECT_ROOT)
+    from src.modules.cart_export import format_shopping_list
+
+    with closing(connect(args.db)) as connection:
+        items = [{'name': name, 'quantity': quantity, 'unit': unit} for name, quantity, unit in connection.execute(
+            "SELECT ingredient_name, quantity, unit FROM cart WHERE user_id = ? ORDER BY id", (args.user,)
+        )]
+    if not items:
+        raise CliError(f"Корзина пользователя {args.user} пуста")
+    write_output(format_shopping_list(items), args.output)
+
+
+def cmd_stats(args):
+    counts = {
+        'Рецептов': "SELECT COUNT(*) FROM Recipes",
+        'с изображением': "SELECT COUNT(*) FROM Recipes WHERE image IS NOT NULL AND image != ''",
+        'с КБЖУ': "SELECT COUNT(*) FROM Nutrition",
+        'Ингредиентов': "SELECT COUNT(*) FROM Ingredients",
+        'Пользователей': "SELECT COUNT(*) FROM Users",
+        'В избранном': "SELECT COUNT(*) FROM Favorites",
+        'Приготовлено': "SELECT COUNT(*) FROM cooked_recipes",
+        'В корзинах': "SELECT COUNT(*) FROM cart",
+        'Файлов изображений': "SELECT COUNT(*) FROM images",
+    }
+    with closing(connect(args.db)) as connection:
+        stats = {label: query_value(connection, sql) for label, sql in counts.items()}
+        image_bytes = query_value(connection, "SELECT COALESCE(SUM(size), 0) FROM images")
+        page_size = query_value(connection, "PRAGMA page_size")
+        free_pages = query_value(connection, "PRAGMA freelist_count")
+    stats['Объем изображений, МБ'] = None if image_bytes is None else round(image_bytes / 2 ** 20, 1)
+    stats['Размер базы, МБ'] = round(os.path.getsize(args.db) / 2 ** 20, 1)
+    stats['Свободно в базе, МБ'] = round(page_size * free_pages / 2 ** 20, 1)
+
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    for label, value in stats.items():
+        print(f"{label:<24}{'—' if value is None else value}")
+
+
+def cmd_vacuum(args):
+    size = os.path.getsize(args.db)
+    start = time.perf_counter()
+    connection = connect(args.db, readonly=False)
+    try:
+        connection.execute("VACUUM")
+        connection.execute("PRAGMA optimize")
+    finally:
+        connection.close()
+    print(f"VACUUM за {time.perf_counter() - start:.2f} с: {size / 2 ** 20:.1f} МБ -> "
+          f"{os.path.getsize(args.db) / 2 ** 20:.1f} МБ")
+
+
+def cmd_reindex(args):
+    start = time.perf_counter()
+    connection = connect(args.db, readonly=False)
+    try:
+        connection.execute("REINDEX")
+        connection.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"Индексы перестроены, статистика планировщика обновлена за {time.perf_counter() - start:.2f} с")
+
+
+def cmd_bench(args):
+    """Замеряет типовые запросы главного окна через слой данных приложения"""
+    with closing(connect(args.db)) as connection:
+        user_id = connection.execute("SELECT MIN(id) FROM Users").fetchone()[0] or 1
+        recipe_id = connection.execute("SELECT MIN(id) FROM Recipes").fetchone()[0]
+        ingredient = connection.execute("""
+            SELECT i.name FROM Recipe_ingredients ri JOIN Ingredients i ON i.id = ri.ingredient_id
+            GROUP BY ri.ingredient_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()
+    if recipe_id is None:
+        raise CliError("В базе нет рецептов")
+
+    start = time.perf_counter()
+    db = open_database(args.db)
+    print(f"Подключение слоя данных: {(time.perf_counter() - start) * 1000:.0f} мс")
+    checks = {
+        "все рецепты": lambda: db.get_recipes_with_filters(user_id),
+        "поиск по названию": lambda: db.get_recipes_with_filters(user_id, name_filter="са"),
+        "до 30 минут": lambda: db.get_recipes_with_filters(user_id, max_time=30),
+        "по ингредиенту": lambda: db.get_recipes_with_filters(user_id, ingredient_filter=[ingredient[0]]),
+        "избранное": lambda: db.get_recipes_with_filters(user_id, favorites_only=True),
+        "счетчики фильтров": lambda: db.get_filter_facets(user_id),
+        "рецепт по ID": lambda: (db.get_recipe_by_id(recipe_id), db.get_recipe_ingredients(recipe_id)),
+    }
+    if ingredient is None:
+        del checks["по ингредиенту"]
+
+    results = {}
+    try:
+        for label, check in checks.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                check()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[label] = {'median_ms': round(timings[len(timings) // 2], 2),
+                              'max_ms': round(timings[-1], 2)}
+    finally:
+        db.engine.dispose()
+
+    slow = [label for label, result in results.items()
+            if args.max_ms is not None and result['median_ms'] > args.max_ms]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for label, result in results.items():
+            mark = "  МЕДЛЕННО" if label in slow else ""
+            print(f"{label:<20} медиана {result['median_ms']:8.2f} мс, максимум {result['max_ms']:8.2f} мс{mark}")
+    if slow:
+        raise CliError(f"Медиана больше {args.max_ms} мс: {', '.join(slow)}")
+
+
+# ===== РАЗБОР АРГУМЕНТОВ =====
+
+def cmd_serve(args):
+    """Сервис каталога для нескольких терминалов (окно подключается через --server)"""
+    if not os.path.isfile(args.db):
+        raise CliError(f"База данных не найдена: {args.db}")
+    sys.path.insert(0, PROJECT_ROOT)
+    from src.modules.catalog_server import serve
+
+    serve(args.host, args.port, args.db, args.verbose)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m taste_puzzle",
+                                     description="Операции с каталогом рецептов «Пазл Вкусов» без интерфейса")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"путь к базе данных (по умолчанию {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='команда')
+
+    def command(name, handler, help_text, json_output=False):
+        subparser = commands.add_parser(name, help=help_text, description=help_text)
+        subparser.set_defaults(handler=handler)
+        if json_output:
+            subparser.add_argument('--json', action='store_true', help="вывод в JSON")
+        return subparser
+
+    search = command('search', cmd_search, "поиск рецептов по названию", json_output=True)
+    search.add_argument('text', help="часть названия")
+    search.add_argument('--limit', type=int, default=50)
+
+    filter_ = command('filter', cmd_filter, "отбор рецептов по фильтрам главного окна", json_output=True)
+    filter_.add_argument('--dish-type', help="тип блюда")
+    filter_.add_argument('--cuisine', help="кухня")
+    filter_.add_argument('--max-time', type=int, help="время приготовления не больше, минут")
+    filter_.add_argument('--ingredient', action='append', help="ингредиент (можно повторять)")
+    filter_.add_argument('--mode', choices=('all', 'any', 'none'), default='all',
+                         help="все ингредиенты, хотя бы один или ни одного")
+    for column in NUTRITION_COLUMNS:
+        filter_.add_argument(f'--min-{column}', type=float)
+        filter_.add_argument(f'--max-{column}', type=float)
+    filter_.add_argument('--user', type=int, help="пользователь для --favorites и --cooked")
+    filter_.add_argument('--favorites', action='store_true', help="только избранное")
+    filter_.add_argument('--cooked', action='store_true', help="только приготовленные")
+    filter_.add_argument('--limit', type=int, default=50)
+
+    show = command('show', cmd_show, "рецепт целиком", json_output=True)
+    show.add_argument('recipe_id', type=int)
+
+    import_ = command('import', cmd_import, "импорт рецептов из файла экспорта (одной транзакцией)")
+    import_.add_argument('file')
+    import_.add_argument('--user', type=int, required=True, help="автор импортируемых рецептов")
+
+    export = command('export', cmd_export, "экспорт рецептов в JSON")
+    export.add_argument('ids', nargs='*', type=int, help="ID рецептов (по умолчанию все)")
+    export.add_argument('-o', '--output', help="файл (по умолчанию stdout)")
+
+    cart_export = command('cart-export', cmd_cart_export, "список покупок из корзины пользователя")
+    cart_export.add_argument('--user', type=int, required=True)
+    cart_export.add_argument('-o', '--output', help="файл (по умолчанию stdout)")
+
+    command('stats', cmd_stats, "размеры каталога и базы", json_output=True)
+    command('vacuum', cmd_vacuum, "сжатие файла базы (VACUUM)")
+    command('reindex', cmd_reindex, "перестроение индексов и обновление статистики (REINDEX, ANALYZE)")
+
+    bench = command('bench', cmd_bench, "замер типовых запросов главного окна", json_output=True)
+    bench.add_argument('--repeat', type=int, default=5)
+    bench.add_argument('--max-ms', type=float, help="код возврата 1, если медиана запроса больше")
+
+    serve = command('serve', cmd_serve, "HTTP/JSON сервис каталога для нескольких терминалов")
+    serve.add_argument('--host', default='127.0.0.1', help="адрес (0.0.0.0 - доступ из локальной сети)")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--verbose', action='store_true', help="печатать каждый запрос")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.db = os.path.abspath(args.db)
+    try:
+        args.handler(args)
+    except (CliError, sqlite3.Error, OSError, json.JSONDecodeError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    return 0